@@ -0,0 +1,383 @@
+# benchmarks/e2e.py
+"""
+End-to-end benchmarks against the mock Gemini upstream.
+
+Each scenario starts the mock upstream in a child process, drives one entry
+point (GeminiHandler, GeminiServer over HTTP, or the v2 gateway) and reports
+requests/s, p50/p95/p99 latency, CPU per request and memory.
+
+    python -m benchmarks.e2e --output results.json
+    python -m benchmarks.e2e --baseline results.json --threshold 0.10
+
+With --baseline the run exits with status 1 if any scenario regressed by more
+than the threshold (throughput, p95/p99 latency or CPU per request).
+"""
+import argparse
+import importlib.util
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+import httpx
+import yaml
+
+from benchmarks.harness import (
+    BenchmarkResult, MockUpstreamProcess, ProcessStats, ThreadedServer, compare, format_table,
+    free_port, load_results, percentile, run_load, save_results, wait_for_http
+)
+from gemini_handler.config import genai_client_options
+from gemini_handler.data_models import Strategy
+from gemini_handler.gemini_handler import GeminiHandler
+from gemini_handler.proxy import ProxyManager
+from gemini_handler.server import GeminiServer
+
+MODEL = "gemini-2.0-flash"
+PROMPT = "Summarize the benefits of connection pooling in two sentences."
+V2_GATEWAY_DIR = Path(__file__).resolve().parent.parent / "v2" / "test"
+
+
+def _keys(count: int) -> List[str]:
+    return [f"bench-key-{i:05d}" for i in range(count)]
+
+
+def _handler(keys: List[str], endpoint: str, **kwargs) -> GeminiHandler:
+    handler = GeminiHandler(api_keys=keys, proxy_settings=None, api_endpoint=endpoint, **kwargs)
+    # The benchmark measures the client side, not the local per-key quota
+    handler.key_manager.rate_limit = 10 ** 9
+    return handler
+
+
+@contextmanager
+def _no_proxy_for_localhost() -> Iterator[None]:
+    """Let rotated (unreachable) proxies be applied without routing local traffic through them."""
+    saved = {name: os.environ.get(name) for name in ("NO_PROXY", "no_proxy", "HTTP_PROXY", "HTTPS_PROXY")}
+    os.environ["NO_PROXY"] = os.environ["no_proxy"] = "127.0.0.1,localhost"
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+# --- Scenarios ---
+
+def scenario_handler_many_keys(args: argparse.Namespace) -> BenchmarkResult:
+    """GeminiHandler.generate_content rotating over many keys."""
+    with MockUpstreamProcess(latency_ms=args.latency_ms) as mock:
+        handler = _handler(_keys(args.keys), mock.url)
+
+        def call(_: int) -> bool:
+            return handler.generate_content(PROMPT, model_name=MODEL, use_cache=False)["success"]
+
+        result = run_load("handler_many_keys", call, args.requests, args.concurrency, warmup=args.warmup)
+        result.extra["keys"] = args.keys
+        return result
+
+
+def scenario_handler_429_storm(args: argparse.Namespace) -> BenchmarkResult:
+    """A share of keys always answers 429; the retry strategy has to route around them."""
+    keys = _keys(args.keys)
+    storm_keys = keys[:int(len(keys) * args.storm_fraction)]
+    with MockUpstreamProcess(latency_ms=args.latency_ms, rate_limited_keys=storm_keys) as mock:
+        handler = _handler(keys, mock.url, content_strategy=Strategy.RETRY)
+        handler.config.retry_delay = 0
+        handler.config.max_retries = max(handler.config.max_retries, 10)
+        attempts: List[int] = []
+
+        def call(_: int) -> bool:
+            result = handler.generate_content(PROMPT, model_name=MODEL, use_cache=False)
+            attempts.append(result.get("attempts") or 0)
+            return result["success"]
+
+        result = run_load("handler_429_storm", call, args.requests, args.concurrency, warmup=args.warmup)
+        result.extra.update({
+            "keys": len(keys),
+            "rate_limited_keys": len(storm_keys),
+            "mean_attempts": round(sum(attempts) / len(attempts), 3) if attempts else None,
+            "upstream_429": mock.stats().get("status_429", 0)
+        })
+        return result
+
+
+def _server_chat(args: argparse.Namespace, scenario: str, proxies: List[str]) -> BenchmarkResult:
+    with MockUpstreamProcess(latency_ms=args.latency_ms) as mock:
+        server = GeminiServer(
+            api_keys=_keys(args.keys),
+            proxy_settings={"http": proxies[0], "https": proxies[0]} if proxies else None,
+            api_endpoint=mock.url,
+            rate_limit=10 ** 9
+        )
+        body = {"model": MODEL, "messages": [
+            {"role": "system", "content": "You are terse."},
+            {"role": "user", "content": PROMPT}
+        ]}
+        stop = threading.Event()
+        churned = itertools.count()
+
+        def churn() -> None:
+            for proxy in itertools.cycle(proxies):
+                if stop.wait(args.churn_interval_ms / 1000.0):
+                    return
+                ProxyManager.configure_proxy({"http": proxy, "https": proxy})
+                next(churned)
+
+        with ThreadedServer(server.app) as running, httpx.Client(
+            base_url=running.url,
+            trust_env=False,
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=args.concurrency)
+        ) as client:
+
+            def call(_: int) -> bool:
+                return client.post("/v1/chat/completions", json=body).status_code == 200
+
+            churner = threading.Thread(target=churn, daemon=True) if proxies else None
+            if churner:
+                churner.start()
+            try:
+                result = run_load(scenario, call, args.requests, args.concurrency, warmup=args.warmup)
+            finally:
+                stop.set()
+                if churner:
+                    churner.join()
+                if proxies:
+                    ProxyManager.configure_proxy(None)
+
+        if proxies:
+            result.extra.update({"proxy_pool": len(proxies), "proxy_reconfigurations": next(churned)})
+        result.extra["keys"] = args.keys
+        return result
+
+
+def scenario_server_chat(args: argparse.Namespace) -> BenchmarkResult:
+    """OpenAI-compatible /v1/chat/completions on GeminiServer over HTTP."""
+    return _server_chat(args, "server_chat", [])
+
+
+def scenario_server_proxy_churn(args: argparse.Namespace) -> BenchmarkResult:
+    """
+    /v1/chat/completions while the proxy configuration is replaced continuously.
+
+    The server rotates the proxy on every request; the pool points at
+    unroutable addresses and NO_PROXY keeps traffic to the local mock direct,
+    so the scenario measures proxy bookkeeping, not proxy hops.
+    """
+    proxies = [f"http://10.255.{i // 250}.{i % 250 + 1}:3128" for i in range(args.proxies)]
+    with _no_proxy_for_localhost():
+        return _server_chat(args, "server_proxy_churn", proxies)
+
+
+def scenario_stream(args: argparse.Namespace) -> BenchmarkResult:
+    """
+    streamGenerateContent (SSE) with per-call key rotation from the handler's KeyRotationManager.
+
+    GeminiHandler and GeminiServer do not stream yet, so calls go through the
+    google.genai client the handler already depends on; time to first chunk
+    is reported in extra.
+    """
+    from google import genai
+
+    with MockUpstreamProcess(
+        latency_ms=args.latency_ms,
+        stream_chunks=args.stream_chunks,
+        stream_chunk_interval_ms=args.stream_chunk_interval_ms
+    ) as mock:
+        handler = _handler(_keys(args.keys), mock.url)
+        # One client per key, built up front: client construction is not part of a request
+        clients = {
+            key: genai.Client(api_key=key, **genai_client_options(mock.url)) for key in handler.api_keys
+        }
+        first_chunk: List[float] = []
+        chunk_counts: List[int] = []
+
+        def call(_: int) -> bool:
+            api_key, key_index = handler.key_manager.get_next_key()
+            start = time.perf_counter()
+            chunks = 0
+            for chunk in clients[api_key].models.generate_content_stream(model=MODEL, contents=PROMPT):
+                if chunks == 0:
+                    first_chunk.append(time.perf_counter() - start)
+                chunks += 1
+            handler.key_manager.mark_success(key_index)
+            chunk_counts.append(chunks)
+            return chunks > 0
+
+        result = run_load("stream", call, args.requests, args.concurrency, warmup=args.warmup)
+        if first_chunk:
+            result.extra["time_to_first_chunk_p50_ms"] = round(percentile(sorted(first_chunk), 50) * 1000.0, 3)
+        if chunk_counts:
+            result.extra["mean_chunks_per_response"] = round(sum(chunk_counts) / len(chunk_counts), 2)
+        return result
+
+
+def scenario_embeddings_large(args: argparse.Namespace) -> BenchmarkResult:
+    """generate_embeddings on thousands of texts per call, returned as one numpy array."""
+    with MockUpstreamProcess(latency_ms=args.latency_ms) as mock:
+        handler = _handler(_keys(args.keys), mock.url)
+        texts = [f"Document {i}: " + "lorem ipsum dolor sit amet " * 8 for i in range(args.embedding_texts)]
+
+        def call(_: int) -> bool:
+            result = handler.generate_embeddings(texts, output_format="numpy")
+            return result["success"] and result["embeddings"].shape[0] == len(texts)
+
+        result = run_load("embeddings_large", call, args.embedding_calls, 1, warmup=1 if args.warmup else 0)
+        result.extra.update({
+            "texts_per_call": len(texts),
+            "texts_per_second": round(len(texts) * result.requests_per_second, 1)
+        })
+        return result
+
+
+def _v2_gateway(args: argparse.Namespace, scenario: str, stream: bool) -> BenchmarkResult:
+    if importlib.util.find_spec("swiftshadow") is None:
+        return BenchmarkResult(scenario=scenario, skipped="v2 gateway needs swiftshadow (pip install swiftshadow)")
+
+    server_key = "bench-server-key"
+    with MockUpstreamProcess(
+        latency_ms=args.latency_ms,
+        stream_chunks=args.stream_chunks,
+        stream_chunk_interval_ms=args.stream_chunk_interval_ms
+    ) as mock, tempfile.TemporaryDirectory() as workdir:
+        keys = _keys(args.keys)
+        # The gateway reads config.yaml from its working directory
+        Path(workdir, "config.yaml").write_text(yaml.safe_dump({
+            "server_settings": {"server_key": server_key, "host": "127.0.0.1", "port": 0},
+            "gemini": {"base_url": mock.url, "api_keys": keys},
+            "proxy_settings": {"auto_update_interval_seconds": 3600, "max_proxies": 1},
+            # No proxies and no retries: every request goes direct to the mock
+            "retry_settings": {"max_request_retries": 0, "fallback_to_direct_on_failure": True, "retry_delay_seconds": 0},
+            "health_check_settings": {"enabled": False, "health_check_api_key": keys[0]}
+        }))
+        port = free_port()
+        env = dict(os.environ, NO_PROXY="127.0.0.1,localhost", no_proxy="127.0.0.1,localhost")
+        # The gateway logs every request at INFO; a file keeps it from blocking on a full pipe
+        log_path = Path(workdir, "gateway.log")
+        with open(log_path, "wb") as log_file:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "gemini_gateway:app", "--app-dir", str(V2_GATEWAY_DIR),
+                 "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=log_file
+            )
+        try:
+            try:
+                wait_for_http(f"http://127.0.0.1:{port}/_gateway/health", process=process)
+            except RuntimeError as e:
+                last_line = (log_path.read_text(errors="replace").strip().splitlines() or [""])[-1]
+                return BenchmarkResult(scenario=scenario, skipped=f"{e}: {last_line}")
+
+            action = "streamGenerateContent" if stream else "generateContent"
+            params = {"key": server_key, **({"alt": "sse"} if stream else {})}
+            body = {"contents": [{"role": "user", "parts": [{"text": PROMPT}]}]}
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", trust_env=False, timeout=60.0,
+                              limits=httpx.Limits(max_connections=args.concurrency)) as client:
+
+                def call(_: int) -> bool:
+                    response = client.post(f"/v1beta/models/{MODEL}:{action}", params=params, json=body)
+                    return response.status_code == 200
+
+                probe = client.post(f"/v1beta/models/{MODEL}:{action}", params=params, json=body)
+                if probe.status_code != 200:
+                    # e.g. the gateway passes proxies= to httpx, which httpx 0.28 removed
+                    return BenchmarkResult(
+                        scenario=scenario,
+                        skipped=f"gateway answered {probe.status_code}: {probe.text[:200]}"
+                    )
+
+                result = run_load(scenario, call, args.requests, args.concurrency,
+                                  warmup=args.warmup, process=ProcessStats(process.pid))
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+        result.extra["measured_process"] = "gateway"
+        return result
+
+
+def scenario_v2_gateway(args: argparse.Namespace) -> BenchmarkResult:
+    """v2/test/gemini_gateway.py forwarding generateContent to the mock."""
+    return _v2_gateway(args, "v2_gateway", stream=False)
+
+
+def scenario_v2_gateway_stream(args: argparse.Namespace) -> BenchmarkResult:
+    """v2/test/gemini_gateway.py passing an SSE stream through."""
+    return _v2_gateway(args, "v2_gateway_stream", stream=True)
+
+
+SCENARIOS: Dict[str, Callable[[argparse.Namespace], BenchmarkResult]] = {
+    "handler_many_keys": scenario_handler_many_keys,
+    "handler_429_storm": scenario_handler_429_storm,
+    "server_chat": scenario_server_chat,
+    "server_proxy_churn": scenario_server_proxy_churn,
+    "stream": scenario_stream,
+    "embeddings_large": scenario_embeddings_large,
+    "v2_gateway": scenario_v2_gateway,
+    "v2_gateway_stream": scenario_v2_gateway_stream,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks against the mock Gemini upstream")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests before each scenario")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Mock upstream latency")
+    parser.add_argument("--keys", type=int, default=500, help="API keys per scenario")
+    parser.add_argument("--storm-fraction", type=float, default=0.5, help="Share of keys always answering 429")
+    parser.add_argument("--proxies", type=int, default=200, help="Proxy pool size for server_proxy_churn")
+    parser.add_argument("--churn-interval-ms", type=float, default=5.0, help="Delay between proxy reconfigurations")
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    parser.add_argument("--stream-chunk-interval-ms", type=float, default=5.0)
+    parser.add_argument("--embedding-texts", type=int, default=5000, help="Texts per embeddings_large call")
+    parser.add_argument("--embedding-calls", type=int, default=3, help="Measured embeddings_large calls")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    results = []
+    for name in names:
+        print(f"Running {name}...", file=sys.stderr, flush=True)
+        try:
+            results.append(SCENARIOS[name](args))
+        except Exception as e:
+            results.append(BenchmarkResult(scenario=name, skipped=f"failed: {type(e).__name__}: {e}"))
+
+    save_results(
+        results, args.output,
+        requests=args.requests, concurrency=args.concurrency, latency_ms=args.latency_ms, keys=args.keys
+    )
+    print(format_table(results))
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(load_results(args.baseline), {r.scenario: vars(r) for r in results}, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
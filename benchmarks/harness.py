@@ -0,0 +1,424 @@
+# benchmarks/harness.py
+"""Load generation, resource measurement and result comparison for the benchmark suite."""
+import datetime
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import requests
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESULTS_VERSION = 1
+
+
+@dataclass
+class BenchmarkResult:
+    """Measurements of one scenario run."""
+    scenario: str
+    requests: int = 0
+    concurrency: int = 0
+    successes: int = 0
+    errors: int = 0
+    duration_s: float = 0.0
+    requests_per_second: float = 0.0
+    latency_ms: Dict[str, float] = field(default_factory=dict)  # mean, p50, p95, p99, max
+    cpu_ms_per_request: Optional[float] = None
+    rss_mb: Optional[float] = None  # Resident memory after the run
+    peak_rss_mb: Optional[float] = None
+    extra: Dict[str, Any] = field(default_factory=dict)  # Scenario-specific numbers
+    skipped: Optional[str] = None  # Reason the scenario could not run
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """
+    Linear-interpolated percentile of already sorted values.
+
+    Args:
+        sorted_values: Values in ascending order
+        q: Percentile in [0, 100]
+    """
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize_latencies(latencies_s: Sequence[float]) -> Dict[str, float]:
+    """Mean, p50, p95, p99 and max in milliseconds."""
+    values = sorted(v * 1000.0 for v in latencies_s)
+    if not values:
+        return {}
+    return {
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3)
+    }
+
+
+# --- Resource usage ---
+
+def _rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Current resident set size from /proc (None where unavailable)."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class ProcessStats:
+    """CPU time and memory of another process, read from /proc (Linux only)."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+
+    def cpu_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                # Fields after the parenthesised command name; utime and stime are 14 and 15
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError, AttributeError):
+            return None
+
+    def rss_mb(self) -> Optional[float]:
+        return _rss_mb(self.pid)
+
+    def peak_rss_mb(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+
+# --- Load generation ---
+
+def run_load(
+    scenario: str,
+    call: Callable[[int], bool],
+    total: int,
+    concurrency: int,
+    warmup: int = 0,
+    process: Optional[ProcessStats] = None
+) -> BenchmarkResult:
+    """
+    Run call(i) total times from concurrency threads and measure it.
+
+    Args:
+        scenario: Scenario name stored in the result
+        call: Performs request i; returns True on success (exceptions count as errors)
+        total: Number of measured calls
+        concurrency: Worker threads
+        warmup: Unmeasured calls made first (connection setup, imports, JIT caches)
+        process: Measure CPU and memory of this process instead of the current one
+                 (for targets running out of process)
+
+    Returns:
+        BenchmarkResult with throughput, latency percentiles, CPU per request and memory
+    """
+    for i in range(warmup):
+        try:
+            call(-1 - i)
+        except Exception:
+            pass
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    next_index = iter(range(total))
+
+    def worker() -> None:
+        while True:
+            with lock:
+                index = next(next_index, None)
+            if index is None:
+                return
+            start = time.perf_counter()
+            try:
+                ok = call(index)
+                error = None if ok else "call returned failure"
+            except Exception as e:
+                ok = False
+                error = f"{type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors.append(error)
+
+    cpu_start = process.cpu_seconds() if process else time.process_time()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    duration = time.perf_counter() - wall_start
+    cpu_end = process.cpu_seconds() if process else time.process_time()
+
+    cpu_ms = None
+    if cpu_start is not None and cpu_end is not None and total:
+        cpu_ms = round((cpu_end - cpu_start) * 1000.0 / total, 3)
+
+    result = BenchmarkResult(
+        scenario=scenario,
+        requests=total,
+        concurrency=concurrency,
+        successes=total - len(errors),
+        errors=len(errors),
+        duration_s=round(duration, 4),
+        requests_per_second=round(total / duration, 2) if duration > 0 else 0.0,
+        latency_ms=summarize_latencies(latencies),
+        cpu_ms_per_request=cpu_ms,
+        rss_mb=process.rss_mb() if process else _rss_mb(),
+        peak_rss_mb=process.peak_rss_mb() if process else _peak_rss_mb()
+    )
+    if errors:
+        result.extra["first_error"] = errors[0][:300]
+    return result
+
+
+# --- Servers ---
+
+def free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_http(url: str, timeout: float = 20.0, process: Optional[subprocess.Popen] = None) -> None:
+    """Poll url until it answers (any status) or raise RuntimeError."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} before {url} was ready")
+        try:
+            requests.get(url, timeout=1.0)
+            return
+        except requests.RequestException:
+            time.sleep(0.05)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+class ThreadedServer:
+    """Serve an ASGI app with uvicorn in a background thread of this process."""
+
+    def __init__(self, app: Any, host: str = "127.0.0.1"):
+        import uvicorn
+
+        self.host = host
+        self.port = free_port(host)
+        self._server = uvicorn.Server(uvicorn.Config(app, host=host, port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, name="benchmark-server", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self) -> "ThreadedServer":
+        self._thread.start()
+        deadline = time.monotonic() + 20.0
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Benchmark server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+class MockUpstreamProcess:
+    """
+    The mock Gemini upstream in a child process.
+
+    Running it out of process keeps its CPU time and memory out of the
+    numbers measured for the client side.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", **settings: Any):
+        """
+        Args:
+            host: Interface to bind
+            **settings: MockUpstreamConfig fields applied after start
+        """
+        self.host = host
+        self.port = free_port(host)
+        self.settings = settings
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def configure(self, **settings: Any) -> None:
+        requests.post(f"{self.url}/mock/config", json=settings, timeout=5).raise_for_status()
+
+    def stats(self) -> Dict[str, int]:
+        return requests.get(f"{self.url}/mock/stats", timeout=5).json()
+
+    def __enter__(self) -> "MockUpstreamProcess":
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gemini_handler.mock_upstream", "--host", self.host, "--port", str(self.port)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_for_http(f"{self.url}/mock/stats", process=self.process)
+            if self.settings:
+                self.configure(**self.settings)
+        except Exception:
+            self.__exit__()
+            raise
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+
+
+# --- Results ---
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5, cwd=Path(__file__).resolve().parent
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save_results(results: List[Any], path: Union[str, Path], **settings: Any) -> Dict[str, Any]:
+    """
+    Write results and run metadata as JSON.
+
+    Args:
+        results: Result dataclasses (BenchmarkResult or MicroResult)
+        path: Output file
+        **settings: Run settings recorded in the metadata (requests, concurrency, ...)
+
+    Returns:
+        The written document
+    """
+    document = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            **settings
+        },
+        "results": [asdict(r) for r in results]
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, indent=2))
+    return document
+
+
+def load_results(path: Union[str, Path], key: str = "scenario") -> Dict[str, Dict[str, Any]]:
+    """Load a results file as {result[key]: result dict}."""
+    document = json.loads(Path(path).read_text())
+    return {r[key]: r for r in document.get("results", [])}
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    threshold: float = 0.10
+) -> List[str]:
+    """
+    Find regressions of current against baseline.
+
+    A scenario regresses when its throughput drops, or its p95/p99 latency or
+    CPU per request grows, by more than threshold (relative). Scenarios that
+    are missing or skipped on either side are ignored.
+
+    Args:
+        baseline: {scenario: result dict} from load_results
+        current: {scenario: result dict}
+        threshold: Allowed relative change, e.g. 0.10 for 10%
+
+    Returns:
+        One human-readable line per regression (empty if none)
+    """
+    regressions = []
+    for scenario, new in current.items():
+        old = baseline.get(scenario)
+        if not old or old.get("skipped") or new.get("skipped"):
+            continue
+
+        old_rps, new_rps = old.get("requests_per_second") or 0, new.get("requests_per_second") or 0
+        if old_rps > 0 and new_rps < old_rps * (1 - threshold):
+            regressions.append(
+                f"{scenario}: throughput {old_rps:.1f} -> {new_rps:.1f} req/s ({new_rps / old_rps - 1:+.1%})"
+            )
+
+        checks = [
+            (f"p{q} latency", (old.get("latency_ms") or {}).get(f"p{q}"), (new.get("latency_ms") or {}).get(f"p{q}"), "ms")
+            for q in (95, 99)
+        ]
+        checks.append(("CPU per request", old.get("cpu_ms_per_request"), new.get("cpu_ms_per_request"), "ms"))
+        for name, old_value, new_value, unit in checks:
+            if old_value and new_value is not None and new_value > old_value * (1 + threshold):
+                regressions.append(
+                    f"{scenario}: {name} {old_value:.2f} -> {new_value:.2f} {unit} ({new_value / old_value - 1:+.1%})"
+                )
+    return regressions
+
+
+def format_table(results: List[BenchmarkResult]) -> str:
+    """Plain-text summary table of results."""
+    header = f"{'scenario':<22} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cpu ms/req':>11} {'rss MB':>8} {'errors':>7}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        if r.skipped:
+            lines.append(f"{r.scenario:<22} skipped: {r.skipped}")
+            continue
+
+        def number(value: Optional[float], width: int) -> str:
+            return f"{value:>{width}.2f}" if value is not None else f"{'-':>{width}}"
+
+        lines.append(
+            f"{r.scenario:<22} {number(r.requests_per_second, 9)} {number(r.latency_ms.get('p50'), 9)} "
+            f"{number(r.latency_ms.get('p95'), 9)} {number(r.latency_ms.get('p99'), 9)} "
+            f"{number(r.cpu_ms_per_request, 11)} {number(r.rss_mb, 8)} {r.errors:>7}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,173 @@
+# benchmarks/import_time.py
+"""
+Cold-start benchmark: how long importing gemini_handler takes.
+
+Each statement runs in a fresh interpreter several times. Wall time is the
+whole subprocess minus a bare ``python -c pass``; the module breakdown comes
+from ``python -X importtime`` (cumulative microseconds per top-level import).
+
+    python -m benchmarks.import_time --output import-results.json
+    python -m benchmarks.import_time --baseline import-results.json --threshold 0.2
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from benchmarks.harness import load_results, save_results
+
+STATEMENTS = {
+    "import": "import gemini_handler",
+    "first_use": "from gemini_handler import GeminiHandler",
+    "server": "from gemini_handler.server import GeminiServer",
+}
+
+
+@dataclass
+class ImportResult:
+    """Cold-start cost of one import statement"""
+    name: str
+    statement: str
+    runs: int
+    wall_ms: float
+    min_wall_ms: float
+    importtime_ms: float
+    # Slowest third-party packages, (name, cumulative ms)
+    top_modules: List[Tuple[str, float]] = field(default_factory=list)
+
+
+def _wall_ms(code: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def _importtime(code: str) -> Dict[str, float]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        check=True, capture_output=True, text=True
+    )
+    return parse_importtime(proc.stderr)
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """
+    Parse ``-X importtime`` output into cumulative ms per module.
+
+    Args:
+        stderr: Output of ``python -X importtime``
+
+    Returns:
+        {module: cumulative ms}
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        if cum.strip().isdigit():
+            cumulative[name.strip()] = int(cum) / 1000
+    return cumulative
+
+
+def measure(name: str, statement: str, runs: int = 5, top: int = 10) -> ImportResult:
+    """
+    Time one import statement in fresh interpreters.
+
+    Args:
+        name: Result name
+        statement: Python code to run
+        runs: Number of fresh interpreters to time
+        top: How many of the slowest modules to report
+
+    Returns:
+        ImportResult with median/min wall time and the importtime breakdown
+    """
+    baseline = statistics.median(_wall_ms("pass") for _ in range(runs))
+    walls = [_wall_ms(statement) - baseline for _ in range(runs)]
+
+    startup = set(_importtime("pass"))
+    cumulative = _importtime(statement)
+    own = {m: ms for m, ms in cumulative.items() if m.split(".")[0] == "gemini_handler"}
+    # Attribute each third-party package's cost to its top-level name
+    packages: Dict[str, float] = {}
+    for module, ms in cumulative.items():
+        package = module.split(".")[0]
+        if package != "gemini_handler" and module not in startup:
+            packages[package] = max(packages.get(package, 0.0), ms)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+    return ImportResult(
+        name=name,
+        statement=statement,
+        runs=runs,
+        wall_ms=round(statistics.median(walls), 2),
+        min_wall_ms=round(min(walls), 2),
+        importtime_ms=round(max(own.values(), default=0.0), 2),
+        top_modules=[(m, round(ms, 2)) for m, ms in slowest[:top]]
+    )
+
+
+def compare(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    threshold: float = 0.20
+) -> List[str]:
+    """
+    Find statements whose median wall time grew by more than threshold.
+
+    Args:
+        baseline: {name: result dict} from load_results
+        current: {name: result dict}
+        threshold: Allowed relative change
+
+    Returns:
+        One line per regression
+    """
+    regressions = []
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base or not base.get("wall_ms"):
+            continue
+        # A few ms of jitter is noise, not a regression
+        allowed = max(base["wall_ms"] * (1 + threshold), base["wall_ms"] + 5.0)
+        if cur["wall_ms"] > allowed:
+            regressions.append(f"{name}: wall {base['wall_ms']:.1f} -> {cur['wall_ms']:.1f} ms")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time (cold start) benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per statement")
+    parser.add_argument("--top", type=int, default=10, help="Slowest third-party modules to show")
+    parser.add_argument("--output", default="import-results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed relative regression (0.20 = 20%%)")
+    args = parser.parse_args()
+
+    results = [measure(name, stmt, runs=args.runs, top=args.top) for name, stmt in STATEMENTS.items()]
+    save_results(results, args.output, runs=args.runs)
+
+    for result in results:
+        print(f"{result.name:<10} {result.wall_ms:8.1f} ms (min {result.min_wall_ms:.1f}, "
+              f"importtime {result.importtime_ms:.1f})  {result.statement}")
+        for module, ms in result.top_modules:
+            print(f"    {ms:8.1f} ms  {module}")
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(load_results(args.baseline, key="name"),
+                              {r.name: {"wall_ms": r.wall_ms} for r in results}, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
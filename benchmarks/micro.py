@@ -0,0 +1,403 @@
+# benchmarks/micro.py
+"""
+Microbenchmarks for the per-request hot paths.
+
+Each case is timed in rounds of a calibrated number of calls and reports
+ns/op (median and best round) plus memory per op from tracemalloc:
+
+- peak_bytes_per_op: transient high-water mark of one call (temporaries included)
+- allocs_per_op / retained_bytes_per_op: memory blocks and bytes still alive
+  after the calls, per call (growth such as history lists or caches)
+
+CPython has no counter of every allocation, so allocs/op counts blocks that
+survive the call; short-lived temporaries show up in peak_bytes_per_op.
+
+    python -m benchmarks.micro --output micro.json
+    python -m benchmarks.micro --filter key_rotation --baseline micro.json --threshold 0.2
+"""
+import argparse
+import dataclasses
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks.harness import load_results, save_results
+from gemini_handler.data_models import KeyRotationStrategy, ModelResponse
+from gemini_handler.key_rotation import KeyRotationManager
+from gemini_handler.message_conversion import MessageConverter
+from gemini_handler.proxy import SWIFTSHADOW_AVAILABLE, ProxyManager
+from gemini_handler.response_handler import ResponseHandler
+from gemini_handler.server import GeminiServer
+
+KEY_COUNTS = (1, 10, 100, 1000, 10000)
+HISTORY_LENGTHS = (10, 100, 1000)
+
+
+@dataclass
+class MicroResult:
+    """Timing and memory of one microbenchmark case."""
+    name: str
+    iterations: int  # Calls per timed round
+    rounds: int
+    ns_per_op: float  # Median round
+    min_ns_per_op: float  # Best round
+    peak_bytes_per_op: int
+    allocs_per_op: float
+    retained_bytes_per_op: float
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Case:
+    """A named benchmark; setup() returns the operation and an optional cleanup."""
+    name: str
+    setup: Callable[[], Tuple[Callable[[], Any], Optional[Callable[[], None]]]]
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def _time_calls(fn: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def measure(
+    fn: Callable[[], Any],
+    min_time: float = 0.2,
+    rounds: int = 5,
+    max_memory_calls: int = 1000
+) -> Dict[str, Any]:
+    """
+    Time fn and measure its memory per call.
+
+    Args:
+        fn: Operation to measure (called many times)
+        min_time: Target seconds per timed round; sets the calls per round
+        rounds: Timed rounds (the median and best are reported)
+        max_memory_calls: Calls made under tracemalloc for the retained-memory numbers
+
+    Returns:
+        Dict with the MicroResult measurement fields
+    """
+    fn()  # Warm caches and lazy initialisation
+
+    iterations = 1
+    while True:
+        elapsed_s = _time_calls(fn, iterations) * iterations / 1e9
+        if elapsed_s >= min_time or iterations >= 10 ** 7:
+            break
+        # Aim a little past min_time so the next round usually settles it
+        iterations = min(10 ** 7, max(iterations * 2, int(iterations * min_time * 1.2 / max(elapsed_s, 1e-9))))
+
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        per_op = [_time_calls(fn, iterations) for _ in range(rounds)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    memory_calls = max(1, min(iterations, max_memory_calls))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        for _ in range(memory_calls):
+            fn()
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "filename")
+    retained_blocks = sum(s.count_diff for s in stats)
+    retained_bytes = sum(s.size_diff for s in stats)
+
+    return {
+        "iterations": iterations,
+        "rounds": rounds,
+        "ns_per_op": round(statistics.median(per_op), 1),
+        "min_ns_per_op": round(min(per_op), 1),
+        "peak_bytes_per_op": max(0, peak - base),
+        "allocs_per_op": round(max(0, retained_blocks) / memory_calls, 3),
+        "retained_bytes_per_op": round(max(0, retained_bytes) / memory_calls, 1)
+    }
+
+
+# --- Cases ---
+
+def _key_rotation_cases(key_counts: Tuple[int, ...]) -> Iterator[Case]:
+    for strategy in KeyRotationStrategy:
+        for count in key_counts:
+            def setup(strategy=strategy, count=count):
+                # A quota that is never reached, so every strategy runs its normal path
+                manager = KeyRotationManager(
+                    [f"key-{i}" for i in range(count)], strategy=strategy, rate_limit=10 ** 12
+                )
+                return manager.get_next_key, None
+
+            yield Case(
+                f"key_rotation.get_next_key[{strategy.value},keys={count}]",
+                setup,
+                {"strategy": strategy.value, "keys": count}
+            )
+
+
+@dataclass
+class _ProxyState:
+    """Snapshot of ProxyManager class state, restored after a proxy case."""
+    values: Dict[str, Any]
+
+    ATTRIBUTES = (
+        "_auto_proxy_interface", "_current_static_proxy", "_current_auto_proxy", "_proxy_history",
+        "_auto_rotate", "_initialized", "_current_proxy_index"
+    )
+
+    @classmethod
+    def save(cls) -> "_ProxyState":
+        return cls({name: getattr(ProxyManager, name) for name in cls.ATTRIBUTES})
+
+    def restore(self) -> None:
+        for name, value in self.values.items():
+            setattr(ProxyManager, name, value)
+
+
+def _proxy_cases() -> Iterator[Case]:
+    def static_setup():
+        state = _ProxyState.save()
+        ProxyManager._proxy_history = []
+        ProxyManager._apply_static_proxy(
+            {"http": "http://10.0.0.1:3128", "https": "http://10.0.0.1:3128"}, set_environment=False
+        )
+        ProxyManager._initialized = True
+        return ProxyManager.get_next_proxy, state.restore
+
+    yield Case("proxy.get_next_proxy[static]", static_setup, {"mode": "static"})
+
+    if not SWIFTSHADOW_AVAILABLE:
+        return
+
+    from swiftshadow.classes import Proxy
+
+    class _ProxyList:
+        def __init__(self, proxies):
+            self.proxies = proxies
+
+    for count in (10, 1000):
+        def auto_setup(count=count):
+            # A fixed swiftshadow proxy list instead of a network update
+            state = _ProxyState.save()
+            ProxyManager._proxy_history = []
+            ProxyManager._auto_proxy_interface = _ProxyList(
+                [Proxy(ip=f"10.{i // 65536}.{i // 256 % 256}.{i % 256}", protocol="http", port=3128) for i in range(count)]
+            )
+            ProxyManager._auto_rotate = True
+            ProxyManager._initialized = True
+            return ProxyManager.get_next_proxy, state.restore
+
+        yield Case(f"proxy.get_next_proxy[auto,proxies={count}]", auto_setup, {"mode": "auto", "proxies": count})
+
+
+def _history(length: int) -> List[Dict[str, Any]]:
+    messages = [{"role": "system", "content": "You are a helpful assistant. Answer concisely."}]
+    for i in range(length - 1):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": f"Message {i}: " + "some conversational text " * 8})
+    return messages
+
+
+def _message_cases() -> Iterator[Case]:
+    for length in HISTORY_LENGTHS:
+        def flatten_setup(length=length):
+            messages = _history(length)
+            # The method does not use the server instance
+            return (lambda: GeminiServer._convert_messages_to_prompt(None, messages)), None
+
+        def contents_setup(length=length):
+            messages = _history(length)
+            return (lambda: MessageConverter.to_gemini_contents(messages)), None
+
+        yield Case(f"server._convert_messages_to_prompt[messages={length}]", flatten_setup, {"messages": length})
+        yield Case(f"message_converter.to_gemini_contents[messages={length}]", contents_setup, {"messages": length})
+
+
+def _sdk_response(text: str) -> Any:
+    """A real google.generativeai response object, as the strategies receive it."""
+    from google.generativeai import protos
+    from google.generativeai.types import generation_types
+
+    return generation_types.GenerateContentResponse.from_response(protos.GenerateContentResponse({
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finish_reason": 1}]
+    }))
+
+
+def _response_cases() -> Iterator[Case]:
+    proxy_info = {"proxy_string": "10.0.0.1:3128", "source": "static"}
+    payloads = {
+        "text": ("text/plain", "A plain text answer. " * 20),
+        "json_small": ("application/json", json.dumps({"answer": "yes", "confidence": 0.9})),
+        "json_large": ("application/json", json.dumps({
+            "items": [{"id": i, "name": f"item {i}", "tags": ["a", "b"], "score": i / 7} for i in range(200)]
+        }))
+    }
+    for label, (mime_type, text) in payloads.items():
+        def setup(mime_type=mime_type, text=text):
+            response = _sdk_response(text)
+            start = time.time()
+            return (lambda: ResponseHandler.process_response(
+                response, "gemini-2.0-flash", start, 0, mime_type, proxy_info
+            )), None
+
+        yield Case(
+            f"response_handler.process_response[{label}]",
+            setup,
+            {"mime_type": mime_type, "text_bytes": len(text)}
+        )
+
+
+def _model_response_cases() -> Iterator[Case]:
+    def make() -> ModelResponse:
+        return ModelResponse(
+            success=True,
+            model="gemini-2.0-flash",
+            text="A plain text answer. " * 20,
+            time=0.25,
+            api_key_index=3,
+            structured_data={"items": [{"id": i, "tags": ["a", "b"]} for i in range(20)]},
+            proxy_info={"proxy_string": "10.0.0.1:3128", "source": "static"}
+        )
+
+    # generate_content returns response.__dict__; the response caches store dataclasses.asdict
+    def dict_setup():
+        response = make()
+        return (lambda: response.__dict__), None
+
+    def asdict_setup():
+        response = make()
+        return (lambda: dataclasses.asdict(response)), None
+
+    yield Case("model_response.to_dict[__dict__]", dict_setup, {"method": "__dict__"})
+    yield Case("model_response.to_dict[asdict]", asdict_setup, {"method": "dataclasses.asdict"})
+
+
+def all_cases(max_keys: int = max(KEY_COUNTS)) -> List[Case]:
+    """Every microbenchmark case, with key counts up to max_keys."""
+    return [
+        *_key_rotation_cases(tuple(n for n in KEY_COUNTS if n <= max_keys)),
+        *_proxy_cases(),
+        *_message_cases(),
+        *_response_cases(),
+        *_model_response_cases()
+    ]
+
+
+def run_case(case: Case, min_time: float = 0.2, rounds: int = 5) -> MicroResult:
+    fn, cleanup = case.setup()
+    try:
+        measured = measure(fn, min_time=min_time, rounds=rounds)
+    finally:
+        if cleanup:
+            cleanup()
+    return MicroResult(name=case.name, params=case.params, **measured)
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    threshold: float = 0.20
+) -> List[str]:
+    """
+    Find cases whose ns/op or peak bytes/op grew by more than threshold.
+
+    Args:
+        baseline: {name: result dict} from load_results(path, key="name")
+        current: {name: result dict}
+        threshold: Allowed relative increase, e.g. 0.20 for 20%
+
+    Returns:
+        One line per regression (empty if none)
+    """
+    regressions = []
+    for name, new in current.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        # Peak bytes move by a few small objects between runs; ignore changes under 256 B
+        for metric, unit, floor in (("ns_per_op", "ns", 0), ("peak_bytes_per_op", "B", 256)):
+            old_value, new_value = old.get(metric), new.get(metric)
+            if (old_value and new_value is not None and new_value > old_value * (1 + threshold)
+                    and new_value - old_value > floor):
+                regressions.append(
+                    f"{name}: {metric} {old_value:,.0f} -> {new_value:,.0f} {unit} ({new_value / old_value - 1:+.1%})"
+                )
+    return regressions
+
+
+def format_table(results: List[MicroResult]) -> str:
+    width = max([len(r.name) for r in results] + [4])
+    header = f"{'case':<{width}} {'ns/op':>14} {'min ns/op':>14} {'peak B/op':>10} {'allocs/op':>10}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r.name:<{width}} {r.ns_per_op:>14,.1f} {r.min_ns_per_op:>14,.1f} "
+            f"{r.peak_bytes_per_op:>10,} {r.allocs_per_op:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for per-request hot paths")
+    parser.add_argument("--filter", action="append", default=[],
+                        help="Only run cases whose name contains this text (repeatable)")
+    parser.add_argument("--list", action="store_true", help="List case names and exit")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per timed round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--max-keys", type=int, default=max(KEY_COUNTS), help="Largest key count for key_rotation")
+    parser.add_argument("--output", default="micro-results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed relative regression (0.20 = 20%%)")
+    args = parser.parse_args()
+
+    cases = [c for c in all_cases(args.max_keys) if not args.filter or any(f in c.name for f in args.filter)]
+    if args.list:
+        print("\n".join(c.name for c in cases))
+        return
+
+    results = []
+    for case in cases:
+        print(f"Running {case.name}...", file=sys.stderr, flush=True)
+        results.append(run_case(case, min_time=args.min_time, rounds=args.rounds))
+
+    save_results(results, args.output, min_time=args.min_time, rounds=args.rounds)
+    print(format_table(results))
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(
+            load_results(args.baseline, key="name"),
+            {r.name: dataclasses.asdict(r) for r in results},
+            args.threshold
+        )
+        if regressions:
+            print(f"\nRegressions over {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
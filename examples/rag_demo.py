@@ -23,28 +23,17 @@ class SimpleChromaRAG:
             doc_id = f"doc_{len(self.collection.get()['ids'])}"
         
         # Generate embedding
-        result = self.handler.generate_embeddings(text)
+        result = self.handler.generate_embeddings(text, output_format="numpy")
         if not result['success']:
             raise RuntimeError(f"Embedding failed: {result['error']}")
         
-        # Extract embedding values - this is the key fix
-        # The embedding is returned as a ContentEmbedding object, so we need to convert it
+        # Embeddings come back as a float32 matrix of shape (1, dim)
         embedding = result['embeddings'][0]
         
-        # Convert embedding to a simple list of floats
-        # This handles both the case where it's already a list and when it's a ContentEmbedding object
-        if hasattr(embedding, 'values'):
-            embedding_list = embedding.values
-        elif isinstance(embedding, list):
-            embedding_list = embedding
-        else:
-            # Try to convert to list as a last resort
-            embedding_list = list(embedding)
-        
         # Add to ChromaDB
         self.collection.add(
             documents=[text],
-            embeddings=[embedding_list],
+            embeddings=[embedding],
             ids=[doc_id]
         )
         
@@ -87,22 +76,13 @@ class SimpleChromaRAG:
     def answer_question(self, question, n_results=2):
         """Answer question based on retrieved documents."""
         # Generate question embedding
-        q_result = self.handler.generate_embeddings(question)
+        q_result = self.handler.generate_embeddings(question, output_format="numpy")
         if not q_result['success']:
             return f"Error: {q_result['error']}"
         
-        # Extract query embedding values
-        q_embedding = q_result['embeddings'][0]
-        if hasattr(q_embedding, 'values'):
-            q_embedding_list = q_embedding.values
-        elif isinstance(q_embedding, list):
-            q_embedding_list = q_embedding
-        else:
-            q_embedding_list = list(q_embedding)
-        
         # Query ChromaDB for similar documents
         results = self.collection.query(
-            query_embeddings=[q_embedding_list],
+            query_embeddings=[q_result['embeddings'][0]],
             n_results=n_results
         )
         
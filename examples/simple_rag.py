@@ -1,6 +1,7 @@
+import json
 import os
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
 import numpy as np
 import yaml
@@ -10,6 +11,7 @@ from gemini_handler import (
     GenerationConfig,
     KeyRotationStrategy,
     Strategy,
+    VectorIndex,
 )
 
 
@@ -32,9 +34,9 @@ class SimpleRAG:
         # Set up Gemini handler with configuration
         self.handler = self._initialize_handler()
         
-        # Storage for document chunks and their embeddings
+        # Storage for document chunks and their (pre-normalized) embeddings
         self.documents = []
-        self.embeddings = []
+        self.index = VectorIndex()
     
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from YAML file."""
@@ -126,33 +128,55 @@ class SimpleRAG:
         embedding_model = embedding_config.get('default_model', "gemini-embedding-exp-03-07")
         task_type = embedding_config.get('task_types', {}).get('default', "SEMANTIC_SIMILARITY")
         
-        # Generate embeddings for each chunk
-        for chunk in chunks:
-            embedding_result = self.handler.generate_embeddings(
-                content=chunk,
-                model_name=embedding_model,
-                task_type=task_type
-            )
-            
-            if embedding_result['success']:
-                self.embeddings.append(embedding_result['embeddings'][0])
-            else:
-                raise RuntimeError(f"Failed to generate embedding: {embedding_result['error']}")
+        # Generate embeddings for all chunks in one call; the handler splits
+        # them into API-sized batches and runs the batches concurrently
+        embedding_result = self.handler.generate_embeddings(
+            content=chunks,
+            model_name=embedding_model,
+            task_type=task_type,
+            output_format="numpy"
+        )
+        
+        if embedding_result['success']:
+            self.index.add(embedding_result['embeddings'])
+        else:
+            raise RuntimeError(f"Failed to generate embedding: {embedding_result['error']}")
     
-    def _compute_similarity(self, query_embedding: List[float], doc_embeddings: List[List[float]]) -> List[float]:
-        """Compute cosine similarity between query and documents."""
-        # Convert to numpy arrays for efficient computation
-        query_array = np.array(query_embedding)
-        doc_array = np.array(doc_embeddings)
+    def index_corpus(self, chunks: Iterable[str], output_dir: str) -> int:
+        """
+        Embed a large corpus straight to disk without holding it in memory.
         
-        # Normalize vectors
-        query_norm = query_array / np.linalg.norm(query_array)
-        doc_norm = doc_array / np.linalg.norm(doc_array, axis=1)[:, np.newaxis]
+        Vectors are appended to ``vectors.f32`` (raw float32 rows) and chunk texts
+        to ``chunks.jsonl``. Progress is checkpointed, so calling this again with
+        the same chunks after an interruption resumes where it stopped.
+        
+        Args:
+            chunks: Iterable of chunk texts (e.g. a generator reading files)
+            output_dir: Directory for the vector, text and checkpoint files
+            
+        Returns:
+            Number of chunks embedded in this call
+        """
+        out = Path(output_dir)
+        out.mkdir(parents=True, exist_ok=True)
         
-        # Compute cosine similarity
-        similarities = np.dot(doc_norm, query_norm)
+        embedding_config = self.config['gemini'].get('embedding', {})
+        embedding_model = embedding_config.get('default_model', "gemini-embedding-exp-03-07")
+        task_type = embedding_config.get('task_types', {}).get('default', "SEMANTIC_SIMILARITY")
         
-        return similarities.tolist()
+        # Use each chunk's text as its id so it comes back alongside its vector
+        count = 0
+        with open(out / "vectors.f32", "ab") as vectors, open(out / "chunks.jsonl", "a", encoding="utf-8") as docs:
+            for text, vector in self.handler.embed_stream(
+                ((chunk, chunk) for chunk in chunks),
+                model_name=embedding_model,
+                task_type=task_type,
+                checkpoint_path=out / "checkpoint.json"
+            ):
+                vectors.write(vector.astype(np.float32).tobytes())
+                docs.write(json.dumps(text) + "\n")
+                count += 1
+        return count
     
     def retrieve(self, query: str, top_k: int = 2) -> List[Dict[str, Any]]:
         """
@@ -174,24 +198,20 @@ class SimpleRAG:
         query_result = self.handler.generate_embeddings(
             content=query,
             model_name=embedding_model,
-            task_type=task_type
+            task_type=task_type,
+            output_format="numpy"
         )
         
         if not query_result['success']:
             raise RuntimeError(f"Failed to generate query embedding: {query_result['error']}")
         
-        query_embedding = query_result['embeddings'][0]
-        
-        # Calculate similarity scores
-        similarities = self._compute_similarity(query_embedding, self.embeddings)
-        
-        # Get top-k documents
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        # Top-k cosine search over the pre-normalized index (ids are chunk positions)
+        scores, ids = self.index.search(query_result['embeddings'], k=top_k)
         
         # Return top documents with their scores
         return [
-            {"text": self.documents[idx], "score": similarities[idx]}
-            for idx in top_indices
+            {"text": self.documents[idx], "score": float(score)}
+            for idx, score in zip(ids[0], scores[0])
         ]
     
     def answer_question(self, question: str) -> str:
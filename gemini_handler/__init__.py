@@ -1,21 +1,86 @@
 # gemini_handler/__init__.py
+"""
+Public names are loaded lazily (PEP 562): ``import gemini_handler`` only
+imports a submodule when one of its names is first used, so CLI tools and
+serverless cold starts do not pay for the Gemini SDKs, numpy or FastAPI
+until they need them.
+"""
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+# Public name -> submodule that defines it
+_LAZY_ATTRS = {
+    'AutoProxyManager': '.auto_proxy',
+    'ContentGenerationMixin': '.content_generation',
+    'ContextCacheManager': '.context_cache',
+    'EmbeddingConfig': '.data_models',
+    'GenerationConfig': '.data_models',
+    'KeyRotationStrategy': '.data_models',
+    'KeyStats': '.data_models',
+    'ModelConfig': '.data_models',
+    'ModelResponse': '.data_models',
+    'Strategy': '.data_models',
+    'EmbeddingCache': '.embedding_cache',
+    'FileMetadataCache': '.file_cache',
+    'UploadIndex': '.file_cache',
+    'FileHandler': '.file_handler',
+    'FileOperationsMixin': '.file_operations',
+    'GeminiHandler': '.gemini_handler',
+    'LiteLLMGeminiAdapter': '.litellm_integration',
+    'configure_logging': '.log_utils',
+    'get_logger': '.log_utils',
+    'GeminiMetrics': '.metrics',
+    'MetricsRegistry': '.metrics',
+    'ProxyManager': '.proxy',
+    'ResponseCache': '.response_cache',
+    'SemanticCache': '.semantic_cache',
+    'configure_tracing': '.tracing',
+    'get_tracer': '.tracing',
+    'IVFIndex': '.vector_index',
+    'VectorIndex': '.vector_index',
+}
+
+if TYPE_CHECKING:
+    from .auto_proxy import AutoProxyManager
+    from .content_generation import ContentGenerationMixin
+    from .context_cache import ContextCacheManager
+    from .data_models import (
+        EmbeddingConfig,
+        GenerationConfig,
+        KeyRotationStrategy,
+        KeyStats,
+        ModelConfig,
+        ModelResponse,
+        Strategy,
+    )
+    from .embedding_cache import EmbeddingCache
+    from .file_cache import FileMetadataCache, UploadIndex
+    from .file_handler import FileHandler
+    from .file_operations import FileOperationsMixin
+    from .gemini_handler import GeminiHandler
+    from .litellm_integration import LiteLLMGeminiAdapter
+    from .log_utils import configure_logging, get_logger
+    from .metrics import GeminiMetrics, MetricsRegistry
+    from .proxy import ProxyManager
+    from .response_cache import ResponseCache
+    from .semantic_cache import SemanticCache
+    from .tracing import configure_tracing, get_tracer
+    from .vector_index import IVFIndex, VectorIndex
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache it so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
 
-from .auto_proxy import AutoProxyManager
-from .content_generation import ContentGenerationMixin
-from .data_models import (
-    EmbeddingConfig,
-    GenerationConfig,
-    KeyRotationStrategy,
-    KeyStats,
-    ModelConfig,
-    ModelResponse,
-    Strategy,
-)
-from .file_handler import FileHandler
-from .file_operations import FileOperationsMixin
-from .gemini_handler import GeminiHandler
-from .litellm_integration import LiteLLMGeminiAdapter  # Add this import
-from .proxy import ProxyManager
 
 __all__ = [
     'GeminiHandler',
@@ -31,5 +96,19 @@ __all__ = [
     'FileOperationsMixin',
     'ProxyManager',
     'LiteLLMGeminiAdapter',
-    'AutoProxyManager'
+    'AutoProxyManager',
+    'ContextCacheManager',
+    'ResponseCache',
+    'SemanticCache',
+    'EmbeddingCache',
+    'VectorIndex',
+    'IVFIndex',
+    'UploadIndex',
+    'FileMetadataCache',
+    'GeminiMetrics',
+    'MetricsRegistry',
+    'configure_logging',
+    'get_logger',
+    'configure_tracing',
+    'get_tracer'
 ]
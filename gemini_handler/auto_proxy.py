@@ -5,17 +5,15 @@ import threading
 import time
 from typing import Any, Dict, List, Optional, Union
 
-# Check if SwiftShadow is available
-try:
-    from swiftshadow.classes import Proxy, ProxyInterface
-    SWIFTSHADOW_AVAILABLE = True
-except ImportError:
-    SWIFTSHADOW_AVAILABLE = False
-    print("SwiftShadow library not available. Install with: pip install swiftshadow")
-    # Create dummy Proxy class for type hints when SwiftShadow isn't available
-    class Proxy:
-        def as_string(self) -> str:
-            return ""
+from .lazy_import import module_available
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Check if SwiftShadow is available (imported in initialize(); it loads slowly)
+SWIFTSHADOW_AVAILABLE = module_available("swiftshadow")
+if not SWIFTSHADOW_AVAILABLE:
+    logger.debug("SwiftShadow library not available. Install with: pip install swiftshadow")
 
 
 class AutoProxyManager:
@@ -67,7 +65,7 @@ class AutoProxyManager:
             Whether initialization was successful
         """
         if not SWIFTSHADOW_AVAILABLE:
-            print("SwiftShadow library not available. Install with: pip install swiftshadow")
+            logger.info("SwiftShadow library not available. Install with: pip install swiftshadow")
             return False
         
         with cls._lock:
@@ -76,6 +74,11 @@ class AutoProxyManager:
             cls._update_interval = update_interval
             
             if cls._proxy_interface is None:
+                try:
+                    from swiftshadow.classes import ProxyInterface
+                except ImportError as e:
+                    logger.warning("Failed to import SwiftShadow: %s", e)
+                    return False
                 cls._proxy_interface = ProxyInterface(autoUpdate=False, autoRotate=False)
                 
                 # Initial proxy update
@@ -83,9 +86,9 @@ class AutoProxyManager:
                     cls._proxy_interface.update()
                     cls._last_update = time.time()
                     cls._initialized = True
-                    print(f"Initial proxy update successful, got {len(cls._proxy_interface.proxies)} proxies")
+                    logger.info("Initial proxy update successful, got %s proxies", len(cls._proxy_interface.proxies))
                 except Exception as e:
-                    print(f"Failed initial proxy update: {e}")
+                    logger.warning("Failed initial proxy update: %s", e)
                     return False
                 
                 # Start background update thread if auto_update is enabled
@@ -103,17 +106,17 @@ class AutoProxyManager:
                     time.sleep(cls._update_interval)
                     with cls._lock:
                         if cls._proxy_interface and cls._auto_update:
-                            print(f"Updating proxies... (interval: {cls._update_interval}s)")
+                            logger.debug("Updating proxies... (interval: %ss)", cls._update_interval)
                             cls._proxy_interface.update()
                             cls._last_update = time.time()
-                            print(f"Proxy update successful, now have {len(cls._proxy_interface.proxies)} proxies")
+                            logger.info("Proxy update successful, now have %s proxies", len(cls._proxy_interface.proxies))
                 except Exception as e:
-                    print(f"Error updating proxies: {e}")
+                    logger.warning("Error updating proxies: %s", e)
                     time.sleep(5)  # Back off on error
         
         cls._update_thread = threading.Thread(target=update_proxies, daemon=True)
         cls._update_thread.start()
-        print("Started proxy update background thread")
+        logger.info("Started proxy update background thread")
     
     @classmethod
     def get_next_proxy(cls) -> Optional[Dict[str, str]]:
@@ -151,10 +154,10 @@ class AutoProxyManager:
             # Use async version for integration with FastAPI
             await cls._proxy_interface.async_update()
             cls._last_update = time.time()
-            print(f"Async proxy update successful, now have {len(cls._proxy_interface.proxies)} proxies")
+            logger.info("Async proxy update successful, now have %s proxies", len(cls._proxy_interface.proxies))
             return True
         except Exception as e:
-            print(f"Error in async proxy update: {e}")
+            logger.warning("Error in async proxy update: %s", e)
             return False
     
     @classmethod
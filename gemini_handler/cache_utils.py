@@ -0,0 +1,32 @@
+# gemini_handler/cache_utils.py
+"""Shared helpers for building stable cache keys."""
+import hashlib
+import json
+from enum import Enum
+from typing import Any
+
+
+def _json_default(value: Any) -> Any:
+    """Make non-JSON values (bytes, enums, dataclasses) hashable in a stable way."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"__bytes_sha256__": hashlib.sha256(bytes(value)).hexdigest()}
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "__dict__"):
+        return value.__dict__
+    return repr(value)
+
+
+def canonical_json(value: Any) -> str:
+    """Serialize a value to canonical JSON (sorted keys, compact separators)."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=_json_default)
+
+
+def canonical_hash(*parts: Any) -> str:
+    """Return a SHA-256 hex digest over the canonical JSON form of the given parts."""
+    return hashlib.sha256(canonical_json(list(parts)).encode("utf-8")).hexdigest()
+
+
+def hash_api_key(api_key: str) -> str:
+    """Return a short, non-reversible identifier for an API key."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
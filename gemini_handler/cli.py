@@ -8,7 +8,10 @@ from typing import Dict, List, Optional
 import yaml
 
 from .data_models import KeyRotationStrategy, Strategy
+from .lazy_import import module_available
+from .log_utils import configure_logging
 from .server import GeminiServer
+from .tracing import configure_tracing_from_settings
 
 
 def parse_args():
@@ -43,6 +46,44 @@ def parse_args():
         action="store_true",
         help="Enable auto proxy rotation (requires SwiftShadow)"
     )
+    parser.add_argument(
+        "--log-level",
+        type=str,
+        default=None,
+        help="Log level (default: gemini.logging.level from config, else WARNING)"
+    )
+    parser.add_argument(
+        "--log-json",
+        action="store_true",
+        help="Emit logs as JSON lines"
+    )
+    parser.add_argument(
+        "--no-warmup",
+        action="store_true",
+        help="Skip background warmup (key probes, model list, connection pools) at startup"
+    )
+    parser.add_argument(
+        "--watch-config",
+        action="store_true",
+        help="Reload API keys and strategies when the config file changes"
+    )
+    parser.add_argument(
+        "--response-cache",
+        action="store_true",
+        help="Cache identical generation requests (overrides gemini.response_cache.enabled)"
+    )
+    parser.add_argument(
+        "--response-cache-dir",
+        type=str,
+        default=None,
+        help="Directory for the on-disk response cache tier (enables the cache)"
+    )
+    parser.add_argument(
+        "--response-cache-ttl",
+        type=float,
+        default=None,
+        help="Default lifetime of cached responses in seconds (default: 3600)"
+    )
     
     return parser.parse_args()
 
@@ -68,6 +109,15 @@ def main():
     
     # Load configuration
     config = load_config(args.config)
+
+    # Configure logging (priority: CLI args > config file > env vars)
+    logging_config = ((config or {}).get('gemini') or {}).get('logging') or {}
+    configure_logging(
+        level=args.log_level or logging_config.get('level'),
+        json_format=True if args.log_json else logging_config.get('json'),
+        sample_rate=logging_config.get('sample_rate')
+    )
+    configure_tracing_from_settings(((config or {}).get('gemini') or {}).get('tracing') or {})
     
     # Process API keys (priority: CLI args > config file > env vars)
     api_keys = None
@@ -128,6 +178,23 @@ def main():
         # Extract system instruction
         if 'system_instruction' in gemini_config:
             server_settings['system_instruction'] = gemini_config['system_instruction']
+        
+        # Custom upstream endpoint (e.g. the local mock upstream)
+        if gemini_config.get('api_endpoint'):
+            server_settings['api_endpoint'] = gemini_config['api_endpoint']
+        
+        # Extract response cache settings
+        if isinstance(gemini_config.get('response_cache'), dict):
+            server_settings['response_cache'] = dict(gemini_config['response_cache'])
+    
+    # Response cache flags (priority: CLI args > config file)
+    if args.response_cache or args.response_cache_dir or args.response_cache_ttl is not None:
+        response_cache = server_settings.setdefault('response_cache', {})
+        response_cache['enabled'] = True
+        if args.response_cache_dir:
+            response_cache['cache_dir'] = args.response_cache_dir
+        if args.response_cache_ttl is not None:
+            response_cache['ttl'] = args.response_cache_ttl
     
     # Extract proxy settings
     proxy_settings = None
@@ -145,10 +212,9 @@ def main():
         
         # If auto_proxy is configured, check for SwiftShadow
         if 'auto_proxy' in proxy_settings:
-            try:
-                import swiftshadow
+            if module_available("swiftshadow"):
                 print(f"✓ Auto proxy configuration: {proxy_settings['auto_proxy']}")
-            except ImportError:
+            else:
                 print("! SwiftShadow not found. Install with: pip install swiftshadow")
                 print("! Auto proxy features will be disabled")
                 # Keep the regular proxy settings, just remove auto_proxy
@@ -161,6 +227,9 @@ def main():
         host=args.host,
         port=args.port,
         proxy_settings=proxy_settings,
+        warmup=not args.no_warmup,
+        config_path=args.config if not args.keys and Path(args.config).exists() else None,
+        watch_config=args.watch_config,
         **server_settings
     )
     
@@ -171,7 +240,11 @@ def main():
     print("  - GET  /v1/models")
     print("  - POST /v1/chat/completions")
     print("  - POST /v1/embeddings")
-    print("  - GET  /health")
+    print("  - GET  /health (liveness)")
+    print("  - GET  /ready  (readiness, after warmup)")
+    
+    if server.handler.response_cache is not None:
+        print(f"✓ Response cache enabled (dir: {server.handler.response_cache.cache_dir or 'memory only'})")
     
     # Print proxy info
     if proxy_settings:
@@ -197,6 +270,8 @@ def main():
     print("  - GET  /v1/proxy/info")
     print("  - GET  /v1/proxy/stats")
     print("  - POST /v1/proxy/rotate")
+    print("✓ Admin endpoints (GEMINI_ADMIN_TOKEN, or localhost only):")
+    print("  - POST /admin/reload")
     
     # Run the server
     server.run()
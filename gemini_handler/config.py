@@ -1,10 +1,29 @@
 # Modified config.py
 import os
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 import yaml
 
+from .data_models import KeyRotationStrategy, Strategy
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def genai_configure_options(api_endpoint: Optional[str]) -> Dict[str, Any]:
+    """Extra google.generativeai.configure() arguments for a custom API endpoint."""
+    if not api_endpoint:
+        return {}
+    return {"transport": "rest", "client_options": {"api_endpoint": api_endpoint}}
+
+
+def genai_client_options(api_endpoint: Optional[str]) -> Dict[str, Any]:
+    """Extra google.genai.Client() arguments for a custom API endpoint."""
+    if not api_endpoint:
+        return {}
+    return {"http_options": {"base_url": api_endpoint}}
+
 
 class ConfigLoader:
     """Handles loading configuration from various sources."""
@@ -27,7 +46,7 @@ class ConfigLoader:
                         if isinstance(keys, list) and all(isinstance(k, str) for k in keys):
                             return keys
             except Exception as e:
-                print(f"Warning: Failed to load config from {config_path}: {e}")
+                logger.warning("Failed to load config from %s: %s", config_path, e)
 
         # Try loading from GEMINI_API_KEYS environment variable
         api_keys_str = os.getenv('GEMINI_API_KEYS')
@@ -72,7 +91,7 @@ class ConfigLoader:
                             if 'https' in proxy_config and proxy_config['https']:
                                 proxy_settings['https'] = proxy_config['https']
             except Exception as e:
-                print(f"Warning: Failed to load proxy config from {config_path}: {e}")
+                logger.warning("Failed to load proxy config from %s: %s", config_path, e)
         
         # Try loading from environment variables (environment takes precedence over config file)
         http_proxy = os.getenv('HTTP_PROXY')
@@ -84,3 +103,130 @@ class ConfigLoader:
             proxy_settings['https'] = https_proxy
             
         return proxy_settings
+
+    @staticmethod
+    def _load_gemini_section(config_path: Optional[Union[str, Path]], section: str) -> Dict[str, Any]:
+        """Load one 'gemini.<section>' mapping from a YAML config (empty if not configured)."""
+        if not config_path:
+            return {}
+        try:
+            with open(config_path, 'r') as f:
+                config = yaml.safe_load(f)
+                if config and isinstance(config.get('gemini'), dict):
+                    value = config['gemini'].get(section)
+                    if isinstance(value, dict):
+                        return value
+        except Exception as e:
+            logger.warning("Failed to load %s config from %s: %s", section, config_path, e)
+        return {}
+
+    @staticmethod
+    def load_embedding_settings(config_path: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
+        """
+        Load embedding settings from the 'gemini.embedding' section of a YAML config.
+        
+        Returns:
+            Dictionary with the embedding section (empty if not configured)
+        """
+        return ConfigLoader._load_gemini_section(config_path, 'embedding')
+
+    @staticmethod
+    def load_file_settings(config_path: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
+        """
+        Load file upload settings from the 'gemini.files' section of a YAML config.
+        
+        Returns:
+            Dictionary with the files section (empty if not configured)
+        """
+        return ConfigLoader._load_gemini_section(config_path, 'files')
+
+    @staticmethod
+    def load_key_validation_settings(config_path: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
+        """
+        Load key probing and quarantine settings from the 'gemini.key_validation' section.
+        
+        Returns:
+            Dictionary with the key_validation section (empty if not configured)
+        """
+        return ConfigLoader._load_gemini_section(config_path, 'key_validation')
+
+    @staticmethod
+    def load_yaml(config_path: Union[str, Path]) -> Dict[str, Any]:
+        """
+        Parse a YAML config file strictly (errors are raised, not logged).
+        
+        Returns:
+            The parsed mapping (empty for an empty file)
+            
+        Raises:
+            OSError, yaml.YAMLError: If the file cannot be read or parsed
+            ValueError: If the top level is not a mapping
+        """
+        with open(config_path, 'r') as f:
+            config = yaml.safe_load(f)
+        if config is None:
+            return {}
+        if not isinstance(config, dict):
+            raise ValueError(f"Config file {config_path} must contain a mapping")
+        return config
+
+    @staticmethod
+    def load_strategy_settings(config_path: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
+        """
+        Load strategies from the 'gemini.strategies' section of a YAML config.
+        
+        Returns:
+            Dictionary with 'content_strategy' (Strategy) and/or 'key_strategy'
+            (KeyRotationStrategy) for the entries that are set and valid
+        """
+        return ConfigLoader.parse_strategy_settings(
+            ConfigLoader._load_gemini_section(config_path, 'strategies'), config_path
+        )
+
+    @staticmethod
+    def parse_strategy_settings(strategies: Dict[str, Any], source: Any = None) -> Dict[str, Any]:
+        """
+        Convert an already parsed 'gemini.strategies' mapping to strategy enums.
+        
+        Args:
+            strategies: The strategies mapping
+            source: Where the mapping came from (for warnings)
+        
+        Returns:
+            Dictionary with 'content_strategy' and/or 'key_strategy' for the
+            entries that are set and valid
+        """
+        settings: Dict[str, Any] = {}
+        for name, option, enum in (
+            ('content', 'content_strategy', Strategy),
+            ('key_rotation', 'key_strategy', KeyRotationStrategy)
+        ):
+            if name in strategies:
+                try:
+                    settings[option] = enum(strategies[name])
+                except ValueError:
+                    logger.warning("Unknown %s strategy in %s: %s", name, source, strategies[name])
+        return settings
+
+    @staticmethod
+    def load_api_endpoint(config_path: Optional[Union[str, Path]] = None) -> Optional[str]:
+        """
+        Load a custom API endpoint (e.g. a local mock upstream) in priority order:
+        1. GEMINI_API_ENDPOINT environment variable
+        2. 'gemini.api_endpoint' in the YAML config file
+        
+        Returns:
+            Base URL such as "http://127.0.0.1:8765", or None for the public API
+        """
+        endpoint = os.getenv('GEMINI_API_ENDPOINT')
+        if endpoint:
+            return endpoint
+        if config_path:
+            try:
+                with open(config_path, 'r') as f:
+                    config = yaml.safe_load(f)
+                    if config and isinstance(config.get('gemini'), dict):
+                        return config['gemini'].get('api_endpoint') or None
+            except Exception as e:
+                logger.warning("Failed to load api_endpoint from %s: %s", config_path, e)
+        return None
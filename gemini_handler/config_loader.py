@@ -6,6 +6,10 @@ from typing import Any, Dict, List, Optional, Union
 
 import yaml
 
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
 
 class ServerConfig:
     """Configuration for the Gemini API Server."""
@@ -54,7 +58,7 @@ class ServerConfig:
                             if section in yaml_config:
                                 config[section].update(yaml_config[section])
             except Exception as e:
-                print(f"Warning: Failed to load config from {self.config_path}: {e}")
+                logger.warning("Failed to load config from %s: %s", self.config_path, e)
         
         # Override with environment variables
         self._update_from_env(config)
@@ -0,0 +1,95 @@
+# gemini_handler/config_watcher.py
+"""Polls a config file and reports changes (used for hot reload)."""
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple, Union
+
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class ConfigWatcher:
+    """
+    Calls on_change when a config file's contents change.
+
+    Polls the file's mtime and size, and compares a content hash before
+    calling back, so touching the file or rewriting identical contents does
+    not trigger a reload. Errors raised by on_change are logged and the
+    watcher keeps running.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        on_change: Callable[[], Any],
+        interval: float = 2.0
+    ):
+        """
+        Args:
+            path: Config file to watch
+            on_change: Called (in the watcher thread) after the contents change
+            interval: Seconds between polls
+        """
+        self.path = Path(path)
+        self.on_change = on_change
+        self.interval = interval
+        self._signature = self._stat()
+        self._digest = self._hash()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _hash(self) -> Optional[str]:
+        try:
+            return hashlib.sha256(self.path.read_bytes()).hexdigest()
+        except OSError:
+            return None
+
+    def check(self) -> bool:
+        """
+        Poll once and call on_change if the contents changed.
+
+        Returns:
+            Whether on_change was called
+        """
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        digest = self._hash()
+        if digest is None or digest == self._digest:
+            # Deleted (e.g. mid-save) or rewritten with identical contents
+            return False
+        self._digest = digest
+        logger.info("Config file %s changed; reloading", self.path)
+        try:
+            self.on_change()
+        except Exception as e:
+            logger.error("Reload after change to %s failed: %s", self.path, e)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self) -> None:
+        """Start polling in a daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gemini-config-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -1,4 +1,19 @@
-from typing import Any, Dict, List, Optional, Union
+import dataclasses
+import time
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .cache_utils import canonical_hash
+from .data_models import ModelResponse
+from .message_conversion import MessageConverter
+from .log_utils import get_logger
+from .tracing import get_tracer
+
+logger = get_logger(__name__)
+tracer = get_tracer()
+
+# Fields of a cached ModelResponse payload
+_RESPONSE_FIELDS = frozenset(field.name for field in dataclasses.fields(ModelResponse))
 
 
 class ContentGenerationMixin:
@@ -6,27 +21,120 @@ class ContentGenerationMixin:
     
     def generate_content(
         self,
-        prompt: str,
+        prompt: Union[str, List[Dict[str, Any]]],
         model_name: Optional[str] = None,
         return_stats: bool = False,
-        include_proxy_info: bool = True  # New parameter
+        include_proxy_info: bool = True,  # New parameter
+        system_instruction: Optional[str] = None,
+        use_cache: bool = True,
+        cache_ttl: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Generate content using the selected strategies.
         
         Args:
-            prompt: The input prompt for content generation
+            prompt: The input prompt, or native Gemini multi-turn contents
+                    (list of {"role": ..., "parts": [...]} dicts)
             model_name: Optional specific model to use (default: None)
             return_stats: Whether to include key usage statistics (default: False)
             include_proxy_info: Whether to include proxy information (default: True)
+            system_instruction: Optional system instruction for this request only
+            use_cache: Whether to use the configured response caches (exact and semantic) (default: True)
+            cache_ttl: Optional TTL in seconds for caching this response
             
         Returns:
             Dictionary containing generation results and optionally key statistics
         """
         if not model_name:
             model_name = self.config.default_model
+        # Deferred auto proxies are configured by warmup() or here, once
+        self._ensure_proxies()
             
-        response = self._strategy.generate(prompt, model_name)
+        start_time = time.time()
+        response = None
+        cache_lookup = False
+        semantic_text = None
+        semantic_context = 0
+        semantic_vector = None
+        response_cache = getattr(self, 'response_cache', None)
+        semantic_cache = getattr(self, 'semantic_cache', None)
+
+        if use_cache and (response_cache is not None or semantic_cache is not None):
+            cache_lookup = True
+            effective_system_instruction = (
+                system_instruction if system_instruction is not None else self._strategy.system_instruction
+            )
+            gen_config = self._strategy.generation_config.to_dict()
+            # Entries are keyed on the model that served them
+            candidate_models = self._strategy.cache_models(model_name)
+
+            # Exact-match tier first: no embedding call, no key quota
+            if response_cache is not None:
+                for candidate in candidate_models:
+                    response = self._response_from_cache(
+                        response_cache.get(
+                            response_cache.make_key(candidate, prompt, gen_config, effective_system_instruction)
+                        ),
+                        start_time
+                    )
+                    if response is not None:
+                        break
+
+            # Semantic tier: one cheap embedding call instead of a generation
+            if response is None and semantic_cache is not None:
+                split = semantic_cache.split_prompt(prompt)
+                if split is not None:
+                    semantic_text, semantic_context = split
+                    payload, semantic_vector = semantic_cache.lookup_many(
+                        semantic_text,
+                        [
+                            self._semantic_namespace(candidate, gen_config, effective_system_instruction)
+                            for candidate in candidate_models
+                        ],
+                        context=semantic_context
+                    )
+                    response = self._response_from_cache(payload, start_time)
+
+        metrics = getattr(self, 'metrics', None)
+        if response is None:
+            if metrics is not None:
+                metrics.in_flight.inc()
+            try:
+                with tracer.span("gemini.generate") as span:
+                    span.set_attribute("model", model_name)
+                    span.set_attribute("strategy", type(self._strategy).__name__)
+                    response = self._strategy.generate(prompt, model_name, system_instruction=system_instruction)
+                    span.set_attribute("attempts", response.attempts)
+                    if not response.success:
+                        span.set_status("error", response.error)
+            finally:
+                if metrics is not None:
+                    metrics.in_flight.dec()
+            if metrics is not None:
+                metrics.record_request(
+                    model_name,
+                    "success" if response.success else "error",
+                    time.time() - start_time,
+                    response.attempts
+                )
+            if response.success and cache_lookup:
+                payload = dataclasses.asdict(response)
+                if response_cache is not None:
+                    response_cache.set(
+                        response_cache.make_key(response.model, prompt, gen_config, effective_system_instruction),
+                        payload,
+                        ttl_seconds=cache_ttl
+                    )
+                if semantic_text is not None:
+                    semantic_cache.add(
+                        semantic_text,
+                        self._semantic_namespace(response.model, gen_config, effective_system_instruction),
+                        payload,
+                        vector=semantic_vector, context=semantic_context, ttl_seconds=cache_ttl
+                    )
+        elif metrics is not None:
+            metrics.record_request(model_name, "cache_hit", time.time() - start_time, 0)
+
         result = response.__dict__
         
         if return_stats:
@@ -49,20 +157,23 @@ class ContentGenerationMixin:
 
     def generate_structured_content(
         self,
-        prompt: str,
+        prompt: Union[str, List[Dict[str, Any]]],
         schema: Dict[str, Any],
         model_name: Optional[str] = None,
         return_stats: bool = False,
         temperature: Optional[float] = None,
         top_p: Optional[float] = None,
         top_k: Optional[int] = None,
-        max_output_tokens: Optional[int] = None
+        max_output_tokens: Optional[int] = None,
+        system_instruction: Optional[str] = None,
+        use_cache: bool = True,
+        cache_ttl: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Generate structured content according to the provided schema.
         
         Args:
-            prompt: The input prompt for content generation
+            prompt: The input prompt, or native Gemini multi-turn contents
             schema: JSON schema that defines the structure of the response
             model_name: Optional specific model to use (default: None)
             return_stats: Whether to include key usage statistics (default: False)
@@ -70,6 +181,9 @@ class ContentGenerationMixin:
             top_p: Optional top_p to override default
             top_k: Optional top_k to override default
             max_output_tokens: Optional max_output_tokens to override default
+            system_instruction: Optional system instruction for this request only
+            use_cache: Whether to use the configured response caches (default: True)
+            cache_ttl: Optional TTL in seconds for caching this response
             
         Returns:
             Dictionary containing generation results and optionally key statistics
@@ -94,18 +208,92 @@ class ContentGenerationMixin:
         
         try:
             # Generate the content
-            result = self.generate_content(prompt, model_name, return_stats)
+            result = self.generate_content(
+                prompt,
+                model_name,
+                return_stats,
+                system_instruction=system_instruction,
+                use_cache=use_cache,
+                cache_ttl=cache_ttl
+            )
             return result
         finally:
             # Restore the original config
             self._strategy.generation_config = original_config
 
+    @staticmethod
+    def _semantic_namespace(model_name: str, gen_config: Dict[str, Any], system_instruction: Optional[str]) -> str:
+        """Semantic cache namespace of a model, generation config and system instruction."""
+        return f"{model_name}:{canonical_hash(gen_config, system_instruction)[:16]}"
+
+    @staticmethod
+    def _response_from_cache(payload: Optional[Dict[str, Any]], start_time: float) -> Optional[ModelResponse]:
+        """
+        Rebuild a cached response payload as a ModelResponse.
+
+        Returns None on a miss, and for entries written with a different set of
+        ModelResponse fields (e.g. by an older version), which count as misses.
+        """
+        if payload is None:
+            return None
+        if payload.keys() != _RESPONSE_FIELDS:
+            logger.debug("Ignoring cached response with mismatched fields")
+            return None
+        response = ModelResponse(**payload)
+        response.cached = True
+        response.time = time.time() - start_time
+        response.proxy_info = None
+        return response
+
+    def generate_chat_content(
+        self,
+        messages: List[Dict[str, Any]],
+        model_name: Optional[str] = None,
+        return_stats: bool = False,
+        include_proxy_info: bool = True,
+        use_cache: bool = True,
+        cache_ttl: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate a reply to an OpenAI-style chat history.
+
+        The history is sent as native Gemini multi-turn contents and any system
+        messages are passed as the system instruction, so the conversation keeps
+        its role structure and a stable prefix for prompt caching.
+
+        Args:
+            messages: List of OpenAI-format messages ({"role": ..., "content": ...})
+            model_name: Optional specific model to use (default: None)
+            return_stats: Whether to include key usage statistics (default: False)
+            include_proxy_info: Whether to include proxy information (default: True)
+            use_cache: Whether to use the configured response caches (default: True)
+            cache_ttl: Optional TTL in seconds for caching this response
+
+        Returns:
+            Dictionary containing generation results and optionally key statistics
+        """
+        contents, system_instruction = MessageConverter.to_gemini_contents(messages)
+
+        return self.generate_content(
+            contents,
+            model_name=model_name,
+            return_stats=return_stats,
+            include_proxy_info=include_proxy_info,
+            system_instruction=system_instruction,
+            use_cache=use_cache,
+            cache_ttl=cache_ttl
+        )
+
     def generate_embeddings(
         self,
         content: Union[str, List[str]],
         model_name: Optional[str] = None,
         task_type: Optional[str] = None,
-        return_stats: bool = False
+        return_stats: bool = False,
+        output_format: str = "list",
+        normalize: bool = False,
+        output_dimensionality: Optional[int] = None,
+        truncate_locally: bool = False
     ) -> Dict[str, Any]:
         """
         Generate embeddings for the provided content.
@@ -115,17 +303,27 @@ class ContentGenerationMixin:
             model_name: Embedding model to use (default: gemini-embedding-exp-03-07)
             task_type: Optional task type for specialized embeddings
             return_stats: Whether to include key usage statistics
+            output_format: "list" (ContentEmbedding objects) or "numpy" (one float32
+                           array of shape (n, dim), about 3 KB per 768-dim vector)
+            normalize: L2-normalize the vectors
+            output_dimensionality: Reduced vector size (default: gemini.embedding.dimensions)
+            truncate_locally: Truncate and renormalize locally instead of asking the API
             
         Returns:
             Dictionary containing embeddings or error information
         """
         if not model_name:
             model_name = self.config.default_embedding_model
+        self._ensure_proxies()
             
         response = self.embedding_handler.generate_embeddings(
             content=content,
             model_name=model_name,
-            task_type=task_type
+            task_type=task_type,
+            output_format=output_format,
+            normalize=normalize,
+            output_dimensionality=output_dimensionality,
+            truncate_locally=truncate_locally
         )
         
         result = response.__dict__
@@ -142,3 +340,39 @@ class ContentGenerationMixin:
             }
             
         return result
+
+    def embed_stream(
+        self,
+        items: Iterable[Union[str, Tuple[Hashable, str]]],
+        model_name: Optional[str] = None,
+        task_type: Optional[str] = None,
+        output_dimensionality: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        checkpoint_path: Optional[Union[str, Path]] = None
+    ) -> Iterator[Tuple[Hashable, Any]]:
+        """
+        Embed a corpus that does not fit in memory, yielding (id, vector) pairs in order.
+        
+        Args:
+            items: Texts or (id, text) pairs, consumed lazily
+            model_name: Embedding model to use (default: gemini-embedding-exp-03-07)
+            task_type: Optional task type for specialized embeddings
+            output_dimensionality: Reduced vector size (default: gemini.embedding.dimensions)
+            max_in_flight: Batches dispatched ahead of the consumer
+            checkpoint_path: JSON file recording progress so an interrupted run can resume
+            
+        Returns:
+            Iterator of (id, float32 NumPy vector) tuples
+        """
+        if not model_name:
+            model_name = self.config.default_embedding_model
+        self._ensure_proxies()
+            
+        return self.embedding_handler.embed_stream(
+            items,
+            model_name=model_name,
+            task_type=task_type,
+            output_dimensionality=output_dimensionality,
+            max_in_flight=max_in_flight,
+            checkpoint_path=checkpoint_path
+        )
@@ -0,0 +1,366 @@
+# gemini_handler/context_cache.py
+"""Explicit Gemini context caching for long, shared prompt prefixes."""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .cache_utils import canonical_hash, hash_api_key
+from .lazy_import import LazyModule
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Imported on first use to keep `import gemini_handler` fast
+google_genai = LazyModule("google.genai")
+
+PromptType = Union[str, List[Dict[str, Any]]]
+
+
+@dataclass
+class CachedPrefix:
+    """A registered prompt prefix that should be served from a Gemini cached content."""
+    prefix_id: str
+    system_instruction: Optional[str] = None
+    text: Optional[str] = None
+    contents: Optional[List[Dict[str, Any]]] = None
+    ttl_seconds: int = 3600
+    display_name: Optional[str] = None
+
+
+@dataclass
+class CacheEntry:
+    """A live cached content created for one (prefix, model, API key) combination."""
+    cached_content: Any
+    name: str
+    model: str
+    expires_at: float
+    client: Any = None  # google.genai client of the key that created the cache
+    last_used: float = field(default_factory=time.time)
+    refreshing: bool = False
+
+
+class ContextCacheManager:
+    """
+    Creates, reuses, refreshes and evicts Gemini cached contents.
+
+    Cached contents are scoped to the API key that created them, so entries are
+    keyed by (prefix content hash, model, API key hash) and every remote call
+    goes through a client bound to that key. Requests whose prompt starts with
+    a registered prefix are rewritten to reference the cache and only send the
+    remaining turns.
+
+    Remote calls are made outside the manager lock: concurrent requests for a
+    cache that is being created wait for that creation only, and other
+    requests are not blocked.
+    """
+
+    def __init__(
+        self,
+        default_ttl_seconds: int = 3600,
+        refresh_margin_seconds: int = 300,
+        max_entries: int = 100,
+        failure_backoff_seconds: int = 600,
+        client_factory: Optional[Callable[[str], Any]] = None
+    ):
+        """
+        Args:
+            default_ttl_seconds: TTL for newly created caches
+            refresh_margin_seconds: Extend a cache's TTL when it is used with less than this left
+            max_entries: Maximum live caches kept; least recently used ones are deleted
+            failure_backoff_seconds: How long to skip caching a (prefix, model, key) after
+                                     creation failed (e.g. prefix below the minimum token count)
+            client_factory: Returns the google.genai client for an API key
+                            (default: one new client per key)
+        """
+        self.default_ttl_seconds = default_ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.max_entries = max_entries
+        self.failure_backoff_seconds = failure_backoff_seconds
+        self.client_factory = client_factory
+
+        self._prefixes: Dict[str, CachedPrefix] = {}
+        self._entries: "OrderedDict[Tuple[str, str, str], CacheEntry]" = OrderedDict()
+        self._failures: Dict[Tuple[str, str, str], float] = {}
+        # Creations in progress; requests for the same cache wait on the future
+        self._pending: Dict[Tuple[str, str, str], "Future[Optional[CacheEntry]]"] = {}
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "creates": 0, "refreshes": 0, "evictions": 0, "failures": 0}
+
+    # --- Registration ---
+
+    def register_prefix(
+        self,
+        prefix: Optional[PromptType] = None,
+        system_instruction: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        display_name: Optional[str] = None
+    ) -> str:
+        """
+        Register a shared prefix (system instruction and/or leading prompt content).
+
+        Args:
+            prefix: Leading prompt text, or leading Gemini contents turns
+            system_instruction: System instruction that is part of the cached prefix
+            ttl_seconds: TTL for caches created for this prefix
+            display_name: Optional display name for the remote cached content
+
+        Returns:
+            The prefix id (content hash) used to refer to this registration
+        """
+        if prefix is None and not system_instruction:
+            raise ValueError("A prefix or a system_instruction is required to register a cached prefix")
+
+        text = prefix if isinstance(prefix, str) else None
+        contents = list(prefix) if isinstance(prefix, list) else None
+        prefix_id = canonical_hash(system_instruction, text, contents)
+
+        with self._lock:
+            self._prefixes[prefix_id] = CachedPrefix(
+                prefix_id=prefix_id,
+                system_instruction=system_instruction,
+                text=text,
+                contents=contents,
+                ttl_seconds=ttl_seconds or self.default_ttl_seconds,
+                display_name=display_name
+            )
+        return prefix_id
+
+    def unregister_prefix(self, prefix_id: str) -> None:
+        """Remove a registered prefix and delete its live caches."""
+        with self._lock:
+            self._prefixes.pop(prefix_id, None)
+        self.evict(prefix_id)
+
+    def match(
+        self,
+        prompt: PromptType,
+        system_instruction: Optional[str]
+    ) -> Optional[Tuple[CachedPrefix, PromptType]]:
+        """
+        Find the longest registered prefix matching a request.
+
+        Returns:
+            Tuple of (registration, remaining prompt) or None if nothing matches
+        """
+        best = None
+        best_length = -1
+        with self._lock:
+            prefixes = list(self._prefixes.values())
+
+        for registration in prefixes:
+            if registration.system_instruction != system_instruction:
+                continue
+
+            remainder: Optional[PromptType] = None
+            length = 0
+            if registration.text is not None:
+                if isinstance(prompt, str) and prompt.startswith(registration.text):
+                    remainder = prompt[len(registration.text):]
+                    length = len(registration.text)
+            elif registration.contents is not None:
+                size = len(registration.contents)
+                if isinstance(prompt, list) and prompt[:size] == registration.contents:
+                    remainder = prompt[size:]
+                    length = size
+            else:
+                remainder = prompt
+
+            # Gemini needs at least some new content next to the cache reference
+            if remainder and length > best_length:
+                best = (registration, remainder)
+                best_length = length
+
+        return best
+
+    # --- Cache lifecycle ---
+
+    def resolve(
+        self,
+        prompt: PromptType,
+        model_name: str,
+        system_instruction: Optional[str],
+        api_key: str
+    ) -> Optional[Tuple[Any, PromptType]]:
+        """
+        Get the cached content to use for a request, creating or refreshing it as needed.
+
+        Returns:
+            Tuple of (cached content, remaining prompt) or None when the request
+            should be sent without a cache reference
+        """
+        matched = self.match(prompt, system_instruction)
+        if matched is None:
+            return None
+        registration, remainder = matched
+
+        cache_key = (registration.prefix_id, model_name, hash_api_key(api_key))
+        now = time.time()
+        create = refresh = False
+
+        with self._lock:
+            if self._failures.get(cache_key, 0) > now:
+                return None
+
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry.expires_at <= now:
+                # Expired remotely; drop it and create a new one below
+                del self._entries[cache_key]
+                entry = None
+
+            if entry is None:
+                pending = self._pending.get(cache_key)
+                if pending is None:
+                    pending = self._pending[cache_key] = Future()
+                    create = True
+            else:
+                self._stats["hits"] += 1
+                entry.last_used = now
+                self._entries.move_to_end(cache_key)
+                if entry.expires_at - now < self.refresh_margin_seconds and not entry.refreshing:
+                    entry.refreshing = refresh = True
+
+        if create:
+            entry = self._create(cache_key, registration, model_name, api_key, pending)
+        elif entry is None:
+            # Another request is creating this cache
+            entry = pending.result()
+        elif refresh:
+            self._refresh(entry, registration)
+
+        if entry is None:
+            return None
+        return entry.cached_content, remainder
+
+    def _client_for(self, api_key: str) -> Any:
+        """google.genai client bound to one API key."""
+        if self.client_factory is not None:
+            return self.client_factory(api_key)
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                client = self._clients[api_key] = google_genai.Client(api_key=api_key)
+            return client
+
+    def _create(
+        self,
+        cache_key: Tuple[str, str, str],
+        registration: CachedPrefix,
+        model_name: str,
+        api_key: str,
+        pending: "Future[Optional[CacheEntry]]"
+    ) -> Optional[CacheEntry]:
+        """Create a cache (outside the lock) and publish the result to waiting requests."""
+        entry = None
+        evicted: List[CacheEntry] = []
+        try:
+            entry = self._create_entry(registration, model_name, self._client_for(api_key))
+        except Exception as e:
+            logger.warning("Context cache unavailable for model %s: %s", model_name, e)
+            with self._lock:
+                self._failures[cache_key] = time.time() + self.failure_backoff_seconds
+                self._stats["failures"] += 1
+        else:
+            with self._lock:
+                self._entries[cache_key] = entry
+                self._stats["creates"] += 1
+                evicted = self._pop_over_capacity()
+        finally:
+            with self._lock:
+                self._pending.pop(cache_key, None)
+            pending.set_result(entry)
+
+        for old_entry in evicted:
+            self._delete_remote(old_entry)
+        return entry
+
+    def _refresh(self, entry: CacheEntry, registration: CachedPrefix) -> None:
+        """Extend a cache's TTL; the cache stays usable until it expires if this fails."""
+        try:
+            entry.client.caches.update(name=entry.name, config={"ttl": f"{registration.ttl_seconds}s"})
+        except Exception as e:
+            logger.warning("Failed to refresh cached content %s: %s", entry.name, e)
+            with self._lock:
+                self._stats["failures"] += 1
+        else:
+            with self._lock:
+                entry.expires_at = time.time() + registration.ttl_seconds
+                self._stats["refreshes"] += 1
+        finally:
+            entry.refreshing = False
+
+    def _create_entry(self, registration: CachedPrefix, model_name: str, client: Any) -> CacheEntry:
+        """Create the remote cached content for a registration with one key's client."""
+        cached_content = client.caches.create(
+            model=model_name,
+            config={
+                "display_name": registration.display_name,
+                "system_instruction": registration.system_instruction,
+                "contents": registration.contents or ([registration.text] if registration.text else None),
+                "ttl": f"{registration.ttl_seconds}s"
+            }
+        )
+        return CacheEntry(
+            cached_content=cached_content,
+            name=cached_content.name,
+            model=model_name,
+            expires_at=time.time() + registration.ttl_seconds,
+            client=client
+        )
+
+    def _pop_over_capacity(self) -> List[CacheEntry]:
+        """Remove least recently used caches beyond max_entries; the caller deletes them remotely."""
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            _, entry = self._entries.popitem(last=False)
+            evicted.append(entry)
+        return evicted
+
+    def _delete_remote(self, entry: CacheEntry) -> None:
+        """Best-effort deletion of a remote cached content."""
+        with self._lock:
+            self._stats["evictions"] += 1
+        try:
+            entry.client.caches.delete(name=entry.name)
+        except Exception as e:
+            # The cache expires on its own; deletion is only an optimization
+            logger.warning("Failed to delete cached content %s: %s", entry.name, e)
+
+    def evict(self, prefix_id: Optional[str] = None) -> int:
+        """
+        Delete live caches.
+
+        Args:
+            prefix_id: Only delete caches for this prefix (default: all caches)
+
+        Returns:
+            Number of caches evicted
+        """
+        with self._lock:
+            keys = [k for k in self._entries if prefix_id is None or k[0] == prefix_id]
+            entries = [self._entries.pop(k) for k in keys]
+        for entry in entries:
+            self._delete_remote(entry)
+        return len(entries)
+
+    def evict_expired(self) -> int:
+        """Forget caches whose TTL has passed. Returns the number removed."""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, e in self._entries.items() if e.expires_at <= now]
+            for k in expired:
+                del self._entries[k]
+            self._failures = {k: t for k, t in self._failures.items() if t > now}
+        return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get counters and the number of registered prefixes and live caches."""
+        with self._lock:
+            return {
+                **self._stats,
+                "registered_prefixes": len(self._prefixes),
+                "live_caches": len(self._entries)
+            }
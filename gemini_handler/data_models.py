@@ -71,9 +71,11 @@ class ModelResponse:
     attempts: int = 1
     api_key_index: int = 0
     structured_data: Optional[Dict[str, Any]] = None
-    embeddings: Optional[Union[List[float], List[List[float]]]] = None
+    embeddings: Optional[Union[List[float], List[List[float]], Any]] = None  # np.ndarray for output_format="numpy"
     file_info: Optional[Dict[str, Any]] = None
     proxy_info: Optional[Dict[str, Any]] = None  # Add this field to track proxy used
+    cached: bool = False  # True when served from a response cache
+    item_errors: Optional[Dict[int, str]] = None  # Input position -> error for partly failed embedding calls
 
 
 class ModelConfig:
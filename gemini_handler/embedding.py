@@ -1,99 +1,543 @@
 # Modified embedding.py
 """Module for handling Gemini embedding functionality."""
+import itertools
+import json
+import os
+import random
+import threading
 import time
-from typing import Any, Dict, List, Optional, Union
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, Union
 
-from google import genai
-from google.api_core import client_options
-from google.genai import types
+import numpy as np
 
+from .config import genai_client_options
 from .data_models import EmbeddingConfig, ModelResponse
+from .embedding_cache import EmbeddingCache
 from .key_rotation import KeyRotationManager
-from .proxy import ProxyManager
+from .key_validation import QUARANTINE_STATUSES, classify_key_error
+from .lazy_import import LazyModule
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Imported on first use to keep `import gemini_handler` fast
+genai = LazyModule("google.genai")
+types = LazyModule("google.genai.types")
+
+# Upper bound (seconds) of the delay between embedding retry rounds
+MAX_RETRY_BACKOFF = 8.0
+
+
+def embeddings_to_array(embeddings: List[Any]) -> np.ndarray:
+    """
+    Pack embeddings into one C-contiguous float32 matrix of shape (n, dim).
+
+    Accepts ContentEmbedding objects, NumPy vectors or plain lists of floats.
+    """
+    if not embeddings:
+        return np.empty((0, 0), dtype=np.float32)
+    first = embeddings[0]
+    dim = len(getattr(first, "values", first))
+    matrix = np.empty((len(embeddings), dim), dtype=np.float32)
+    for row, embedding in enumerate(embeddings):
+        matrix[row] = getattr(embedding, "values", embedding)
+    return matrix
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of a float32 matrix in place (zero rows are left as-is)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def truncate_embeddings(matrix: np.ndarray, dimensionality: int) -> np.ndarray:
+    """
+    Matryoshka truncation: keep the first ``dimensionality`` components and renormalize.
+
+    Gemini embedding models are trained so that leading prefixes of a vector
+    are themselves usable embeddings once re-normalized.
+    """
+    if matrix.shape[1] <= dimensionality:
+        return matrix
+    return l2_normalize(np.ascontiguousarray(matrix[:, :dimensionality]))
 
 
 class EmbeddingHandler:
     """Handles embedding generation using Gemini API."""
-    
+
     def __init__(
-        self, 
+        self,
         key_manager: KeyRotationManager,
-        proxy_settings: Optional[Dict[str, str]] = None
+        proxy_settings: Optional[Dict[str, str]] = None,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        default_dimensionality: Optional[int] = None,
+        api_endpoint: Optional[str] = None
     ):
         """
         Initialize the embedding handler with a key manager.
-        
+
         Args:
             key_manager: The key rotation manager instance
             proxy_settings: Optional dictionary with proxy settings
+            batch_size: Maximum number of texts sent in one API call
+                        (the Gemini batch embedding limit is 100)
+            max_concurrency: Maximum number of batches in flight at once
+            max_retries: Attempts per batch before giving up
+            retry_backoff: Base delay in seconds between retry rounds; doubles every
+                           round (capped at MAX_RETRY_BACKOFF) with +/-50% jitter
+            embedding_cache: Optional cache; only texts missing from it are sent upstream
+            default_dimensionality: Output dimensionality used when a call does not
+                                    specify one (None = the model's full size)
+            api_endpoint: Custom API base URL (e.g. a local mock upstream)
         """
         self.key_manager = key_manager
         self.proxy_settings = proxy_settings
-        
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.embedding_cache = embedding_cache
+        self.default_dimensionality = default_dimensionality
+        self.api_endpoint = api_endpoint
+
+        # Models that rejected output_dimensionality; these are truncated locally
+        self._local_truncation_models: set = set()
+
+        # One client (and connection pool) per API key
+        self._clients: Dict[str, "genai.Client"] = {}
+        self._clients_lock = threading.Lock()
+
+    def _get_client(self, api_key: str) -> "genai.Client":
+        """Get or create the client for an API key."""
+        client = self._clients.get(api_key)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(api_key)
+                if client is None:
+                    client = genai.Client(api_key=api_key, **genai_client_options(self.api_endpoint))
+                    self._clients[api_key] = client
+        return client
+
+    def remove_clients(self, api_keys: Iterable[str]) -> List["genai.Client"]:
+        """
+        Forget the clients of removed keys.
+
+        Requests already using a client keep their reference; the caller
+        closes the returned clients once those have finished.
+
+        Args:
+            api_keys: Keys that are no longer in use
+
+        Returns:
+            The clients that were removed
+        """
+        with self._clients_lock:
+            return [client for key in api_keys if (client := self._clients.pop(key, None)) is not None]
+
+    def _embed_batch(
+        self,
+        texts: List[str],
+        model_name: str,
+        config: Optional["types.EmbedContentConfig"]
+    ) -> Tuple[Optional[List[Any]], int, Optional[str]]:
+        """
+        Embed one batch with the next available key.
+
+        Returns:
+            Tuple of (embeddings or None, key index used, error message or None)
+        """
+        api_key, key_index = self.key_manager.get_next_key()
+        try:
+            result = self._get_client(api_key).models.embed_content(
+                model=model_name,
+                contents=texts,
+                config=config
+            )
+        except Exception as e:
+            key_status = classify_key_error(str(e))
+            if key_status in QUARANTINE_STATUSES:
+                # Dead key: out of rotation until a background re-probe succeeds
+                self.key_manager.quarantine(key_index, key_status, api_key=api_key)
+            # Handle rate limiting
+            elif "429" in str(e):
+                self.key_manager.mark_rate_limited(key_index, api_key=api_key)
+            else:
+                self.key_manager.mark_failure(key_index, api_key=api_key)
+            return None, key_index, str(e)
+
+        # Mark successful API call
+        self.key_manager.mark_success(key_index, api_key=api_key)
+        return list(result.embeddings), key_index, None
+
+    @staticmethod
+    def _rejects_dimensionality(error: str) -> bool:
+        """Whether an error says the model does not support output_dimensionality."""
+        error = error.lower()
+        return ("400" in error or "invalid_argument" in error) and "dimensionality" in error
+
+    @staticmethod
+    def _is_retryable(error: str) -> bool:
+        """Invalid or forbidden requests (bad model, bad arguments, no access) fail the same way on every key."""
+        if classify_key_error(error) in QUARANTINE_STATUSES:
+            # A dead key (also reported as 400) does not affect the other keys
+            return True
+        return not (
+            "400" in error or "403" in error or "404" in error
+            or "INVALID_ARGUMENT" in error or "PERMISSION_DENIED" in error
+        )
+
     def generate_embeddings(
         self,
         content: Union[str, List[str]],
         model_name: str = "gemini-embedding-exp-03-07",
-        task_type: Optional[str] = None
+        task_type: Optional[str] = None,
+        output_format: str = "list",
+        normalize: bool = False,
+        output_dimensionality: Optional[int] = None,
+        truncate_locally: bool = False
     ) -> ModelResponse:
         """
         Generate embeddings for the provided content.
-        
+
+        Inputs larger than batch_size are split into API-sized batches that run
+        concurrently across keys (at most max_concurrency at a time). Batches
+        that fail are retried on their own; embeddings are returned in input order.
+        With an embedding_cache, only texts missing from the cache are embedded.
+        If some batches still fail, the response is unsuccessful but carries the
+        embeddings that did succeed (None for the others) and item_errors; with
+        an embedding_cache, the successful ones are cached.
+
         Args:
             content: Text content to embed (string or list of strings)
             model_name: Embedding model to use
             task_type: Optional task type for specialized embeddings
-            
+            output_format: "list" for a list of ContentEmbedding objects, or "numpy"
+                           for one C-contiguous float32 array of shape (n, dim)
+            normalize: L2-normalize every vector (done in one vectorized step)
+            output_dimensionality: Reduced vector size to request (default:
+                                   default_dimensionality). Longer vectors are
+                                   truncated and renormalized locally.
+            truncate_locally: Do not send output_dimensionality; always truncate locally
+                              (for models that do not accept the parameter)
+
         Returns:
             ModelResponse object containing embeddings or error information
         """
+        if output_format not in ("list", "numpy"):
+            raise ValueError(f"Unsupported output_format: {output_format}. Use 'list' or 'numpy'.")
+
         start_time = time.time()
-        api_key, key_index = self.key_manager.get_next_key()
-        
-        try:
-            # Configure client with the selected API key
-            # Proxy settings are handled via environment variables
-            if self.proxy_settings:
-                ProxyManager.configure_proxy(self.proxy_settings)
-                
-            client = genai.Client(api_key=api_key)
-            
-            # Prepare embedding configuration
-            config = None
-            if task_type:
-                config = types.EmbedContentConfig(task_type=task_type)
-            
-            # Generate embeddings
-            result = client.models.embed_content(
-                model=model_name,
-                contents=content,
-                config=config
+        texts = [content] if isinstance(content, str) else list(content)
+
+        dimensionality = output_dimensionality or self.default_dimensionality
+        truncate_locally = truncate_locally or model_name in self._local_truncation_models
+
+        if self.embedding_cache is None:
+            embeddings, key_index, error, item_errors = self._embed_texts(
+                texts, model_name, task_type, dimensionality, truncate_locally
             )
-            
-            # Mark successful API call
-            self.key_manager.mark_success(key_index)
-            
-            # Process embeddings to extract values
-            processed_embeddings = result.embeddings
-            
-            # Prepare response
+        else:
+            keys = [self.embedding_cache.make_key(model_name, task_type, dimensionality, text) for text in texts]
+            hits, misses = self.embedding_cache.get_many(keys)
+            embeddings: List[Any] = [None] * len(texts)
+            for position, vector in hits.items():
+                embeddings[position] = vector
+
+            key_index, error, item_errors = 0, None, {}
+            if misses:
+                fresh, key_index, error, fresh_errors = self._embed_texts(
+                    [texts[i] for i in misses], model_name, task_type, dimensionality, truncate_locally
+                )
+                # Cache whatever succeeded, so a retry only sends the texts that failed
+                done = [(position, embedding) for position, embedding in zip(misses, fresh) if embedding is not None]
+                if done:
+                    self.embedding_cache.set_many(
+                        [keys[position] for position, _ in done],
+                        [getattr(embedding, "values", embedding) for _, embedding in done]
+                    )
+                for position, embedding in done:
+                    embeddings[position] = embedding
+                item_errors = {misses[i]: item_error for i, item_error in fresh_errors.items()}
+
+        if error is not None:
             return ModelResponse(
-                success=True,
+                success=False,
                 model=model_name,
+                error=error,
                 time=time.time() - start_time,
                 api_key_index=key_index,
-                embeddings=processed_embeddings
+                embeddings=[
+                    types.ContentEmbedding(values=e.tolist()) if isinstance(e, np.ndarray) else e
+                    for e in embeddings
+                ],
+                item_errors=item_errors
             )
-            
-        except Exception as e:
-            # Handle rate limiting
-            if "429" in str(e):
-                self.key_manager.mark_rate_limited(key_index)
-            
-            return ModelResponse(
-                success=False,
-                model=model_name,
-                error=str(e),
-                time=time.time() - start_time,
-                api_key_index=key_index
+
+        if output_format == "numpy":
+            embeddings = embeddings_to_array(embeddings)
+            if normalize:
+                l2_normalize(embeddings)
+        elif normalize:
+            embeddings = [
+                types.ContentEmbedding(values=row.tolist())
+                for row in l2_normalize(embeddings_to_array(embeddings))
+            ]
+        else:
+            # Cache hits and locally truncated vectors are NumPy arrays
+            embeddings = [
+                types.ContentEmbedding(values=e.tolist()) if isinstance(e, np.ndarray) else e
+                for e in embeddings
+            ]
+
+        # Prepare response
+        return ModelResponse(
+            success=True,
+            model=model_name,
+            time=time.time() - start_time,
+            api_key_index=key_index,
+            embeddings=embeddings
+        )
+
+    def embed_stream(
+        self,
+        items: Iterable[Union[str, Tuple[Hashable, str]]],
+        model_name: str = "gemini-embedding-exp-03-07",
+        task_type: Optional[str] = None,
+        output_dimensionality: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        checkpoint_path: Optional[Union[str, Path]] = None
+    ) -> Iterator[Tuple[Hashable, np.ndarray]]:
+        """
+        Embed a corpus lazily, yielding (id, vector) pairs in input order.
+
+        Items are read from the iterable only as batches are dispatched, so at
+        most max_in_flight batches (plus the one being yielded) are held in
+        memory. With a checkpoint_path, the number of items already yielded is
+        recorded after every fully consumed batch; re-running with the same
+        (deterministic) iterable skips them. Items of a partly consumed batch
+        are yielded again on resume.
+
+        Args:
+            items: Texts, or (id, text) pairs. Plain texts get their position as id.
+            model_name: Embedding model to use
+            task_type: Optional task type for specialized embeddings
+            output_dimensionality: Reduced vector size (default: default_dimensionality)
+            max_in_flight: Batches dispatched ahead of the consumer (default: 2 * max_concurrency)
+            checkpoint_path: JSON file used to resume an interrupted run
+
+        Yields:
+            (id, float32 vector) tuples
+
+        Raises:
+            RuntimeError: If a batch still fails after max_retries attempts
+        """
+        checkpoint = Path(checkpoint_path) if checkpoint_path else None
+        done = self._read_checkpoint(checkpoint) if checkpoint else 0
+
+        pairs = (item if isinstance(item, tuple) else (position, item) for position, item in enumerate(items))
+        batches = self._batched(itertools.islice(pairs, done, None), max(1, self.batch_size))
+        max_in_flight = max(1, max_in_flight or 2 * self.max_concurrency)
+
+        def embed_batch(batch: List[Tuple[Hashable, str]]) -> np.ndarray:
+            response = self.generate_embeddings(
+                [text for _, text in batch],
+                model_name=model_name,
+                task_type=task_type,
+                output_format="numpy",
+                output_dimensionality=output_dimensionality
+            )
+            if not response.success:
+                raise RuntimeError(f"Embedding batch failed: {response.error}")
+            return response.embeddings
+
+        in_flight: deque = deque()
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+            try:
+                for batch in itertools.islice(batches, max_in_flight):
+                    in_flight.append((batch, executor.submit(embed_batch, batch)))
+
+                while in_flight:
+                    batch, future = in_flight.popleft()
+                    matrix = future.result()
+                    # Keep the pipeline full before handing results to the consumer
+                    for next_batch in itertools.islice(batches, 1):
+                        in_flight.append((next_batch, executor.submit(embed_batch, next_batch)))
+
+                    for (item_id, _), vector in zip(batch, matrix):
+                        yield item_id, vector
+
+                    done += len(batch)
+                    if checkpoint:
+                        self._write_checkpoint(checkpoint, done, model_name)
+            finally:
+                for _, future in in_flight:
+                    future.cancel()
+
+    @staticmethod
+    def _batched(pairs: Iterator[Tuple[Hashable, str]], size: int) -> Iterator[List[Tuple[Hashable, str]]]:
+        while True:
+            batch = list(itertools.islice(pairs, size))
+            if not batch:
+                return
+            yield batch
+
+    @staticmethod
+    def _read_checkpoint(path: Path) -> int:
+        """Number of items a previous run already yielded (0 if there is no checkpoint)."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return int(json.load(f).get("processed", 0))
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable embedding checkpoint %s: %s", path, e)
+            return 0
+
+    @staticmethod
+    def _write_checkpoint(path: Path, processed: int, model_name: str) -> None:
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"processed": processed, "model": model_name, "updated_at": time.time()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to write embedding checkpoint %s: %s", path, e)
+
+    def _embed_texts(
+        self,
+        texts: List[str],
+        model_name: str,
+        task_type: Optional[str],
+        dimensionality: Optional[int],
+        truncate_locally: bool
+    ) -> Tuple[List[Optional[Any]], int, Optional[str], Dict[int, str]]:
+        """
+        Embed texts, reducing them to ``dimensionality`` if requested.
+
+        The size is requested upstream unless truncate_locally is set. If the
+        model rejects the parameter, the request is repeated without it and the
+        model is remembered for local truncation.
+
+        Returns:
+            Tuple of (embeddings in input order with None for failed texts,
+            last key index used, error message or None, {text position: error})
+        """
+        send_dimensionality = dimensionality if dimensionality and not truncate_locally else None
+        config = None
+        if task_type or send_dimensionality:
+            config = types.EmbedContentConfig(task_type=task_type, output_dimensionality=send_dimensionality)
+
+        embeddings, key_index, error, item_errors = self._embed_in_batches(texts, model_name, config)
+
+        if error is not None and send_dimensionality and self._rejects_dimensionality(error):
+            logger.info("Model %s does not accept output_dimensionality; truncating locally", model_name)
+            self._local_truncation_models.add(model_name)
+            config = types.EmbedContentConfig(task_type=task_type) if task_type else None
+            embeddings, key_index, error, item_errors = self._embed_in_batches(texts, model_name, config)
+
+        done = [position for position, embedding in enumerate(embeddings) if embedding is not None]
+        if dimensionality and done:
+            first = embeddings[done[0]]
+            if len(getattr(first, "values", first)) > dimensionality:
+                # The model returned full-size vectors
+                matrix = truncate_embeddings(embeddings_to_array([embeddings[i] for i in done]), dimensionality)
+                for position, row in zip(done, matrix):
+                    embeddings[position] = row
+        return embeddings, key_index, error, item_errors
+
+    def _retry_delay(self, attempt: int) -> float:
+        """Jittered exponential backoff before retry round ``attempt`` (1-based)."""
+        if self.retry_backoff <= 0:
+            return 0.0
+        delay = min(self.retry_backoff * 2 ** (attempt - 1), MAX_RETRY_BACKOFF)
+        return delay * random.uniform(0.5, 1.5)
+
+    def _embed_in_batches(
+        self,
+        texts: List[str],
+        model_name: str,
+        config: Optional["types.EmbedContentConfig"]
+    ) -> Tuple[List[Optional[Any]], int, Optional[str], Dict[int, str]]:
+        """
+        Embed texts in concurrent batches, retrying only the failed ones.
+
+        Retry rounds are separated by a jittered exponential backoff. Batches
+        that succeeded are kept even if others fail for good.
+
+        Returns:
+            Tuple of (embeddings in input order with None for failed texts,
+            last key index used, error message or None, {text position: error})
+        """
+        batch_size = max(1, self.batch_size)
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        results: List[Optional[List[Any]]] = [None] * len(batches)
+        errors: Dict[int, str] = {}
+        key_index = 0
+
+        pending = list(range(len(batches)))
+        executor = None
+        if len(batches) > 1:
+            executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(batches))))
+
+        try:
+            for attempt in range(max(1, self.max_retries)):
+                if not pending:
+                    break
+                if attempt:
+                    time.sleep(self._retry_delay(attempt))
+
+                if executor is None:
+                    outcomes = [self._embed_batch(batches[i], model_name, config) for i in pending]
+                else:
+                    outcomes = list(executor.map(
+                        lambda i: self._embed_batch(batches[i], model_name, config),
+                        pending
+                    ))
+
+                still_pending = []
+                retryable = False
+                for batch_index, (embeddings, used_key_index, error) in zip(pending, outcomes):
+                    key_index = used_key_index
+                    if error is None:
+                        results[batch_index] = embeddings
+                        errors.pop(batch_index, None)
+                    else:
+                        errors[batch_index] = error
+                        still_pending.append(batch_index)
+                        retryable = retryable or self._is_retryable(error)
+                pending = still_pending
+                if not retryable:
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+        embeddings: List[Optional[Any]] = []
+        item_errors: Dict[int, str] = {}
+        for batch_index, batch in enumerate(batches):
+            if results[batch_index] is None:
+                item_errors.update((len(embeddings) + i, errors[batch_index]) for i in range(len(batch)))
+                embeddings.extend([None] * len(batch))
+            else:
+                embeddings.extend(results[batch_index])
+
+        if not pending:
+            return embeddings, key_index, None, item_errors
+
+        first_failed = pending[0]
+        error = errors[first_failed]
+        if len(batches) > 1:
+            error = (
+                f"{len(pending)} of {len(batches)} embedding batches failed after "
+                f"{self.max_retries} attempts. First error (batch {first_failed}): {error}"
             )
+        return embeddings, key_index, error, item_errors
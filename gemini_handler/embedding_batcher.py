@@ -0,0 +1,145 @@
+# gemini_handler/embedding_batcher.py
+"""Micro-batching of concurrent embedding requests into shared upstream calls."""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# (texts, model_name, task_type, output_dimensionality) -> float32 matrix (n, dim)
+EmbedFunction = Callable[[List[str], str, Optional[str], Optional[int]], np.ndarray]
+
+
+@dataclass
+class _PendingBatch:
+    """Requests waiting to be sent together."""
+    texts: List[str] = field(default_factory=list)
+    # (future, start row, row count) per waiting request
+    waiters: List[Tuple[asyncio.Future, int, int]] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent embedding requests and sends them as one batch call.
+
+    Requests for the same (model, task_type, dimensionality) that arrive within
+    max_wait_ms of the first one are merged, up to max_items texts. The merged
+    batch runs in a worker thread and each waiting request gets back its own rows.
+    """
+
+    def __init__(
+        self,
+        embed_fn: EmbedFunction,
+        max_wait_ms: float = 5.0,
+        max_items: int = 100
+    ):
+        """
+        Args:
+            embed_fn: Blocking function embedding a list of texts, returning a
+                      float32 matrix with one row per text (raises on failure)
+            max_wait_ms: How long the first request of a batch waits for company
+            max_items: Flush as soon as a batch holds this many texts
+        """
+        self.embed_fn = embed_fn
+        self.max_wait_ms = max_wait_ms
+        self.max_items = max_items
+
+        self._pending: Dict[Hashable, _PendingBatch] = {}
+        self._stats = {"requests": 0, "batches": 0, "texts": 0}
+
+    async def embed(
+        self,
+        texts: List[str],
+        model_name: str,
+        task_type: Optional[str] = None,
+        output_dimensionality: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Embed texts, sharing the upstream call with concurrent requests.
+
+        Returns:
+            float32 matrix of shape (len(texts), dim)
+        """
+        loop = asyncio.get_running_loop()
+        self._stats["requests"] += 1
+
+        if len(texts) >= self.max_items:
+            # Already a full batch on its own
+            return await self._run(loop, list(texts), model_name, task_type, output_dimensionality)
+
+        key = (model_name, task_type, output_dimensionality)
+        batch = self._pending.get(key)
+        if batch is not None and len(batch.texts) + len(texts) > self.max_items:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = _PendingBatch()
+            batch.timer = loop.call_later(self.max_wait_ms / 1000.0, self._flush, key)
+            self._pending[key] = batch
+
+        future = loop.create_future()
+        batch.waiters.append((future, len(batch.texts), len(texts)))
+        batch.texts.extend(texts)
+
+        if len(batch.texts) >= self.max_items:
+            self._flush(key)
+
+        return await future
+
+    def _flush(self, key: Hashable) -> None:
+        """Send the pending batch for a key (called on timeout or when full)."""
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        model_name, task_type, output_dimensionality = key
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(self._run(loop, batch.texts, model_name, task_type, output_dimensionality))
+        task.add_done_callback(lambda done: self._fan_out(done, batch))
+
+    @staticmethod
+    def _fan_out(done: "asyncio.Task", batch: _PendingBatch) -> None:
+        """Hand each waiting request its rows, the shared error, or the cancellation."""
+        cancelled = done.cancelled()
+        error = None if cancelled else done.exception()
+        for future, start, count in batch.waiters:
+            if future.done():
+                continue
+            if cancelled:
+                # The flush task was cancelled (e.g. at shutdown)
+                future.cancel()
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[start:start + count])
+
+    async def _run(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        texts: List[str],
+        model_name: str,
+        task_type: Optional[str],
+        output_dimensionality: Optional[int]
+    ) -> np.ndarray:
+        self._stats["batches"] += 1
+        self._stats["texts"] += len(texts)
+        return await loop.run_in_executor(
+            None, self.embed_fn, texts, model_name, task_type, output_dimensionality
+        )
+
+    def pending_texts(self) -> int:
+        """Number of texts waiting for their batch to be sent."""
+        return sum(len(batch.texts) for batch in list(self._pending.values()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get request/batch counters and the average batch size."""
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "pending_batches": len(self._pending),
+            "pending_texts": self.pending_texts(),
+            "avg_batch_size": self._stats["texts"] / batches if batches else 0.0
+        }
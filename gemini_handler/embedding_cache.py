@@ -0,0 +1,223 @@
+# gemini_handler/embedding_cache.py
+"""Content-addressed embedding cache with a memory LRU and a memory-mapped disk store."""
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .cache_utils import canonical_hash
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Caches embedding vectors keyed by hash(model, task_type, dimensionality, text).
+
+    The memory tier is an LRU of float32 vectors. The optional disk tier keeps
+    one append-only raw float32 file per dimension (read through np.memmap)
+    plus an append-only JSON-lines index mapping keys to (dimension, row), so
+    re-indexing a corpus only embeds chunks whose text changed.
+    """
+
+    INDEX_FILE = "index.jsonl"
+
+    def __init__(
+        self,
+        max_memory_entries: int = 100000,
+        cache_dir: Optional[Union[str, Path]] = None
+    ):
+        """
+        Args:
+            max_memory_entries: Vectors kept in the in-memory LRU
+            cache_dir: Directory for the on-disk store (None = memory only)
+        """
+        self.max_memory_entries = max_memory_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # key -> (dimension, row) in the disk store
+        self._index: Dict[str, Tuple[int, int]] = {}
+        # dimension -> number of rows written / open read-only memmap
+        self._rows: Dict[int, int] = {}
+        self._maps: Dict[int, np.memmap] = {}
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._load_index()
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        task_type: Optional[str],
+        dimensionality: Optional[int],
+        text: str
+    ) -> str:
+        """Build the cache key for one text."""
+        return canonical_hash(model_name, task_type, dimensionality, text)
+
+    def get_many(self, keys: Sequence[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """
+        Look up many keys in one pass.
+
+        Returns:
+            Tuple of (hits as {position: vector}, positions of misses)
+        """
+        hits: Dict[int, np.ndarray] = {}
+        misses: List[int] = []
+        with self._lock:
+            for position, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    hits[position] = vector
+                    continue
+
+                vector = self._read_disk(key)
+                if vector is not None:
+                    self._store_memory(key, vector)
+                    self._stats["disk_hits"] += 1
+                    hits[position] = vector
+                    continue
+
+                self._stats["misses"] += 1
+                misses.append(position)
+        return hits, misses
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached vector for a key, or None on a miss."""
+        hits, _ = self.get_many([key])
+        return hits.get(0)
+
+    def set_many(self, keys: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Store vectors for keys (in both tiers)."""
+        with self._lock:
+            new_rows: Dict[int, List[Tuple[str, np.ndarray]]] = {}
+            for key, values in zip(keys, vectors):
+                vector = np.asarray(values, dtype=np.float32)
+                self._store_memory(key, vector)
+                self._stats["sets"] += 1
+                if self.cache_dir and key not in self._index:
+                    new_rows.setdefault(vector.shape[0], []).append((key, vector))
+
+            for dim, items in new_rows.items():
+                self._append_disk(dim, items)
+
+    def set(self, key: str, vector: Sequence[float]) -> None:
+        """Store one vector."""
+        self.set_many([key], [vector])
+
+    def clear(self) -> None:
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._index.clear()
+            self._rows.clear()
+            self._maps.clear()
+            if self.cache_dir:
+                for path in list(self.cache_dir.glob("vectors_*.f32")) + [self.cache_dir / self.INDEX_FILE]:
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+
+    def get_stats(self) -> Dict[str, object]:
+        """Get hit/miss counters and entry counts."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._index),
+                "hit_rate": (lookups - self._stats["misses"]) / lookups if lookups else 0.0
+            }
+
+    # --- Memory tier ---
+
+    def _store_memory(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    # --- Disk tier ---
+
+    def _vectors_path(self, dim: int) -> Path:
+        return self.cache_dir / f"vectors_{dim}.f32"
+
+    def _load_index(self) -> None:
+        """Rebuild the in-memory index from the index file, ignoring torn or dangling lines."""
+        index_path = self.cache_dir / self.INDEX_FILE
+        if not index_path.exists():
+            return
+
+        file_rows: Dict[int, int] = {}
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        key, dim, row = json.loads(line)
+                    except (ValueError, TypeError):
+                        continue
+                    if dim not in file_rows:
+                        try:
+                            file_rows[dim] = self._vectors_path(dim).stat().st_size // (dim * 4)
+                        except OSError:
+                            file_rows[dim] = 0
+                    if row < file_rows[dim]:
+                        self._index[key] = (dim, row)
+                        self._rows[dim] = max(self._rows.get(dim, 0), row + 1)
+        except OSError as e:
+            logger.warning("Failed to load embedding cache index: %s", e)
+
+    def _append_disk(self, dim: int, items: List[Tuple[str, np.ndarray]]) -> None:
+        """Append vectors to the dimension's file, then record them in the index."""
+        start_row = self._rows.get(dim, 0)
+        matrix = np.ascontiguousarray(np.stack([vector for _, vector in items]), dtype=np.float32)
+        try:
+            with open(self._vectors_path(dim), "r+b" if start_row else "wb") as f:
+                # Truncate any partial write left behind by an earlier crash
+                f.seek(start_row * dim * 4)
+                f.truncate()
+                f.write(matrix.tobytes())
+            with open(self.cache_dir / self.INDEX_FILE, "a", encoding="utf-8") as f:
+                f.write("".join(
+                    json.dumps([key, dim, start_row + offset]) + "\n"
+                    for offset, (key, _) in enumerate(items)
+                ))
+        except OSError as e:
+            logger.warning("Failed to write embedding cache vectors: %s", e)
+            return
+
+        for offset, (key, _) in enumerate(items):
+            self._index[key] = (dim, start_row + offset)
+        self._rows[dim] = start_row + len(items)
+        # Remap lazily on the next read so the map covers the new rows
+        self._maps.pop(dim, None)
+
+    def _read_disk(self, key: str) -> Optional[np.ndarray]:
+        location = self._index.get(key)
+        if location is None:
+            return None
+        dim, row = location
+
+        vectors = self._maps.get(dim)
+        if vectors is None or row >= vectors.shape[0]:
+            try:
+                vectors = np.memmap(
+                    self._vectors_path(dim), dtype=np.float32, mode="r",
+                    shape=(self._rows[dim], dim)
+                )
+            except (OSError, ValueError) as e:
+                logger.warning("Failed to map embedding cache vectors: %s", e)
+                return None
+            self._maps[dim] = vectors
+        return np.array(vectors[row])
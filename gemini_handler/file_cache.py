@@ -0,0 +1,212 @@
+# gemini_handler/file_cache.py
+"""Upload deduplication index and metadata cache for the Gemini Files API."""
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Uploaded files are deleted by the API after 48 hours
+DEFAULT_FILE_LIFETIME_SECONDS = 48 * 3600
+
+
+def hash_file(file_path: Union[str, Path], chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_expiry(file: Any, safety_margin_seconds: float = 600) -> float:
+    """Timestamp after which an uploaded file should no longer be reused."""
+    expiration = getattr(file, "expiration_time", None)
+    if isinstance(expiration, datetime.datetime):
+        if expiration.tzinfo is None:
+            expiration = expiration.replace(tzinfo=datetime.timezone.utc)
+        return expiration.timestamp() - safety_margin_seconds
+    return time.time() + DEFAULT_FILE_LIFETIME_SECONDS - safety_margin_seconds
+
+
+class UploadIndex:
+    """
+    Maps file content hashes to files already uploaded with a given API key.
+
+    Entries expire with the remote file. With an index_path the index is kept
+    on disk so deduplication also works across processes and restarts: every
+    change is appended to a JSON-lines log (one small write per upload), and
+    the log is compacted to the live records when the index is loaded.
+    """
+
+    def __init__(self, index_path: Optional[Union[str, Path]] = None):
+        """
+        Args:
+            index_path: JSON-lines file for the persistent index (None = memory only)
+        """
+        self.index_path = Path(index_path) if index_path else None
+        # "<key id>:<content hash>" -> {"name", "uri", "mime_type", "expires_at"}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "misses": 0}
+        if self.index_path:
+            self._load()
+
+    def get(self, content_hash: str, key_id: str) -> Optional[Dict[str, Any]]:
+        """Return the upload record for content uploaded with a key, if still valid."""
+        with self._lock:
+            record = self._entries.get(f"{key_id}:{content_hash}")
+            if record is not None and record["expires_at"] > time.time():
+                self._stats["hits"] += 1
+                return dict(record)
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, content_hash: str, key_id: str, file: Any) -> None:
+        """Record an uploaded file."""
+        key = f"{key_id}:{content_hash}"
+        record = {
+            "name": file.name,
+            "uri": getattr(file, "uri", None),
+            "mime_type": getattr(file, "mime_type", None),
+            "expires_at": file_expiry(file)
+        }
+        with self._lock:
+            self._entries[key] = record
+            self._append([{"k": key, "v": record}])
+
+    def remove(self, file_name: str) -> None:
+        """Forget every record pointing at a file name (e.g. after deletion)."""
+        with self._lock:
+            stale = [k for k, record in self._entries.items() if record["name"] == file_name]
+            for k in stale:
+                del self._entries[k]
+            # A null value is a tombstone; compaction drops it
+            self._append([{"k": k, "v": None} for k in stale])
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get hit/miss counters and the number of records."""
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+    def _append(self, changes: List[Dict[str, Any]]) -> None:
+        """Append changes to the log as one write (O_APPEND keeps lines whole across processes)."""
+        if not self.index_path or not changes:
+            return
+        data = "".join(json.dumps(change) + "\n" for change in changes)
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning("Failed to write upload index %s: %s", self.index_path, e)
+
+    def _load(self) -> None:
+        """Replay the log, then rewrite it with only the live records."""
+        entries: Dict[str, Dict[str, Any]] = {}
+        lines = 0
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        change = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash
+                        continue
+                    if not isinstance(change, dict):
+                        continue
+                    if "k" not in change:
+                        # Index written as a single JSON mapping by older versions
+                        entries.update(change)
+                    elif change.get("v") is None:
+                        entries.pop(change["k"], None)
+                    else:
+                        entries[change["k"]] = change["v"]
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning("Ignoring unreadable upload index %s: %s", self.index_path, e)
+            return
+
+        now = time.time()
+        self._entries = {
+            k: v for k, v in entries.items()
+            if isinstance(v, dict) and v.get("expires_at", 0) > now
+        }
+        if lines != len(self._entries):
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for k, v in self._entries.items():
+                    f.write(json.dumps({"k": k, "v": v}) + "\n")
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning("Failed to compact upload index %s: %s", self.index_path, e)
+
+
+class FileMetadataCache:
+    """TTL + LRU cache of file objects returned by files.get, keyed by file name."""
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 1024):
+        """
+        Args:
+            ttl_seconds: How long metadata is reused before it is fetched again
+            max_entries: Maximum cached files (least recently used are dropped)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def is_cacheable(file: Any) -> bool:
+        """Only files that finished processing are cached (their metadata no longer changes)."""
+        state = getattr(file, "state", None)
+        return state is None or "ACTIVE" in str(getattr(state, "name", state))
+
+    def get(self, file_name: str) -> Optional[Any]:
+        with self._lock:
+            item = self._entries.get(file_name)
+            if item is not None and item[0] > time.time():
+                self._entries.move_to_end(file_name)
+                self._stats["hits"] += 1
+                return item[1]
+            if item is not None:
+                del self._entries[file_name]
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, file: Any) -> None:
+        if self.ttl_seconds <= 0 or not self.is_cacheable(file):
+            return
+        expires_at = min(time.time() + self.ttl_seconds, file_expiry(file, safety_margin_seconds=0))
+        with self._lock:
+            self._entries[file.name] = (expires_at, file)
+            self._entries.move_to_end(file.name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, file_name: Optional[str] = None) -> None:
+        """Drop one file (or all files) from the cache."""
+        with self._lock:
+            if file_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(file_name, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
@@ -1,36 +1,66 @@
 # /home/son/Documents/gemini-handler/gemini_handler/file_handler.py
 
+import fnmatch
 import mimetypes
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
-from google import genai
+from .file_cache import FileMetadataCache, UploadIndex, hash_file
+from .lazy_import import LazyModule
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Imported on first use to keep `import gemini_handler` fast
+genai = LazyModule("google.genai")
 
 
 class FileHandler:
     """Handles file operations with the Gemini API."""
 
-    def __init__(self, client: genai.Client):
+    def __init__(
+        self,
+        client: "genai.Client",
+        max_upload_workers: int = 4,
+        upload_index: Optional[UploadIndex] = None,
+        key_id: Optional[str] = None,
+        metadata_cache: Optional[FileMetadataCache] = None
+    ):
         """
         Initialize with a Gemini API client.
 
         Args:
             client: An initialized Gemini API client
+            max_upload_workers: Concurrent uploads in batch_upload_files
+            upload_index: Optional content-hash index used to skip re-uploading
+                          identical files
+            key_id: Hashed API key of the client (uploads are scoped to its project)
+            metadata_cache: Optional TTL cache for get_file results
         """
         self.client = client
+        self.max_upload_workers = max_upload_workers
+        self.upload_index = upload_index
+        self.key_id = key_id
+        self.metadata_cache = metadata_cache
 
     def upload_file(
         self,
         file_path: Union[str, Path],
-        display_name: Optional[str] = None  # Keep parameter for backward compatibility
+        display_name: Optional[str] = None,  # Keep parameter for backward compatibility
+        deduplicate: bool = True
     ) -> Any:
         """
         Upload a file to the Gemini API.
 
+        With an upload_index, a file whose exact contents were already uploaded
+        with this key (and has not expired) is returned instead of uploading again.
+
         Args:
             file_path: Path to the file to upload
             display_name: Optional display name (not supported by current API version)
+            deduplicate: Reuse an earlier upload of identical contents when possible
 
         Returns:
             File object containing metadata for the uploaded file
@@ -41,6 +71,17 @@ class FileHandler:
         if not file_path.exists() or not file_path.is_file():
             raise FileNotFoundError(f"File not found: {file_path}")
 
+        content_hash = None
+        if deduplicate and self.upload_index is not None and self.key_id:
+            content_hash = hash_file(file_path)
+            record = self.upload_index.get(content_hash, self.key_id)
+            if record is not None:
+                try:
+                    return self.get_file(record["name"])
+                except RuntimeError:
+                    # Deleted or expired remotely; upload again
+                    self.upload_index.remove(record["name"])
+
         try:
             # Upload file using only supported parameters
             uploaded_file = self.client.files.upload(
@@ -50,7 +91,12 @@ class FileHandler:
             
             # Log message if display_name provided but not used
             if display_name:
-                print(f"Note: 'display_name' parameter is not supported by the current API version.")
+                logger.debug("'display_name' parameter is not supported by the current API version.")
+
+            if content_hash is not None:
+                self.upload_index.put(content_hash, self.key_id, uploaded_file)
+            if self.metadata_cache is not None:
+                self.metadata_cache.put(uploaded_file)
                 
             return uploaded_file
         except Exception as e:
@@ -76,11 +122,20 @@ class FileHandler:
         if not file_name.startswith("files/"):
             raise ValueError("File name must start with 'files/'")
 
+        if self.metadata_cache is not None:
+            cached = self.metadata_cache.get(file_name)
+            if cached is not None:
+                return cached
+
         try:
-            return self.client.files.get(name=file_name)
+            file = self.client.files.get(name=file_name)
         except Exception as e:
             raise RuntimeError(f"Failed to get file metadata: {str(e)}")
 
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(file)
+        return file
+
     def list_files(
         self,
         page_size: int = 10,
@@ -138,6 +193,11 @@ class FileHandler:
         if not file_name.startswith("files/"):
             raise ValueError("File name must start with 'files/'")
 
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate(file_name)
+        if self.upload_index is not None:
+            self.upload_index.remove(file_name)
+
         try:
             self.client.files.delete(name=file_name)
             return True
@@ -188,21 +248,33 @@ class FileHandler:
     def batch_upload_files(
         self,
         directory_path: Union[str, Path],
-        file_extensions: Optional[List[str]] = None
-    ) -> List[Any]:  # Using List[Any] for List[genai.types.File]
+        file_extensions: Optional[List[str]] = None,
+        recursive: bool = False,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        max_workers: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Upload multiple files from a directory.
+        Upload multiple files from a directory concurrently.
+
+        All uploads go through this handler's client (one API key): uploaded
+        files belong to the key's project, so spreading them over keys would
+        make them unusable from the other keys.
 
         Args:
             directory_path: Path to directory containing files
             file_extensions: Optional list of file extensions to filter by (e.g., ['.jpg', '.png'])
+            recursive: Also upload files in subdirectories
+            include: Optional glob patterns; only files whose path relative to the
+                     directory (or name) matches one of them are uploaded
+            exclude: Optional glob patterns for files to skip
+            max_workers: Concurrent uploads (default: max_upload_workers)
 
         Returns:
-            List of File objects for uploaded files
+            One result per file, in path order: {"path", "success", "file", "error"}
 
         Raises:
             FileNotFoundError: If directory doesn't exist
-            RuntimeError: If uploads fail
         """
         directory = Path(directory_path)
 
@@ -210,44 +282,50 @@ class FileHandler:
         if not directory.exists() or not directory.is_dir():
             raise FileNotFoundError(f"Directory not found: {directory}")
 
-        # Prepare file extensions for matching (lowercase, ensure leading dot)
-        processed_extensions = None
-        if file_extensions:
-             processed_extensions = {ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in file_extensions}
-
-
-        # Filter files by extension if specified
-        file_paths = []
-        for f in directory.iterdir():
-            if f.is_file():
-                if processed_extensions:
-                    if f.suffix.lower() in processed_extensions:
-                        file_paths.append(f)
-                else:
-                     file_paths.append(f) # Upload all files if no extension filter
-
-
-        # Upload each file
-        uploaded_files = []
-        errors = []
+        file_paths = self._find_files(directory, file_extensions, recursive, include, exclude)
 
-        for file_path in file_paths:
+        def upload(file_path: Path) -> Dict[str, Any]:
             try:
                 # Use self.upload_file to handle individual uploads consistently
-                uploaded_file = self.upload_file(file_path, display_name=file_path.name)
-                uploaded_files.append(uploaded_file)
-                print(f"Successfully uploaded: {file_path.name}") # Add feedback
+                uploaded_file = self.upload_file(file_path)
+                logger.debug("Successfully uploaded: %s", file_path.name)
+                return {"path": str(file_path), "success": True, "file": uploaded_file, "error": None}
             except Exception as e:
-                error_message = f"Failed to upload {file_path.name}: {str(e)}"
-                print(error_message) # Add feedback
-                errors.append(error_message)
-
+                logger.warning("Failed to upload %s: %s", file_path.name, e)
+                return {"path": str(file_path), "success": False, "file": None, "error": str(e)}
+
+        workers = max(1, min(max_workers or self.max_upload_workers, len(file_paths) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(upload, file_paths))
+
+    @staticmethod
+    def _find_files(
+        directory: Path,
+        file_extensions: Optional[List[str]],
+        recursive: bool,
+        include: Optional[List[str]],
+        exclude: Optional[List[str]]
+    ) -> List[Path]:
+        """Collect the files to upload, applying extension and glob filters."""
+        # Prepare file extensions for matching (lowercase, ensure leading dot)
+        processed_extensions = None
+        if file_extensions:
+            processed_extensions = {ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in file_extensions}
 
-        # If there were errors, include them in the exception message
-        if errors:
-            error_summary = "\n".join(errors)
-            # Decide whether to raise an error or just return successfully uploaded files
-            # Raising an error might be better for script automation
-            raise RuntimeError(f"Some files failed to upload:\n{error_summary}")
+        def matches(relative: str, name: str, patterns: List[str]) -> bool:
+            return any(fnmatch.fnmatch(relative, p) or fnmatch.fnmatch(name, p) for p in patterns)
 
-        return uploaded_files
\ No newline at end of file
+        candidates = directory.rglob("*") if recursive else directory.iterdir()
+        file_paths = []
+        for f in candidates:
+            if not f.is_file():
+                continue
+            if processed_extensions and f.suffix.lower() not in processed_extensions:
+                continue
+            relative = f.relative_to(directory).as_posix()
+            if include and not matches(relative, f.name, include):
+                continue
+            if exclude and matches(relative, f.name, exclude):
+                continue
+            file_paths.append(f)
+        return sorted(file_paths)
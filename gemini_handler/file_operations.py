@@ -1,16 +1,27 @@
 # /home/son/Documents/gemini-handler/gemini_handler/file_operations.py
 
+import os
 import time
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
-import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
-
 # Import data models explicitly to avoid circular import issues
+from .config import genai_configure_options
 from .data_models import GenerationConfig, ModelResponse
+from .lazy_import import LazyModule
+from .log_utils import get_logger
+from .mime_utils import guess_mime_type, to_supported_image
 from .response_handler import ResponseHandler
 
+logger = get_logger(__name__)
+
+# Imported on first use to keep `import gemini_handler` fast
+genai = LazyModule("google.generativeai")
+google_exceptions = LazyModule("google.api_core.exceptions")
+
+# Requests above ~20 MB must reference files through the Files API
+INLINE_MAX_BYTES = 19 * 1024 * 1024
+
 
 class FileOperationsMixin:
     """Mixin for file operations methods."""
@@ -33,7 +44,9 @@ class FileOperationsMixin:
     ) -> ModelResponse:
         """Internal helper to generate content with file, handling keys and response."""
         start_time = time.time()
-        api_key, key_index = self.key_manager.get_next_key()
+        # Uploaded files belong to the project of the key that uploaded them;
+        # any other key is denied, so the call is pinned to the files client's key
+        api_key, key_index = self._file_key()
 
         try:
             # Retrieve the actual File object if a name was passed
@@ -44,7 +57,7 @@ class FileOperationsMixin:
             }
 
             # Configure API key
-            genai.configure(api_key=api_key)
+            genai.configure(api_key=api_key, **genai_configure_options(getattr(self, 'api_endpoint', None)))
 
             # Create the generative model instance
             gen_config_dict = generation_config.to_dict()
@@ -54,38 +67,18 @@ class FileOperationsMixin:
                 system_instruction=system_instruction or self.system_instruction
             )
 
-            # Handle file conversion - we need to download and convert to a format
-            # acceptable by the generate_content method
-            if hasattr(file_object, 'uri') and file_object.uri:
-                # Need to import necessary libraries for downloading and processing
-                from io import BytesIO
-
-                import requests
-                from PIL import Image
-
-                # Get appropriate URI for download
-                uri = file_object.download_uri if hasattr(file_object, 'download_uri') and file_object.download_uri else file_object.uri
-                
-                # Download file content
-                headers = {"Authorization": f"Bearer {api_key}"} if "googleapis.com" in uri else {}
-                response = requests.get(uri, headers=headers)
-                response.raise_for_status()
-                
-                # Process file based on MIME type
-                mime_type = getattr(file_object, 'mime_type', '')
-                if mime_type and mime_type.startswith('image/'):
-                    # For images, convert to PIL Image which is accepted by genai
-                    file_content = Image.open(BytesIO(response.content))
-                else:
-                    # For other file types, you might need different handling
-                    # depending on what the genai API accepts
-                    raise ValueError(f"Unsupported file MIME type: {mime_type}")
-                    
-                # Generate content with properly formatted content
-                response = model.generate_content([file_content, "\n\n", prompt])
-            else:
+            if not getattr(file_object, 'uri', None):
                 raise ValueError(f"File object does not have a URI: {file_object.name}")
 
+            # Reference the uploaded file by URI; the API reads it server-side
+            file_part = {
+                "file_data": {
+                    "mime_type": getattr(file_object, 'mime_type', None) or "application/octet-stream",
+                    "file_uri": file_object.uri
+                }
+            }
+            response = model.generate_content([{"role": "user", "parts": [file_part, {"text": prompt}]}])
+
             # Process response
             result = ResponseHandler.process_response(
                 response,
@@ -96,7 +89,7 @@ class FileOperationsMixin:
             )
 
             if result.success:
-                self.key_manager.mark_success(key_index)
+                self.key_manager.mark_success(key_index, api_key=api_key)
             
             # Add file info to the result
             result.file_info = file_info
@@ -104,10 +97,10 @@ class FileOperationsMixin:
 
         except Exception as e:
             if "429" in str(e):
-                self.key_manager.mark_rate_limited(key_index)
+                self.key_manager.mark_rate_limited(key_index, api_key=api_key)
                 error_message = f"Rate limit exceeded: {str(e)}"
             else:
-                self.key_manager.mark_failure(key_index)
+                self.key_manager.mark_failure(key_index, api_key=api_key)
                 error_message = f"An unexpected error occurred: {str(e)}"
                 
             return ModelResponse(
@@ -119,6 +112,24 @@ class FileOperationsMixin:
                 file_info={"name": getattr(file, 'name', str(file))}
             )
 
+    @staticmethod
+    def _file_state(file: Any) -> str:
+        """State of an uploaded file as a string ("" if unknown)."""
+        state = getattr(file, 'state', None)
+        return str(getattr(state, 'name', state) or "")
+
+    def _wait_until_active(self, file: Any, timeout: float = 600, poll_interval: float = 2) -> Any:
+        """Poll an uploaded file until processing (e.g. of video) has finished."""
+        deadline = time.time() + timeout
+        while "PROCESSING" in self._file_state(file):
+            if time.time() > deadline:
+                raise TimeoutError(f"File {file.name} is still processing after {timeout}s")
+            time.sleep(poll_interval)
+            file = self.file_handler.get_file(file.name)
+        if "FAILED" in self._file_state(file):
+            raise RuntimeError(f"Processing of uploaded file {file.name} failed")
+        return file
+
     # --- Existing File Operations (Upload, Get, List, Delete, Batch Upload) ---
 
     def upload_file(
@@ -225,28 +236,52 @@ class FileOperationsMixin:
     def batch_upload_files(
         self,
         directory_path: Union[str, Path],
-        file_extensions: Optional[List[str]] = None
+        file_extensions: Optional[List[str]] = None,
+        recursive: bool = False,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        max_workers: Optional[int] = None
     ) -> Dict[str, Any]:
         """
-        Upload multiple files from a directory.
+        Upload multiple files from a directory concurrently.
         Uses self.file_handler internally.
+
+        Returns a dictionary with "success" (True only if every upload succeeded),
+        "files" (the uploaded files), "failed" ({"path", "error"} per failed file),
+        "results" (one entry per file, in path order) and "count".
         """
         try:
-            files = self.file_handler.batch_upload_files(directory_path, file_extensions)
-             # Convert file objects to dicts for simpler JSON serialization if needed later
-            files_list = [
-                {
-                    "name": f.name,
-                    "display_name": getattr(f, 'display_name', None),
-                    "uri": getattr(f, 'uri', None),
-                    "mime_type": getattr(f, 'mime_type', None),
-                    "size_bytes": getattr(f, 'size_bytes', None),
-                    "state": getattr(f, 'state', None)
-                } for f in files
-            ]
+            results = self.file_handler.batch_upload_files(
+                directory_path,
+                file_extensions,
+                recursive=recursive,
+                include=include,
+                exclude=exclude,
+                max_workers=max_workers
+            )
+            entries = []
+            for r in results:
+                f = r["file"]
+                entry = {"path": r["path"], "success": r["success"], "error": r["error"]}
+                if f is not None:
+                    # Convert file objects to dicts for simpler JSON serialization if needed later
+                    entry.update({
+                        "name": f.name,
+                        "display_name": getattr(f, 'display_name', None),
+                        "uri": getattr(f, 'uri', None),
+                        "mime_type": getattr(f, 'mime_type', None),
+                        "size_bytes": getattr(f, 'size_bytes', None),
+                        "state": getattr(f, 'state', None)
+                    })
+                entries.append(entry)
+
+            files_list = [e for e in entries if e["success"]]
+            failed = [{"path": e["path"], "error": e["error"]} for e in entries if not e["success"]]
             return {
-                "success": True,
+                "success": not failed,
                 "files": files_list,
+                "failed": failed,
+                "results": entries,
                 "count": len(files_list)
             }
         except Exception as e:
@@ -310,7 +345,7 @@ class FileOperationsMixin:
         if not model_name:
             # Suggest or default to a model known for function calling / structured output with vision
             model_name = "gemini-2.0-flash"  # Use a vision-capable model
-            print(f"Warning: No model_name specified, defaulting to '{model_name}' for structured output with file.")
+            logger.warning("No model_name specified, defaulting to '%s' for structured output with file.", model_name)
 
         # Create a structured generation config based on current config + overrides
         original_config = self.generation_config  # Get base config from handler instance
@@ -354,11 +389,14 @@ class FileOperationsMixin:
         top_k: Optional[int] = None,
         max_output_tokens: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Generate content using a local file directly without uploading first."""
-        import os
+        """
+        Generate content using a local file (image, PDF, audio, video, text...).
 
-        from PIL import Image
-        
+        The file's raw bytes are sent inline with a MIME type sniffed from its
+        magic bytes. Only images of a type Gemini does not accept (GIF, BMP...)
+        are re-encoded, as PNG. Files above the inline request limit are
+        uploaded through the Files API instead and referenced by URI.
+        """
         start_time = time.time()
         file_path = Path(file_path)
         
@@ -371,8 +409,27 @@ class FileOperationsMixin:
             }
         
         try:
-            # Get API key
-            api_key, key_index = self.key_manager.get_next_key()
+            size_bytes = os.path.getsize(file_path)
+            mime_type = guess_mime_type(file_path)
+            uploaded_name = None
+
+            if size_bytes <= getattr(self, 'inline_max_bytes', INLINE_MAX_BYTES):
+                # GIF, BMP and other image types Gemini rejects are converted to PNG
+                data, mime_type = to_supported_image(file_path.read_bytes(), mime_type)
+                file_part = {"inline_data": {"mime_type": mime_type, "data": data}}
+                # Get API key
+                api_key, key_index = self.key_manager.get_next_key()
+            else:
+                uploaded = self._wait_until_active(self.file_handler.upload_file(file_path))
+                uploaded_name = uploaded.name
+                file_part = {
+                    "file_data": {
+                        "mime_type": getattr(uploaded, 'mime_type', None) or mime_type,
+                        "file_uri": uploaded.uri
+                    }
+                }
+                # Uploaded files are only visible to the uploading key's project
+                api_key, key_index = self._file_key()
             
             # Configure with API key
             # If proxy settings exist, make sure they're applied
@@ -380,7 +437,7 @@ class FileOperationsMixin:
                 from .proxy import ProxyManager
                 ProxyManager.configure_proxy(self.proxy_settings)
                 
-            genai.configure(api_key=api_key)
+            genai.configure(api_key=api_key, **genai_configure_options(getattr(self, 'api_endpoint', None)))
             
             # Determine if structured output is needed
             use_structured = schema is not None
@@ -418,22 +475,7 @@ class FileOperationsMixin:
                 system_instruction=self.system_instruction
             )
             
-            # Load the file directly based on file type
-            file_extension = file_path.suffix.lower()
-            if file_extension in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-                # Open image file directly
-                image = Image.open(file_path)
-                # Generate content with image
-                response = model.generate_content([image, "\n\n", prompt])
-            else:
-                # For other file types, handle accordingly
-                # Currently just supporting images
-                return {
-                    "success": False,
-                    "error": f"Unsupported file type: {file_extension}",
-                    "time": time.time() - start_time,
-                    "api_key_index": key_index
-                }
+            response = model.generate_content([{"role": "user", "parts": [file_part, {"text": prompt}]}])
             
             # Process response
             result = ResponseHandler.process_response(
@@ -446,13 +488,15 @@ class FileOperationsMixin:
             
             # Mark success
             if result.success:
-                self.key_manager.mark_success(key_index)
+                self.key_manager.mark_success(key_index, api_key=api_key)
             
             # Add file info
             result.file_info = {
                 "name": str(file_path),
                 "is_local": True,
-                "size_bytes": os.path.getsize(file_path)
+                "size_bytes": size_bytes,
+                "mime_type": mime_type,
+                "uploaded_as": uploaded_name
             }
             
             # Convert to dictionary
@@ -465,11 +509,14 @@ class FileOperationsMixin:
             return result_dict
             
         except Exception as e:
-            if "429" in str(e):
-                self.key_manager.mark_rate_limited(key_index)
+            if 'key_index' not in locals():
+                # Failed before any key was used (reading or uploading the file)
+                error_message = f"An unexpected error occurred: {str(e)}"
+            elif "429" in str(e):
+                self.key_manager.mark_rate_limited(key_index, api_key=api_key)
                 error_message = f"Rate limit exceeded: {str(e)}"
             else:
-                self.key_manager.mark_failure(key_index)
+                self.key_manager.mark_failure(key_index, api_key=api_key)
                 error_message = f"An unexpected error occurred: {str(e)}"
                 
             return {
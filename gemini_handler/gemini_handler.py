@@ -1,12 +1,16 @@
 # Modified gemini_handler.py
+import asyncio
+import functools
+import os
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-import google.generativeai as genai
-from google import genai as google_genai
-
-from .config import ConfigLoader
+from .cache_utils import hash_api_key
+from .config import ConfigLoader, genai_client_options
 from .content_generation import ContentGenerationMixin
+from .context_cache import ContextCacheManager
 from .data_models import (
     EmbeddingConfig,
     GenerationConfig,
@@ -15,10 +19,18 @@ from .data_models import (
     Strategy,
 )
 from .embedding import EmbeddingHandler
+from .embedding_cache import EmbeddingCache
+from .file_cache import FileMetadataCache, UploadIndex
 from .file_handler import FileHandler
-from .file_operations import FileOperationsMixin
+from .file_operations import INLINE_MAX_BYTES, FileOperationsMixin
 from .key_rotation import KeyRotationManager
+from .key_validation import KeyValidator
+from .lazy_import import LazyModule
+from .log_utils import get_logger
+from .metrics import GeminiMetrics
 from .proxy import ProxyManager
+from .response_cache import ResponseCache
+from .semantic_cache import SemanticCache
 from .strategies import (
     ContentStrategy,
     FallbackStrategy,
@@ -26,6 +38,12 @@ from .strategies import (
     RoundRobinStrategy,
 )
 
+logger = get_logger(__name__)
+
+# Imported on first use to keep `import gemini_handler` fast
+genai = LazyModule("google.generativeai")
+google_genai = LazyModule("google.genai")
+
 # Define sentinel object to detect when parameter is not provided
 _SENTINEL = object()
 
@@ -40,7 +58,12 @@ class GeminiHandler(ContentGenerationMixin, FileOperationsMixin):
         key_strategy: KeyRotationStrategy = KeyRotationStrategy.ROUND_ROBIN,
         system_instruction: Optional[str] = None,
         generation_config: Optional[GenerationConfig] = None,
-        proxy_settings: Any = _SENTINEL  # Use sentinel to detect if provided
+        proxy_settings: Any = _SENTINEL,  # Use sentinel to detect if provided
+        response_cache: Optional[ResponseCache] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        metrics: Optional[GeminiMetrics] = None,
+        api_endpoint: Optional[str] = None
     ):
         """
         Initialize GeminiHandler with flexible configuration options.
@@ -55,6 +78,18 @@ class GeminiHandler(ContentGenerationMixin, FileOperationsMixin):
             proxy_settings: Explicit proxy settings dictionary:
                             - If provided (even {}, or explicitly None), this value is used directly
                             - If not provided, may be loaded from config_path if available
+            response_cache: Optional exact-match response cache. Identical requests
+                            (model, contents, generation config, system instruction)
+                            are answered from it without using key quota.
+            semantic_cache: Optional semantic cache answering near-duplicate prompts
+                            (checked after the exact-match cache)
+            embedding_cache: Optional embedding cache; only uncached texts are embedded.
+                             If not provided, one is created when gemini.embedding.cache_dir
+                             is set in the config file.
+            metrics: Optional metrics collector (default: a new GeminiMetrics);
+                     render it with self.metrics.render() for Prometheus
+            api_endpoint: Custom API base URL, e.g. a local mock upstream
+                          (default: GEMINI_API_ENDPOINT or gemini.api_endpoint from config)
         """
         # Load API keys first
         self.api_keys = api_keys or ConfigLoader.load_api_keys(config_path)
@@ -63,39 +98,48 @@ class GeminiHandler(ContentGenerationMixin, FileOperationsMixin):
         if proxy_settings is not _SENTINEL:
             # Case: Parameter was explicitly provided - use it exactly as given
             self.proxy_settings = proxy_settings
-            print(f"Proxy settings explicitly provided: {proxy_settings}")
+            logger.debug("Proxy settings explicitly provided: %s", proxy_settings)
         elif config_path:
             # Case: Parameter not provided, try loading from config
             try:
                 self.proxy_settings = ConfigLoader.load_proxy_settings(config_path)
                 if self.proxy_settings:
-                    print(f"Loaded proxy settings from config: {self.proxy_settings}")
+                    logger.info("Loaded proxy settings from config: %s", self.proxy_settings)
                 else:
-                    print("No proxy settings found in config file.")
+                    logger.debug("No proxy settings found in config file.")
                     self.proxy_settings = None
             except Exception as e:
-                print(f"Error loading proxy settings from config: {e}")
+                logger.warning("Error loading proxy settings from config: %s", e)
                 self.proxy_settings = None
         else:
             # Case: No sources for proxy settings
             self.proxy_settings = None
-            print("No proxy settings sources available.")
+            logger.debug("No proxy settings sources available.")
 
-        # Apply proxy configuration if we have valid settings
-        if self.proxy_settings:
-            print(f"Configuring ProxyManager with: {self.proxy_settings}")
+        # Static proxies only set environment variables, so apply them now; auto
+        # proxies fetch proxy lists over the network and are configured by
+        # warmup() or the first request instead
+        self._proxies_configured = False
+        self._proxy_lock = threading.Lock()
+        if isinstance(self.proxy_settings, dict) and 'auto_proxy' in self.proxy_settings:
+            logger.info("Deferring auto proxy configuration until warmup or first use")
+        elif self.proxy_settings:
+            logger.info("Configuring ProxyManager with: %s", self.proxy_settings)
             ProxyManager.configure_proxy(self.proxy_settings)
+            self._proxies_configured = True
         else:
-            print("No proxy configuration applied.")
+            logger.debug("No proxy configuration applied.")
             # Optionally clear environment variables to ensure no proxy is used
-            import os
             os.environ.pop('HTTP_PROXY', None)
             os.environ.pop('HTTPS_PROXY', None)
+            self._proxies_configured = True
 
         # Initialize other components
         self.config = ModelConfig()
         self.system_instruction = system_instruction
         self.generation_config = generation_config or GenerationConfig()
+        self.response_cache = response_cache
+        self.api_endpoint = api_endpoint or ConfigLoader.load_api_endpoint(config_path)
         
         # Initialize key rotation manager
         self.key_manager = KeyRotationManager(
@@ -103,21 +147,299 @@ class GeminiHandler(ContentGenerationMixin, FileOperationsMixin):
             strategy=key_strategy
         )
         
-        # Initialize embedding handler
+        # Request/attempt metrics; key gauges are computed when scraped
+        self.metrics = metrics if metrics is not None else GeminiMetrics()
+        self.metrics.bind_keys(self.key_manager)
+        self.metrics.bind_models(self.config.models)
+        
+        # Initialize embedding handler (batching limits come from gemini.embedding)
+        embedding_settings = ConfigLoader.load_embedding_settings(config_path)
+        if embedding_cache is None and embedding_settings.get('cache_dir'):
+            embedding_cache = EmbeddingCache(cache_dir=embedding_settings['cache_dir'])
         self.embedding_handler = EmbeddingHandler(
             key_manager=self.key_manager,
-            proxy_settings=self.proxy_settings
+            proxy_settings=self.proxy_settings,
+            batch_size=embedding_settings.get('batch_size', 100),
+            max_concurrency=embedding_settings.get('max_concurrency', 4),
+            retry_backoff=embedding_settings.get('retry_backoff', 0.5),
+            embedding_cache=embedding_cache,
+            default_dimensionality=embedding_settings.get('dimensions'),
+            api_endpoint=self.api_endpoint
         )
         
-        # Initialize client for file operations
-        api_key, _ = self.key_manager.get_next_key()
-        self.client = google_genai.Client(api_key=api_key)
+        # Explicit context caching for registered shared prefixes; caches are
+        # created with the per-key clients so each belongs to the key it is keyed by
+        self.context_cache = ContextCacheManager(client_factory=self.embedding_handler._get_client)
+        
+        # Semantic cache embeds prompts with this handler's embedding handler by default
+        self.semantic_cache = semantic_cache
+        if self.semantic_cache is not None and self.semantic_cache.embedding_handler is None:
+            self.semantic_cache.embedding_handler = self.embedding_handler
         
-        # Create file handler
-        self.file_handler = FileHandler(client=self.client)
+        # The files client is created on first use (see _ensure_file_client)
+        # so construction makes no key selection or client setup
+        file_settings = ConfigLoader.load_file_settings(config_path)
+        self._file_settings = file_settings
+        self._client = None
+        self._file_handler = None
+        self._file_api_key = None
+        self._file_client_lock = threading.Lock()
+        # Local files larger than this are uploaded instead of sent inline
+        self.inline_max_bytes = file_settings.get('inline_max_bytes', INLINE_MAX_BYTES)
         
         # Create strategy
+        self.content_strategy = content_strategy
         self._strategy = self._create_strategy(content_strategy)
+        self._reload_lock = threading.Lock()
+        
+        # Probes keys (warmup) and re-probes quarantined ones in the background
+        validation_settings = ConfigLoader.load_key_validation_settings(config_path)
+        self.key_validator = KeyValidator(
+            self.key_manager,
+            probe=self._list_models,
+            max_workers=validation_settings.get('max_workers', 16),
+            reprobe_interval=validation_settings.get('reprobe_interval', 60.0),
+            max_reprobe_interval=validation_settings.get('max_reprobe_interval', 3600.0)
+        )
+        
+        # Filled in by warmup(); readiness is reported separately from liveness
+        self.available_models: List[str] = []
+        self.warmup_status: Optional[Dict[str, Any]] = None
+
+    def _ensure_proxies(self) -> None:
+        """Configure deferred (auto) proxies once, on warmup or first use."""
+        if self._proxies_configured:
+            return
+        with self._proxy_lock:
+            if not self._proxies_configured:
+                logger.info("Configuring ProxyManager with: %s", self.proxy_settings)
+                ProxyManager.configure_proxy(self.proxy_settings)
+                self._proxies_configured = True
+
+    def _ensure_file_client(self) -> FileHandler:
+        """Create the files client and FileHandler on first use."""
+        if self._file_handler is None:
+            with self._file_client_lock:
+                if self._file_handler is None:
+                    self._ensure_proxies()
+                    api_key, _ = self.key_manager.get_next_key()
+                    client = google_genai.Client(api_key=api_key, **genai_client_options(self.api_endpoint))
+                    # Create file handler (upload concurrency, dedup and metadata caching come from gemini.files)
+                    file_settings = self._file_settings
+                    file_handler = FileHandler(
+                        client=client,
+                        max_upload_workers=file_settings.get('max_upload_workers', 4),
+                        upload_index=(
+                            UploadIndex(file_settings.get('upload_index_path'))
+                            if file_settings.get('deduplicate_uploads', True) else None
+                        ),
+                        key_id=hash_api_key(api_key),
+                        metadata_cache=FileMetadataCache(ttl_seconds=file_settings.get('metadata_cache_ttl', 300))
+                    )
+                    self._client, self._file_api_key = client, api_key
+                    self._file_handler = file_handler
+        return self._file_handler
+
+    @property
+    def client(self) -> "google_genai.Client":
+        """google.genai client used for file operations (created on first use)."""
+        self._ensure_file_client()
+        return self._client
+
+    @property
+    def file_handler(self) -> FileHandler:
+        """FileHandler bound to the files client (created on first use)."""
+        return self._ensure_file_client()
+
+    @property
+    def file_key_index(self) -> int:
+        """Index of the API key the files client uses."""
+        self._ensure_file_client()
+        return self.key_manager.index_of(self._file_api_key)
+
+    def _file_key(self) -> Tuple[str, Optional[int]]:
+        """API key of the files client and its index; uploaded files are only visible to it."""
+        self._ensure_file_client()
+        api_key = self._file_api_key
+        return api_key, self.key_manager.index_of(api_key)
+
+    @property
+    def ready(self) -> bool:
+        """Whether warmup() has completed and at least one key is out of quarantine."""
+        return (
+            self.warmup_status is not None
+            and len(self.key_manager.quarantined) < len(self.key_manager.api_keys)
+        )
+
+    def _list_models(self, api_key: str) -> List[str]:
+        """List model names with one key; the key validator's probe."""
+        # Uses the key's embedding client, so the probe also opens its connection
+        client = self.embedding_handler._get_client(api_key)
+        return sorted(model.name.split("/", 1)[-1] for model in client.models.list() if model.name)
+
+    def warmup(self, validate_keys: bool = True, prefetch_models: bool = True) -> Dict[str, Any]:
+        """
+        Do the slow setup the constructor skips, so the first requests are fast.
+
+        Configures deferred proxies, creates the files client and one client
+        (connection pool) per API key. With validate_keys every key is probed
+        concurrently by the key validator: invalid and zero-quota keys are
+        quarantined and re-probed in the background. Otherwise only the first
+        key is probed, when prefetch_models is set.
+
+        Args:
+            validate_keys: Probe every key with a models.list call
+            prefetch_models: Store the upstream model list in available_models
+
+        Returns:
+            Summary with ready, duration, per-key probe results, quarantined key
+            indexes and model count; also stored in warmup_status
+        """
+        start_time = time.time()
+        self._ensure_proxies()
+        self._ensure_file_client()
+
+        if validate_keys:
+            keys = self.key_validator.validate_all()
+        else:
+            keys = [self.key_validator.probe_key(0)] if prefetch_models else []
+            for api_key in self.key_manager.api_keys:
+                self.embedding_handler._get_client(api_key)
+
+        if prefetch_models:
+            models = next((k["value"] for k in keys if k["status"] == "ok" and k["value"]), None)
+            if models:
+                self.available_models = models
+
+        for key in keys:
+            if key["status"] in ("rate_limited", "error"):
+                logger.warning("Key index %d probe failed (%s): %s", key["key_index"], key["status"], key["error"])
+
+        key_count = len(self.key_manager.api_keys)
+        quarantined = sorted(self.key_manager.quarantined)
+        self.warmup_status = {
+            "ready": len(quarantined) < key_count,
+            "duration": round(time.time() - start_time, 3),
+            "keys": [{k: v for k, v in key.items() if k != "value"} for key in keys],
+            "invalid_keys": quarantined,
+            "models": len(self.available_models)
+        }
+        logger.info(
+            "Warmup finished in %.2fs: %d/%d keys usable, %d models",
+            self.warmup_status["duration"], key_count - len(quarantined), key_count, len(self.available_models)
+        )
+        return self.warmup_status
+
+    async def awarmup(self, **kwargs: Any) -> Dict[str, Any]:
+        """
+        Run warmup() in a worker thread without blocking the event loop.
+
+        Args:
+            **kwargs: Arguments for warmup()
+
+        Returns:
+            The warmup summary
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.warmup, **kwargs))
+
+    def reload(
+        self,
+        config_path: Optional[Union[str, Path]] = None,
+        api_keys: Optional[List[str]] = None,
+        content_strategy: Optional[Strategy] = None,
+        key_strategy: Optional[KeyRotationStrategy] = None,
+        validate_new_keys: bool = True,
+        drain_seconds: float = 30.0
+    ) -> Dict[str, Any]:
+        """
+        Swap API keys and strategies without interrupting in-flight requests.
+
+        The key set is replaced atomically; stats, cooldowns and quarantine are
+        kept for keys that remain. Strategy objects are rebuilt, while requests
+        already running finish on the objects they started with. Clients of
+        removed keys are closed after drain_seconds.
+
+        Args:
+            config_path: YAML config to read keys (gemini.api_keys) and
+                         strategies (gemini.strategies) from
+            api_keys: New API keys (overrides config_path)
+            content_strategy: New content strategy (default: from config, else unchanged)
+            key_strategy: New key rotation strategy (default: from config, else unchanged)
+            validate_new_keys: Probe added keys before returning
+            drain_seconds: Grace period before closing clients of removed keys
+
+        Returns:
+            Summary with added/removed/kept key counts and the active strategies
+
+        Raises:
+            ValueError: If the key list is missing or empty
+            OSError, yaml.YAMLError: If config_path cannot be read or parsed
+        """
+        if config_path is not None:
+            # Parsed once and strictly: a broken, half-written or key-less file
+            # must not fall back to other key sources such as GEMINI_API_KEYS
+            gemini_config = ConfigLoader.load_yaml(config_path).get('gemini') or {}
+            if not isinstance(gemini_config, dict):
+                raise ValueError(f"'gemini' in {config_path} must be a mapping")
+            strategies = ConfigLoader.parse_strategy_settings(gemini_config.get('strategies') or {}, config_path)
+            content_strategy = content_strategy or strategies.get('content_strategy')
+            key_strategy = key_strategy or strategies.get('key_strategy')
+            if api_keys is None:
+                api_keys = gemini_config.get('api_keys')
+                if not isinstance(api_keys, list) or not all(isinstance(k, str) for k in api_keys):
+                    raise ValueError(f"{config_path} has no gemini.api_keys list")
+        elif api_keys is None:
+            api_keys = ConfigLoader.load_api_keys()
+        if not api_keys:
+            raise ValueError("No API keys to reload; keeping the current keys")
+
+        with self._reload_lock:
+            old_keys = set(self.key_manager.api_keys)
+            changes = self.key_manager.update_keys(api_keys, strategy=key_strategy)
+            self.api_keys = self.key_manager.api_keys
+            self.metrics.bind_keys(self.key_manager)
+
+            self.content_strategy = content_strategy or self.content_strategy
+            self._strategy = self._create_strategy(self.content_strategy)
+
+            removed = old_keys - set(api_keys)
+            retired = self.embedding_handler.remove_clients(removed)
+            with self._file_client_lock:
+                if self._file_api_key in removed:
+                    # Recreated with a current key on next use
+                    retired.append(self._client)
+                    self._client = self._file_handler = self._file_api_key = None
+            if retired:
+                timer = threading.Timer(drain_seconds, self._close_clients, args=(retired,))
+                timer.daemon = True
+                timer.start()
+
+        if validate_new_keys and changes["added"]:
+            self.key_validator.validate_all(changes["added"])
+
+        logger.info(
+            "Reloaded keys (%d added, %d removed, %d kept); strategies: %s, %s",
+            len(changes["added"]), changes["removed"], changes["kept"],
+            self.content_strategy.value, self.key_manager.strategy.value
+        )
+        return {
+            "added": len(changes["added"]),
+            "removed": changes["removed"],
+            "kept": changes["kept"],
+            "quarantined": len(self.key_manager.quarantined),
+            "content_strategy": self.content_strategy.value,
+            "key_strategy": self.key_manager.strategy.value
+        }
+
+    @staticmethod
+    def _close_clients(clients: List[Any]) -> None:
+        """Close clients of removed keys once their requests have drained."""
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                logger.debug("Error closing retired client: %s", e)
 
     def _create_strategy(self, strategy: Strategy) -> ContentStrategy:
         """Factory method to create appropriate strategy."""
@@ -136,9 +458,60 @@ class GeminiHandler(ContentGenerationMixin, FileOperationsMixin):
             key_manager=self.key_manager,
             system_instruction=self.system_instruction,
             generation_config=self.generation_config,
-            proxy_settings=self.proxy_settings
+            proxy_settings=self.proxy_settings,
+            context_cache=self.context_cache,
+            metrics=self.metrics,
+            api_endpoint=self.api_endpoint
+        )
+
+    def register_cached_prefix(
+        self,
+        prefix: Optional[Union[str, List[Dict[str, Any]]]] = None,
+        system_instruction: Optional[str] = None,
+        ttl_seconds: Optional[int] = None
+    ) -> str:
+        """
+        Register a long shared prompt prefix for explicit context caching.
+
+        Requests whose system instruction matches and whose prompt starts with
+        the prefix are sent with a reference to a Gemini cached content (created
+        lazily per model and API key) plus only the remaining prompt.
+
+        Args:
+            prefix: Leading prompt text or leading Gemini contents turns
+            system_instruction: System instruction included in the cache
+                                (defaults to the handler's system instruction)
+            ttl_seconds: Cache TTL in seconds (default: 1 hour)
+
+        Returns:
+            Prefix id that can be passed to evict_cached_prefix
+        """
+        if system_instruction is None:
+            system_instruction = self.system_instruction
+        return self.context_cache.register_prefix(
+            prefix=prefix,
+            system_instruction=system_instruction,
+            ttl_seconds=ttl_seconds
         )
 
+    def evict_cached_prefix(self, prefix_id: Optional[str] = None, unregister: bool = True) -> int:
+        """
+        Delete cached contents for a prefix (or all prefixes).
+
+        Args:
+            prefix_id: Prefix id returned by register_cached_prefix (default: all)
+            unregister: Also stop matching new requests against the prefix
+                        (only applies when prefix_id is given)
+
+        Returns:
+            Number of cached contents evicted
+        """
+        if prefix_id is not None and unregister:
+            count = self.context_cache.evict(prefix_id)
+            self.context_cache.unregister_prefix(prefix_id)
+            return count
+        return self.context_cache.evict(prefix_id)
+
     def get_key_stats(self, key_index: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
         """
         Get current key usage statistics.
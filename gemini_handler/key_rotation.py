@@ -1,6 +1,7 @@
+import threading
 import time
 from itertools import cycle
-from typing import List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from .data_models import KeyRotationStrategy, KeyStats
 
@@ -26,9 +27,24 @@ class KeyRotationManager:
         self.key_stats = {i: KeyStats() for i in range(len(api_keys))}
         self._key_cycle = cycle(range(len(api_keys)))
         self.current_index = 0
+        self._index_of = {key: i for i, key in enumerate(api_keys)}
+        
+        # Guards key selection against update_keys(); waiters for a free key
+        # are woken when keys change
+        self._lock = threading.RLock()
+        self._keys_changed = threading.Condition(self._lock)
+        
+        # Keys found invalid (revoked, quota zero): key index -> reason
+        self.quarantined: Dict[int, str] = {}
+        # Called with (key_index, reason) when a key is newly quarantined
+        self.on_quarantine: Optional[Callable[[int, str], None]] = None
 
     def _is_key_available(self, key_index: int) -> bool:
         """Check if a key is available based on rate limits and cooldown."""
+        # With every key quarantined, selection ignores quarantine so requests
+        # fail fast upstream instead of waiting forever for a usable key
+        if key_index in self.quarantined and len(self.quarantined) < len(self.api_keys):
+            return False
         stats = self.key_stats[key_index]
         current_time = time.time()
         
@@ -53,6 +69,8 @@ class KeyRotationManager:
             self.current_index = (self.current_index + 1) % len(self.api_keys)
             if self.current_index == start_index:
                 self._handle_all_keys_busy()
+                # Keys may have been replaced while waiting
+                start_index = self.current_index
 
     def _get_round_robin_key(self) -> Tuple[str, int]:
         """Get next key using round-robin strategy."""
@@ -66,6 +84,8 @@ class KeyRotationManager:
             current_index = next(self._key_cycle)
             if current_index == start_index:
                 self._handle_all_keys_busy()
+                # Keys may have been replaced while waiting
+                start_index = current_index = next(self._key_cycle)
 
     def _get_least_used_key(self) -> Tuple[str, int]:
         """Get key with lowest usage count."""
@@ -110,7 +130,8 @@ class KeyRotationManager:
                 any_reset = True
                 
         if not any_reset:
-            time.sleep(1)
+            # Releases the lock while waiting, so results and reloads get through
+            self._keys_changed.wait(1)
 
     def get_next_key(self) -> Tuple[str, int]:
         """Get next available API key based on selected strategy."""
@@ -121,35 +142,142 @@ class KeyRotationManager:
             KeyRotationStrategy.SMART_COOLDOWN: self._get_smart_cooldown_key
         }
         
-        method = strategy_methods.get(self.strategy)
-        if not method:
-            raise ValueError(f"Unknown strategy: {self.strategy}")
+        with self._lock:
+            # Looked up under the lock so update_keys() cannot swap the
+            # strategy between choosing the method and running it
+            method = strategy_methods.get(self.strategy)
+            if not method:
+                raise ValueError(f"Unknown strategy: {self.strategy}")
+            api_key, key_index = method()
             
-        api_key, key_index = method()
-        
-        stats = self.key_stats[key_index]
-        stats.uses += 1
-        stats.last_used = time.time()
+            stats = self.key_stats[key_index]
+            stats.uses += 1
+            stats.last_used = time.time()
         
         return api_key, key_index
 
-    def mark_success(self, key_index: int) -> None:
+    def _resolve(self, key_index: int, api_key: Optional[str]) -> Optional[int]:
+        """
+        Current index of a key a caller selected earlier.
+
+        Indexes change when update_keys() replaces the key set; passing the
+        key itself keeps results of in-flight requests on the right key
+        (None if the key has since been removed).
+        """
+        if api_key is None:
+            return key_index if 0 <= key_index < len(self.api_keys) else None
+        if 0 <= key_index < len(self.api_keys) and self.api_keys[key_index] == api_key:
+            return key_index
+        return self._index_of.get(api_key)
+
+    def index_of(self, api_key: str) -> Optional[int]:
+        """Current index of an API key (None if it is not in the key set)."""
+        return self._index_of.get(api_key)
+
+    def mark_success(self, key_index: int, api_key: Optional[str] = None) -> None:
         """Mark successful API call."""
-        if 0 <= key_index < len(self.api_keys):
-            self.key_stats[key_index].failures = 0
+        with self._lock:
+            key_index = self._resolve(key_index, api_key)
+            if key_index is not None:
+                self.key_stats[key_index].failures = 0
 
-    def mark_rate_limited(self, key_index: int) -> None:
+    def mark_rate_limited(self, key_index: int, api_key: Optional[str] = None) -> None:
         """Mark API key as rate limited."""
-        if 0 <= key_index < len(self.api_keys):
-            stats = self.key_stats[key_index]
-            stats.failures += 1
-            stats.rate_limited_until = time.time() + self.reset_window
-            stats.uses = self.rate_limit
+        with self._lock:
+            key_index = self._resolve(key_index, api_key)
+            if key_index is not None:
+                stats = self.key_stats[key_index]
+                stats.failures += 1
+                stats.rate_limited_until = time.time() + self.reset_window
+                stats.uses = self.rate_limit
 
-    def mark_failure(self, key_index: int) -> None:
+    def mark_failure(self, key_index: int, api_key: Optional[str] = None) -> None:
         """Mark a generic failure for the API key."""
-        if 0 <= key_index < len(self.api_keys):
-            stats = self.key_stats[key_index]
-            stats.failures += 1
-            # Optionally add a short cooldown even for generic failures
-            # stats.rate_limited_until = time.time() + 5 # e.g., 5 second cooldown
\ No newline at end of file
+        with self._lock:
+            key_index = self._resolve(key_index, api_key)
+            if key_index is not None:
+                stats = self.key_stats[key_index]
+                stats.failures += 1
+                # Optionally add a short cooldown even for generic failures
+                # stats.rate_limited_until = time.time() + 5 # e.g., 5 second cooldown
+
+    def quarantine(self, key_index: int, reason: str = "invalid", api_key: Optional[str] = None) -> None:
+        """
+        Take a key out of rotation until release() is called.
+
+        Args:
+            key_index: Index of the key
+            reason: Why the key is unusable (e.g. "invalid", "quota_zero")
+            api_key: The key itself, if the index may predate update_keys()
+        """
+        with self._lock:
+            key_index = self._resolve(key_index, api_key)
+            if key_index is None:
+                return
+            newly = key_index not in self.quarantined
+            self.quarantined[key_index] = reason
+        if newly and self.on_quarantine is not None:
+            self.on_quarantine(key_index, reason)
+
+    def release(self, key_index: int, api_key: Optional[str] = None) -> None:
+        """Put a quarantined key back into rotation."""
+        with self._lock:
+            key_index = self._resolve(key_index, api_key)
+            if key_index is not None and self.quarantined.pop(key_index, None) is not None:
+                self.key_stats[key_index].failures = 0
+                self._keys_changed.notify_all()
+
+    def is_quarantined(self, key_index: int) -> bool:
+        """Whether a key is currently quarantined."""
+        return key_index in self.quarantined
+
+    def update_keys(
+        self,
+        api_keys: List[str],
+        strategy: Optional[KeyRotationStrategy] = None
+    ) -> Dict[str, Any]:
+        """
+        Atomically replace the key set, keeping stats for keys that remain.
+
+        Usage counts, cooldowns, failures and quarantine carry over for keys in
+        both sets; new keys start fresh. Requests already holding a key finish
+        normally, and their results are recorded against the right key when
+        they pass it to the mark_* methods.
+
+        Args:
+            api_keys: The new API keys
+            strategy: New rotation strategy (default: keep the current one)
+
+        Returns:
+            {"added": new key indexes, "removed": count, "kept": count}
+        """
+        if not api_keys:
+            raise ValueError("At least one API key must be provided")
+
+        with self._lock:
+            old_stats = {key: self.key_stats[i] for i, key in enumerate(self.api_keys)}
+            old_quarantine = {self.api_keys[i]: reason for i, reason in self.quarantined.items()}
+
+            key_stats = {}
+            quarantined = {}
+            added = []
+            for i, key in enumerate(api_keys):
+                stats = old_stats.pop(key, None)
+                if stats is None:
+                    stats = KeyStats()
+                    added.append(i)
+                elif key in old_quarantine:
+                    quarantined[i] = old_quarantine[key]
+                key_stats[i] = stats
+
+            self.api_keys = list(api_keys)
+            self.key_stats = key_stats
+            self.quarantined = quarantined
+            self._index_of = {key: i for i, key in enumerate(self.api_keys)}
+            self._key_cycle = cycle(range(len(self.api_keys)))
+            self.current_index = 0
+            if strategy is not None:
+                self.strategy = strategy
+            self._keys_changed.notify_all()
+
+        return {"added": added, "removed": len(old_stats), "kept": len(api_keys) - len(added)}
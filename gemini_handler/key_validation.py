@@ -0,0 +1,239 @@
+# gemini_handler/key_validation.py
+"""Concurrent API key probing, dead-key quarantine and background re-probes."""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .key_rotation import KeyRotationManager
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Probe outcomes that take a key out of rotation
+QUARANTINE_STATUSES = ("invalid", "quota_zero")
+
+_UNAUTHENTICATED_STATUS = re.compile(r"\b401\b")
+
+
+def classify_key_error(error: str) -> str:
+    """
+    Classify an upstream error by what it says about the API key.
+
+    Args:
+        error: Error message from a probe or request
+
+    A 403 / PERMISSION_DENIED is not treated as a dead key: it usually means
+    the request used a file, cached content or model the key's project cannot
+    access, which says nothing about the key's other requests.
+
+    Returns:
+        "invalid" (unknown, expired or unauthenticated key), "quota_zero" (the
+        key's project has no quota at all), "rate_limited" (temporary 429) or
+        "error" (anything that says nothing about the key: request errors,
+        permission errors, server or network trouble)
+    """
+    text = error.lower()
+    if (
+        "api_key_invalid" in text
+        or "api key not valid" in text
+        or "api key expired" in text
+        or "unauthenticated" in text
+        or _UNAUTHENTICATED_STATUS.search(text)
+    ):
+        return "invalid"
+    if "429" in text or "resource_exhausted" in text or "quota" in text or "rate limit" in text:
+        # Free-tier-disabled and billing-less projects report a zero limit
+        return "quota_zero" if re.search(r"\blimit: ?0\b", text) else "rate_limited"
+    return "error"
+
+
+class KeyValidator:
+    """
+    Probes API keys and keeps dead ones out of rotation.
+
+    validate_all() probes keys concurrently with a cheap call (by default the
+    handler lists models). Keys that come back invalid or with zero quota are
+    quarantined in the KeyRotationManager. Quarantined keys, including ones
+    quarantined by live requests, are re-probed in a background thread at
+    exponentially growing intervals and released once a probe succeeds. The
+    thread only runs while some key is quarantined.
+    """
+
+    def __init__(
+        self,
+        key_manager: KeyRotationManager,
+        probe: Callable[[str], Any],
+        max_workers: int = 16,
+        reprobe_interval: float = 60.0,
+        max_reprobe_interval: float = 3600.0,
+        backoff: float = 2.0
+    ):
+        """
+        Args:
+            key_manager: Manager whose keys are probed and quarantined
+            probe: Called with an API key; raises on failure. Its return value
+                   is passed back in the probe result (e.g. a model list).
+            max_workers: Keys probed at once
+            reprobe_interval: Seconds before the first re-probe of a quarantined key
+            max_reprobe_interval: Upper bound for the re-probe interval
+            backoff: Factor the interval grows by after each failed re-probe
+        """
+        self.key_manager = key_manager
+        self.probe = probe
+        self.max_workers = max_workers
+        self.reprobe_interval = reprobe_interval
+        self.max_reprobe_interval = max_reprobe_interval
+        self.backoff = backoff
+
+        # API key -> (next probe time, current interval); keyed by the key
+        # itself so the schedule survives KeyRotationManager.update_keys()
+        self._schedule: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+        key_manager.on_quarantine = self._on_quarantine
+
+    def probe_key(self, key_index: int) -> Dict[str, Any]:
+        """
+        Probe one key and quarantine or release it based on the outcome.
+
+        Args:
+            key_index: Index of the key in the key manager
+
+        Returns:
+            Dict with key_index, status ("ok" or a classify_key_error result),
+            error, latency_ms and value (what the probe returned)
+        """
+        api_key = self.key_manager.api_keys[key_index]
+        start = time.time()
+        result: Dict[str, Any] = {"key_index": key_index, "status": "ok", "error": None, "value": None}
+        try:
+            result["value"] = self.probe(api_key)
+        except Exception as e:
+            result["status"] = classify_key_error(str(e))
+            result["error"] = str(e)
+        result["latency_ms"] = round((time.time() - start) * 1000, 1)
+        self._apply(result, api_key)
+        return result
+
+    def validate_all(self, key_indexes: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Probe keys concurrently.
+
+        Args:
+            key_indexes: Keys to probe (default: all)
+
+        Returns:
+            One probe result per key, in the order given
+        """
+        indexes = list(range(len(self.key_manager.api_keys)) if key_indexes is None else key_indexes)
+        if not indexes:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(indexes)))) as pool:
+            results = list(pool.map(self.probe_key, indexes))
+
+        bad = [r["key_index"] for r in results if r["status"] in QUARANTINE_STATUSES]
+        if bad:
+            logger.warning("%d of %d probed keys quarantined: %s", len(bad), len(indexes), bad)
+        return results
+
+    def _apply(self, result: Dict[str, Any], api_key: str) -> None:
+        """Update quarantine state and the re-probe schedule from a probe result."""
+        key_index, status = result["key_index"], result["status"]
+        if status == "ok":
+            if self.key_manager.is_quarantined(key_index):
+                logger.info("Key index %d passed its probe; back in rotation", key_index)
+            self.key_manager.release(key_index, api_key=api_key)
+            with self._lock:
+                self._schedule.pop(api_key, None)
+            return
+
+        if status == "rate_limited":
+            self.key_manager.mark_rate_limited(key_index, api_key=api_key)
+
+        with self._lock:
+            scheduled = self._schedule.get(api_key)
+            if scheduled is not None:
+                # A failed re-probe: stay quarantined and wait longer next time
+                interval = min(scheduled[1] * self.backoff, self.max_reprobe_interval)
+                self._schedule[api_key] = (time.time() + interval, interval)
+                logger.debug("Key index %d still failing (%s); next probe in %.0fs", key_index, status, interval)
+                return
+
+        if status in QUARANTINE_STATUSES:
+            logger.warning("Quarantining key index %d (%s): %s", key_index, status, result["error"])
+            self.key_manager.quarantine(key_index, status, api_key=api_key)
+
+    def _on_quarantine(self, key_index: int, reason: str) -> None:
+        """Schedule the first re-probe of a newly quarantined key."""
+        api_keys = self.key_manager.api_keys
+        if not 0 <= key_index < len(api_keys):
+            return
+        api_key = api_keys[key_index]
+        with self._lock:
+            if self._stopped or api_key in self._schedule:
+                return
+            self._schedule[api_key] = (time.time() + self.reprobe_interval, self.reprobe_interval)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="gemini-key-reprobe", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        """Re-probe quarantined keys when due; exits once none are left."""
+        while True:
+            with self._lock:
+                if self._stopped or not self._schedule:
+                    self._thread = None
+                    return
+                now = time.time()
+                due = []
+                for api_key, (at, _) in list(self._schedule.items()):
+                    key_index = self.key_manager.index_of(api_key)
+                    if key_index is None:
+                        # Removed by update_keys()
+                        del self._schedule[api_key]
+                    elif at <= now:
+                        due.append(key_index)
+                if not self._schedule:
+                    continue
+                next_at = min(at for at, _ in self._schedule.values())
+            if due:
+                self.validate_all(due)
+                continue
+            self._wakeup.wait(max(0.0, next_at - time.time()))
+            self._wakeup.clear()
+
+    def status(self) -> Dict[int, Dict[str, Any]]:
+        """
+        Quarantined keys with their reason and re-probe schedule.
+
+        Returns:
+            {key index: {"reason", "next_probe_in", "interval"}}
+        """
+        now = time.time()
+        with self._lock:
+            schedule = dict(self._schedule)
+        api_keys = self.key_manager.api_keys
+        status = {}
+        for idx, reason in list(self.key_manager.quarantined.items()):
+            at, interval = schedule.get(api_keys[idx], (None, None))
+            status[idx] = {
+                "reason": reason,
+                "next_probe_in": round(max(0.0, at - now), 1) if at is not None else None,
+                "interval": interval
+            }
+        return status
+
+    def stop(self) -> None:
+        """Stop background re-probes (quarantined keys stay quarantined)."""
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+        self._wakeup.set()
+        if thread is not None:
+            thread.join(timeout=5)
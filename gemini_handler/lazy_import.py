@@ -0,0 +1,47 @@
+# gemini_handler/lazy_import.py
+"""Deferred imports for heavy optional SDKs."""
+import importlib
+import importlib.util
+import types
+from typing import Any, List
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stands in for a module and imports it on first attribute access.
+
+    ``genai = LazyModule("google.generativeai")`` keeps ``genai`` a module
+    attribute (so tests can patch it) without paying the SDK import until
+    ``genai.configure(...)`` or similar is first called. Attributes are looked
+    up on the real module every time, so patches on the SDK itself apply too.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            # importlib serialises concurrent imports of the same module
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def module_available(name: str) -> bool:
+    """Whether a top-level module can be found, without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
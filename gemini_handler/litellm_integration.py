@@ -4,14 +4,12 @@ import os
 import time
 from typing import Any, Dict, List, Optional, Union
 
-import google.generativeai as genai
-from google import genai as google_genai
-
 from .data_models import GenerationConfig, KeyRotationStrategy, ModelConfig, Strategy
 
 # Import your existing components
 from .gemini_handler import GeminiHandler
 from .key_rotation import KeyRotationManager
+from .message_conversion import MessageConverter
 
 
 class LiteLLMGeminiAdapter:
@@ -135,14 +133,12 @@ class LiteLLMGeminiAdapter:
                 stop_sequences=stop if isinstance(stop, list) else [stop] if stop else None
             )
             
-            # Handle system instruction
-            if system_instruction:
-                handler.system_instruction = system_instruction
-            elif "system" in kwargs:
-                handler.system_instruction = kwargs.pop("system")
-                
-            # Convert OpenAI-style messages to prompt text
-            prompt = cls._convert_messages_to_prompt(messages)
+            # Convert OpenAI-style messages to native multi-turn contents
+            contents, message_system_instruction = MessageConverter.to_gemini_contents(messages)
+            
+            # Handle system instruction (explicit parameter wins over system messages)
+            if not system_instruction:
+                system_instruction = kwargs.pop("system", None) or message_system_instruction
             
             # Check if we need to handle structured output (JSON)
             if response_format and response_format.get("type") == "json_object":
@@ -155,18 +151,20 @@ class LiteLLMGeminiAdapter:
                 
                 # Generate structured content
                 response_dict = handler.generate_structured_content(
-                    prompt=prompt,
+                    prompt=contents,
                     schema=schema,
                     model_name=gemini_model,
                     temperature=temperature,
                     top_p=top_p,
-                    max_output_tokens=max_tokens
+                    max_output_tokens=max_tokens,
+                    system_instruction=system_instruction
                 )
             else:
                 # Regular text generation
                 response_dict = handler.generate_content(
-                    prompt=prompt,
-                    model_name=gemini_model
+                    prompt=contents,
+                    model_name=gemini_model,
+                    system_instruction=system_instruction
                 )
             
             # Convert to OpenAI-style response
@@ -280,7 +278,10 @@ class LiteLLMGeminiAdapter:
     @staticmethod
     def _convert_messages_to_prompt(messages: List[Dict[str, Any]]) -> str:
         """
-        Convert OpenAI-format messages to a text prompt.
+        Convert OpenAI-format messages to a single flattened text prompt.
+        
+        Kept for backward compatibility; completion() now sends native
+        multi-turn contents via MessageConverter.to_gemini_contents.
         
         Args:
             messages: List of message objects with role and content
@@ -12,6 +12,10 @@ import json
 from .gemini_handler import GeminiHandler
 from .data_models import GenerationConfig, ModelResponse as GeminiModelResponse
 from .config import ConfigLoader # To potentially load config if needed
+from .message_conversion import MessageConverter
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
 
 class GeminiHandlerLiteLLM(CustomLLM):
     """
@@ -31,7 +35,7 @@ class GeminiHandlerLiteLLM(CustomLLM):
         if GeminiHandlerLiteLLM.handler_instance is None:
             # Warn or raise error if not initialized
             # For now, we assume initialize() will be called externally
-            print("Warning: GeminiHandlerLiteLLM not initialized. Call GeminiHandlerLiteLLM.initialize() before use.")
+            logger.warning("GeminiHandlerLiteLLM not initialized. Call GeminiHandlerLiteLLM.initialize() before use.")
             pass
 
     @classmethod
@@ -60,7 +64,7 @@ class GeminiHandlerLiteLLM(CustomLLM):
 
         if cls.handler_instance is None:
              raise ValueError("GeminiHandler instance could not be initialized.")
-        print("GeminiHandlerLiteLLM initialized successfully.")
+        logger.info("GeminiHandlerLiteLLM initialized successfully.")
 
 
     def completion(self,
@@ -110,19 +114,10 @@ class GeminiHandlerLiteLLM(CustomLLM):
         # Extract actual model name
         actual_model_name = model.split('/')[-1] if '/' in model else model
 
-        # Convert messages to a single prompt string (simple concatenation for now)
-        # TODO: Improve this based on roles if needed
-        prompt = "\n".join([msg.get("content", "") for msg in messages if isinstance(msg.get("content"), str)])
-        # Handle potential vision content (basic check, no processing yet)
-        has_vision_content = any(
-            isinstance(part, dict) and part.get("type") == "image_url"
-            for msg in messages
-            for part in (msg.get("content") if isinstance(msg.get("content"), list) else [])
-        )
-        if has_vision_content:
-             # For now, raise error. Future: Implement file handling bridge.
-             raise NotImplementedError("Vision/Image input via LiteLLM messages is not yet supported by this gemini-handler integration. Use gemini-handler directly for vision tasks.")
-
+        # Convert messages to native multi-turn contents; system messages become
+        # the system instruction. Image parts (data URIs / file URIs) map to
+        # inline_data / file_data parts.
+        contents, system_instruction = MessageConverter.to_gemini_contents(messages)
 
         # Check for structured output request
         schema = None
@@ -152,10 +147,11 @@ class GeminiHandlerLiteLLM(CustomLLM):
             if schema:
                 # Call structured content generation
                 result_dict = self.handler_instance.generate_structured_content(
-                    prompt=prompt,
+                    prompt=contents,
                     schema=schema,
                     model_name=actual_model_name,
                     return_stats=return_stats,
+                    system_instruction=system_instruction,
                     **gen_config_overrides # Pass overrides
                 )
                 # Convert dict back to GeminiModelResponse for consistent handling below
@@ -175,9 +171,10 @@ class GeminiHandlerLiteLLM(CustomLLM):
                 self.handler_instance._strategy.generation_config = temp_config
                 try:
                     result_dict = self.handler_instance.generate_content(
-                        prompt=prompt,
+                        prompt=contents,
                         model_name=actual_model_name,
-                        return_stats=return_stats
+                        return_stats=return_stats,
+                        system_instruction=system_instruction
                     )
                     gemini_response = GeminiModelResponse(**result_dict)
                 finally:
@@ -354,7 +351,7 @@ class GeminiHandlerLiteLLM(CustomLLM):
     # Optional: Add logging method
     def log(self, message: str):
         # Implement your preferred logging mechanism
-        print(f"GeminiHandlerLiteLLM Log: {message}")
+        logger.info("GeminiHandlerLiteLLM Log: %s", message)
 
     # Optional: Health check
     def health_check(self):
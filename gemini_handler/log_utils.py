@@ -0,0 +1,124 @@
+# gemini_handler/log_utils.py
+"""Leveled, optionally sampled and JSON-formatted logging for the package."""
+import json
+import logging
+import os
+import random
+import sys
+from typing import IO, Any, Dict, Optional, Union
+
+ROOT_LOGGER_NAME = "gemini_handler"
+
+# Pass as ``extra=SAMPLED`` on per-request debug lines so SamplingFilter can thin them out
+SAMPLED = {"sampled": True}
+
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "sampled"
+}
+
+# Libraries should not configure handlers; applications call configure_logging()
+logging.getLogger(ROOT_LOGGER_NAME).addHandler(logging.NullHandler())
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Get the logger for a package module.
+
+    Args:
+        name: Module ``__name__`` (or a short suffix such as "strategies")
+
+    Returns:
+        Logger under the ``gemini_handler`` hierarchy
+    """
+    if name == ROOT_LOGGER_NAME or name.startswith(ROOT_LOGGER_NAME + "."):
+        return logging.getLogger(name)
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through only a fraction of records logged with ``extra=SAMPLED``.
+
+    Records without the marker (and anything at WARNING or above) always pass.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        """
+        Args:
+            rate: Fraction (0.0 - 1.0) of sampled records to keep
+        """
+        super().__init__()
+        self.rate = max(0.0, min(1.0, rate))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "sampled", False):
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def configure_logging(
+    level: Union[int, str, None] = None,
+    json_format: Optional[bool] = None,
+    sample_rate: Optional[float] = None,
+    stream: Optional[IO[str]] = None
+) -> logging.Logger:
+    """
+    Attach a stream handler to the package logger (replacing one added earlier).
+
+    Unset arguments fall back to the GEMINI_LOG_LEVEL, GEMINI_LOG_JSON and
+    GEMINI_LOG_SAMPLE_RATE environment variables, then to WARNING / text / 1.0.
+
+    Args:
+        level: Log level name or number
+        json_format: Emit one JSON object per line instead of plain text
+        sample_rate: Fraction of per-request debug lines to keep
+        stream: Output stream (default: stderr)
+
+    Returns:
+        The configured package logger
+    """
+    if level is None:
+        level = os.environ.get("GEMINI_LOG_LEVEL", "WARNING")
+    if json_format is None:
+        json_format = os.environ.get("GEMINI_LOG_JSON", "").lower() in ("1", "true", "yes")
+    if sample_rate is None:
+        sample_rate = float(os.environ.get("GEMINI_LOG_SAMPLE_RATE", "1.0"))
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            raise ValueError(f"Unknown log level: {level}")
+
+    logger = logging.getLogger(ROOT_LOGGER_NAME)
+    for handler in list(logger.handlers):
+        if getattr(handler, "_gemini_handler", False):
+            logger.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler._gemini_handler = True
+    handler.setFormatter(
+        JsonFormatter() if json_format
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    handler.addFilter(SamplingFilter(sample_rate))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return logger
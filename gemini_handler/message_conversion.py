@@ -0,0 +1,210 @@
+# gemini_handler/message_conversion.py
+"""Conversion of OpenAI-style chat messages into native Gemini contents."""
+import base64
+import json
+import mimetypes
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .mime_utils import sniff_mime_type, to_supported_image
+
+# Uploaded files; the only http(s) URIs Gemini accepts in file_data parts
+_FILES_API_URI = re.compile(r"^https://generativelanguage\.googleapis\.com/[^/]+/files/")
+
+# Seconds to wait when downloading a remote image URL
+REMOTE_IMAGE_TIMEOUT = 30
+
+# OpenAI roles mapped onto the two conversational roles Gemini understands
+_ROLE_MAP = {
+    "user": "user",
+    "assistant": "model",
+    "model": "model",
+    "function": "user",
+    "tool": "user",
+}
+
+
+class MessageConverter:
+    """Maps OpenAI chat messages to Gemini ``contents`` and ``system_instruction``."""
+
+    @staticmethod
+    def to_gemini_contents(
+        messages: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Convert OpenAI-format messages to Gemini multi-turn contents.
+
+        System messages are collected into a single system instruction instead of
+        being inlined into the conversation, and consecutive messages with the
+        same Gemini role are merged into one turn so the history keeps a stable,
+        cacheable prefix. Assistant tool_calls become function_call parts and
+        tool results the matching function_response parts. A conversation with
+        only system messages is sent as a single user turn.
+
+        Args:
+            messages: List of message dicts with 'role' and 'content' (plus
+                      'tool_calls', 'tool_call_id' or 'name' for tool use)
+
+        Returns:
+            Tuple of (contents, system_instruction). system_instruction is None
+            when the messages contain no system text.
+        """
+        contents: List[Dict[str, Any]] = []
+        system_parts: List[str] = []
+        # tool_call_id -> function name, for tool messages that only carry the id
+        call_names: Dict[str, str] = {}
+
+        for message in messages:
+            role = message.get("role", "user")
+            content = message.get("content")
+
+            if role in ("system", "developer"):
+                text = MessageConverter._content_to_text(content)
+                if text:
+                    system_parts.append(text)
+                continue
+
+            if role in ("function", "tool"):
+                parts = [MessageConverter._tool_result_to_part(message, call_names)]
+            else:
+                parts = MessageConverter._content_to_parts(content)
+                if role == "assistant":
+                    parts.extend(MessageConverter._tool_calls_to_parts(message, call_names))
+
+            if not parts:
+                continue
+
+            gemini_role = _ROLE_MAP.get(role, "user")
+            if contents and contents[-1]["role"] == gemini_role:
+                contents[-1]["parts"].extend(parts)
+            else:
+                contents.append({"role": gemini_role, "parts": parts})
+
+        system_instruction = "\n\n".join(system_parts) if system_parts else None
+        if not contents and system_instruction:
+            # Gemini rejects a request without contents, so a system-only
+            # conversation is sent as the user turn instead
+            return [{"role": "user", "parts": [{"text": system_instruction}]}], None
+        return contents, system_instruction
+
+    @staticmethod
+    def _tool_calls_to_parts(message: Dict[str, Any], call_names: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Convert an assistant message's tool_calls (or legacy function_call) to function_call parts."""
+        calls = [
+            (call.get("id"), call.get("function") or {})
+            for call in message.get("tool_calls") or []
+            if isinstance(call, dict)
+        ]
+        if isinstance(message.get("function_call"), dict):
+            calls.append((None, message["function_call"]))
+
+        parts = []
+        for call_id, function in calls:
+            name = function.get("name")
+            if not name:
+                continue
+            if call_id:
+                call_names[call_id] = name
+            parts.append({"function_call": {"name": name, "args": _parse_arguments(function.get("arguments"))}})
+        return parts
+
+    @staticmethod
+    def _tool_result_to_part(message: Dict[str, Any], call_names: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Convert a tool/function result message to a function_response part.
+
+        Gemini only accepts a function_response that answers a function_call
+        made earlier in the conversation, so results whose call is not in the
+        history are sent as text instead.
+        """
+        text = MessageConverter._content_to_text(message.get("content"))
+        name = call_names.get(message.get("tool_call_id") or "") or message.get("name")
+        if name and name in call_names.values():
+            return {"function_response": {"name": name, "response": {"content": text}}}
+        label = name or message.get("tool_call_id") or "function"
+        return {"text": f"Result of {label}: {text}"}
+
+    @staticmethod
+    def _content_to_parts(content: Union[str, List[Any], None]) -> List[Dict[str, Any]]:
+        """Convert a message content field (string or list of content parts) to Gemini parts."""
+        if content is None:
+            return []
+        if isinstance(content, str):
+            return [{"text": content}] if content else []
+
+        parts = []
+        for item in content:
+            if isinstance(item, str):
+                parts.append({"text": item})
+                continue
+            if not isinstance(item, dict):
+                continue
+
+            item_type = item.get("type")
+            if item_type == "text":
+                parts.append({"text": item.get("text", "")})
+            elif item_type == "image_url":
+                image_url = item.get("image_url")
+                url = image_url.get("url") if isinstance(image_url, dict) else image_url
+                if url:
+                    parts.append(MessageConverter._url_to_part(url))
+        return parts
+
+    @staticmethod
+    def _url_to_part(url: str) -> Dict[str, Any]:
+        """
+        Convert an image URL to a Gemini part.
+
+        Data URIs are decoded, Files API and gs:// URIs are referenced by URI,
+        and other remote URLs are downloaded and sent inline: Gemini does not
+        fetch arbitrary URLs itself.
+        """
+        if url.startswith("data:") and ";base64," in url:
+            header, data = url.split(";base64,", 1)
+            data, mime_type = to_supported_image(
+                base64.b64decode(data), header[len("data:"):] or "application/octet-stream"
+            )
+            return {"inline_data": {"mime_type": mime_type, "data": data}}
+        mime_type = mimetypes.guess_type(url.split("?", 1)[0])[0] or "image/jpeg"
+        if url.startswith("gs://") or _FILES_API_URI.match(url):
+            return {"file_data": {"mime_type": mime_type, "file_uri": url}}
+        if not url.startswith(("http://", "https://")):
+            raise ValueError(f"Unsupported image URL: {url[:100]}")
+
+        import requests
+
+        response = requests.get(url, timeout=REMOTE_IMAGE_TIMEOUT)
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "").split(";", 1)[0].strip()
+        data, mime_type = to_supported_image(
+            response.content, sniff_mime_type(response.content[:16]) or content_type or mime_type
+        )
+        return {"inline_data": {"mime_type": mime_type, "data": data}}
+
+    @staticmethod
+    def _content_to_text(content: Union[str, List[Any], None]) -> str:
+        """Flatten a message content field to plain text."""
+        if content is None:
+            return ""
+        if isinstance(content, str):
+            return content
+        texts = []
+        for item in content:
+            if isinstance(item, str):
+                texts.append(item)
+            elif isinstance(item, dict) and item.get("type") == "text":
+                texts.append(item.get("text", ""))
+        return "\n".join(texts)
+
+
+def _parse_arguments(arguments: Any) -> Dict[str, Any]:
+    """Parse OpenAI function-call arguments (a JSON string) into a dict for function_call.args."""
+    if isinstance(arguments, dict):
+        return arguments
+    if not arguments:
+        return {}
+    try:
+        parsed = json.loads(arguments)
+    except (TypeError, ValueError):
+        return {"arguments": arguments}
+    return parsed if isinstance(parsed, dict) else {"arguments": parsed}
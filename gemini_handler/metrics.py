@@ -0,0 +1,450 @@
+# gemini_handler/metrics.py
+"""Low-overhead Prometheus metrics rendered in the text exposition format."""
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .cache_utils import hash_api_key
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ATTEMPT_BUCKETS = (1, 2, 3, 4, 5, 8)
+
+# Model label for models outside the configured list
+OTHER_MODEL = "other"
+# Proxy labels: no proxy, and proxies beyond the first max_proxy_labels seen
+NO_PROXY = "none"
+OTHER_PROXY = "other"
+
+LabelValues = Tuple[str, ...]
+# Scrape-time callback returning (label values, value) pairs
+SampleFunction = Callable[[], Iterable[Tuple[LabelValues, float]]]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # Non-cumulative counts per bucket; the extra slot is +Inf
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric(ABC):
+    """A metric family; labels() returns a child that can be kept and reused."""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_child(self):
+        """Create the child holding the values of one label set."""
+
+    def labels(self, *values: str):
+        """
+        Get the child for a set of label values (created on first use).
+
+        Bind children once and keep them to avoid the lookup on hot paths.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def remove(self, *values: str) -> None:
+        """Drop the child for a set of label values."""
+        with self._lock:
+            self._children.pop(values, None)
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Sample lines of all children in the text exposition format."""
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    metric_type = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in list(self._children.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, set directly or computed at scrape time."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[SampleFunction] = None
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set_function(self, function: SampleFunction) -> None:
+        """
+        Compute the gauge when it is scraped instead of on every change.
+
+        Args:
+            function: Returns (label values, value) pairs
+        """
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            items = [(tuple(values), value) for values, value in self._function()]
+        else:
+            items = [(values, child.value) for values, child in list(self._children.items())]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+            for values, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if not math.isinf(b)))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        bucket_names = self.labelnames + ("le",)
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(bucket_names, values + (_format_value(bound),))} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them for a /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+class GeminiMetrics:
+    """
+    Request, attempt and key metrics for a GeminiHandler.
+
+    Attempt and request recorders cache their bound children by label tuple,
+    so the hot path is one tuple lookup plus a counter and histogram update.
+    Key gauges are computed from the key manager only when scraped. Once
+    bind_models() is called, models outside that list share the "other"
+    label. Per-proxy attempts have their own families, labelled by the first
+    max_proxy_labels proxies seen (later ones share "other"), which keeps
+    the number of label sets bounded.
+    """
+
+    def __init__(
+        self,
+        registry: Optional[MetricsRegistry] = None,
+        latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        max_proxy_labels: int = 32
+    ):
+        """
+        Args:
+            registry: Registry to add the metrics to (default: a new one)
+            latency_buckets: Histogram buckets in seconds for latencies
+            max_proxy_labels: Distinct proxies reported by name; others are "other"
+        """
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.requests = r.counter(
+            "gemini_requests_total", "Generation requests by model and outcome", ("model", "outcome")
+        )
+        self.request_duration = r.histogram(
+            "gemini_request_duration_seconds", "End-to-end generation latency including retries and fallbacks",
+            ("model", "outcome"), latency_buckets
+        )
+        self.attempts = r.counter(
+            "gemini_attempts_total", "Upstream generate calls by model, key and outcome",
+            ("model", "key", "outcome")
+        )
+        self.attempt_duration = r.histogram(
+            "gemini_attempt_duration_seconds", "Latency of single upstream generate calls",
+            ("model", "key"), latency_buckets
+        )
+        self.proxy_attempts = r.counter(
+            "gemini_proxy_attempts_total", "Upstream generate calls by proxy and outcome", ("proxy", "outcome")
+        )
+        self.proxy_attempt_duration = r.histogram(
+            "gemini_proxy_attempt_duration_seconds", "Latency of single upstream generate calls by proxy",
+            ("proxy",), latency_buckets
+        )
+        self.attempts_per_request = r.histogram(
+            "gemini_attempts_per_request", "Upstream calls needed per generation request", ("model",), ATTEMPT_BUCKETS
+        )
+        self.fallbacks = r.counter(
+            "gemini_fallbacks_total", "Retries and fallbacks beyond the first attempt", ("model",)
+        )
+        self.in_flight = r.gauge(
+            "gemini_requests_in_flight", "Generation requests currently being processed"
+        ).labels()
+        self.key_available = r.gauge(
+            "gemini_key_available", "Whether an API key can currently be used (1) or not (0)", ("key",)
+        )
+        self.key_cooldown = r.gauge(
+            "gemini_key_cooldown_seconds", "Seconds until a rate-limited API key is usable again", ("key",)
+        )
+        self.queue_depth = r.gauge(
+            "gemini_embedding_queue_depth", "Texts waiting in the embedding micro-batcher"
+        )
+
+        self._key_labels: List[str] = []
+        # None accepts every model name (until bind_models is called)
+        self._models: Optional[frozenset] = None
+        self.max_proxy_labels = max_proxy_labels
+        self._proxy_labels: Dict[str, str] = {}
+        self._proxy_lock = threading.Lock()
+        # label tuple -> bound children
+        self._attempt_children: Dict[tuple, Tuple[_CounterChild, _HistogramChild]] = {}
+        self._request_children: Dict[tuple, Tuple[_CounterChild, _HistogramChild, _HistogramChild, _CounterChild]] = {}
+        self._proxy_children: Dict[tuple, Tuple[_CounterChild, _HistogramChild]] = {}
+
+    def bind_keys(self, key_manager) -> None:
+        """
+        Report key availability and cooldowns from a KeyRotationManager.
+
+        Keys are labelled by a short hash, never by the key itself.
+        """
+        self._key_labels = [hash_api_key(key)[:8] for key in key_manager.api_keys]
+        self._attempt_children.clear()
+
+        def availability():
+            now = time.time()
+            for index, stats in key_manager.key_stats.items():
+                usable = (
+                    index not in key_manager.quarantined
+                    and now >= stats.rate_limited_until
+                    and (stats.uses < key_manager.rate_limit or now - stats.last_used > key_manager.reset_window)
+                )
+                yield (self.key_label(index),), 1.0 if usable else 0.0
+
+        def cooldowns():
+            now = time.time()
+            for index, stats in key_manager.key_stats.items():
+                yield (self.key_label(index),), max(0.0, stats.rate_limited_until - now)
+
+        self.key_available.set_function(availability)
+        self.key_cooldown.set_function(cooldowns)
+
+    def bind_models(self, models: Iterable[str]) -> None:
+        """
+        Restrict model labels to the configured models.
+
+        Args:
+            models: Model names reported as-is; any other model is labelled "other"
+        """
+        self._models = frozenset(models)
+
+    def model_label(self, model_name: str) -> str:
+        """Label for a model name (OTHER_MODEL if it is not a configured model)."""
+        if self._models is None or model_name in self._models:
+            return model_name
+        return OTHER_MODEL
+
+    def proxy_label(self, proxy: Optional[str]) -> str:
+        """Label for a proxy (host:port), "none" without one, "other" beyond max_proxy_labels."""
+        if not proxy:
+            return NO_PROXY
+        label = self._proxy_labels.get(proxy)
+        if label is None:
+            with self._proxy_lock:
+                label = self._proxy_labels.get(proxy)
+                if label is None:
+                    label = proxy if len(self._proxy_labels) < self.max_proxy_labels else OTHER_PROXY
+                    self._proxy_labels[proxy] = label
+        return label
+
+    def key_label(self, key_index: int) -> str:
+        """Hashed label for a key index."""
+        if 0 <= key_index < len(self._key_labels):
+            return self._key_labels[key_index]
+        return str(key_index)
+
+    def record_attempt(
+        self,
+        model_name: str,
+        key_index: int,
+        proxy: Optional[str],
+        outcome: str,
+        duration: float
+    ) -> None:
+        """Record one upstream generate call."""
+        model = self.model_label(model_name)
+        label_key = (model, key_index, outcome)
+        children = self._attempt_children.get(label_key)
+        if children is None:
+            key = self.key_label(key_index)
+            children = (
+                self.attempts.labels(model, key, outcome),
+                self.attempt_duration.labels(model, key)
+            )
+            self._attempt_children[label_key] = children
+        children[0].inc()
+        children[1].observe(duration)
+
+        proxy_key = (self.proxy_label(proxy), outcome)
+        proxy_children = self._proxy_children.get(proxy_key)
+        if proxy_children is None:
+            proxy_children = (
+                self.proxy_attempts.labels(*proxy_key),
+                self.proxy_attempt_duration.labels(proxy_key[0])
+            )
+            self._proxy_children[proxy_key] = proxy_children
+        proxy_children[0].inc()
+        proxy_children[1].observe(duration)
+
+    def record_request(self, model_name: str, outcome: str, duration: float, attempts: int) -> None:
+        """Record one generation request (attempts=0 for cache hits)."""
+        model = self.model_label(model_name)
+        label_key = (model, outcome)
+        children = self._request_children.get(label_key)
+        if children is None:
+            children = (
+                self.requests.labels(model, outcome),
+                self.request_duration.labels(model, outcome),
+                self.attempts_per_request.labels(model),
+                self.fallbacks.labels(model)
+            )
+            self._request_children[label_key] = children
+        children[0].inc()
+        children[1].observe(duration)
+        if attempts > 0:
+            children[2].observe(attempts)
+            if attempts > 1:
+                children[3].inc(attempts - 1)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        return self.registry.render()
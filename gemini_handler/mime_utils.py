@@ -0,0 +1,131 @@
+# gemini_handler/mime_utils.py
+"""MIME type detection for files sent to Gemini."""
+import io
+import mimetypes
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# ISO base media ("ftyp") brands -> MIME type
+_FTYP_BRANDS = {
+    b"qt  ": "video/quicktime",
+    b"M4A ": "audio/mp4",
+    b"M4B ": "audio/mp4",
+    b"heic": "image/heic",
+    b"heix": "image/heic",
+    b"mif1": "image/heif",
+    b"3gp4": "video/3gpp",
+    b"3gp5": "video/3gpp",
+}
+
+# Sizes of the BMP DIB header variants
+_BMP_DIB_HEADER_SIZES = (12, 40, 52, 56, 64, 108, 124)
+
+# Image types Gemini accepts; other images are converted to PNG before sending
+SUPPORTED_IMAGE_TYPES = frozenset({"image/png", "image/jpeg", "image/webp", "image/heic", "image/heif"})
+
+
+def sniff_mime_type(header: bytes) -> Optional[str]:
+    """
+    Detect a MIME type from the first bytes of a file (at least 16 bytes).
+
+    Returns:
+        The MIME type, or None if the signature is not recognized
+    """
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if header.startswith(b"%PDF-"):
+        return "application/pdf"
+    if header[:4] == b"RIFF":
+        return {b"WEBP": "image/webp", b"WAVE": "audio/wav", b"AVI ": "video/x-msvideo"}.get(header[8:12])
+    if header[4:8] == b"ftyp":
+        return _FTYP_BRANDS.get(header[8:12], "video/mp4")
+    if header.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    if header.startswith(b"ID3") or header[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "audio/mp3"
+    if header.startswith(b"fLaC"):
+        return "audio/flac"
+    if header.startswith(b"OggS"):
+        return "audio/ogg"
+    if header[:2] in (b"\xff\xf1", b"\xff\xf9"):
+        return "audio/aac"
+    if header.startswith(b"BM") and _is_bmp_header(header):
+        return "image/bmp"
+    return None
+
+
+def _is_bmp_header(header: bytes) -> bool:
+    """Check a BMP file header's fields, so text that happens to start with "BM" is not an image."""
+    if len(header) < 16:
+        return False
+    file_size = int.from_bytes(header[2:6], "little")
+    reserved = header[6:10]
+    pixel_offset = int.from_bytes(header[10:14], "little")
+    # Low half of the DIB header size (BITMAPCOREHEADER ... BITMAPV5HEADER)
+    dib_size = int.from_bytes(header[14:16], "little")
+    return (
+        reserved == b"\x00\x00\x00\x00"
+        and dib_size in _BMP_DIB_HEADER_SIZES
+        and 14 + dib_size <= pixel_offset
+        and (file_size == 0 or pixel_offset <= file_size)
+    )
+
+
+def guess_mime_type(file_path: Union[str, Path], header: Optional[bytes] = None) -> str:
+    """
+    Determine a file's MIME type from its magic bytes, falling back to its extension.
+
+    Args:
+        file_path: Path of the file
+        header: First bytes of the file (read from disk if not given)
+
+    Returns:
+        The MIME type ("application/octet-stream" if unknown)
+    """
+    if header is None:
+        with open(file_path, "rb") as f:
+            header = f.read(16)
+    return (
+        sniff_mime_type(header)
+        or mimetypes.guess_type(str(file_path))[0]
+        or "application/octet-stream"
+    )
+
+
+def to_supported_image(data: bytes, mime_type: str) -> Tuple[bytes, str]:
+    """
+    Re-encode an image Gemini does not accept (GIF, BMP, TIFF...) as PNG.
+
+    Supported images and non-image data are returned unchanged, as are images
+    PIL cannot read. Animated images keep their first frame.
+
+    Args:
+        data: File contents
+        mime_type: MIME type of data
+
+    Returns:
+        Tuple of (data, mime_type) to send
+    """
+    if not mime_type.startswith("image/") or mime_type in SUPPORTED_IMAGE_TYPES:
+        return data, mime_type
+
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.mode not in ("1", "L", "LA", "P", "RGB", "RGBA", "I", "I;16"):
+                image = image.convert("RGBA" if "A" in image.mode else "RGB")
+            output = io.BytesIO()
+            image.save(output, format="PNG")
+    except Exception as e:
+        logger.warning("Could not convert %s image to PNG, sending as is: %s", mime_type, e)
+        return data, mime_type
+    return output.getvalue(), "image/png"
@@ -0,0 +1,543 @@
+# gemini_handler/mock_upstream.py
+"""Offline stand-in for the Gemini REST API, for deterministic load tests."""
+import argparse
+import asyncio
+import base64
+import datetime
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+_STATUS_NAMES = {
+    400: "INVALID_ARGUMENT",
+    403: "PERMISSION_DENIED",
+    404: "NOT_FOUND",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE"
+}
+
+
+@dataclass
+class MockUpstreamConfig:
+    """Behaviour of the mock upstream; can be changed at runtime via POST /mock/config."""
+    latency_ms: float = 50.0  # Median latency of a call (time to first chunk when streaming)
+    latency_distribution: str = "fixed"  # fixed | uniform | lognormal
+    latency_jitter_ms: float = 0.0  # Half-width of the uniform distribution
+    latency_sigma: float = 0.5  # Shape of the lognormal distribution
+    stream_chunks: int = 4  # Chunks per streamed response
+    stream_chunk_interval_ms: float = 10.0  # Delay between streamed chunks
+    rate_limit_per_minute: int = 0  # Requests per key per window before 429 (0 = unlimited)
+    rate_limit_window_seconds: float = 60.0
+    rate_limited_keys: List[str] = field(default_factory=list)  # Keys that always get 429
+    invalid_keys: List[str] = field(default_factory=list)  # Keys that always get 400 API_KEY_INVALID
+    error_rate: float = 0.0  # Fraction of calls failing with error_status
+    error_status: int = 500
+    safety_block_rate: float = 0.0  # Fraction of generations blocked with finishReason SAFETY
+    response_text: str = "This is a mock response from the Gemini upstream."
+    json_response_text: str = '{"result": "mock"}'  # Used when responseMimeType is application/json
+    embedding_dim: int = 768
+    seed: Optional[int] = None  # Seed for latency/error sampling (None = random)
+
+
+def count_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+
+def mock_embedding(text: str, dimensionality: int) -> List[float]:
+    """Deterministic unit vector derived from the text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensionality)
+    vector /= np.linalg.norm(vector)
+    return vector.astype(np.float32).tolist()
+
+
+def _contents_text(contents: Any) -> str:
+    """Concatenate the text parts of a contents payload (str, content or list of contents)."""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, dict):
+        contents = [contents]
+    texts = []
+    for content in contents or []:
+        for part in (content.get("parts") or []) if isinstance(content, dict) else []:
+            if isinstance(part, dict) and isinstance(part.get("text"), str):
+                texts.append(part["text"])
+    return "\n".join(texts)
+
+
+def _rfc3339(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class MockGeminiUpstream:
+    """
+    FastAPI app implementing the parts of the Gemini REST API used by this package.
+
+    Supported: models.list/get, generateContent, streamGenerateContent (JSON array
+    or SSE), embedContent, batchEmbedContents, countTokens and the Files API
+    (resumable or raw upload, get, list, delete). Files belong to the key that
+    uploaded them, as on the real API. Point clients at it with
+    ``api_endpoint="http://host:port"``.
+    """
+
+    def __init__(self, config: Optional[MockUpstreamConfig] = None):
+        """
+        Args:
+            config: Upstream behaviour (default: 50 ms fixed latency, no faults)
+        """
+        self.config = config or MockUpstreamConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._key_calls: Dict[str, Deque[float]] = defaultdict(deque)
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._uploads: Dict[str, Dict[str, Any]] = {}
+        self._stats: Dict[str, int] = defaultdict(int)
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+        self.app = FastAPI(title="Mock Gemini Upstream")
+        self._register_routes()
+
+    # --- Fault and latency injection ---
+
+    def update_config(self, **changes: Any) -> None:
+        """Change behaviour at runtime (e.g. start a 429 storm)."""
+        names = {f.name for f in fields(MockUpstreamConfig)}
+        unknown = set(changes) - names
+        if unknown:
+            raise ValueError(f"Unknown mock upstream settings: {sorted(unknown)}")
+        with self._lock:
+            for name, value in changes.items():
+                setattr(self.config, name, value)
+            if "seed" in changes:
+                self._rng = random.Random(self.config.seed)
+
+    def _sample_latency(self) -> float:
+        """Latency of the next call in seconds."""
+        config = self.config
+        with self._lock:
+            if config.latency_distribution == "uniform":
+                ms = self._rng.uniform(config.latency_ms - config.latency_jitter_ms,
+                                       config.latency_ms + config.latency_jitter_ms)
+            elif config.latency_distribution == "lognormal" and config.latency_ms > 0:
+                ms = self._rng.lognormvariate(math.log(config.latency_ms), config.latency_sigma)
+            else:
+                ms = config.latency_ms
+        return max(0.0, ms) / 1000.0
+
+    def _roll(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def _check_key(self, api_key: Optional[str]) -> Optional[JSONResponse]:
+        """Apply key validation, rate limits and random errors; return an error response or None."""
+        config = self.config
+        if not api_key:
+            return self._error(403, "Method doesn't allow unregistered callers. Please use API Key.")
+        if api_key in config.invalid_keys:
+            return self._error(400, "API key not valid. Please pass a valid API key.", reason="API_KEY_INVALID")
+        if api_key in config.rate_limited_keys:
+            return self._error(429, "Resource has been exhausted (e.g. check quota).")
+        if config.rate_limit_per_minute > 0:
+            now = time.monotonic()
+            with self._lock:
+                calls = self._key_calls[api_key]
+                while calls and now - calls[0] > config.rate_limit_window_seconds:
+                    calls.popleft()
+                if len(calls) >= config.rate_limit_per_minute:
+                    limited = True
+                else:
+                    calls.append(now)
+                    limited = False
+            if limited:
+                return self._error(429, "Resource has been exhausted (e.g. check quota).")
+        if self._roll(config.error_rate):
+            return self._error(config.error_status, "An internal error has occurred.")
+        return None
+
+    def _error(self, code: int, message: str, reason: Optional[str] = None) -> JSONResponse:
+        with self._lock:
+            self._stats[f"status_{code}"] += 1
+        error: Dict[str, Any] = {"code": code, "message": message, "status": _STATUS_NAMES.get(code, "UNKNOWN")}
+        if reason:
+            error["details"] = [{"@type": "type.googleapis.com/google.rpc.ErrorInfo", "reason": reason}]
+        return JSONResponse(status_code=code, content={"error": error})
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """Counters per endpoint and per error status."""
+        with self._lock:
+            return dict(self._stats)
+
+    @staticmethod
+    def _api_key(request: Request) -> Optional[str]:
+        return request.query_params.get("key") or request.headers.get("x-goog-api-key")
+
+    # --- Response builders ---
+
+    def _generation(self, model: str, body: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """Build a GenerateContentResponse and the full text it contains."""
+        prompt_tokens = count_tokens(_contents_text(body.get("contents")))
+        if self._roll(self.config.safety_block_rate):
+            self._count("safety_blocks")
+            return {
+                "candidates": [{
+                    "finishReason": "SAFETY",
+                    "index": 0,
+                    "safetyRatings": [{
+                        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+                        "probability": "HIGH",
+                        "blocked": True
+                    }]
+                }],
+                "usageMetadata": {"promptTokenCount": prompt_tokens, "totalTokenCount": prompt_tokens},
+                "modelVersion": model
+            }, ""
+
+        generation_config = body.get("generationConfig") or body.get("generation_config") or {}
+        mime_type = generation_config.get("responseMimeType") or generation_config.get("response_mime_type")
+        text = self.config.json_response_text if mime_type == "application/json" else self.config.response_text
+        output_tokens = count_tokens(text)
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": output_tokens,
+                "totalTokenCount": prompt_tokens + output_tokens
+            },
+            "modelVersion": model
+        }, text
+
+    def _file_resource(self, file_id: str, request: Request) -> Dict[str, Any]:
+        record = self._files[file_id]
+        base = str(request.base_url).rstrip("/")
+        return {
+            "name": f"files/{file_id}",
+            "displayName": record["display_name"],
+            "mimeType": record["mime_type"],
+            "sizeBytes": str(len(record["data"])),
+            "createTime": _rfc3339(record["created"]),
+            "updateTime": _rfc3339(record["created"]),
+            "expirationTime": _rfc3339(record["created"] + 48 * 3600),
+            "sha256Hash": base64.b64encode(hashlib.sha256(record["data"]).digest()).decode("ascii"),
+            "uri": f"{base}/v1beta/files/{file_id}",
+            "state": "ACTIVE",
+            "source": "UPLOADED"
+        }
+
+    def _store_file(self, api_key: str, data: bytes, mime_type: str, display_name: Optional[str]) -> str:
+        file_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._files[file_id] = {
+                "owner": api_key,
+                "data": data,
+                "mime_type": mime_type or "application/octet-stream",
+                "display_name": display_name or file_id,
+                "created": time.time()
+            }
+            self._stats["uploads"] += 1
+        return file_id
+
+    def _owned_file(self, file_id: str, api_key: str) -> Optional[JSONResponse]:
+        record = self._files.get(file_id)
+        if record is None:
+            return self._error(404, f"File files/{file_id} not found.")
+        if record["owner"] != api_key:
+            return self._error(403, f"You do not have permission to access the File {file_id} or it may not exist.")
+        return None
+
+    def _referenced_files(self, contents: Any) -> List[str]:
+        """IDs of uploaded files referenced by file_data parts in a request's contents."""
+        file_ids = []
+        for content in contents or []:
+            for part in (content.get("parts") or []) if isinstance(content, dict) else []:
+                file_data = part.get("file_data") or part.get("fileData") if isinstance(part, dict) else None
+                uri = (file_data or {}).get("file_uri") or (file_data or {}).get("fileUri") or ""
+                if "/files/" in uri:
+                    file_ids.append(uri.rsplit("/files/", 1)[1])
+        return file_ids
+
+    # --- Routes ---
+
+    def _register_routes(self) -> None:
+        app = self.app
+
+        @app.get("/mock/stats")
+        async def mock_stats():
+            return self.get_stats()
+
+        @app.get("/mock/config")
+        async def mock_get_config():
+            return asdict(self.config)
+
+        @app.post("/mock/config")
+        async def mock_update_config(request: Request):
+            try:
+                self.update_config(**(await request.json()))
+            except (ValueError, TypeError) as e:
+                return self._error(400, str(e))
+            return asdict(self.config)
+
+        @app.get("/{version}/models")
+        async def list_models(version: str, request: Request):
+            if error := self._check_key(self._api_key(request)):
+                return error
+            return {"models": [
+                {"name": f"models/{name}", "displayName": name, "supportedGenerationMethods": methods}
+                for name, methods in (
+                    ("gemini-2.0-flash", ["generateContent", "countTokens"]),
+                    ("gemini-1.5-flash", ["generateContent", "countTokens"]),
+                    ("text-embedding-004", ["embedContent"]),
+                    ("gemini-embedding-exp-03-07", ["embedContent"])
+                )
+            ]}
+
+        @app.get("/{version}/models/{model}")
+        async def get_model(version: str, model: str, request: Request):
+            if error := self._check_key(self._api_key(request)):
+                return error
+            return {"name": f"models/{model}", "displayName": model, "inputTokenLimit": 1048576}
+
+        @app.post("/{version}/models/{model_action}")
+        async def model_action(version: str, model_action: str, request: Request):
+            model, _, action = model_action.partition(":")
+            self._count(action or "unknown")
+            if error := self._check_key(self._api_key(request)):
+                return error
+            body = await request.json()
+            # Like the real API, a file can only be used by the key that uploaded it
+            request_body = body.get("generateContentRequest") or body
+            for file_id in self._referenced_files(request_body.get("contents")):
+                if error := self._owned_file(file_id, self._api_key(request)):
+                    return error
+
+            if action == "countTokens":
+                await asyncio.sleep(self._sample_latency() / 4)
+                request_body = body.get("generateContentRequest") or body
+                return {"totalTokens": count_tokens(_contents_text(request_body.get("contents")))}
+
+            if action == "embedContent":
+                await asyncio.sleep(self._sample_latency())
+                dim = body.get("outputDimensionality") or self.config.embedding_dim
+                return {"embedding": {"values": mock_embedding(_contents_text(body.get("content")), dim)}}
+
+            if action == "batchEmbedContents":
+                await asyncio.sleep(self._sample_latency())
+                return {"embeddings": [
+                    {"values": mock_embedding(
+                        _contents_text(item.get("content")),
+                        item.get("outputDimensionality") or self.config.embedding_dim
+                    )}
+                    for item in body.get("requests", [])
+                ]}
+
+            if action == "generateContent":
+                await asyncio.sleep(self._sample_latency())
+                return self._generation(model, body)[0]
+
+            if action == "streamGenerateContent":
+                return self._stream(model, body, sse=request.query_params.get("alt") == "sse")
+
+            return self._error(404, f"Unknown method: {action}")
+
+        @app.post("/upload/{version}/files")
+        async def upload_file(version: str, request: Request):
+            command = request.headers.get("x-goog-upload-command", "")
+            protocol = request.headers.get("x-goog-upload-protocol", "")
+            upload_id = request.query_params.get("upload_id")
+
+            # The upload URL returned by the start request carries its own authorization
+            with self._lock:
+                pending = self._uploads.pop(upload_id, None) if upload_id else None
+            if upload_id and pending is None:
+                return self._error(404, "Unknown upload session.")
+            api_key = pending["owner"] if pending else self._api_key(request)
+            if pending is None and (error := self._check_key(api_key)):
+                return error
+
+            if protocol == "resumable" and "start" in command:
+                metadata = (await request.json() if await request.body() else {}).get("file") or {}
+                upload_id = uuid.uuid4().hex
+                with self._lock:
+                    self._uploads[upload_id] = {
+                        "owner": api_key,
+                        "display_name": metadata.get("displayName") or metadata.get("display_name"),
+                        "mime_type": request.headers.get("x-goog-upload-header-content-type")
+                        or metadata.get("mimeType") or metadata.get("mime_type")
+                    }
+                url = f"{str(request.base_url).rstrip('/')}/upload/{version}/files?upload_id={upload_id}&upload_protocol=resumable"
+                return Response(headers={"x-goog-upload-url": url, "x-goog-upload-status": "active"})
+
+            data = await request.body()
+            pending = pending or {}
+            file_id = self._store_file(
+                api_key, data,
+                pending.get("mime_type") or request.headers.get("content-type", ""),
+                pending.get("display_name")
+            )
+            await asyncio.sleep(self._sample_latency())
+            return JSONResponse(
+                content={"file": self._file_resource(file_id, request)},
+                headers={"x-goog-upload-status": "final"}
+            )
+
+        @app.get("/{version}/files")
+        async def list_files(version: str, request: Request):
+            api_key = self._api_key(request)
+            if error := self._check_key(api_key):
+                return error
+            return {"files": [
+                self._file_resource(file_id, request)
+                for file_id, record in list(self._files.items()) if record["owner"] == api_key
+            ]}
+
+        @app.get("/{version}/files/{file_id}")
+        async def get_file(version: str, file_id: str, request: Request):
+            api_key = self._api_key(request)
+            if error := self._check_key(api_key) or self._owned_file(file_id, api_key):
+                return error
+            if request.query_params.get("alt") == "media":
+                record = self._files[file_id]
+                return Response(content=record["data"], media_type=record["mime_type"])
+            return self._file_resource(file_id, request)
+
+        @app.delete("/{version}/files/{file_id}")
+        async def delete_file(version: str, file_id: str, request: Request):
+            api_key = self._api_key(request)
+            if error := self._check_key(api_key) or self._owned_file(file_id, api_key):
+                return error
+            with self._lock:
+                self._files.pop(file_id, None)
+            return {}
+
+    def _stream(self, model: str, body: Dict[str, Any], sse: bool) -> StreamingResponse:
+        """Stream the response text in config.stream_chunks pieces."""
+        response, text = self._generation(model, body)
+        chunk_count = max(1, self.config.stream_chunks)
+        size = max(1, math.ceil(len(text) / chunk_count)) if text else 1
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        first_delay = self._sample_latency()
+        interval = self.config.stream_chunk_interval_ms / 1000.0
+
+        def chunk(index: int, piece: str) -> Dict[str, Any]:
+            last = index == len(pieces) - 1
+            candidate = dict(response["candidates"][0])
+            if text:
+                candidate["content"] = {"parts": [{"text": piece}], "role": "model"}
+            if not last:
+                candidate.pop("finishReason", None)
+            payload = {"candidates": [candidate], "modelVersion": model}
+            if last:
+                payload["usageMetadata"] = response["usageMetadata"]
+            return payload
+
+        async def generate():
+            await asyncio.sleep(first_delay)
+            if not sse:
+                yield "["
+            for index, piece in enumerate(pieces):
+                if index:
+                    await asyncio.sleep(interval)
+                data = json.dumps(chunk(index, piece))
+                if sse:
+                    yield f"data: {data}\r\n\r\n"
+                else:
+                    yield ("," if index else "") + data
+            if not sse:
+                yield "]"
+
+        return StreamingResponse(generate(), media_type="text/event-stream" if sse else "application/json")
+
+    # --- Running ---
+
+    def run(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        """Run the mock upstream in the foreground."""
+        uvicorn.run(self.app, host=host, port=port, log_level="warning")
+
+    def start(self, host: str = "127.0.0.1", port: int = 0, timeout: float = 10.0) -> str:
+        """
+        Run the mock upstream in a background thread.
+
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 = pick a free port)
+            timeout: Seconds to wait for the server to start
+
+        Returns:
+            Base URL of the running server (use as api_endpoint)
+        """
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, name="mock-gemini-upstream", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Mock upstream failed to start")
+            time.sleep(0.01)
+        bound_port = self._server.servers[0].sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}"
+
+    def stop(self) -> None:
+        """Stop a server started with start()."""
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=10)
+            self._server = None
+            self._thread = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run an offline mock of the Gemini API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-distribution", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per key per minute before 429")
+    parser.add_argument("--rate-limited-keys", default="", help="Comma-separated keys that always get 429")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--safety-block-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockUpstreamConfig(
+        latency_ms=args.latency_ms,
+        latency_distribution=args.latency_distribution,
+        latency_jitter_ms=args.latency_jitter_ms,
+        latency_sigma=args.latency_sigma,
+        rate_limit_per_minute=args.rate_limit,
+        rate_limited_keys=[k.strip() for k in args.rate_limited_keys.split(",") if k.strip()],
+        error_rate=args.error_rate,
+        safety_block_rate=args.safety_block_rate,
+        seed=args.seed
+    )
+    print(f"Mock Gemini upstream on http://{args.host}:{args.port} (set gemini.api_endpoint to this URL)")
+    MockGeminiUpstream(config).run(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
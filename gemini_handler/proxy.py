@@ -1,20 +1,20 @@
 # gemini_handler/proxy.py
+import logging
 import os
 import threading  # Import threading
 import time
 from typing import Any, Dict, List, Optional, Union
 
-# Import the auto proxy functionality
-try:
-    from swiftshadow.classes import Proxy, ProxyInterface
-    SWIFTSHADOW_AVAILABLE = True
-except ImportError:
-    SWIFTSHADOW_AVAILABLE = False
-    print("SwiftShadow library not available. Auto proxy features will be disabled.")
-    # Create dummy Proxy class for type hints
-    class Proxy:
-        def as_string(self) -> str:
-            return ""
+from .lazy_import import module_available
+from .log_utils import SAMPLED, get_logger
+
+logger = get_logger(__name__)
+
+# Probe for the auto proxy functionality without importing it (swiftshadow
+# loads slowly); ProxyInterface is imported when auto proxy is configured
+SWIFTSHADOW_AVAILABLE = module_available("swiftshadow")
+if not SWIFTSHADOW_AVAILABLE:
+    logger.debug("SwiftShadow library not available. Auto proxy features will be disabled.")
 
 
 class ProxyManager:
@@ -54,7 +54,7 @@ class ProxyManager:
                 # Clear environment variables if no settings provided
                 os.environ.pop('HTTP_PROXY', None)
                 os.environ.pop('HTTPS_PROXY', None)
-                print("Proxy settings cleared.")
+                logger.info("Proxy settings cleared.")
                 return
 
             # Check for auto proxy settings
@@ -68,35 +68,36 @@ class ProxyManager:
                 try:
                     # Create the ProxyInterface if it doesn't exist
                     if cls._auto_proxy_interface is None:
+                         from swiftshadow.classes import ProxyInterface
                          cls._auto_proxy_interface = ProxyInterface(autoUpdate=False, autoRotate=False)
 
                     # Initial proxy update
-                    print("Attempting initial proxy update...")
+                    logger.info("Attempting initial proxy update...")
                     cls._auto_proxy_interface.update()
-                    print(f"Initial proxy update successful, got {len(cls._auto_proxy_interface.proxies)} proxies")
+                    logger.info("Initial proxy update successful, got %d proxies", len(cls._auto_proxy_interface.proxies))
 
                     # Start background update thread if auto_update is enabled and thread isn't running
                     if cls._auto_update and (cls._update_thread is None or not cls._update_thread.is_alive()):
                         cls._start_update_thread()
 
                     cls._initialized = True
-                    print("Auto Proxy Initialized.")
+                    logger.info("Auto Proxy Initialized.")
 
                     # Apply an initial proxy if auto_rotate is enabled
                     if cls._auto_rotate:
-                        print("Applying initial proxy due to auto_rotate=True...")
+                        logger.info("Applying initial proxy due to auto_rotate=True...")
                         # Don't set environment here, middleware will handle it on first request
                         # cls.apply_next_proxy(set_environment=True)
                         cls.get_next_proxy() # Call once to prime the first proxy selection
 
                 except Exception as e:
-                    print(f"Failed to initialize auto proxy: {e}. Falling back to static proxy if configured.")
+                    logger.warning("Failed to initialize auto proxy: %s. Falling back to static proxy if configured.", e)
                     # Fall back to regular proxy settings if auto proxy fails
                     cls._apply_static_proxy(proxy_settings)
                     cls._initialized = True # Mark as initialized even for static proxy fallback
             else:
                 # Regular proxy configuration (without auto proxy)
-                print("Configuring static proxy.")
+                logger.info("Configuring static proxy.")
                 cls._apply_static_proxy(proxy_settings)
                 cls._initialized = True # Mark as initialized even for static proxy
 
@@ -109,13 +110,13 @@ class ProxyManager:
         if set_environment:
             if http_proxy:
                 os.environ['HTTP_PROXY'] = http_proxy
-                print(f"Set HTTP_PROXY environment variable.")
+                logger.debug("Set HTTP_PROXY environment variable.")
             else:
                 os.environ.pop('HTTP_PROXY', None)
 
             if https_proxy:
                 os.environ['HTTPS_PROXY'] = https_proxy
-                print(f"Set HTTPS_PROXY environment variable.")
+                logger.debug("Set HTTPS_PROXY environment variable.")
             else:
                 os.environ.pop('HTTPS_PROXY', None)
 
@@ -136,7 +137,7 @@ class ProxyManager:
         # import threading # Already imported
 
         if cls._update_thread is not None and cls._update_thread.is_alive():
-            print("Proxy update thread already running.")
+            logger.debug("Proxy update thread already running.")
             return
 
         def update_proxies():
@@ -147,7 +148,7 @@ class ProxyManager:
                          should_run = cls._auto_update and cls._initialized and cls._auto_proxy_interface is not None
 
                     if not should_run:
-                         print("Auto update disabled or not initialized. Stopping update thread.")
+                         logger.info("Auto update disabled or not initialized. Stopping update thread.")
                          break
 
                     time.sleep(cls._update_interval)
@@ -155,26 +156,26 @@ class ProxyManager:
                     with cls._lock:
                         # Re-check conditions before update, in case config changed
                         if cls._auto_proxy_interface and cls._auto_update and cls._initialized:
-                            print(f"Updating proxies... (interval: {cls._update_interval}s)")
+                            logger.debug("Updating proxies... (interval: %ss)", cls._update_interval)
                             try:
                                 cls._auto_proxy_interface.update()
-                                print(f"Proxy update successful, now have {len(cls._auto_proxy_interface.proxies)} proxies")
+                                logger.info("Proxy update successful, now have %d proxies", len(cls._auto_proxy_interface.proxies))
                                 # Reset index if list shrinks beyond current index
                                 if cls._current_proxy_index >= len(cls._auto_proxy_interface.proxies):
                                     cls._current_proxy_index = -1
                             except Exception as update_e:
-                                print(f"Error during proxy update: {update_e}")
+                                logger.warning("Error during proxy update: %s", update_e)
                         else:
                              # Condition changed while sleeping, break
-                             print("Proxy update conditions changed. Stopping update thread.")
+                             logger.info("Proxy update conditions changed. Stopping update thread.")
                              break
                 except Exception as e:
-                    print(f"Error in proxy update loop: {e}")
+                    logger.warning("Error in proxy update loop: %s", e)
                     time.sleep(5)  # Back off on error
 
         cls._update_thread = threading.Thread(target=update_proxies, daemon=True)
         cls._update_thread.start()
-        print("Started proxy update background thread.")
+        logger.info("Started proxy update background thread.")
 
     @classmethod
     def _add_to_history(cls, proxy_info: Dict[str, Any]) -> None:
@@ -199,7 +200,7 @@ class ProxyManager:
             if SWIFTSHADOW_AVAILABLE and cls._initialized and cls._auto_proxy_interface and cls._auto_rotate:
                 proxies = cls._auto_proxy_interface.proxies
                 if not proxies:
-                    print("Warning: Auto proxy enabled, but no proxies available.")
+                    logger.warning("Auto proxy enabled, but no proxies available.")
                     # Optional: Attempt an update if list is empty?
                     # try:
                     #     cls._auto_proxy_interface.update()
@@ -228,10 +229,10 @@ class ProxyManager:
                     }
                     cls._current_auto_proxy = proxy_info
                     cls._add_to_history(proxy_info)
-                    # print(f"Selected auto proxy index {cls._current_proxy_index}: {proxy_info['proxy_string']}") # Debug log
+                    logger.debug("Selected auto proxy index %d: %s", cls._current_proxy_index, proxy_info['proxy_string'], extra=SAMPLED)
                     return {'http': http_url, 'https': https_url}
                 else:
-                    print(f"Warning: Got None proxy object at index {cls._current_proxy_index}")
+                    logger.warning("Got None proxy object at index %d", cls._current_proxy_index)
                     cls._current_auto_proxy = None
                     return None
 
@@ -282,14 +283,15 @@ class ProxyManager:
                     os.environ.pop('HTTPS_PROXY', None)
 
                 # Log based on the actual current proxy state after get_next_proxy
-                current_proxy_info = cls.get_current_proxy()
-                current_proxy_str = current_proxy_info.get('proxy_string', 'N/A') if current_proxy_info else 'None'
-                print(f"Applied proxy to environment: {current_proxy_str}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    current_proxy_info = cls.get_current_proxy()
+                    current_proxy_str = current_proxy_info.get('proxy_string', 'N/A') if current_proxy_info else 'None'
+                    logger.debug("Applied proxy to environment: %s", current_proxy_str, extra=SAMPLED)
             else:
                 # Explicitly clear environment if no proxy was selected
                 os.environ.pop('HTTP_PROXY', None)
                 os.environ.pop('HTTPS_PROXY', None)
-                print("Cleared proxy environment variables (no proxy selected).")
+                logger.debug("Cleared proxy environment variables (no proxy selected).", extra=SAMPLED)
 
 
         return proxy_dict # Return the dict whether applied to env or not
@@ -363,13 +365,13 @@ class ProxyManager:
             try:
                 # Use async version for integration with FastAPI
                 await cls._auto_proxy_interface.async_update()
-                print(f"Async proxy update successful, now have {len(cls._auto_proxy_interface.proxies)} proxies")
+                logger.info("Async proxy update successful, now have %d proxies", len(cls._auto_proxy_interface.proxies))
                 # Reset index if list shrinks beyond current index
                 if cls._current_proxy_index >= len(cls._auto_proxy_interface.proxies):
                     cls._current_proxy_index = -1
                 return True
             except Exception as e:
-                print(f"Error in async proxy update: {e}")
+                logger.warning("Error in async proxy update: %s", e)
                 return False
 
     @staticmethod
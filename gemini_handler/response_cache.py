@@ -0,0 +1,197 @@
+# gemini_handler/response_cache.py
+"""Exact-match response cache with a memory LRU tier and an optional disk tier."""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .cache_utils import canonical_hash
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class ResponseCache:
+    """
+    Caches successful generation responses keyed by a canonical request hash.
+
+    The key covers model, contents, generation config (including any response
+    schema) and system instruction, so only byte-identical requests hit. The
+    memory tier is an LRU bounded by an approximate size budget; the optional
+    disk tier stores one JSON file per entry and survives restarts.
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        default_ttl_seconds: Optional[float] = 3600,
+        cache_dir: Optional[Union[str, Path]] = None
+    ):
+        """
+        Args:
+            max_memory_bytes: Size budget for the in-memory tier
+            default_ttl_seconds: Entry lifetime (None = never expires)
+            cache_dir: Directory for the on-disk tier (None = memory only)
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.default_ttl_seconds = default_ttl_seconds
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # key -> (expires_at, payload, size)
+        self._memory: "OrderedDict[str, Tuple[Optional[float], Dict[str, Any], int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Dict[str, Any]]) -> Optional["ResponseCache"]:
+        """
+        Build a cache from a 'gemini.response_cache' config mapping.
+
+        Args:
+            settings: Mapping with enabled, max_memory_mb, ttl (seconds, null =
+                      never expires) and cache_dir (omit for memory only)
+
+        Returns:
+            The cache, or None if settings are missing or not enabled
+        """
+        if not settings or not settings.get('enabled', False):
+            return None
+        return cls(
+            max_memory_bytes=int(settings.get('max_memory_mb', 64) * 1024 * 1024),
+            default_ttl_seconds=settings.get('ttl', 3600),
+            cache_dir=settings.get('cache_dir')
+        )
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        contents: Union[str, List[Dict[str, Any]]],
+        generation_config: Dict[str, Any],
+        system_instruction: Optional[str] = None
+    ) -> str:
+        """Build the canonical cache key for a request."""
+        return canonical_hash(model_name, contents, generation_config, system_instruction)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached payload for a key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                expires_at, payload, _ = item
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return dict(payload)
+                self._remove_memory(key)
+
+        if self.cache_dir:
+            record = self._read_disk(key)
+            if record is not None:
+                expires_at = record.get("expires_at")
+                if expires_at is None or expires_at > now:
+                    with self._lock:
+                        self._store_memory(key, record["payload"], expires_at)
+                        self._stats["disk_hits"] += 1
+                    return dict(record["payload"])
+                self._delete_disk(key)
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, payload: Dict[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a payload.
+
+        Args:
+            key: Key from make_key
+            payload: JSON-serializable response dictionary
+            ttl_seconds: Override the default TTL for this entry
+        """
+        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl_seconds
+        expires_at = time.time() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._store_memory(key, payload, expires_at)
+            self._stats["sets"] += 1
+
+        if self.cache_dir:
+            self._write_disk(key, {"expires_at": expires_at, "payload": payload})
+
+    def clear(self) -> None:
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self.cache_dir:
+            for path in self.cache_dir.glob("*/*.json"):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and memory usage."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "hit_rate": (lookups - self._stats["misses"]) / lookups if lookups else 0.0
+            }
+
+    # --- Memory tier ---
+
+    def _store_memory(self, key: str, payload: Dict[str, Any], expires_at: Optional[float]) -> None:
+        size = len(json.dumps(payload, default=str))
+        if size > self.max_memory_bytes:
+            return
+        self._remove_memory(key)
+        self._memory[key] = (expires_at, payload, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            oldest = next(iter(self._memory))
+            self._remove_memory(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove_memory(self, key: str) -> None:
+        item = self._memory.pop(key, None)
+        if item is not None:
+            self._memory_bytes -= item[2]
+
+    # --- Disk tier ---
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, record: Dict[str, Any]) -> None:
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to write response cache entry %s: %s", key, e)
+
+    def _delete_disk(self, key: str) -> None:
+        try:
+            self._disk_path(key).unlink()
+        except OSError:
+            pass
@@ -4,6 +4,9 @@ import time
 from typing import Any, Dict, Optional
 
 from .data_models import ModelResponse
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
 
 # No need to import ProxyManager here anymore
 
@@ -105,5 +108,5 @@ class ResponseHandler:
                     proxy_info=proxy_info # Include proxy info in error response
                 )
             # Re-raise other unexpected exceptions
-            print(f"Unexpected error in ResponseHandler: {e}") # Log unexpected errors
+            logger.warning("Unexpected error in ResponseHandler: %s", e) # Log unexpected errors
             raise # Re-raise the original exception for higher-level handling
\ No newline at end of file
@@ -0,0 +1,274 @@
+# gemini_handler/semantic_cache.py
+"""Semantic (near-duplicate) response cache backed by Gemini embeddings."""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .cache_utils import canonical_hash
+
+
+class _Namespace:
+    """Pre-normalized embedding matrix plus payloads for one namespace."""
+
+    def __init__(self, dim: int, initial_capacity: int = 64):
+        self.dim = dim
+        self.vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self.payloads: List[Dict[str, Any]] = []
+        # Hash of the conversation before the compared turn (0 = none)
+        self.contexts = np.zeros(initial_capacity, dtype=np.int64)
+        self.expires_at = np.zeros(initial_capacity, dtype=np.float64)
+        self.last_used = np.zeros(initial_capacity, dtype=np.float64)
+
+    @property
+    def size(self) -> int:
+        return len(self.payloads)
+
+    def append(self, vector: np.ndarray, payload: Dict[str, Any], context: int, expires_at: float, now: float) -> None:
+        if self.size == self.vectors.shape[0]:
+            capacity = self.vectors.shape[0] * 2
+            self.vectors = np.resize(self.vectors, (capacity, self.dim))
+            self.contexts = np.resize(self.contexts, capacity)
+            self.expires_at = np.resize(self.expires_at, capacity)
+            self.last_used = np.resize(self.last_used, capacity)
+        row = self.size
+        self.vectors[row] = vector
+        self.contexts[row] = context
+        self.expires_at[row] = expires_at
+        self.last_used[row] = now
+        self.payloads.append(payload)
+
+    def remove(self, row: int) -> None:
+        """Swap-remove a row so the matrix stays dense."""
+        last = self.size - 1
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.contexts[row] = self.contexts[last]
+            self.expires_at[row] = self.expires_at[last]
+            self.last_used[row] = self.last_used[last]
+            self.payloads[row] = self.payloads[last]
+        self.payloads.pop()
+
+
+class SemanticCache:
+    """
+    Returns cached answers for prompts that are semantically close to earlier ones.
+
+    Prompts are embedded with an EmbeddingHandler and compared by cosine
+    similarity against a per-namespace in-process matrix of normalized
+    float32 vectors. Namespaces keep answers for different models (and
+    generation settings) apart.
+
+    For multi-turn prompts only the final user turn is embedded; the earlier
+    turns must match exactly (by hash). Embedding the whole conversation would
+    let two long chats that differ only in their last question look alike.
+    """
+
+    def __init__(
+        self,
+        embedding_handler: Any = None,
+        similarity_threshold: float = 0.95,
+        max_entries_per_namespace: int = 10000,
+        ttl_seconds: Optional[float] = None,
+        embedding_model: str = "gemini-embedding-exp-03-07",
+        task_type: Optional[str] = "SEMANTIC_SIMILARITY"
+    ):
+        """
+        Args:
+            embedding_handler: EmbeddingHandler used to embed prompts (GeminiHandler
+                               sets its own when left as None)
+            similarity_threshold: Minimum cosine similarity for a hit
+            max_entries_per_namespace: Entries kept per namespace; least recently
+                                       used entries are evicted beyond this
+            ttl_seconds: Default entry lifetime (None = never expires)
+            embedding_model: Embedding model used for prompts
+            task_type: Embedding task type used for prompts
+        """
+        self.embedding_handler = embedding_handler
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_namespace = max_entries_per_namespace
+        self.ttl_seconds = ttl_seconds
+        self.embedding_model = embedding_model
+        self.task_type = task_type
+
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "evictions": 0, "embedding_failures": 0}
+
+    @staticmethod
+    def split_prompt(prompt: Union[str, List[Dict[str, Any]]]) -> Optional[Tuple[str, int]]:
+        """
+        Split a prompt into the text to embed and the context it must match exactly.
+
+        Returns:
+            Tuple of (text of the final user turn, hash of the turns before it;
+            0 for single-turn prompts), or None when the final turn is not a
+            text-only user turn (images, files, function results...)
+        """
+        if isinstance(prompt, str):
+            return prompt, 0
+        if not prompt or prompt[-1].get("role", "user") != "user":
+            return None
+        texts = []
+        for part in prompt[-1].get("parts", []):
+            if isinstance(part, str):
+                texts.append(part)
+            elif isinstance(part, dict) and set(part) == {"text"}:
+                texts.append(part["text"])
+            else:
+                return None
+        history = prompt[:-1]
+        # 63 bits so the hash fits a signed int64 and never collides with "no history"
+        context = (int(canonical_hash(history)[:16], 16) >> 1) or 1 if history else 0
+        return "\n".join(texts), context
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed and L2-normalize a prompt. Returns None if embedding fails."""
+        if self.embedding_handler is None:
+            raise RuntimeError("SemanticCache has no embedding_handler configured")
+
+        response = self.embedding_handler.generate_embeddings(
+            content=text,
+            model_name=self.embedding_model,
+            task_type=self.task_type
+        )
+        if not response.success or response.embeddings is None or len(response.embeddings) == 0:
+            with self._lock:
+                self._stats["embedding_failures"] += 1
+            return None
+
+        embedding = response.embeddings[0]
+        vector = np.asarray(getattr(embedding, "values", embedding), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self,
+        text: str,
+        namespace: str,
+        context: int = 0
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        Find a cached answer for a prompt.
+
+        Args:
+            text: Text to compare (see split_prompt)
+            namespace: Namespace to search
+            context: Only entries stored with this context can match
+
+        Returns:
+            Tuple of (payload or None, prompt vector). Pass the vector to add()
+            on a miss to avoid embedding the prompt twice.
+        """
+        return self.lookup_many(text, [namespace], context)
+
+    def lookup_many(
+        self,
+        text: str,
+        namespaces: Sequence[str],
+        context: int = 0,
+        vector: Optional[np.ndarray] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        Find a cached answer in the first of several namespaces that has one.
+
+        The prompt is embedded once and the whole search counts as one lookup
+        in the stats, so the hit rate stays per request.
+
+        Args:
+            text: Text to compare (see split_prompt)
+            namespaces: Namespaces to search, in order of preference
+            context: Only entries stored with this context can match
+            vector: Prompt vector if already known (skips the embedding call)
+
+        Returns:
+            Tuple of (payload or None, prompt vector)
+        """
+        if vector is None:
+            vector = self.embed(text)
+        with self._lock:
+            self._stats["lookups"] += 1
+            if vector is not None:
+                now = time.time()
+                for namespace in namespaces:
+                    space = self._namespaces.get(namespace)
+                    if space is None or space.size == 0 or space.dim != vector.shape[0]:
+                        continue
+                    self._drop_expired(space, now)
+                    if space.size == 0:
+                        continue
+
+                    similarities = space.vectors[:space.size] @ vector
+                    similarities[space.contexts[:space.size] != context] = -np.inf
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.similarity_threshold:
+                        space.last_used[best] = now
+                        self._stats["hits"] += 1
+                        return dict(space.payloads[best]), vector
+
+            self._stats["misses"] += 1
+            return None, vector
+
+    def add(
+        self,
+        text: str,
+        namespace: str,
+        payload: Dict[str, Any],
+        vector: Optional[np.ndarray] = None,
+        context: int = 0,
+        ttl_seconds: Optional[float] = None
+    ) -> None:
+        """
+        Store an answer for a prompt.
+
+        Args:
+            text: Text to compare (see split_prompt)
+            namespace: Namespace to store the answer in
+            payload: Response dictionary
+            vector: The prompt's vector from lookup() (embedded if not given)
+            context: Context the prompt's earlier turns hash to (see split_prompt)
+            ttl_seconds: Override the default TTL for this entry
+        """
+        if vector is None:
+            vector = self.embed(text)
+            if vector is None:
+                return
+
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = now + ttl if ttl is not None else np.inf
+        with self._lock:
+            space = self._namespaces.get(namespace)
+            if space is None or space.dim != vector.shape[0]:
+                space = _Namespace(vector.shape[0])
+                self._namespaces[namespace] = space
+            while space.size >= self.max_entries_per_namespace:
+                space.remove(int(np.argmin(space.last_used[:space.size])))
+                self._stats["evictions"] += 1
+            space.append(vector, payload, context, expires_at, now)
+
+    def _drop_expired(self, space: _Namespace, now: float) -> None:
+        expired = np.nonzero(space.expires_at[:space.size] <= now)[0]
+        # Remove from the end so swap-removal does not move pending rows
+        for row in sorted(expired.tolist(), reverse=True):
+            space.remove(row)
+            self._stats["evictions"] += 1
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Remove all entries, or only those of one namespace."""
+        with self._lock:
+            if namespace is None:
+                self._namespaces.clear()
+            else:
+                self._namespaces.pop(namespace, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit-rate metrics and namespace sizes."""
+        with self._lock:
+            lookups = self._stats["lookups"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "namespaces": {name: space.size for name, space in self._namespaces.items()}
+            }
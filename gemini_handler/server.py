@@ -1,5 +1,7 @@
 # gemini_handler/server.py
 
+import base64
+import hmac
 import os
 import time
 import uuid
@@ -8,18 +10,30 @@ from typing import Any, Dict, List, Optional, Union
 import uvicorn
 from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, Field
 
+from .config_watcher import ConfigWatcher
 from .data_models import GenerationConfig, KeyRotationStrategy, Strategy
+from .embedding_batcher import EmbeddingBatcher
 from .gemini_handler import GeminiHandler
+from .log_utils import SAMPLED, get_logger
+from .message_conversion import MessageConverter
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .response_cache import ResponseCache
+from .tracing import get_tracer
+
+logger = get_logger(__name__)
+tracer = get_tracer()
 
 # --- Pydantic models for API request/response ---
 
 class Message(BaseModel):
     role: str
-    content: str
+    content: Optional[Union[str, List[Dict[str, Any]]]] = None
     name: Optional[str] = None
+    tool_calls: Optional[List[Dict[str, Any]]] = None
+    tool_call_id: Optional[str] = None
 
 class CompletionRequest(BaseModel):
     model: str
@@ -32,11 +46,16 @@ class CompletionRequest(BaseModel):
     stream: Optional[bool] = False
     user: Optional[str] = None
     response_format: Optional[Dict[str, str]] = None
+    use_cache: Optional[bool] = True  # Use the response caches (extension to the OpenAI API)
+    cache_ttl: Optional[float] = None  # Cache lifetime in seconds for this response (extension)
     
 class EmbeddingRequest(BaseModel):
     model: str
     input: Union[str, List[str]]
     user: Optional[str] = None
+    encoding_format: Optional[str] = "float"  # "float" or "base64" (little-endian float32 bytes)
+    dimensions: Optional[int] = None  # Reduced output dimensionality
+    task_type: Optional[str] = None  # Gemini task type (extension to the OpenAI API)
 
 class ModelListResponse(BaseModel):
     object: str = "list"
@@ -60,9 +79,23 @@ class GeminiServer:
         max_retries=3,
         retry_delay=30,
         system_instruction=None,
-        generation_config=None
+        generation_config=None,
+        embedding_batch_wait_ms=5.0,
+        embedding_batch_max_items=100,
+        api_endpoint=None,
+        warmup=True,
+        config_path=None,
+        watch_config=False,
+        admin_token=None,
+        response_cache=None
     ):
         self.host = host
+        # Source for hot reloads (/admin/reload and the config watcher)
+        self.config_path = config_path
+        self.admin_token = admin_token or os.getenv('GEMINI_ADMIN_TOKEN')
+        self.config_watcher = (
+            ConfigWatcher(config_path, self.reload) if watch_config and config_path else None
+        )
         self.port = port
         
         # Initialize Gemini Handler
@@ -86,6 +119,11 @@ class GeminiServer:
         if generation_config:
             gen_config = GenerationConfig(**generation_config)
         
+        # Exact-match response cache from the 'gemini.response_cache' settings
+        # (requests can still bypass it or set their own TTL)
+        if isinstance(response_cache, dict):
+            response_cache = ResponseCache.from_settings(response_cache)
+        
         # Initialize handler with all settings
         self.handler = GeminiHandler(
             api_keys=api_keys,
@@ -93,7 +131,9 @@ class GeminiServer:
             key_strategy=key_strategy,
             system_instruction=system_instruction,
             generation_config=gen_config,
-            proxy_settings=proxy_settings
+            proxy_settings=proxy_settings,
+            api_endpoint=api_endpoint,
+            response_cache=response_cache
         )
         
         # Configure key rotation manager if rate limits provided
@@ -107,6 +147,20 @@ class GeminiServer:
         if hasattr(self.handler, 'config') and retry_delay:
             self.handler.config.retry_delay = retry_delay
         
+        # Concurrent /v1/embeddings requests share upstream batch calls
+        self.embedding_batcher = EmbeddingBatcher(
+            self._embed_texts,
+            max_wait_ms=embedding_batch_wait_ms,
+            max_items=embedding_batch_max_items
+        )
+        self.handler.metrics.queue_depth.set_function(
+            lambda: [((), float(self.embedding_batcher.pending_texts()))]
+        )
+        
+        # Warmup runs in the background after the port is bound; /ready reports it
+        self.warmup = warmup
+        self._warmup_error: Optional[str] = None
+        
         # Initialize FastAPI app
         self.app = FastAPI(
             title="Gemini API Server",
@@ -131,6 +185,12 @@ class GeminiServer:
         @self.app.on_event("startup")
         async def startup_event():
             """Start background tasks when the server starts."""
+            if self.warmup:
+                import asyncio
+                asyncio.create_task(self._run_warmup())
+            if self.config_watcher is not None:
+                self.config_watcher.start()
+            
             # Check if handler has auto proxy configured
             if (hasattr(self.handler, 'proxy_settings') and 
                 self.handler.proxy_settings and 
@@ -149,34 +209,57 @@ class GeminiServer:
                             """Update proxies periodically."""
                             update_interval = self.handler.proxy_settings['auto_proxy'].get('update_interval', 15)
                             while True:
-                                print(f"Async updating proxies...")
+                                logger.debug("Async updating proxies...")
                                 await AutoProxyManager.async_update()
                                 await asyncio.sleep(update_interval)
                         
                         # Start the task
                         asyncio.create_task(background_update())
-                        print("Started background proxy updater task")
+                        logger.info("Started background proxy updater task")
                 except ImportError:
-                    print("SwiftShadow not available, auto proxy updates disabled")
+                    logger.info("SwiftShadow not available, auto proxy updates disabled")
+        
+        @self.app.on_event("shutdown")
+        async def shutdown_event():
+            """Stop background key re-probes and config watching."""
+            self.handler.key_validator.stop()
+            if self.config_watcher is not None:
+                self.config_watcher.stop()
         
         @self.app.middleware("http")
         async def rotate_proxy_middleware(request: Request, call_next):
-            # Rotate proxy before processing request
-            if request.url.path.startswith("/v1/"):
-                try:
-                    from .proxy import ProxyManager
-                    ProxyManager.apply_next_proxy()
-                    print(f"Rotated proxy for request to {request.url.path}")
-                except Exception as e:
-                    print(f"Failed to rotate proxy: {e}")
-            
-            response = await call_next(request)
-            return response
+            if not request.url.path.startswith("/v1/"):
+                return await call_next(request)
+
+            # Root span for the request; handler spans become its children
+            with tracer.span("http.request") as span:
+                span.set_attribute("http.path", request.url.path)
+
+                # Rotate proxy before processing request
+                with tracer.span("proxy.select") as proxy_span:
+                    try:
+                        from .proxy import ProxyManager
+                        ProxyManager.apply_next_proxy()
+                        logger.debug("Rotated proxy for request to %s", request.url.path, extra=SAMPLED)
+                    except Exception as e:
+                        proxy_span.set_status("error", str(e))
+                        logger.warning("Failed to rotate proxy: %s", e)
+
+                response = await call_next(request)
+                span.set_attribute("http.status_code", response.status_code)
+                return response
 
 
         @self.app.get("/v1/models")
         async def list_models():
             """List available models in OpenAI format."""
+            if self.handler.available_models:
+                # Prefetched from the upstream by warmup
+                return {"object": "list", "data": [
+                    {"id": name, "object": "model", "created": 1677610602, "owned_by": "google"}
+                    for name in self.handler.available_models
+                ]}
+            
             model_list = [
                 {
                     "id": "gemini-2.0-flash",
@@ -217,13 +300,17 @@ class GeminiServer:
             """Create a chat completion (OpenAI format)."""
             try:
                 # Convert to standard format
-                messages = [
-                    {"role": msg.role, "content": msg.content}
-                    for msg in request.messages
-                ]
+                messages = [msg.model_dump(exclude_none=True) for msg in request.messages]
                 
-                # Convert messages to prompt
-                prompt = self._convert_messages_to_prompt(messages)
+                # Convert messages to native multi-turn contents + system instruction
+                if any(isinstance(msg.content, list) for msg in request.messages):
+                    # Content parts may reference remote images, which are downloaded
+                    import asyncio
+                    contents, system_instruction = await asyncio.get_running_loop().run_in_executor(
+                        None, MessageConverter.to_gemini_contents, messages
+                    )
+                else:
+                    contents, system_instruction = MessageConverter.to_gemini_contents(messages)
                 
                 # Check if we need structured output (JSON)
                 if request.response_format and request.response_format.get("type") == "json_object":
@@ -235,18 +322,24 @@ class GeminiServer:
                     }
                     
                     result = self.handler.generate_structured_content(
-                        prompt=prompt,
+                        prompt=contents,
                         schema=schema,
                         model_name=request.model,
                         temperature=request.temperature,
                         top_p=request.top_p,
-                        max_output_tokens=request.max_tokens
+                        max_output_tokens=request.max_tokens,
+                        system_instruction=system_instruction,
+                        use_cache=request.use_cache is not False,
+                        cache_ttl=request.cache_ttl
                     )
                 else:
                     # Regular text generation
                     result = self.handler.generate_content(
-                        prompt=prompt,
+                        prompt=contents,
                         model_name=request.model,
+                        system_instruction=system_instruction,
+                        use_cache=request.use_cache is not False,
+                        cache_ttl=request.cache_ttl
                     )
                 
                 if not result.get("success", False):
@@ -323,35 +416,40 @@ class GeminiServer:
         @self.app.post("/v1/embeddings")
         async def create_embeddings(request: EmbeddingRequest):
             """Create embeddings (OpenAI format)."""
+            encoding_format = request.encoding_format or "float"
+            if encoding_format not in ("float", "base64"):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unsupported encoding_format: {encoding_format}. Use 'float' or 'base64'."
+                )
+            if request.dimensions is not None and request.dimensions <= 0:
+                raise HTTPException(status_code=400, detail="dimensions must be a positive integer")
+
             try:
-                result = self.handler.generate_embeddings(
-                    content=request.input,
-                    model_name=request.model
+                texts = [request.input] if isinstance(request.input, str) else list(request.input)
+                matrix = await self.embedding_batcher.embed(
+                    texts,
+                    model_name=request.model,
+                    task_type=request.task_type,
+                    output_dimensionality=request.dimensions
                 )
                 
-                if not result.get("success", False):
-                    raise HTTPException(status_code=500, detail=result.get("error", "Unknown error"))
-                
-                # Format response in OpenAI style
-                data = []
+                # Format response in OpenAI style (one item per input, single input included)
+                if encoding_format == "base64":
+                    # Raw little-endian float32 bytes, as in the OpenAI API
+                    matrix = matrix.astype("<f4", copy=False)
+                    vectors = [base64.b64encode(row.tobytes()).decode("ascii") for row in matrix]
+                else:
+                    vectors = matrix.tolist()
                 
-                if isinstance(request.input, str):
-                    # Single input
-                    data = [{
+                data = [
+                    {
                         "object": "embedding",
-                        "embedding": result["embeddings"],
-                        "index": 0
-                    }]
-                else:
-                    # List input
-                    data = [
-                        {
-                            "object": "embedding", 
-                            "embedding": emb,
-                            "index": i
-                        }
-                        for i, emb in enumerate(result["embeddings"])
-                    ]
+                        "embedding": vector,
+                        "index": i
+                    }
+                    for i, vector in enumerate(vectors)
+                ]
                 
                 return {
                     "object": "list",
@@ -382,6 +480,46 @@ class GeminiServer:
             """Health check endpoint."""
             return {"status": "ok", "timestamp": time.time()}
 
+        @self.app.get("/ready")
+        async def readiness_check():
+            """Readiness endpoint: 503 until warmup has finished with a usable key."""
+            if not self.warmup:
+                return {"status": "ready", "timestamp": time.time()}
+            status = self.handler.warmup_status
+            if self.handler.ready:
+                return {
+                    "status": "ready",
+                    "timestamp": time.time(),
+                    "warmup_seconds": status["duration"],
+                    "usable_keys": len(self.handler.key_manager.api_keys) - len(self.handler.key_manager.quarantined),
+                    "quarantined_keys": self.handler.key_validator.status()
+                }
+            if self._warmup_error is not None or status is not None:
+                state = "failed"
+            else:
+                state = "warming_up"
+            return JSONResponse(
+                status_code=503,
+                content={"status": state, "error": self._warmup_error, "timestamp": time.time()}
+            )
+
+        @self.app.post("/admin/reload")
+        async def admin_reload(request: Request):
+            """Reload API keys and strategies from the config file without restarting."""
+            self._check_admin(request)
+            import asyncio
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(None, self.reload)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Reload failed: {e}")
+            return {"success": True, **result}
+
+        @self.app.get("/metrics")
+        async def metrics():
+            """Prometheus metrics (text exposition format)."""
+            return Response(content=self.handler.metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
         @self.app.get("/v1/proxy/info")
         async def get_proxy_info():
             """Get information about the current proxy configuration."""
@@ -475,8 +613,47 @@ class GeminiServer:
                     "error": str(e)
                 }
     
+    def _check_admin(self, request: Request) -> None:
+        """Allow admin calls with the admin token, or from localhost when none is set."""
+        if self.admin_token:
+            supplied = request.headers.get("x-admin-token") or ""
+            authorization = request.headers.get("authorization") or ""
+            if authorization.lower().startswith("bearer "):
+                supplied = supplied or authorization[7:]
+            if not hmac.compare_digest(supplied.encode(), self.admin_token.encode()):
+                raise HTTPException(status_code=401, detail="Invalid admin token")
+        elif request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+            raise HTTPException(
+                status_code=403,
+                detail="Admin endpoints are limited to localhost unless GEMINI_ADMIN_TOKEN is set"
+            )
+
+    def reload(self) -> Dict[str, Any]:
+        """
+        Hot-reload API keys and strategies from config_path.
+
+        Without a config_path, keys are re-read from GEMINI_API_KEYS / GEMINI_API_KEY.
+
+        Returns:
+            The handler's reload summary
+        """
+        return self.handler.reload(config_path=self.config_path)
+
+    async def _run_warmup(self) -> None:
+        """Warm up the handler in the background; failures are reported by /ready."""
+        try:
+            await self.handler.awarmup()
+        except Exception as e:
+            self._warmup_error = str(e)
+            logger.error("Warmup failed: %s", e)
+    
     def _convert_messages_to_prompt(self, messages: List[Dict[str, Any]]) -> str:
-        """Convert OpenAI-format messages to a text prompt."""
+        """
+        Convert OpenAI-format messages to a single flattened text prompt.
+
+        Kept for backward compatibility; requests are now sent as native
+        multi-turn contents via MessageConverter.to_gemini_contents.
+        """
         prompt_parts = []
         
         for message in messages:
@@ -495,6 +672,25 @@ class GeminiServer:
                 
         return "\n\n".join(prompt_parts)
     
+    def _embed_texts(
+        self,
+        texts: List[str],
+        model_name: str,
+        task_type: Optional[str],
+        output_dimensionality: Optional[int]
+    ):
+        """Embed one micro-batch; called by the embedding batcher in a worker thread."""
+        result = self.handler.generate_embeddings(
+            content=texts,
+            model_name=model_name,
+            task_type=task_type,
+            output_format="numpy",
+            output_dimensionality=output_dimensionality
+        )
+        if not result.get("success", False):
+            raise RuntimeError(result.get("error", "Unknown error"))
+        return result["embeddings"]
+    
     def run(self):
         """Run the API server."""
         uvicorn.run(self.app, host=self.host, port=self.port)
@@ -1,16 +1,27 @@
 # Modified strategies.py
+import logging
 import os
 import time
-import traceback  # Keep traceback
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
-
-import google.generativeai as genai
+from typing import Any, Dict, List, Optional, Union
 
+from .config import genai_configure_options
+from .context_cache import ContextCacheManager
 from .data_models import GenerationConfig, ModelConfig, ModelResponse
 from .key_rotation import KeyRotationManager
+from .key_validation import classify_key_error
+from .lazy_import import LazyModule
+from .log_utils import SAMPLED, get_logger
+from .metrics import GeminiMetrics
 from .proxy import ProxyManager  # Keep import for reporting
 from .response_handler import ResponseHandler
+from .tracing import get_tracer
+
+logger = get_logger(__name__)
+tracer = get_tracer()
+
+# Imported on first use to keep `import gemini_handler` fast
+genai = LazyModule("google.generativeai")
 
 
 class ContentStrategy(ABC):
@@ -21,78 +32,147 @@ class ContentStrategy(ABC):
         key_manager: KeyRotationManager,
         system_instruction: Optional[str] = None,
         generation_config: Optional[GenerationConfig] = None,
-        proxy_settings: Optional[Dict[str, str]] = None # Keep for config info
+        proxy_settings: Optional[Dict[str, str]] = None, # Keep for config info
+        context_cache: Optional[ContextCacheManager] = None,
+        metrics: Optional[GeminiMetrics] = None,
+        api_endpoint: Optional[str] = None
     ):
         self.config = config
         self.key_manager = key_manager
         self.system_instruction = system_instruction
         self.generation_config = generation_config or GenerationConfig()
         self.proxy_settings = proxy_settings # Store original settings if needed
+        self.context_cache = context_cache # Optional explicit context caching
+        self.metrics = metrics # Optional attempt metrics
+        self.api_endpoint = api_endpoint # Custom endpoint (e.g. a local mock upstream)
 
     @abstractmethod
-    def generate(self, prompt: str, model_name: str) -> ModelResponse:
-        """Generate content using the specific strategy."""
+    def generate(
+        self,
+        prompt: Union[str, List[Dict[str, Any]]],
+        model_name: str,
+        system_instruction: Optional[str] = None
+    ) -> ModelResponse:
+        """
+        Generate content using the specific strategy.
+
+        Args:
+            prompt: Prompt string or native Gemini multi-turn contents
+            model_name: Model to use (interpretation depends on strategy)
+            system_instruction: Per-request system instruction overriding the strategy default
+        """
         pass
 
-    def _try_generate(self, model_name: str, prompt: str, start_time: float) -> ModelResponse:
+    def _try_generate(
+        self,
+        model_name: str,
+        prompt: Union[str, List[Dict[str, Any]]],
+        start_time: float,
+        system_instruction: Optional[str] = None,
+        attempt: int = 1
+    ) -> ModelResponse:
+        """Generate with one key and model, traced as a "gemini.attempt" span."""
+        with tracer.span("gemini.attempt") as span:
+            span.set_attribute("model", model_name)
+            span.set_attribute("attempt", attempt)
+            result = self._generate_once(model_name, prompt, start_time, system_instruction)
+            span.set_attribute("key_index", result.api_key_index)
+            if not result.success:
+                span.set_status("error", result.error)
+            return result
+
+    def _generate_once(
+        self,
+        model_name: str,
+        prompt: Union[str, List[Dict[str, Any]]],
+        start_time: float,
+        system_instruction: Optional[str] = None
+    ) -> ModelResponse:
         """Helper method for generating content with key rotation. Assumes proxy environment is pre-configured."""
-        api_key, key_index = self.key_manager.get_next_key()
+        with tracer.span("key.acquire") as span:
+            api_key, key_index = self.key_manager.get_next_key()
+            span.set_attribute("key_index", key_index)
         current_proxy_info_for_reporting = None # Initialize
+        attempt_start = time.perf_counter()
 
         try:
             # --- Proxy Handling Removed ---
             # The proxy environment variables (HTTP_PROXY, HTTPS_PROXY)
             # are now expected to be set by the middleware before this method is called.
             # We only need to *get* the current proxy for reporting purposes later.
-            print("Executing API call (proxy env vars should be pre-set by middleware)")
 
             # --- API Call ---
-            print(f"Configuring genai with key index {key_index}...")
             # Configure API key globally. The genai library should automatically
             # pick up HTTP_PROXY/HTTPS_PROXY from the environment variables.
-            genai.configure(api_key=api_key)
+            genai.configure(api_key=api_key, **genai_configure_options(self.api_endpoint))
 
             gen_config = self.generation_config.to_dict()
-
-            # Create model instance WITHOUT client_options
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config=gen_config,
-                system_instruction=self.system_instruction
-                # No client_options needed; relies on env vars
+            effective_system_instruction = (
+                system_instruction if system_instruction is not None else self.system_instruction
             )
 
-            print(f"Making API call with model {model_name}...")
-            response = model.generate_content(prompt)
-            print("API call finished.")
+            # Use a cached content for registered prefixes (caches are per API key)
+            cached = None
+            if self.context_cache is not None:
+                cached = self.context_cache.resolve(
+                    prompt, model_name, effective_system_instruction, api_key
+                )
+
+            if cached is not None:
+                cached_content, prompt = cached
+                model = genai.GenerativeModel.from_cached_content(
+                    cached_content=cached_content,
+                    generation_config=gen_config
+                )
+            else:
+                # Create model instance WITHOUT client_options
+                model = genai.GenerativeModel(
+                    model_name=model_name,
+                    generation_config=gen_config,
+                    system_instruction=effective_system_instruction
+                    # No client_options needed; relies on env vars
+                )
+
+            logger.debug("Calling model %s with key index %d", model_name, key_index, extra=SAMPLED)
+            with tracer.span("gemini.upstream") as span:
+                span.set_attribute("model", model_name)
+                response = model.generate_content(prompt)
 
             # --- Process Response ---
             # Get the proxy info *after* the call for accurate reporting
             current_proxy_info_for_reporting = ProxyManager.get_current_proxy()
 
-            result = ResponseHandler.process_response(
-                response,
-                model_name,
-                start_time,
-                key_index,
-                self.generation_config.response_mime_type,
-                proxy_info=current_proxy_info_for_reporting # Pass proxy info directly
-            )
+            with tracer.span("gemini.parse"):
+                result = ResponseHandler.process_response(
+                    response,
+                    model_name,
+                    start_time,
+                    key_index,
+                    self.generation_config.response_mime_type,
+                    proxy_info=current_proxy_info_for_reporting # Pass proxy info directly
+                )
 
             # Mark key status based on result
             if result.success:
-                self.key_manager.mark_success(key_index)
+                self.key_manager.mark_success(key_index, api_key=api_key)
+                outcome = "success"
             else:
                  # Only mark as generic failure if not rate limited (rate limit handled below)
                  if "Rate limit" not in result.error and "429" not in result.error:
-                      self.key_manager.mark_failure(key_index)
+                      self.key_manager.mark_failure(key_index, api_key=api_key)
+                      outcome = "error"
+                 else:
+                      outcome = "rate_limited"
 
+            self._record_attempt(model_name, key_index, current_proxy_info_for_reporting, outcome, attempt_start)
             return result
 
         except Exception as e:
-            # Log the exception traceback for detailed debugging
-            print(f"Error during API call or processing for key index {key_index}:")
-            traceback.print_exc()
+            # Full traceback only when debugging; the error is also returned in the response
+            logger.warning(
+                "API call failed for model %s with key index %d: %s", model_name, key_index, e,
+                exc_info=logger.isEnabledFor(logging.DEBUG)
+            )
 
             # Get the proxy info even on exception for reporting
             current_proxy_info_for_reporting = ProxyManager.get_current_proxy()
@@ -101,21 +181,35 @@ class ContentStrategy(ABC):
 
             # Handle specific errors and mark key status
             error_msg = f"Unhandled Exception (Key Index {key_index}, Proxy: {proxy_string_for_error}). Details: {str(e)}" # Default
-            if "429" in str(e) or "rate limit" in str(e).lower():
-                self.key_manager.mark_rate_limited(key_index)
+            outcome = "error"
+            key_status = classify_key_error(str(e))
+            if key_status == "quota_zero":
+                # No quota at all: waiting out a cooldown will not help
+                self.key_manager.quarantine(key_index, key_status, api_key=api_key)
+                outcome = "rate_limited"
+                error_msg = f"Quota exhausted (Key Index {key_index}, Proxy: {proxy_string_for_error}). Details: {str(e)}"
+            elif "429" in str(e) or "rate limit" in str(e).lower():
+                self.key_manager.mark_rate_limited(key_index, api_key=api_key)
+                outcome = "rate_limited"
                 error_msg = f"Rate limit exceeded (Key Index {key_index}, Proxy: {proxy_string_for_error}). Details: {str(e)}"
             elif "API key not valid" in str(e) or "permission denied" in str(e).lower() or "authentication" in str(e).lower():
-                 self.key_manager.mark_failure(key_index) # Mark as failed, maybe permanent
+                 self.key_manager.mark_failure(key_index, api_key=api_key)
+                 if key_status == "invalid":
+                     # Out of rotation until a background re-probe succeeds
+                     self.key_manager.quarantine(key_index, key_status, api_key=api_key)
+                 outcome = "auth_error"
                  error_msg = f"Authentication/Permission Error (Key Index {key_index}, Proxy: {proxy_string_for_error}). Check API key validity/permissions. Details: {str(e)}"
             elif "proxy" in str(e).lower() or "connection" in str(e).lower() or "timeout" in str(e).lower():
                  # More general connection/proxy error handling
-                 self.key_manager.mark_failure(key_index) # Treat proxy/connection errors as failures for the key
+                 self.key_manager.mark_failure(key_index, api_key=api_key) # Treat proxy/connection errors as failures for the key
+                 outcome = "connection_error"
                  error_msg = f"Connection/Proxy Error (Key Index {key_index}, Proxy: {proxy_string_for_error}). Details: {str(e)}"
             else:
                 # Generic failure for other exceptions
-                self.key_manager.mark_failure(key_index)
+                self.key_manager.mark_failure(key_index, api_key=api_key)
                 # error_msg is already set to the default
 
+            self._record_attempt(model_name, key_index, current_proxy_info_for_reporting, outcome, attempt_start)
 
             return ModelResponse(
                 success=False,
@@ -126,6 +220,38 @@ class ContentStrategy(ABC):
                 proxy_info=current_proxy_info_for_reporting # Include proxy info in error
             )
 
+    def cache_models(self, model_name: str) -> List[str]:
+        """
+        Models whose cached responses can answer a request for ``model_name``.
+
+        Responses are cached under the model that served them; strategies that
+        may serve another model than the requested one return every candidate.
+        """
+        return [model_name]
+
+    def _record_attempt(
+        self,
+        model_name: str,
+        key_index: int,
+        proxy_info: Optional[Dict[str, Any]],
+        outcome: str,
+        attempt_start: float
+    ) -> None:
+        """Record one upstream call in the attempt metrics and the current span."""
+        span = tracer.current_span()
+        if span is not None:
+            span.set_attribute("outcome", outcome)
+            if proxy_info:
+                span.set_attribute("proxy", proxy_info.get('proxy_string'))
+        if self.metrics is not None:
+            self.metrics.record_attempt(
+                model_name,
+                key_index,
+                proxy_info.get('proxy_string') if proxy_info else None,
+                outcome,
+                time.perf_counter() - attempt_start
+            )
+
 # --- No changes needed in RoundRobinStrategy, FallbackStrategy, RetryStrategy ---
 # They all call the updated _try_generate method above.
 
@@ -143,7 +269,18 @@ class RoundRobinStrategy(ContentStrategy):
         self._current_index = (self._current_index + 1) % len(self.config.models)
         return model
 
-    def generate(self, prompt: str, _: str) -> ModelResponse: # Model name arg ignored
+    def cache_models(self, _: str) -> List[str]:
+        """Any configured model may serve the request; the next one in turn comes first."""
+        models = list(self.config.models)
+        start = self._current_index % len(models) if models else 0
+        return models[start:] + models[:start]
+
+    def generate(
+        self,
+        prompt: Union[str, List[Dict[str, Any]]],
+        _: str, # Model name arg ignored
+        system_instruction: Optional[str] = None
+    ) -> ModelResponse:
         start_time = time.time()
 
         if not self.config.models:
@@ -160,30 +297,32 @@ class RoundRobinStrategy(ContentStrategy):
 
         for i in range(len(self.config.models)):
             model_name = self._get_next_model()
-            print(f"[RoundRobin] Attempting model: {model_name}")
-            result = self._try_generate(model_name, prompt, start_time)
+            logger.debug("[RoundRobin] Attempting model: %s", model_name, extra=SAMPLED)
+            result = self._try_generate(model_name, prompt, start_time, system_instruction, attempt=i + 1)
+            result.attempts = i + 1
             last_error = result.error # Update last error
 
             if result.success or 'Copyright' in result.error:
-                print(f"[RoundRobin] Success or non-retryable error with {model_name}.")
+                logger.debug("[RoundRobin] Success or non-retryable error with %s", model_name, extra=SAMPLED)
                 return result
             else:
-                 print(f"[RoundRobin] Failed with {model_name}: {result.error}")
+                 logger.info("[RoundRobin] Failed with %s: %s", model_name, result.error)
                  if first_failing_result is None:
                       first_failing_result = result # Keep the first failure details
 
             # This check might be redundant if _get_next_model works correctly, but safe to keep
             if i > 0 and self._current_index == initial_model_index:
-                 print("[RoundRobin] Cycled through all models.")
+                 logger.debug("[RoundRobin] Cycled through all models")
                  break
 
 
-        print("[RoundRobin] All models failed.")
+        logger.warning("[RoundRobin] All models failed")
         # Return the first failing result if available, otherwise a generic message
         if first_failing_result:
              # Update model field and error message of the first failure
              first_model_name = first_failing_result.model
              first_failing_result.model = 'all_models_failed'
+             first_failing_result.attempts = result.attempts
              first_failing_result.error = f'All models failed. First error ({first_model_name}): {first_failing_result.error}'
              return first_failing_result
         else:
@@ -199,13 +338,18 @@ class RoundRobinStrategy(ContentStrategy):
 
 class FallbackStrategy(ContentStrategy):
     """Fallback implementation of content generation."""
-    def generate(self, prompt: str, start_model: str) -> ModelResponse:
+    def generate(
+        self,
+        prompt: Union[str, List[Dict[str, Any]]],
+        start_model: str,
+        system_instruction: Optional[str] = None
+    ) -> ModelResponse:
         start_time = time.time()
 
         try:
             start_index = self.config.models.index(start_model)
         except ValueError:
-            print(f"Warning: Start model '{start_model}' not found in config. Defaulting to first model.")
+            logger.warning("Start model '%s' not found in config. Defaulting to first model.", start_model)
             if not self.config.models:
                  return ModelResponse(success=False, model=start_model, error="No models configured.", time=time.time()-start_time)
             start_index = 0
@@ -214,23 +358,25 @@ class FallbackStrategy(ContentStrategy):
         last_error = "No models attempted."
         first_failing_result = None
 
-        for model_name in self.config.models[start_index:]:
-            print(f"[Fallback] Attempting model: {model_name}")
-            result = self._try_generate(model_name, prompt, start_time)
+        for attempt, model_name in enumerate(self.config.models[start_index:], start=1):
+            logger.debug("[Fallback] Attempting model: %s", model_name, extra=SAMPLED)
+            result = self._try_generate(model_name, prompt, start_time, system_instruction, attempt=attempt)
+            result.attempts = attempt
             last_error = result.error
 
             if result.success or 'Copyright' in result.error:
-                print(f"[Fallback] Success or non-retryable error with {model_name}.")
+                logger.debug("[Fallback] Success or non-retryable error with %s", model_name, extra=SAMPLED)
                 return result
             else:
-                 print(f"[Fallback] Failed with {model_name}: {result.error}")
+                 logger.info("[Fallback] Failed with %s: %s", model_name, result.error)
                  if first_failing_result is None:
                       first_failing_result = result
 
-        print("[Fallback] All models failed.")
+        logger.warning("[Fallback] All models failed")
         if first_failing_result:
              first_model_name = first_failing_result.model
              first_failing_result.model = 'all_models_failed'
+             first_failing_result.attempts = result.attempts
              first_failing_result.error = f'All models failed starting from {start_model}. First error ({first_model_name}): {first_failing_result.error}'
              return first_failing_result
         else:
@@ -244,14 +390,19 @@ class FallbackStrategy(ContentStrategy):
 
 class RetryStrategy(ContentStrategy):
     """Retry implementation of content generation."""
-    def generate(self, prompt: str, model_name: str) -> ModelResponse:
+    def generate(
+        self,
+        prompt: Union[str, List[Dict[str, Any]]],
+        model_name: str,
+        system_instruction: Optional[str] = None
+    ) -> ModelResponse:
         start_time = time.time()
         last_result = None
 
         if model_name not in self.config.models:
              # Try to find the default model if the requested one isn't listed
              default_model = self.config.default_model
-             print(f"Warning: Model '{model_name}' not found in config. Attempting default model '{default_model}'.")
+             logger.warning("Model '%s' not found in config. Attempting default model '%s'.", model_name, default_model)
              if default_model not in self.config.models:
                   # If even the default isn't found (config issue)
                   return ModelResponse(
@@ -265,23 +416,23 @@ class RetryStrategy(ContentStrategy):
 
 
         for attempt in range(self.config.max_retries):
-            print(f"[Retry] Attempt {attempt + 1}/{self.config.max_retries} for model: {model_name}")
-            result = self._try_generate(model_name, prompt, start_time)
+            logger.debug("[Retry] Attempt %d/%d for model: %s", attempt + 1, self.config.max_retries, model_name, extra=SAMPLED)
+            result = self._try_generate(model_name, prompt, start_time, system_instruction, attempt=attempt + 1)
             result.attempts = attempt + 1
             last_result = result # Store the latest result
 
             # Check for success or non-retryable errors
             if result.success or 'Copyright' in result.error or 'Authentication/Permission Error' in result.error:
-                print(f"[Retry] Success or non-retryable error on attempt {attempt + 1}.")
+                logger.debug("[Retry] Success or non-retryable error on attempt %d", attempt + 1, extra=SAMPLED)
                 return result # Return immediately
 
             # If failed and more retries left, wait and continue
             if attempt < self.config.max_retries - 1:
-                print(f"[Retry] Error encountered: {result.error}. Waiting {self.config.retry_delay}s...")
+                logger.info("[Retry] Error encountered: %s. Waiting %ss...", result.error, self.config.retry_delay)
                 time.sleep(self.config.retry_delay)
             else:
                  # This is the last attempt, loop will end
-                 print(f"[Retry] Max retries exceeded for {model_name}.")
+                 logger.warning("[Retry] Max retries exceeded for %s", model_name)
 
         # If loop finished without returning, it means all retries failed
         if last_result:
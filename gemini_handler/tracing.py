@@ -0,0 +1,369 @@
+# gemini_handler/tracing.py
+"""Lightweight tracing spans with file and OTLP/HTTP exporters and a no-op fast path."""
+import contextvars
+import json
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Union
+
+from .log_utils import get_logger
+
+logger = get_logger(__name__)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("gemini_handler_span", default=None)
+
+
+class Span:
+    """A timed operation with attributes; use as a context manager."""
+
+    __slots__ = (
+        "tracer", "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+        "attributes", "status", "status_message", "_token"
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        parent: Optional["Span"],
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else "%032x" % random.getrandbits(128)
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = "unset"
+        self.status_message = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_status(self, status: str, message: Optional[str] = None) -> None:
+        """Set the span status ("ok" or "error")."""
+        self.status = status
+        self.status_message = message
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer._export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "status_message": self.status_message,
+            "attributes": self.attributes
+        }
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc is not None:
+            self.set_status("error", f"{exc_type.__name__}: {exc}")
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled; every method does nothing."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_status(self, status: str, message: Optional[str] = None) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class InMemoryExporter:
+    """Keeps finished spans in a list (for tests and debugging)."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JsonLinesExporter:
+    """Appends one JSON object per finished span to a file."""
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Args:
+            path: File the spans are appended to
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def spans_to_otlp(spans: List[Span], service_name: str = "gemini_handler") -> Dict[str, Any]:
+    """Build an OTLP/JSON ExportTraceServiceRequest body for finished spans."""
+    otlp_spans = []
+    for span in spans:
+        item = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": {"ok": 1, "error": 2}.get(span.status, 0)}
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        if span.status_message:
+            item["status"]["message"] = span.status_message
+        otlp_spans.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "gemini_handler"}, "spans": otlp_spans}]
+        }]
+    }
+
+
+class OTLPHttpExporter:
+    """
+    Sends spans to an OpenTelemetry collector over OTLP/HTTP (JSON encoding).
+
+    Spans are buffered and posted from a background thread every
+    flush_interval seconds or as soon as max_batch_size spans are waiting.
+    If the collector cannot keep up, the buffer keeps the newest
+    max_buffer_size spans and the number of dropped ones is logged.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        service_name: str = "gemini_handler",
+        max_batch_size: int = 256,
+        flush_interval: float = 5.0,
+        timeout: float = 5.0,
+        max_buffer_size: Optional[int] = None
+    ):
+        """
+        Args:
+            endpoint: Collector traces endpoint
+            service_name: service.name resource attribute
+            max_batch_size: Spans per request (a full buffer triggers a flush)
+            flush_interval: Seconds between background flushes
+            timeout: HTTP timeout in seconds
+            max_buffer_size: Spans held while waiting to be sent; the oldest are
+                             dropped beyond this (default: 10 * max_batch_size)
+        """
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+
+        self.max_buffer_size = max_buffer_size or 10 * max_batch_size
+
+        self._buffer: Deque[Span] = deque(maxlen=self.max_buffer_size)
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            if len(self._buffer) == self.max_buffer_size:
+                # The deque discards the oldest span
+                self._dropped += 1
+            self._buffer.append(span)
+            full = len(self._buffer) >= self.max_batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self) -> None:
+        """Send all buffered spans now."""
+        import requests
+
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            logger.warning(
+                "Dropped %d spans: more than %d were waiting for %s", dropped, self.max_buffer_size, self.endpoint
+            )
+
+        while True:
+            with self._lock:
+                batch = [self._buffer.popleft() for _ in range(min(self.max_batch_size, len(self._buffer)))]
+            if not batch:
+                return
+            try:
+                requests.post(
+                    self.endpoint,
+                    json=spans_to_otlp(batch, self.service_name),
+                    timeout=self.timeout
+                ).raise_for_status()
+            except Exception as e:
+                logger.warning("Failed to export %d spans to %s: %s", len(batch), self.endpoint, e)
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def shutdown(self) -> None:
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=self.timeout)
+        self.flush()
+
+
+class Tracer:
+    """
+    Creates spans and hands finished ones to an exporter.
+
+    While disabled, span() returns a shared no-op object, so instrumented
+    code costs one attribute check per span.
+    """
+
+    def __init__(self):
+        self.exporter = None
+        self.enabled = False
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Union[Span, _NoopSpan]:
+        """
+        Start a span as a child of the current span (use with ``with``).
+
+        Args:
+            name: Span name
+            attributes: Initial attributes
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get() if self.enabled else None
+
+    def _export(self, span: Span) -> None:
+        exporter = self.exporter
+        if exporter is None:
+            return
+        try:
+            exporter.export(span)
+        except Exception as e:
+            logger.warning("Span exporter failed: %s", e)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer (disabled until configure_tracing is called)."""
+    return _tracer
+
+
+def configure_tracing(exporter: Any = None, enabled: Optional[bool] = None) -> Tracer:
+    """
+    Set the exporter and enable or disable tracing.
+
+    Args:
+        exporter: Object with export(span) and shutdown(); the previous one is shut down
+        enabled: Whether spans are recorded (default: True if an exporter is given)
+
+    Returns:
+        The process-wide tracer
+    """
+    previous = _tracer.exporter
+    if previous is not None and previous is not exporter:
+        try:
+            previous.shutdown()
+        except Exception as e:
+            logger.warning("Failed to shut down span exporter: %s", e)
+    _tracer.exporter = exporter
+    _tracer.enabled = exporter is not None if enabled is None else enabled
+    return _tracer
+
+
+def configure_tracing_from_settings(settings: Dict[str, Any]) -> Tracer:
+    """
+    Configure tracing from a gemini.tracing config section.
+
+    Keys: enabled, exporter ("jsonl" or "otlp"), path, endpoint, service_name.
+    """
+    if not settings or not settings.get("enabled", False):
+        return configure_tracing(None, enabled=False)
+    exporter_type = settings.get("exporter", "jsonl")
+    if exporter_type == "otlp":
+        exporter = OTLPHttpExporter(
+            endpoint=settings.get("endpoint", "http://localhost:4318/v1/traces"),
+            service_name=settings.get("service_name", "gemini_handler")
+        )
+    elif exporter_type == "jsonl":
+        exporter = JsonLinesExporter(settings.get("path", "traces.jsonl"))
+    else:
+        raise ValueError(f"Unknown tracing exporter: {exporter_type}")
+    return configure_tracing(exporter)
@@ -0,0 +1,385 @@
+# gemini_handler/vector_index.py
+"""In-process vector indexes for retrieval over Gemini embeddings."""
+import json
+from pathlib import Path
+from typing import Any, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+PathType = Union[str, Path]
+SearchResult = Tuple[np.ndarray, List[List[Hashable]]]
+
+
+def _as_matrix(vectors: Any) -> np.ndarray:
+    """Convert vectors (matrix, list of lists, ContentEmbedding objects) to a 2-D float32 array."""
+    if isinstance(vectors, np.ndarray):
+        matrix = vectors
+    else:
+        matrix = np.asarray([getattr(v, "values", v) for v in vectors])
+    matrix = np.array(matrix, dtype=np.float32, copy=True, ndmin=2)
+    return matrix
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows in place (zero rows are left as-is)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k columns per row of a score matrix, best first.
+
+    Uses argpartition (O(n)) and only sorts the k selected scores.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.float32), empty.astype(np.int64)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    return (
+        np.take_along_axis(candidate_scores, order, axis=1),
+        np.take_along_axis(candidates, order, axis=1)
+    )
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int, seed: int, spherical: bool) -> np.ndarray:
+    """Plain Lloyd's k-means (spherical = cosine assignment with normalized centroids)."""
+    rng = np.random.default_rng(seed)
+    k = min(k, data.shape[0])
+    centroids = data[rng.choice(data.shape[0], size=k, replace=False)].copy()
+    for _ in range(iterations):
+        if spherical:
+            assignment = np.argmax(data @ centroids.T, axis=1)
+        else:
+            distances = (
+                (data ** 2).sum(axis=1, keepdims=True)
+                - 2 * data @ centroids.T
+                + (centroids ** 2).sum(axis=1)
+            )
+            assignment = np.argmin(distances, axis=1)
+        for c in range(k):
+            members = data[assignment == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+        if spherical:
+            _normalize(centroids)
+    return centroids
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity index over a pre-normalized float32 matrix.
+
+    Vectors are normalized once when added, so a query costs one matrix
+    product plus an argpartition. The matrix grows append-only with capacity
+    doubling, and can be saved to disk and reopened memory-mapped.
+    """
+
+    def __init__(self, dim: Optional[int] = None, initial_capacity: int = 1024):
+        """
+        Args:
+            dim: Vector dimensionality (inferred from the first add() when None)
+            initial_capacity: Rows allocated up front
+        """
+        self.dim = dim
+        self.ids: List[Hashable] = []
+        self._capacity = max(1, initial_capacity)
+        self._vectors = np.zeros((self._capacity, dim), dtype=np.float32) if dim else None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The normalized vectors currently in the index (a view, not a copy)."""
+        if self._vectors is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._vectors[:len(self.ids)]
+
+    def add(self, vectors: Any, ids: Optional[Sequence[Hashable]] = None) -> List[Hashable]:
+        """
+        Add vectors to the index.
+
+        Args:
+            vectors: Matrix of shape (n, dim), a single vector, or a list of
+                     vectors / ContentEmbedding objects
+            ids: Optional ids (defaults to row numbers)
+
+        Returns:
+            The ids of the added vectors
+        """
+        matrix = _normalize(_as_matrix(vectors))
+        n = matrix.shape[0]
+        if ids is None:
+            ids = list(range(len(self.ids), len(self.ids) + n))
+        elif len(ids) != n:
+            raise ValueError(f"Got {len(ids)} ids for {n} vectors")
+
+        if self._vectors is None:
+            self.dim = matrix.shape[1]
+            self._vectors = np.zeros((self._capacity, self.dim), dtype=np.float32)
+        if matrix.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {matrix.shape[1]}")
+
+        size = len(self.ids)
+        if size + n > self._vectors.shape[0] or not self._vectors.flags.writeable:
+            capacity = max(self._vectors.shape[0], 1)
+            while capacity < size + n:
+                capacity *= 2
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:size] = self._vectors[:size]
+            self._vectors = grown
+        self._vectors[size:size + n] = matrix
+        self.ids.extend(ids)
+        return list(ids)
+
+    def search(self, queries: Any, k: int = 10) -> SearchResult:
+        """
+        Find the k most similar vectors for each query.
+
+        Args:
+            queries: One query vector or a matrix of shape (q, dim)
+            k: Number of results per query
+
+        Returns:
+            Tuple of (cosine scores of shape (q, k), list of id lists), best first
+        """
+        matrix = _normalize(_as_matrix(queries))
+        scores, rows = _top_k(matrix @ self.vectors.T, k)
+        return scores, [[self.ids[row] for row in query_rows] for query_rows in rows]
+
+    def save(self, path: PathType) -> None:
+        """Save to a directory (vectors.npy plus ids.json; ids must be JSON-serializable)."""
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "vectors.npy", self.vectors)
+        with open(directory / "ids.json", "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "ids": self.ids}, f)
+
+    @classmethod
+    def load(cls, path: PathType, mmap: bool = True) -> "VectorIndex":
+        """
+        Load a saved index.
+
+        Args:
+            path: Directory written by save()
+            mmap: Map the vectors read-only instead of reading them into memory
+                  (they are copied on the first add())
+        """
+        directory = Path(path)
+        with open(directory / "ids.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        # Empty arrays cannot be memory-mapped
+        vectors = np.load(directory / "vectors.npy", mmap_mode="r" if mmap and meta["ids"] else None)
+
+        index = cls(dim=meta["dim"], initial_capacity=1)
+        index._vectors = vectors
+        index._capacity = vectors.shape[0]
+        index.ids = list(meta["ids"])
+        return index
+
+
+class IVFIndex:
+    """
+    Approximate index for millions of vectors: inverted file lists with optional PQ.
+
+    Vectors are assigned to the nearest of n_lists centroids (spherical
+    k-means); a query only scores the vectors in its n_probe nearest lists.
+    With pq_subvectors set, vectors are stored as product-quantization codes
+    (one byte per subvector) and scored with per-query lookup tables, cutting
+    memory from 4*dim bytes to pq_subvectors bytes per vector.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        n_lists: int = 256,
+        n_probe: int = 8,
+        pq_subvectors: Optional[int] = None,
+        initial_capacity: int = 1024
+    ):
+        """
+        Args:
+            dim: Vector dimensionality
+            n_lists: Number of coarse clusters
+            n_probe: Clusters scanned per query (recall/speed trade-off)
+            pq_subvectors: Number of PQ subvectors (must divide dim); None stores full vectors
+            initial_capacity: Rows allocated up front
+        """
+        if pq_subvectors is not None and dim % pq_subvectors != 0:
+            raise ValueError(f"pq_subvectors ({pq_subvectors}) must divide dim ({dim})")
+
+        self.dim = dim
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.pq_subvectors = pq_subvectors
+        self.ids: List[Hashable] = []
+
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None  # (subvectors, 256, dim / subvectors)
+
+        width = pq_subvectors if pq_subvectors else dim
+        dtype = np.uint8 if pq_subvectors else np.float32
+        self._storage = np.zeros((max(1, initial_capacity), width), dtype=dtype)
+        self._lists: List[List[int]] = [[] for _ in range(n_lists)]
+        self._list_arrays: List[Optional[np.ndarray]] = [None] * n_lists
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: Any, iterations: int = 10, seed: int = 0) -> None:
+        """
+        Learn the coarse centroids (and PQ codebooks) from a representative sample.
+
+        Args:
+            vectors: Training vectors (a few hundred per list is plenty)
+            iterations: k-means iterations
+            seed: Random seed for centroid initialization
+        """
+        data = _normalize(_as_matrix(vectors))
+        self.centroids = _kmeans(data, self.n_lists, iterations, seed, spherical=True)
+        self.n_lists = self.centroids.shape[0]
+        self._lists = [[] for _ in range(self.n_lists)]
+        self._list_arrays = [None] * self.n_lists
+
+        if self.pq_subvectors:
+            sub_dim = self.dim // self.pq_subvectors
+            self.codebooks = np.stack([
+                _kmeans(data[:, j * sub_dim:(j + 1) * sub_dim], 256, iterations, seed + j, spherical=False)
+                for j in range(self.pq_subvectors)
+            ])
+
+    def add(self, vectors: Any, ids: Optional[Sequence[Hashable]] = None) -> List[Hashable]:
+        """Add vectors (the index must be trained first). Returns their ids."""
+        if not self.is_trained:
+            raise RuntimeError("IVFIndex must be trained before adding vectors")
+
+        matrix = _normalize(_as_matrix(vectors))
+        n = matrix.shape[0]
+        if ids is None:
+            ids = list(range(len(self.ids), len(self.ids) + n))
+        elif len(ids) != n:
+            raise ValueError(f"Got {len(ids)} ids for {n} vectors")
+
+        size = len(self.ids)
+        if size + n > self._storage.shape[0] or not self._storage.flags.writeable:
+            capacity = max(self._storage.shape[0], 1)
+            while capacity < size + n:
+                capacity *= 2
+            grown = np.zeros((capacity, self._storage.shape[1]), dtype=self._storage.dtype)
+            grown[:size] = self._storage[:size]
+            self._storage = grown
+
+        self._storage[size:size + n] = self._encode(matrix) if self.pq_subvectors else matrix
+        for offset, list_id in enumerate(np.argmax(matrix @ self.centroids.T, axis=1)):
+            self._lists[list_id].append(size + offset)
+            self._list_arrays[list_id] = None
+        self.ids.extend(ids)
+        return list(ids)
+
+    def search(self, queries: Any, k: int = 10, n_probe: Optional[int] = None) -> SearchResult:
+        """
+        Approximate top-k search.
+
+        Returns:
+            Tuple of (scores of shape (q, k), list of id lists), best first. Rows
+            are padded with -inf scores when fewer than k candidates were scanned.
+        """
+        matrix = _normalize(_as_matrix(queries))
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        probes = _top_k(matrix @ self.centroids.T, n_probe)[1]
+
+        all_scores = np.full((matrix.shape[0], k), -np.inf, dtype=np.float32)
+        all_ids: List[List[Hashable]] = []
+        for q, query in enumerate(matrix):
+            rows = np.concatenate([self._rows(list_id) for list_id in probes[q]])
+            if len(rows) == 0:
+                all_ids.append([])
+                continue
+            if self.pq_subvectors:
+                scores = self._pq_scores(query, rows)
+            else:
+                scores = self._storage[rows] @ query
+            top_scores, top = _top_k(scores[np.newaxis, :], k)
+            all_scores[q, :top.shape[1]] = top_scores[0]
+            all_ids.append([self.ids[rows[i]] for i in top[0]])
+        return all_scores, all_ids
+
+    def _rows(self, list_id: int) -> np.ndarray:
+        rows = self._list_arrays[list_id]
+        if rows is None:
+            rows = np.asarray(self._lists[list_id], dtype=np.int64)
+            self._list_arrays[list_id] = rows
+        return rows
+
+    def _encode(self, matrix: np.ndarray) -> np.ndarray:
+        """Product-quantize normalized vectors to one code per subvector."""
+        sub_dim = self.dim // self.pq_subvectors
+        codes = np.empty((matrix.shape[0], self.pq_subvectors), dtype=np.uint8)
+        for j, codebook in enumerate(self.codebooks):
+            sub = matrix[:, j * sub_dim:(j + 1) * sub_dim]
+            distances = -2 * sub @ codebook.T + (codebook ** 2).sum(axis=1)
+            codes[:, j] = np.argmin(distances, axis=1)
+        return codes
+
+    def _pq_scores(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Asymmetric inner products: exact query against quantized vectors."""
+        sub_dim = self.dim // self.pq_subvectors
+        # table[j, c] = <query subvector j, centroid c of codebook j>
+        table = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(self.pq_subvectors, sub_dim))
+        codes = self._storage[rows]
+        return table[np.arange(self.pq_subvectors), codes].sum(axis=1)
+
+    def save(self, path: PathType) -> None:
+        """Save to a directory (storage.npy, centroids/codebooks in ivf.npz, metadata in ivf.json)."""
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "storage.npy", self._storage[:len(self.ids)])
+        arrays = {"centroids": self.centroids}
+        if self.codebooks is not None:
+            arrays["codebooks"] = self.codebooks
+        np.savez(directory / "ivf.npz", **arrays)
+        with open(directory / "ivf.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": self.dim,
+                "n_lists": self.n_lists,
+                "n_probe": self.n_probe,
+                "pq_subvectors": self.pq_subvectors,
+                "ids": self.ids,
+                "lists": self._lists
+            }, f)
+
+    @classmethod
+    def load(cls, path: PathType, mmap: bool = True) -> "IVFIndex":
+        """Load a saved index, memory-mapping the vector/code storage by default."""
+        directory = Path(path)
+        with open(directory / "ivf.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        index = cls(
+            dim=meta["dim"],
+            n_lists=meta["n_lists"],
+            n_probe=meta["n_probe"],
+            pq_subvectors=meta["pq_subvectors"],
+            initial_capacity=1
+        )
+        with np.load(directory / "ivf.npz") as arrays:
+            index.centroids = arrays["centroids"]
+            index.codebooks = arrays["codebooks"] if "codebooks" in arrays else None
+        index._storage = np.load(directory / "storage.npy", mmap_mode="r" if mmap and meta["ids"] else None)
+        index.ids = list(meta["ids"])
+        index._lists = [list(rows) for rows in meta["lists"]]
+        index._list_arrays = [None] * index.n_lists
+        return index
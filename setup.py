@@ -26,6 +26,7 @@ setup(
     entry_points={
         'console_scripts': [
             'gemini-server=gemini_handler.cli:main',
+            'gemini-mock-upstream=gemini_handler.mock_upstream:main',
         ],
     },
 )
@@ -91,5 +91,13 @@ class TestFileHandling:
                 
                 # Verify API calls
                 mock_client.files.get.assert_called_with(name="files/test-file")
-                mock_get.assert_called_once()
+                # The uploaded file is referenced by URI, not downloaded and re-sent
+                mock_get.assert_not_called()
                 mock_model.generate_content.assert_called_once()
+                contents = mock_model.generate_content.call_args[0][0]
+                assert contents[0]["parts"][0] == {
+                    "file_data": {
+                        "mime_type": "image/png",
+                        "file_uri": "https://example.com/files/test-file"
+                    }
+                }
@@ -0,0 +1,57 @@
+# tests/unit/test_benchmark_harness.py
+import json
+
+from benchmarks.harness import (
+    BenchmarkResult, compare, load_results, percentile, run_load, save_results, summarize_latencies
+)
+
+
+class TestBenchmarkHarness:
+    """Tests for the benchmark load runner and result comparison"""
+
+    def test_percentiles_interpolate(self):
+        """Test percentiles interpolate between neighbouring values"""
+        values = [1.0, 2.0, 3.0, 4.0]
+        assert percentile(values, 0) == 1.0
+        assert percentile(values, 50) == 2.5
+        assert percentile(values, 100) == 4.0
+        assert summarize_latencies([0.001, 0.003])["p50"] == 2.0
+
+    def test_run_load_counts_failures_and_exceptions(self):
+        """Test every call is timed and failures are counted"""
+        def call(i):
+            if i == 4:
+                raise RuntimeError("boom")
+            return i % 2 == 0
+
+        result = run_load("unit", call, total=10, concurrency=3)
+
+        assert result.requests == 10
+        assert result.errors == 6
+        assert result.successes == 4
+        assert result.requests_per_second > 0
+        assert set(result.latency_ms) == {"mean", "p50", "p95", "p99", "max"}
+        assert result.cpu_ms_per_request is not None
+
+    def test_save_and_compare(self, tmp_path):
+        """Test results round-trip through JSON and regressions are flagged"""
+        baseline = BenchmarkResult(
+            scenario="s", requests_per_second=100.0,
+            latency_ms={"p95": 10.0, "p99": 20.0}, cpu_ms_per_request=1.0
+        )
+        path = tmp_path / "baseline.json"
+        save_results([baseline, BenchmarkResult(scenario="skipped", skipped="no gateway")], path, requests=10)
+        assert json.loads(path.read_text())["meta"]["requests"] == 10
+
+        loaded = load_results(path)
+        within = {"s": {"requests_per_second": 95.0, "latency_ms": {"p95": 10.5, "p99": 21.0}, "cpu_ms_per_request": 1.05}}
+        assert compare(loaded, within, threshold=0.10) == []
+
+        slower = {
+            "s": {"requests_per_second": 80.0, "latency_ms": {"p95": 10.0, "p99": 30.0}, "cpu_ms_per_request": 1.0},
+            "skipped": {"requests_per_second": 1.0, "latency_ms": {}}
+        }
+        regressions = compare(loaded, slower, threshold=0.10)
+        assert len(regressions) == 2
+        assert regressions[0].startswith("s: throughput")
+        assert "p99 latency" in regressions[1]
@@ -0,0 +1,92 @@
+# tests/unit/test_context_cache.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+from gemini_handler.context_cache import ContextCacheManager
+
+
+class TestContextCacheManager:
+    """Tests for the ContextCacheManager class"""
+
+    def test_match_text_prefix(self):
+        """Test matching a registered text prefix returns the remainder"""
+        manager = ContextCacheManager()
+        manager.register_prefix("LONG DOCUMENT. ", system_instruction="sys")
+
+        registration, remainder = manager.match("LONG DOCUMENT. Question?", "sys")
+        assert registration.text == "LONG DOCUMENT. "
+        assert remainder == "Question?"
+
+        # System instruction must match, and an empty remainder is not a match
+        assert manager.match("LONG DOCUMENT. Question?", "other") is None
+        assert manager.match("LONG DOCUMENT. ", "sys") is None
+
+    def test_match_contents_prefix(self):
+        """Test matching a registered contents prefix"""
+        manager = ContextCacheManager()
+        prefix = [{"role": "user", "parts": [{"text": "doc"}]}]
+        manager.register_prefix(prefix)
+
+        prompt = prefix + [{"role": "user", "parts": [{"text": "q"}]}]
+        _, remainder = manager.match(prompt, None)
+        assert remainder == [{"role": "user", "parts": [{"text": "q"}]}]
+
+    def test_resolve_creates_once_per_model_and_key(self):
+        """Test caches are reused per (prefix, model, key) and created with that key's client"""
+        clients = {}
+        manager = ContextCacheManager(client_factory=lambda key: clients.setdefault(key, MagicMock()))
+        manager.register_prefix(system_instruction="big system prompt")
+
+        first = manager.resolve("q1", "gemini-1.5-flash", "big system prompt", "key-1")
+        second = manager.resolve("q2", "gemini-1.5-flash", "big system prompt", "key-1")
+        other_key = manager.resolve("q3", "gemini-1.5-flash", "big system prompt", "key-2")
+
+        assert first[0] is second[0]
+        assert second[1] == "q2"
+        assert other_key[0] is not first[0]
+        assert first[0] is clients["key-1"].caches.create.return_value
+        assert other_key[0] is clients["key-2"].caches.create.return_value
+        assert clients["key-1"].caches.create.call_count == 1
+        assert manager.get_stats()["hits"] == 1
+
+    def test_resolve_refreshes_ttl_and_backs_off_on_failure(self):
+        """Test TTL refresh near expiry and backoff after creation failures"""
+        client = MagicMock()
+        manager = ContextCacheManager(refresh_margin_seconds=60, client_factory=lambda key: client)
+        prefix_id = manager.register_prefix(system_instruction="sys", ttl_seconds=30)
+
+        cache, _ = manager.resolve("q", "m", "sys", "key")
+        manager.resolve("q", "m", "sys", "key")
+        client.caches.update.assert_called_once_with(name=cache.name, config={"ttl": "30s"})
+
+        manager.unregister_prefix(prefix_id)
+        client.caches.delete.assert_called_once_with(name=cache.name)
+        assert manager.get_stats()["live_caches"] == 0
+
+        manager.register_prefix(system_instruction="tiny")
+        client.caches.create.side_effect = Exception("too few tokens")
+        assert manager.resolve("q", "m", "tiny", "key") is None
+        assert manager.resolve("q", "m", "tiny", "key") is None
+        assert client.caches.create.call_count == 2  # 1 success + 1 failure
+
+    def test_slow_creation_does_not_block_other_requests(self):
+        """Test a cache creation in flight only holds up requests for that cache"""
+        release = threading.Event()
+        slow, fast = MagicMock(), MagicMock()
+        slow.caches.create.side_effect = lambda **kw: release.wait(5) and MagicMock(name="slow")
+        manager = ContextCacheManager(client_factory=lambda key: slow if key == "slow" else fast)
+        manager.register_prefix(system_instruction="sys")
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            waiting = [pool.submit(manager.resolve, "q", "m", "sys", "slow") for _ in range(2)]
+            time.sleep(0.05)
+            # Another key's cache is created while the slow creation is in flight
+            assert manager.resolve("q", "m", "sys", "fast") is not None
+            assert not any(f.done() for f in waiting)
+            release.set()
+            results = [f.result(timeout=5) for f in waiting]
+
+        assert results[0][0] is results[1][0]
+        assert slow.caches.create.call_count == 1
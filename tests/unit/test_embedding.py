@@ -0,0 +1,191 @@
+# tests/unit/test_embedding.py
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from gemini_handler.embedding import EmbeddingHandler
+from gemini_handler.embedding_cache import EmbeddingCache
+from gemini_handler.key_rotation import KeyRotationManager
+
+
+def _fake_embed(model, contents, config):
+    """Return one fake embedding per input text, encoding the text itself"""
+    return MagicMock(embeddings=[[float(text.split("-")[1])] for text in contents])
+
+
+class TestEmbeddingHandler:
+    """Tests for the EmbeddingHandler class"""
+
+    @patch('gemini_handler.embedding.genai')
+    def test_batches_preserve_input_order(self, mock_genai):
+        """Test inputs are split into batch_size chunks and reassembled in order"""
+        client = MagicMock()
+        client.models.embed_content.side_effect = _fake_embed
+        mock_genai.Client.return_value = client
+
+        handler = EmbeddingHandler(
+            KeyRotationManager(api_keys=["k1", "k2"], rate_limit=1000),
+            batch_size=3,
+            max_concurrency=2
+        )
+        texts = [f"text-{i}" for i in range(10)]
+        result = handler.generate_embeddings(texts)
+
+        assert result.success is True
+        assert result.embeddings == [[float(i)] for i in range(10)]
+        assert client.models.embed_content.call_count == 4
+        # One client per key, reused across batches
+        assert mock_genai.Client.call_count == 2
+
+    @patch('gemini_handler.embedding.genai')
+    def test_only_failed_batches_are_retried(self, mock_genai):
+        """Test a failing batch is retried without re-sending successful ones"""
+        calls = []
+        failed_once = set()
+
+        def flaky_embed(model, contents, config):
+            calls.append(tuple(contents))
+            if contents[0] == "text-3" and "text-3" not in failed_once:
+                failed_once.add("text-3")
+                raise Exception("503 Service Unavailable")
+            return _fake_embed(model, contents, config)
+
+        client = MagicMock()
+        client.models.embed_content.side_effect = flaky_embed
+        mock_genai.Client.return_value = client
+
+        handler = EmbeddingHandler(
+            KeyRotationManager(api_keys=["k1"], rate_limit=1000),
+            batch_size=3
+        )
+        result = handler.generate_embeddings([f"text-{i}" for i in range(6)])
+
+        assert result.success is True
+        assert result.embeddings == [[float(i)] for i in range(6)]
+        assert calls.count(("text-0", "text-1", "text-2")) == 1
+        assert calls.count(("text-3", "text-4", "text-5")) == 2
+
+    @patch('gemini_handler.embedding.time.sleep')
+    @patch('gemini_handler.embedding.genai')
+    def test_permanent_failure_keeps_successful_batches(self, mock_genai, mock_sleep):
+        """Test a batch that keeps failing does not discard or re-send the batches that succeeded"""
+        calls = []
+
+        def embed(model, contents, config):
+            calls.append(tuple(contents))
+            if contents[0] == "text-3":
+                raise Exception("503 Service Unavailable")
+            return _fake_embed(model, contents, config)
+
+        client = MagicMock()
+        client.models.embed_content.side_effect = embed
+        mock_genai.Client.return_value = client
+
+        handler = EmbeddingHandler(
+            KeyRotationManager(api_keys=["k1"], rate_limit=1000),
+            batch_size=3,
+            max_retries=3,
+            embedding_cache=EmbeddingCache()
+        )
+        texts = [f"text-{i}" for i in range(6)]
+        result = handler.generate_embeddings(texts)
+
+        assert result.success is False
+        assert result.embeddings[:3] == [[0.0], [1.0], [2.0]]
+        assert result.embeddings[3:] == [None, None, None]
+        assert sorted(result.item_errors) == [3, 4, 5]
+        assert "503" in result.item_errors[3]
+        # Jittered backoff between the three rounds
+        assert mock_sleep.call_count == 2
+        assert all(call.args[0] > 0 for call in mock_sleep.call_args_list)
+
+        # The successful batch was cached, so a retry only sends the failed texts
+        calls.clear()
+        handler.generate_embeddings(texts)
+        assert ("text-0", "text-1", "text-2") not in calls
+
+    @patch('gemini_handler.embedding.genai')
+    def test_invalid_request_is_not_retried(self, mock_genai):
+        """Test non-retryable errors fail immediately"""
+        client = MagicMock()
+        client.models.embed_content.side_effect = Exception("400 INVALID_ARGUMENT: bad model")
+        mock_genai.Client.return_value = client
+
+        handler = EmbeddingHandler(KeyRotationManager(api_keys=["k1"], rate_limit=1000))
+        result = handler.generate_embeddings("hello")
+
+        assert result.success is False
+        assert "INVALID_ARGUMENT" in result.error
+        assert client.models.embed_content.call_count == 1
+
+    @patch('gemini_handler.embedding.genai')
+    def test_numpy_output_format(self, mock_genai):
+        """Test embeddings can be returned as one normalized float32 matrix"""
+        client = MagicMock()
+        client.models.embed_content.return_value = MagicMock(
+            embeddings=[MagicMock(values=[3.0, 4.0]), MagicMock(values=[0.0, 2.0])]
+        )
+        mock_genai.Client.return_value = client
+
+        handler = EmbeddingHandler(KeyRotationManager(api_keys=["k1"], rate_limit=1000))
+        result = handler.generate_embeddings(["a", "b"], output_format="numpy", normalize=True)
+
+        assert result.embeddings.dtype == np.float32
+        assert result.embeddings.flags["C_CONTIGUOUS"]
+        np.testing.assert_allclose(result.embeddings, [[0.6, 0.8], [0.0, 1.0]])
+
+    @patch('gemini_handler.embedding.genai')
+    def test_dimensionality_falls_back_to_local_truncation(self, mock_genai):
+        """Test a model rejecting output_dimensionality is truncated and renormalized locally"""
+        configs = []
+
+        def embed(model, contents, config):
+            configs.append(config)
+            if config is not None and config.output_dimensionality:
+                raise Exception("400 INVALID_ARGUMENT: output_dimensionality is not supported")
+            return MagicMock(embeddings=[MagicMock(values=[3.0, 4.0, 12.0])])
+
+        client = MagicMock()
+        client.models.embed_content.side_effect = embed
+        mock_genai.Client.return_value = client
+
+        handler = EmbeddingHandler(KeyRotationManager(api_keys=["k1"], rate_limit=1000))
+        result = handler.generate_embeddings("a", output_dimensionality=2, output_format="numpy")
+
+        assert result.success is True
+        np.testing.assert_allclose(result.embeddings, [[0.6, 0.8]], rtol=1e-6)
+        assert configs[0].output_dimensionality == 2
+        assert configs[-1] is None
+
+        # The model is remembered, so the next call does not send the parameter
+        configs.clear()
+        handler.generate_embeddings("b", output_dimensionality=2)
+        assert configs == [None]
+
+    @patch('gemini_handler.embedding.genai')
+    def test_embed_stream_resumes_from_checkpoint(self, mock_genai, tmp_path):
+        """Test embed_stream yields in order and skips items recorded in the checkpoint"""
+        client = MagicMock()
+        client.models.embed_content.side_effect = _fake_embed
+        mock_genai.Client.return_value = client
+
+        handler = EmbeddingHandler(
+            KeyRotationManager(api_keys=["k1", "k2"], rate_limit=1000),
+            batch_size=2,
+            max_concurrency=2
+        )
+        checkpoint = tmp_path / "progress.json"
+        texts = [f"text-{i}" for i in range(7)]
+
+        stream = handler.embed_stream(iter(texts), checkpoint_path=checkpoint)
+        first = [next(stream) for _ in range(5)]
+        stream.close()
+
+        assert [item_id for item_id, _ in first] == [0, 1, 2, 3, 4]
+        assert [float(vector[0]) for _, vector in first] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+        # Only fully consumed batches are checkpointed; item 4 is yielded again
+
+        resumed = list(handler.embed_stream(iter(texts), checkpoint_path=checkpoint))
+        assert [item_id for item_id, _ in resumed] == [4, 5, 6]
+        assert [float(vector[0]) for _, vector in resumed] == [4.0, 5.0, 6.0]
@@ -0,0 +1,95 @@
+# tests/unit/test_embedding_batcher.py
+import asyncio
+import threading
+
+import numpy as np
+
+from gemini_handler.embedding_batcher import EmbeddingBatcher
+
+
+class _RecordingEmbedder:
+    """Embeds each text as [len(text)] and records the batches it receives"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, texts, model_name, task_type, output_dimensionality):
+        self.calls.append((list(texts), model_name, task_type))
+        if self.fail:
+            raise RuntimeError("429 Resource exhausted")
+        return np.array([[float(len(t))] for t in texts], dtype=np.float32)
+
+
+class TestEmbeddingBatcher:
+    """Tests for the EmbeddingBatcher class"""
+
+    def test_concurrent_requests_share_one_call(self):
+        """Test concurrent requests are merged and each gets its own rows"""
+        embedder = _RecordingEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_wait_ms=20, max_items=100)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.embed(["a"], "m"),
+                batcher.embed(["bb", "ccc"], "m"),
+                batcher.embed(["dddd"], "m", task_type="RETRIEVAL_QUERY"),
+            )
+
+        first, second, third = asyncio.run(run())
+
+        assert first.tolist() == [[1.0]]
+        assert second.tolist() == [[2.0], [3.0]]
+        assert third.tolist() == [[4.0]]
+        # Different task types are never mixed
+        assert sorted(call[0] for call in embedder.calls) == [["a", "bb", "ccc"], ["dddd"]]
+
+    def test_flushes_when_full(self):
+        """Test a batch is sent as soon as it reaches max_items"""
+        embedder = _RecordingEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_wait_ms=10000, max_items=2)
+
+        async def run():
+            return await asyncio.wait_for(
+                asyncio.gather(batcher.embed(["a"], "m"), batcher.embed(["b"], "m")),
+                timeout=1
+            )
+
+        asyncio.run(run())
+        assert embedder.calls == [(["a", "b"], "m", None)]
+
+    def test_errors_reach_every_waiter(self):
+        """Test a failed batch call fails all requests in it"""
+        batcher = EmbeddingBatcher(_RecordingEmbedder(fail=True), max_wait_ms=5)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.embed(["a"], "m"), batcher.embed(["b"], "m"), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_cancelled_flush_cancels_waiters(self):
+        """Test waiters are cancelled instead of hanging when the flush task is cancelled"""
+        release = threading.Event()
+
+        def blocking_embed(texts, model_name, task_type, output_dimensionality):
+            release.wait(timeout=5)
+            return np.zeros((len(texts), 1), dtype=np.float32)
+
+        batcher = EmbeddingBatcher(blocking_embed, max_wait_ms=1)
+
+        async def run():
+            waiter = asyncio.ensure_future(batcher.embed(["a"], "m"))
+            await asyncio.sleep(0.05)
+            flush_tasks = [t for t in asyncio.all_tasks() if t is not waiter and t is not asyncio.current_task()]
+            for task in flush_tasks:
+                task.cancel()
+            try:
+                return await asyncio.wait_for(asyncio.gather(waiter, return_exceptions=True), timeout=1)
+            finally:
+                release.set()
+
+        (result,) = asyncio.run(run())
+        assert isinstance(result, asyncio.CancelledError)
@@ -0,0 +1,76 @@
+# tests/unit/test_embedding_cache.py
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from gemini_handler.embedding import EmbeddingHandler
+from gemini_handler.embedding_cache import EmbeddingCache
+from gemini_handler.key_rotation import KeyRotationManager
+
+
+class TestEmbeddingCache:
+    """Tests for the EmbeddingCache class"""
+
+    def test_key_covers_model_task_and_dimensionality(self):
+        """Test keys differ when any part of the embedding request differs"""
+        base = EmbeddingCache.make_key("m", "RETRIEVAL_DOCUMENT", None, "text")
+        assert base == EmbeddingCache.make_key("m", "RETRIEVAL_DOCUMENT", None, "text")
+        assert base != EmbeddingCache.make_key("m2", "RETRIEVAL_DOCUMENT", None, "text")
+        assert base != EmbeddingCache.make_key("m", "RETRIEVAL_QUERY", None, "text")
+        assert base != EmbeddingCache.make_key("m", "RETRIEVAL_DOCUMENT", 256, "text")
+
+    def test_get_many_returns_hits_and_misses(self):
+        """Test bulk lookup splits positions into hits and misses"""
+        cache = EmbeddingCache()
+        cache.set_many(["a", "c"], [[1.0, 0.0], [0.0, 1.0]])
+
+        hits, misses = cache.get_many(["a", "b", "c"])
+
+        assert sorted(hits) == [0, 2]
+        assert misses == [1]
+        np.testing.assert_array_equal(hits[2], np.array([0.0, 1.0], dtype=np.float32))
+
+    def test_memory_lru_eviction(self):
+        """Test the least recently used vector is evicted from memory"""
+        cache = EmbeddingCache(max_memory_entries=2)
+        cache.set("a", [1.0])
+        cache.set("b", [2.0])
+        cache.get("a")
+        cache.set("c", [3.0])
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+
+    def test_disk_store_survives_restart(self, tmp_path):
+        """Test vectors are reloaded from the memory-mapped store"""
+        cache = EmbeddingCache(cache_dir=tmp_path)
+        cache.set_many(["a", "b"], [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+        cache.set_many(["c"], [[0.5, 0.5]])
+
+        reopened = EmbeddingCache(cache_dir=tmp_path)
+        hits, misses = reopened.get_many(["b", "c", "d"])
+
+        assert misses == [2]
+        np.testing.assert_array_equal(hits[0], np.array([4.0, 5.0, 6.0], dtype=np.float32))
+        np.testing.assert_array_equal(hits[1], np.array([0.5, 0.5], dtype=np.float32))
+        assert reopened.get_stats()["disk_hits"] == 2
+
+    @patch('gemini_handler.embedding.genai')
+    def test_handler_only_embeds_misses(self, mock_genai):
+        """Test EmbeddingHandler sends only uncached texts upstream"""
+        client = MagicMock()
+        client.models.embed_content.side_effect = lambda model, contents, config: MagicMock(
+            embeddings=[MagicMock(values=[float(len(text))]) for text in contents]
+        )
+        mock_genai.Client.return_value = client
+
+        handler = EmbeddingHandler(
+            KeyRotationManager(api_keys=["k1"], rate_limit=1000),
+            embedding_cache=EmbeddingCache()
+        )
+        handler.generate_embeddings(["a", "bb"])
+        result = handler.generate_embeddings(["a", "bb", "ccc"])
+
+        assert result.success is True
+        assert [e.values for e in result.embeddings] == [[1.0], [2.0], [3.0]]
+        assert client.models.embed_content.call_args_list[-1].kwargs["contents"] == ["ccc"]
@@ -0,0 +1,120 @@
+# tests/unit/test_file_handler.py
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from gemini_handler.file_cache import FileMetadataCache, UploadIndex
+from gemini_handler.file_handler import FileHandler
+
+
+def _make_tree(root):
+    """Create a small directory tree of files to upload"""
+    (root / "sub").mkdir()
+    for path in ["a.png", "b.jpg", "notes.txt", "sub/c.png", "sub/skip.png"]:
+        (root / path).write_bytes(b"data")
+
+
+class TestFileHandler:
+    """Tests for the FileHandler class"""
+
+    def test_batch_upload_recurses_with_filters(self, tmp_path):
+        """Test recursive discovery with extension, include and exclude filters"""
+        _make_tree(tmp_path)
+        client = MagicMock()
+        client.files.upload.return_value = MagicMock()
+        handler = FileHandler(client, max_upload_workers=3)
+
+        results = handler.batch_upload_files(
+            tmp_path, file_extensions=["png"], recursive=True, exclude=["skip*"]
+        )
+
+        assert [r["path"] for r in results] == [str(tmp_path / "a.png"), str(tmp_path / "sub" / "c.png")]
+        assert all(r["success"] for r in results)
+
+        results = handler.batch_upload_files(tmp_path, include=["*.jpg", "*.txt"])
+        assert [r["path"] for r in results] == [str(tmp_path / "b.jpg"), str(tmp_path / "notes.txt")]
+
+    def test_batch_upload_reports_each_failure(self, tmp_path):
+        """Test a failed upload does not hide the successful ones"""
+        _make_tree(tmp_path)
+        client = MagicMock()
+
+        def upload(path):
+            if path.name == "b.jpg":
+                raise Exception("500 Internal error")
+            return MagicMock()
+
+        client.files.upload.side_effect = upload
+        results = FileHandler(client).batch_upload_files(tmp_path)
+
+        by_name = {r["path"].rsplit("/", 1)[-1]: r for r in results}
+        assert by_name["b.jpg"]["success"] is False
+        assert "500" in by_name["b.jpg"]["error"]
+        assert by_name["a.png"]["success"] is True
+        assert by_name["a.png"]["file"] is not None
+
+    def test_identical_contents_are_uploaded_once(self, tmp_path):
+        """Test re-uploading the same bytes reuses the earlier upload"""
+        (tmp_path / "one.png").write_bytes(b"same bytes")
+        (tmp_path / "two.png").write_bytes(b"same bytes")
+        (tmp_path / "other.png").write_bytes(b"different")
+
+        client = MagicMock()
+        client.files.upload.side_effect = lambda path: SimpleNamespace(
+            name=f"files/{path.stem}", state="ACTIVE"
+        )
+        handler = FileHandler(
+            client,
+            upload_index=UploadIndex(tmp_path / "index.json"),
+            key_id="key-1",
+            metadata_cache=FileMetadataCache(ttl_seconds=60)
+        )
+
+        first = handler.upload_file(tmp_path / "one.png")
+        assert handler.upload_file(tmp_path / "two.png") is first
+        handler.upload_file(tmp_path / "other.png")
+
+        assert client.files.upload.call_count == 2
+        # The reused file's metadata came from the cache, not files.get
+        client.files.get.assert_not_called()
+
+        # The persistent index is shared with a new handler for the same key
+        other = FileHandler(client, upload_index=UploadIndex(tmp_path / "index.json"), key_id="key-1")
+        other.upload_file(tmp_path / "one.png")
+        assert client.files.upload.call_count == 2
+        client.files.get.assert_called_once()
+
+    def test_upload_index_log_is_appended_and_compacted(self, tmp_path):
+        """Test each change appends one line and loading compacts the log"""
+        path = tmp_path / "index.jsonl"
+        index = UploadIndex(path)
+        for i in range(3):
+            index.put(f"hash{i}", "key-1", SimpleNamespace(name=f"files/f{i}"))
+        index.remove("files/f1")
+        assert len(path.read_text().splitlines()) == 4
+
+        reloaded = UploadIndex(path)
+        assert reloaded.get("hash0", "key-1")["name"] == "files/f0"
+        assert reloaded.get("hash1", "key-1") is None
+        assert len(path.read_text().splitlines()) == 2
+
+    def test_upload_index_reads_legacy_json(self, tmp_path):
+        """Test an index written as one JSON mapping is still loaded"""
+        path = tmp_path / "index.json"
+        path.write_text(json.dumps({"key-1:abc": {"name": "files/abc", "expires_at": time.time() + 60}}))
+        assert UploadIndex(path).get("abc", "key-1")["name"] == "files/abc"
+
+    def test_get_file_uses_metadata_cache(self):
+        """Test file metadata is fetched once within the TTL"""
+        client = MagicMock()
+        client.files.get.return_value = SimpleNamespace(name="files/abc", state="ACTIVE")
+        handler = FileHandler(client, metadata_cache=FileMetadataCache(ttl_seconds=60))
+
+        handler.get_file("files/abc")
+        handler.get_file("files/abc")
+        client.files.get.assert_called_once()
+
+        handler.delete_file("files/abc")
+        handler.get_file("files/abc")
+        assert client.files.get.call_count == 2
@@ -0,0 +1,106 @@
+# tests/unit/test_file_operations.py
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from gemini_handler.gemini_handler import GeminiHandler
+from gemini_handler.mime_utils import sniff_mime_type
+from gemini_handler.mock_upstream import MockGeminiUpstream, MockUpstreamConfig
+
+
+class TestFileOperations:
+    """Tests for the FileOperationsMixin class"""
+
+    def test_uploaded_file_uses_owning_key(self, tmp_path):
+        """Test generation with an uploaded file always uses the key that uploaded it"""
+        upstream = MockGeminiUpstream(MockUpstreamConfig(latency_ms=0))
+        url = upstream.start()
+        try:
+            handler = GeminiHandler(api_keys=["k1", "k2", "k3"], api_endpoint=url, proxy_settings=None)
+            notes = tmp_path / "notes.txt"
+            notes.write_text("meeting notes")
+            uploaded = handler.client.files.upload(file=str(notes))
+
+            results = [
+                handler.generate_content_with_file(uploaded.name, "Summarize", model_name="gemini-2.0-flash")
+                for _ in range(3)
+            ]
+
+            assert [r["success"] for r in results] == [True, True, True]
+            assert {r["api_key_index"] for r in results} == {handler.file_key_index}
+            # The mock rejects file references from other keys with 403
+            assert upstream.get_stats().get("status_403", 0) == 0
+        finally:
+            upstream.stop()
+
+    @patch('gemini_handler.file_operations.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_local_file_sent_as_raw_bytes(self, mock_google_genai, mock_genai, mock_genai_response, tmp_path):
+        """Test local files are sent inline with a sniffed MIME type, without decoding"""
+        pdf = tmp_path / "scan.bin"
+        pdf.write_bytes(b"%PDF-1.7\n" + b"x" * 100)
+        model = MagicMock()
+        model.generate_content.return_value = mock_genai_response
+        mock_genai.GenerativeModel.return_value = model
+
+        handler = GeminiHandler(api_keys=["k1", "k2"])
+        result = handler.generate_with_local_file(pdf, "Summarize", model_name="m")
+
+        assert result["success"] is True
+        part = model.generate_content.call_args[0][0][0]["parts"][0]
+        assert part == {"inline_data": {"mime_type": "application/pdf", "data": pdf.read_bytes()}}
+
+    @patch('gemini_handler.file_operations.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_large_local_file_is_uploaded(self, mock_google_genai, mock_genai, mock_genai_response, tmp_path):
+        """Test files above the inline limit go through the Files API with the uploading key"""
+        video = tmp_path / "clip.mp4"
+        video.write_bytes(b"\x00\x00\x00\x18ftypmp42" + b"x" * 100)
+        client = mock_google_genai.Client.return_value
+        client.files.upload.return_value = SimpleNamespace(
+            name="files/clip", uri="https://example.com/files/clip", mime_type="video/mp4", state="ACTIVE"
+        )
+        model = MagicMock()
+        model.generate_content.return_value = mock_genai_response
+        mock_genai.GenerativeModel.return_value = model
+
+        handler = GeminiHandler(api_keys=["k1", "k2"])
+        handler.inline_max_bytes = 50
+        result = handler.generate_with_local_file(video, "Describe", model_name="m")
+
+        assert result["success"] is True
+        assert result["api_key_index"] == handler.file_key_index
+        part = model.generate_content.call_args[0][0][0]["parts"][0]
+        assert part == {"file_data": {"mime_type": "video/mp4", "file_uri": "https://example.com/files/clip"}}
+
+    @patch('gemini_handler.file_operations.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_unsupported_image_converted_to_png(self, mock_google_genai, mock_genai, mock_genai_response, tmp_path):
+        """Test GIF images, which Gemini rejects, are converted to PNG before sending"""
+        from PIL import Image
+
+        gif = tmp_path / "anim.gif"
+        Image.new("P", (4, 4)).save(gif, format="GIF")
+        model = MagicMock()
+        model.generate_content.return_value = mock_genai_response
+        mock_genai.GenerativeModel.return_value = model
+
+        handler = GeminiHandler(api_keys=["k1"])
+        result = handler.generate_with_local_file(gif, "Describe", model_name="m")
+
+        assert result["success"] is True
+        inline = model.generate_content.call_args[0][0][0]["parts"][0]["inline_data"]
+        assert inline["mime_type"] == "image/png"
+        assert inline["data"].startswith(b"\x89PNG")
+
+
+class TestMimeUtils:
+    """Tests for MIME type sniffing"""
+
+    def test_bmp_requires_a_valid_header(self, tmp_path):
+        """Test only real BMP headers are detected, not text starting with "BM" """
+        from PIL import Image
+
+        bmp = tmp_path / "image.bmp"
+        Image.new("RGB", (2, 2)).save(bmp, format="BMP")
+        assert sniff_mime_type(bmp.read_bytes()[:16]) == "image/bmp"
+        assert sniff_mime_type(b"BMW service notes, 2024") is None
@@ -0,0 +1,163 @@
+# tests/unit/test_hot_reload.py
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from gemini_handler.config_watcher import ConfigWatcher
+from gemini_handler.data_models import KeyRotationStrategy, Strategy
+from gemini_handler.gemini_handler import GeminiHandler
+from gemini_handler.key_rotation import KeyRotationManager
+from gemini_handler.mock_upstream import MockGeminiUpstream, MockUpstreamConfig
+from gemini_handler.server import GeminiServer
+
+
+class TestHotReload:
+    """Tests for swapping keys and strategies at runtime"""
+
+    def test_update_keys_preserves_stats_of_kept_keys(self):
+        """Test kept keys keep stats and quarantine, new keys start fresh"""
+        manager = KeyRotationManager(["a", "b", "c"])
+        manager.key_stats[1].uses = 7
+        manager.key_stats[1].last_used = time.time()
+        manager.quarantine(2, "invalid")
+
+        changes = manager.update_keys(["c", "b", "d"], strategy=KeyRotationStrategy.LEAST_USED)
+
+        assert changes == {"added": [2], "removed": 1, "kept": 2}
+        assert manager.api_keys == ["c", "b", "d"]
+        assert manager.key_stats[1].uses == 7
+        assert manager.quarantined == {0: "invalid"}
+        assert manager.key_stats[2].uses == 0
+        assert manager.strategy == KeyRotationStrategy.LEAST_USED
+        assert manager.get_next_key()[0] == "d"
+
+    def test_in_flight_results_follow_their_key(self):
+        """Test results reported with a pre-reload index land on the right key"""
+        manager = KeyRotationManager(["a", "b"])
+        api_key, key_index = manager.get_next_key()
+        assert (api_key, key_index) == ("a", 0)
+
+        manager.update_keys(["x", "a"])
+        manager.mark_rate_limited(key_index, api_key=api_key)
+        assert manager.key_stats[1].rate_limited_until > time.time()
+        assert manager.key_stats[0].rate_limited_until == 0
+
+        manager.update_keys(["x"])
+        manager.mark_failure(key_index, api_key=api_key)  # removed key: ignored
+        assert manager.key_stats[0].failures == 0
+
+    def test_waiting_selection_wakes_on_update(self):
+        """Test a request waiting for a free key picks up newly added keys"""
+        manager = KeyRotationManager(["a"], rate_limit=1)
+        manager.get_next_key()
+        selected = []
+        waiter = threading.Thread(target=lambda: selected.append(manager.get_next_key()))
+        start = time.monotonic()
+        waiter.start()
+        time.sleep(0.05)
+        manager.update_keys(["a", "b"])
+        waiter.join(timeout=5)
+
+        assert selected == [("b", 1)]
+        assert time.monotonic() - start < 0.9
+
+    @patch('gemini_handler.strategies.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_handler_reload_rebuilds_strategy_and_drains_clients(self, mock_google_genai, mock_genai, tmp_path):
+        """Test reload swaps keys and strategies and closes clients of removed keys"""
+        handler = GeminiHandler(api_keys=["k1", "k2"], proxy_settings=None)
+        old_strategy = handler._strategy
+        retired_client = MagicMock()
+        handler.embedding_handler._clients["k1"] = retired_client
+        handler.client  # files client on k1
+        handler.key_manager.key_stats[1].uses = 3
+
+        config_path = tmp_path / "config.yaml"
+        config_path.write_text(
+            "gemini:\n  api_keys: [k2, k3]\n  strategies:\n    content: fallback\n    key_rotation: least_used\n"
+        )
+        result = handler.reload(config_path=config_path, validate_new_keys=False, drain_seconds=0.01)
+
+        assert result["added"] == 1 and result["removed"] == 1 and result["kept"] == 1
+        assert handler._strategy is not old_strategy
+        assert type(handler._strategy).__name__ == "FallbackStrategy"
+        assert handler.key_manager.strategy == KeyRotationStrategy.LEAST_USED
+        assert handler.key_manager.key_stats[0].uses == 3
+        assert "k1" not in handler.embedding_handler._clients
+        time.sleep(0.2)
+        retired_client.close.assert_called_once()
+        assert handler.key_manager.api_keys[handler.file_key_index] != "k1"
+
+    @patch('gemini_handler.strategies.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_broken_config_keeps_current_keys(self, mock_google_genai, mock_genai, tmp_path, monkeypatch):
+        """Test an unparseable config file is rejected instead of falling back to env keys"""
+        monkeypatch.setenv("GEMINI_API_KEY", "env-key")
+        handler = GeminiHandler(api_keys=["k1"], proxy_settings=None, content_strategy=Strategy.RETRY)
+        config_path = tmp_path / "config.yaml"
+        config_path.write_text("gemini:\n  api_keys: [k2\n")
+
+        with pytest.raises(Exception):
+            handler.reload(config_path=config_path, validate_new_keys=False)
+        assert handler.key_manager.api_keys == ["k1"]
+
+        # Emptying the list must not reload the environment's keys either
+        config_path.write_text("gemini:\n  api_keys: []\n")
+        with pytest.raises(ValueError):
+            handler.reload(config_path=config_path, validate_new_keys=False)
+        monkeypatch.setenv("GEMINI_API_KEYS", "env-1,env-2")
+        config_path.write_text("gemini:\n  strategies:\n    content: retry\n")
+        with pytest.raises(ValueError):
+            handler.reload(config_path=config_path, validate_new_keys=False)
+        assert handler.key_manager.api_keys == ["k1"]
+
+    def test_config_watcher_ignores_identical_rewrites(self, tmp_path):
+        """Test the watcher calls back on content changes only"""
+        path = tmp_path / "config.yaml"
+        path.write_text("a: 1\n")
+        calls = []
+        watcher = ConfigWatcher(path, lambda: calls.append(1))
+
+        assert not watcher.check()
+        path.write_text("a: 1\n")
+        path.touch()
+        watcher._signature = None  # force a re-read even on coarse mtime clocks
+        assert not watcher.check()
+        path.write_text("a: 2\n")
+        watcher._signature = None
+        assert watcher.check()
+        assert calls == [1]
+
+    def test_admin_reload_endpoint(self, tmp_path):
+        """Test /admin/reload requires the admin token and swaps the key set"""
+        upstream = MockGeminiUpstream(MockUpstreamConfig(latency_ms=0))
+        url = upstream.start()
+        config_path = tmp_path / "config.yaml"
+        config_path.write_text("gemini:\n  api_keys: [k1]\n")
+        server = GeminiServer(
+            api_keys=["k1"], api_endpoint=url, proxy_settings=None, warmup=False,
+            config_path=str(config_path), admin_token="secret"
+        )
+        try:
+            with TestClient(server.app) as client:
+                assert client.post("/admin/reload").status_code == 401
+
+                config_path.write_text("gemini:\n  api_keys: [k1, k2]\n  strategies:\n    content: retry\n")
+                response = client.post("/admin/reload", headers={"Authorization": "Bearer secret"})
+
+                assert response.status_code == 200
+                assert response.json()["added"] == 1
+                assert response.json()["content_strategy"] == "retry"
+                assert server.handler.key_manager.api_keys == ["k1", "k2"]
+        finally:
+            upstream.stop()
+
+    def test_admin_reload_without_token_is_local_only(self):
+        """Test admin calls from non-local clients are refused when no token is set"""
+        server = GeminiServer(api_keys=["k1"], proxy_settings=None, warmup=False)
+        server.admin_token = None
+        with TestClient(server.app) as client:
+            assert client.post("/admin/reload").status_code == 403
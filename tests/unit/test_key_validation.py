@@ -0,0 +1,131 @@
+# tests/unit/test_key_validation.py
+import time
+from unittest.mock import MagicMock, patch
+
+from gemini_handler.data_models import Strategy
+from gemini_handler.gemini_handler import GeminiHandler
+from gemini_handler.key_rotation import KeyRotationManager
+from gemini_handler.key_validation import KeyValidator, classify_key_error
+from gemini_handler.mock_upstream import MockGeminiUpstream, MockUpstreamConfig
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestKeyValidation:
+    """Tests for key probing, quarantine and background re-probes"""
+
+    def test_classify_key_error(self):
+        """Test upstream errors are classified by what they say about the key"""
+        assert classify_key_error("400 INVALID_ARGUMENT. API key not valid. Please pass a valid API key.") == "invalid"
+        assert classify_key_error("401 UNAUTHENTICATED") == "invalid"
+        # Permission errors are about the request (file, cache or model access), not the key
+        assert classify_key_error("403 PERMISSION_DENIED") == "error"
+        assert classify_key_error("403 You do not have permission to access the File abc") == "error"
+        assert classify_key_error("429 RESOURCE_EXHAUSTED. Quota exceeded for metric: x, limit: 0") == "quota_zero"
+        assert classify_key_error("429 RESOURCE_EXHAUSTED. Resource has been exhausted") == "rate_limited"
+        assert classify_key_error("503 UNAVAILABLE") == "error"
+        assert classify_key_error("Connection reset by peer") == "error"
+
+    def test_quarantined_keys_are_skipped(self):
+        """Test selection skips quarantined keys unless every key is quarantined"""
+        manager = KeyRotationManager(["k1", "k2", "k3"])
+        manager.quarantine(1, "invalid")
+
+        assert {manager.get_next_key()[1] for _ in range(6)} == {0, 2}
+
+        manager.quarantine(0)
+        manager.quarantine(2)
+        assert manager.get_next_key()[1] in (0, 1, 2)
+
+        manager.release(1)
+        assert not manager.is_quarantined(1)
+
+    def test_validate_all_quarantines_dead_keys(self):
+        """Test concurrent probes quarantine invalid and zero-quota keys only"""
+        errors = {
+            "revoked": "API key not valid",
+            "broke": "429 Quota exceeded, limit: 0",
+            "busy": "429 Resource has been exhausted",
+            "flaky": "503 UNAVAILABLE"
+        }
+
+        def probe(api_key):
+            if api_key in errors:
+                raise RuntimeError(errors[api_key])
+            return ["gemini-2.0-flash"]
+
+        manager = KeyRotationManager(["ok", "revoked", "broke", "busy", "flaky"])
+        validator = KeyValidator(manager, probe, reprobe_interval=60)
+        try:
+            results = validator.validate_all()
+        finally:
+            validator.stop()
+
+        assert [r["status"] for r in results] == ["ok", "invalid", "quota_zero", "rate_limited", "error"]
+        assert results[0]["value"] == ["gemini-2.0-flash"]
+        assert manager.quarantined == {1: "invalid", 2: "quota_zero"}
+        assert manager.key_stats[3].rate_limited_until > time.time()
+
+    def test_background_reprobe_backs_off_and_releases(self):
+        """Test quarantined keys are re-probed with growing intervals and released on success"""
+        calls = []
+        healthy = {"k1"}
+
+        def probe(api_key):
+            calls.append(api_key)
+            if api_key not in healthy:
+                raise RuntimeError("API key not valid")
+
+        manager = KeyRotationManager(["k1", "k2"])
+        validator = KeyValidator(manager, probe, reprobe_interval=0.05, max_reprobe_interval=1.0)
+        try:
+            validator.validate_all()
+            assert manager.is_quarantined(1)
+
+            assert _wait_for(lambda: (validator.status()[1]["interval"] or 0) >= 0.1)
+
+            healthy.add("k2")
+            assert _wait_for(lambda: not manager.is_quarantined(1))
+            assert _wait_for(lambda: validator._thread is None)
+        finally:
+            validator.stop()
+        assert calls.count("k2") >= 3
+
+    def test_live_failure_quarantines_key(self):
+        """Test an invalid key seen by a live request is quarantined and scheduled for re-probe"""
+        upstream = MockGeminiUpstream(MockUpstreamConfig(latency_ms=0, invalid_keys=["bad"]))
+        url = upstream.start()
+        handler = GeminiHandler(
+            api_keys=["bad", "k2"], proxy_settings=None, api_endpoint=url
+        )
+        try:
+            result = handler.generate_embeddings(["hello", "world"])
+
+            assert result["success"]
+            assert handler.key_manager.quarantined == {0: "invalid"}
+            assert handler.key_validator.status()[0]["next_probe_in"] > 0
+        finally:
+            handler.key_validator.stop()
+            upstream.stop()
+
+    @patch('gemini_handler.strategies.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_permission_error_does_not_quarantine(self, mock_google_genai, mock_genai):
+        """Test a 403 for a model the project cannot use leaves every key in rotation"""
+        model = MagicMock()
+        model.generate_content.side_effect = Exception("403 PERMISSION_DENIED: model not available to this project")
+        mock_genai.GenerativeModel.return_value = model
+        handler = GeminiHandler(api_keys=["k1", "k2", "k3"], proxy_settings=None, content_strategy=Strategy.RETRY)
+        handler.config.retry_delay = 0
+
+        for _ in range(3):
+            assert not handler.generate_content("hi", model_name="restricted-model")["success"]
+
+        assert handler.key_manager.quarantined == {}
@@ -0,0 +1,68 @@
+# tests/unit/test_lazy_import.py
+import subprocess
+import sys
+
+import pytest
+
+import gemini_handler
+from benchmarks.import_time import parse_importtime
+from gemini_handler.lazy_import import LazyModule, module_available
+
+
+def _run(code: str) -> str:
+    return subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+class TestLazyImport:
+    """Tests for deferred SDK imports and lazy package exports"""
+
+    def test_package_import_skips_heavy_dependencies(self):
+        """Test importing the package loads no SDKs or submodules"""
+        heavy = ["google.generativeai", "google.genai", "swiftshadow", "numpy", "gemini_handler.gemini_handler"]
+        out = _run(
+            "import sys, gemini_handler\n"
+            f"print(sorted(m for m in {heavy!r} if m in sys.modules))"
+        )
+        assert out == "[]"
+
+    def test_first_use_defers_generation_sdk(self):
+        """Test building the handler's class does not import the generation SDK"""
+        out = _run(
+            "import sys\n"
+            "from gemini_handler import GeminiHandler\n"
+            "print(GeminiHandler.__name__, 'google.generativeai' in sys.modules)"
+        )
+        assert out == "GeminiHandler False"
+
+    def test_exports_resolve_and_are_cached(self):
+        """Test lazy exports resolve to the submodule objects"""
+        from gemini_handler.data_models import Strategy
+
+        assert gemini_handler.Strategy is Strategy
+        assert "Strategy" in vars(gemini_handler)
+        assert set(gemini_handler.__all__) <= set(dir(gemini_handler))
+        with pytest.raises(AttributeError):
+            gemini_handler.DoesNotExist
+
+    def test_lazy_module_loads_on_attribute_access(self):
+        """Test LazyModule imports on first access and forwards attributes"""
+        lazy = LazyModule("json")
+        assert "not loaded" in repr(lazy)
+        assert lazy.dumps({"a": 1}) == '{"a": 1}'
+        assert "(loaded)" in repr(lazy)
+
+    def test_module_available(self):
+        """Test availability probes do not raise for missing modules"""
+        assert module_available("json")
+        assert not module_available("definitely_not_a_module_xyz")
+
+    def test_parse_importtime(self):
+        """Test -X importtime output is parsed into cumulative ms"""
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        250 |   json.decoder\n"
+            "import time:       500 |       1500 | json\n"
+        )
+        assert parse_importtime(stderr) == {"json.decoder": 0.25, "json": 1.5}
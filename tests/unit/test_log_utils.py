@@ -0,0 +1,75 @@
+# tests/unit/test_log_utils.py
+import io
+import json
+import logging
+
+import pytest
+
+from gemini_handler.log_utils import SAMPLED, SamplingFilter, configure_logging, get_logger
+
+
+@pytest.fixture
+def package_logger():
+    """Restore the package logger's level and handlers after each test"""
+    logger = logging.getLogger("gemini_handler")
+    level, handlers = logger.level, list(logger.handlers)
+    yield logger
+    logger.setLevel(level)
+    logger.handlers[:] = handlers
+
+
+class _Unformattable:
+    """Argument that fails the test if it is ever formatted"""
+
+    def __str__(self):
+        raise AssertionError("debug argument was formatted")
+
+
+class TestLogUtils:
+    """Tests for the logging helpers"""
+
+    def test_get_logger_namespaces_under_package(self):
+        """Test module names and short names map into the package hierarchy"""
+        assert get_logger("gemini_handler.strategies").name == "gemini_handler.strategies"
+        assert get_logger("custom").name == "gemini_handler.custom"
+
+    def test_debug_lines_are_not_formatted_by_default(self, package_logger):
+        """Test the default level skips formatting of per-request debug lines"""
+        stream = io.StringIO()
+        configure_logging(level="WARNING", stream=stream)
+        get_logger("strategies").debug("value %s", _Unformattable(), extra=SAMPLED)
+        assert stream.getvalue() == ""
+
+    def test_json_output_includes_extra_fields(self, package_logger):
+        """Test JSON lines carry level, logger, message and extra fields"""
+        stream = io.StringIO()
+        configure_logging(level="INFO", json_format=True, stream=stream)
+        get_logger("strategies").info("model %s failed", "gemini-pro", extra={"key_index": 2})
+
+        record = json.loads(stream.getvalue())
+        assert record["level"] == "INFO"
+        assert record["logger"] == "gemini_handler.strategies"
+        assert record["message"] == "model gemini-pro failed"
+        assert record["key_index"] == 2
+
+    def test_configure_replaces_previous_handler(self, package_logger):
+        """Test calling configure_logging twice does not duplicate output"""
+        stream = io.StringIO()
+        configure_logging(level="INFO", stream=io.StringIO())
+        configure_logging(level="INFO", stream=stream)
+        get_logger("proxy").info("once")
+        assert stream.getvalue().count("once") == 1
+
+    def test_sampling_filter_drops_only_sampled_debug_lines(self):
+        """Test sampling applies to marked debug records but never to warnings"""
+        sampling = SamplingFilter(rate=0.0)
+
+        def make(level, sampled):
+            record = logging.LogRecord("gemini_handler.x", level, "", 0, "msg", None, None)
+            if sampled:
+                record.sampled = True
+            return record
+
+        assert not sampling.filter(make(logging.DEBUG, True))
+        assert sampling.filter(make(logging.DEBUG, False))
+        assert sampling.filter(make(logging.WARNING, True))
@@ -0,0 +1,107 @@
+# tests/unit/test_message_conversion.py
+import base64
+from unittest.mock import MagicMock, patch
+
+from gemini_handler.message_conversion import MessageConverter
+
+
+class TestMessageConverter:
+    """Tests for the MessageConverter class"""
+
+    def test_roles_and_system_instruction(self):
+        """Test that roles map to Gemini roles and system messages are extracted"""
+        messages = [
+            {"role": "system", "content": "You are helpful."},
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello!"},
+            {"role": "user", "content": "How are you?"},
+        ]
+
+        contents, system_instruction = MessageConverter.to_gemini_contents(messages)
+
+        assert system_instruction == "You are helpful."
+        assert [c["role"] for c in contents] == ["user", "model", "user"]
+        assert contents[0]["parts"] == [{"text": "Hi"}]
+        assert contents[1]["parts"] == [{"text": "Hello!"}]
+
+    def test_no_system_message(self):
+        """Test that system_instruction is None without system messages"""
+        contents, system_instruction = MessageConverter.to_gemini_contents(
+            [{"role": "user", "content": "Hi"}]
+        )
+        assert system_instruction is None
+        assert contents == [{"role": "user", "parts": [{"text": "Hi"}]}]
+
+    def test_consecutive_roles_are_merged(self):
+        """Test that consecutive messages with the same role become one turn"""
+        messages = [
+            {"role": "user", "content": "First"},
+            {"role": "user", "content": "Second"},
+        ]
+        contents, _ = MessageConverter.to_gemini_contents(messages)
+
+        assert len(contents) == 1
+        assert contents[0]["parts"] == [{"text": "First"}, {"text": "Second"}]
+
+    def test_content_parts(self):
+        """Test list content with text and data URI images"""
+        data = base64.b64encode(b"png-bytes").decode()
+        messages = [
+            {"role": "user", "content": [
+                {"type": "text", "text": "Describe"},
+                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{data}"}},
+            ]},
+        ]
+        contents, _ = MessageConverter.to_gemini_contents(messages)
+
+        parts = contents[0]["parts"]
+        assert parts[0] == {"text": "Describe"}
+        assert parts[1]["inline_data"] == {"mime_type": "image/png", "data": b"png-bytes"}
+
+    def test_tool_calls_and_results(self):
+        """Test assistant tool_calls become function_call parts answered by function_response parts"""
+        messages = [
+            {"role": "user", "content": "What is 6 times 7?"},
+            {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_1", "type": "function",
+                "function": {"name": "multiply", "arguments": '{"a": 6, "b": 7}'}
+            }]},
+            {"role": "tool", "tool_call_id": "call_1", "content": "42"},
+        ]
+        contents, _ = MessageConverter.to_gemini_contents(messages)
+
+        assert [c["role"] for c in contents] == ["user", "model", "user"]
+        assert contents[1]["parts"] == [{"function_call": {"name": "multiply", "args": {"a": 6, "b": 7}}}]
+        assert contents[2]["parts"] == [
+            {"function_response": {"name": "multiply", "response": {"content": "42"}}}
+        ]
+
+    def test_tool_result_without_call_is_text(self):
+        """Test a tool result with no matching call in the history is sent as text"""
+        contents, _ = MessageConverter.to_gemini_contents([
+            {"role": "user", "content": "Hi"},
+            {"role": "tool", "name": "lookup", "content": "42"},
+        ])
+        assert contents[0]["parts"][1] == {"text": "Result of lookup: 42"}
+
+    def test_system_only_becomes_user_turn(self):
+        """Test a conversation with only system messages still has contents"""
+        contents, system_instruction = MessageConverter.to_gemini_contents(
+            [{"role": "system", "content": "Write a haiku."}]
+        )
+        assert contents == [{"role": "user", "parts": [{"text": "Write a haiku."}]}]
+        assert system_instruction is None
+
+    def test_image_urls(self):
+        """Test Files API URIs are referenced and other remote images are downloaded inline"""
+        file_uri = "https://generativelanguage.googleapis.com/v1beta/files/abc"
+        assert MessageConverter._url_to_part(file_uri) == {
+            "file_data": {"mime_type": "image/jpeg", "file_uri": file_uri}
+        }
+
+        png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16
+        with patch("requests.get") as mock_get:
+            mock_get.return_value = MagicMock(content=png, headers={"content-type": "image/png"})
+            part = MessageConverter._url_to_part("https://example.com/cat")
+
+        assert part == {"inline_data": {"mime_type": "image/png", "data": png}}
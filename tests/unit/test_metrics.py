@@ -0,0 +1,139 @@
+# tests/unit/test_metrics.py
+from unittest.mock import MagicMock, patch
+
+from gemini_handler.data_models import ModelConfig
+from gemini_handler.key_rotation import KeyRotationManager
+from gemini_handler.metrics import GeminiMetrics, MetricsRegistry
+from gemini_handler.strategies import FallbackStrategy
+
+
+class TestMetricsRegistry:
+    """Tests for the metric families and text rendering"""
+
+    def test_counter_and_gauge_rendering(self):
+        """Test counters and gauges render with escaped labels"""
+        registry = MetricsRegistry()
+        counter = registry.counter("calls_total", "Calls", ("model",))
+        counter.labels('a"b').inc()
+        counter.labels('a"b').inc(2)
+        registry.gauge("in_flight", "In flight").labels().set(3)
+
+        text = registry.render()
+        assert "# TYPE calls_total counter" in text
+        assert 'calls_total{model="a\\"b"} 3.0' in text
+        assert "in_flight 3.0" in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets, sum and count"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", ("model",), buckets=(0.1, 1.0))
+        child = histogram.labels("m")
+        for value in (0.05, 0.1, 0.5, 3.0):
+            child.observe(value)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{model="m",le="0.1"} 2' in text
+        assert 'latency_seconds_bucket{model="m",le="1.0"} 3' in text
+        assert 'latency_seconds_bucket{model="m",le="+Inf"} 4' in text
+        assert 'latency_seconds_count{model="m"} 4' in text
+        assert 'latency_seconds_sum{model="m"} 3.65' in text
+
+    def test_labels_returns_same_child(self):
+        """Test bound children are reused"""
+        counter = MetricsRegistry().counter("x_total", "X", ("a",))
+        assert counter.labels("1") is counter.labels("1")
+
+
+class TestGeminiMetrics:
+    """Tests for the handler metric bundle"""
+
+    def test_key_gauges_are_hashed_and_computed_on_scrape(self):
+        """Test key labels never contain the key and cooldowns reflect rate limits"""
+        key_manager = KeyRotationManager(["secret-key-1", "secret-key-2"], reset_window=60)
+        metrics = GeminiMetrics()
+        metrics.bind_keys(key_manager)
+        key_manager.mark_rate_limited(1)
+
+        text = metrics.render()
+        assert "secret-key" not in text
+        assert f'gemini_key_available{{key="{metrics.key_label(0)}"}} 1.0' in text
+        assert f'gemini_key_available{{key="{metrics.key_label(1)}"}} 0.0' in text
+        cooldown_line = next(
+            line for line in text.splitlines()
+            if line.startswith(f'gemini_key_cooldown_seconds{{key="{metrics.key_label(1)}"}}')
+        )
+        assert 55.0 < float(cooldown_line.split()[-1]) <= 60.0
+
+    def test_request_records_fallbacks(self):
+        """Test attempts beyond the first count as fallbacks; cache hits do not"""
+        metrics = GeminiMetrics()
+        metrics.record_request("m", "success", 0.2, attempts=3)
+        metrics.record_request("m", "cache_hit", 0.001, attempts=0)
+
+        text = metrics.render()
+        assert 'gemini_requests_total{model="m",outcome="success"} 1.0' in text
+        assert 'gemini_requests_total{model="m",outcome="cache_hit"} 1.0' in text
+        assert 'gemini_fallbacks_total{model="m"} 2.0' in text
+        assert 'gemini_attempts_per_request_count{model="m"} 1' in text
+
+    @patch('gemini_handler.strategies.ProxyManager')
+    @patch('gemini_handler.strategies.genai')
+    def test_strategy_records_each_attempt(self, mock_genai, mock_proxy_manager):
+        """Test a fallback records one attempt per model with its outcome"""
+        mock_proxy_manager.get_current_proxy.return_value = {'proxy_string': '10.0.0.1:8080'}
+        success = MagicMock()
+        success.text = "ok"
+        success.candidates = [MagicMock()]
+        success.candidates[0].finish_reason = 1
+        model = MagicMock()
+        model.generate_content.side_effect = [Exception("429 Resource exhausted"), success]
+        mock_genai.GenerativeModel.return_value = model
+
+        key_manager = KeyRotationManager(["k1", "k2"])
+        metrics = GeminiMetrics()
+        metrics.bind_keys(key_manager)
+        config = ModelConfig()
+        config.models = ["model-a", "model-b"]
+        strategy = FallbackStrategy(
+            config=config,
+            key_manager=key_manager,
+            metrics=metrics
+        )
+
+        result = strategy.generate("hello", "model-a")
+
+        assert result.success
+        assert result.attempts == 2
+        text = metrics.render()
+        assert 'model="model-a"' in text and 'outcome="rate_limited"' in text
+        assert f'model="model-b",key="{metrics.key_label(1)}",outcome="success"}} 1.0' in text
+        assert 'gemini_proxy_attempts_total{proxy="10.0.0.1:8080",outcome="rate_limited"} 1.0' in text
+        assert 'gemini_proxy_attempts_total{proxy="10.0.0.1:8080",outcome="success"} 1.0' in text
+        assert 'gemini_proxy_attempt_duration_seconds_count{proxy="10.0.0.1:8080"} 2' in text
+
+    def test_unknown_models_share_other_label(self):
+        """Test model labels are limited to the configured models"""
+        metrics = GeminiMetrics()
+        metrics.bind_models(["model-a"])
+        metrics.bind_keys(KeyRotationManager(["k1"]))
+        for name in ("model-a", "made-up-1", "made-up-2"):
+            metrics.record_request(name, "success", 0.1, attempts=1)
+            metrics.record_attempt(name, 0, None, "success", 0.1)
+
+        text = metrics.render()
+        assert "made-up" not in text
+        assert 'gemini_requests_total{model="other",outcome="success"} 2.0' in text
+        assert f'gemini_attempts_total{{model="model-a",key="{metrics.key_label(0)}",outcome="success"}} 1.0' in text
+        assert len(metrics._attempt_children) == 2
+
+    def test_proxy_labels_are_capped(self):
+        """Test proxies beyond max_proxy_labels share the "other" label"""
+        metrics = GeminiMetrics(max_proxy_labels=2)
+        for proxy in ("p1:1", "p2:2", "p3:3", "p4:4", None):
+            metrics.record_attempt("m", 0, proxy, "success", 0.1)
+
+        text = metrics.render()
+        assert 'gemini_proxy_attempts_total{proxy="p2:2",outcome="success"} 1.0' in text
+        assert 'gemini_proxy_attempts_total{proxy="other",outcome="success"} 2.0' in text
+        assert 'gemini_proxy_attempts_total{proxy="none",outcome="success"} 1.0' in text
+        assert "p3:3" not in text
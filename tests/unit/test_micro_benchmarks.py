@@ -0,0 +1,50 @@
+# tests/unit/test_micro_benchmarks.py
+from benchmarks.micro import all_cases, compare, measure, run_case
+from gemini_handler.proxy import ProxyManager
+
+
+class TestMicroBenchmarks:
+    """Tests for the hot-path microbenchmark runner"""
+
+    def test_measure_reports_time_and_retained_allocations(self):
+        """Test objects kept alive by the operation are counted per call"""
+        kept = []
+
+        def leaky():
+            kept.append(object())
+
+        result = measure(leaky, min_time=0.001, rounds=2, max_memory_calls=100)
+
+        assert result["ns_per_op"] > 0
+        assert result["min_ns_per_op"] <= result["ns_per_op"]
+        assert result["allocs_per_op"] >= 1.0
+        assert result["retained_bytes_per_op"] > 0
+
+    def test_cases_cover_hot_paths(self):
+        """Test the suite includes every required hot path"""
+        names = [case.name for case in all_cases(max_keys=100)]
+        for prefix in (
+            "key_rotation.get_next_key[smart_cooldown,keys=100]",
+            "proxy.get_next_proxy[static]",
+            "server._convert_messages_to_prompt[messages=1000]",
+            "response_handler.process_response[json_large]",
+            "model_response.to_dict[asdict]"
+        ):
+            assert prefix in names
+        assert not any("keys=1000]" in name for name in names)
+
+    def test_proxy_case_restores_manager_state(self):
+        """Test proxy cases leave ProxyManager as they found it"""
+        before = ProxyManager._current_static_proxy
+        case = next(c for c in all_cases(max_keys=1) if c.name == "proxy.get_next_proxy[static]")
+        result = run_case(case, min_time=0.001, rounds=1)
+        assert result.ns_per_op > 0
+        assert ProxyManager._current_static_proxy is before
+
+    def test_compare_flags_slower_cases(self):
+        """Test ns/op and peak bytes/op increases over the threshold are reported"""
+        baseline = {"a": {"ns_per_op": 100.0, "peak_bytes_per_op": 1000}}
+        assert compare(baseline, {"a": {"ns_per_op": 110.0, "peak_bytes_per_op": 1000}}, 0.20) == []
+        regressions = compare(baseline, {"a": {"ns_per_op": 150.0, "peak_bytes_per_op": 2000}, "new": {}}, 0.20)
+        assert compare({"b": {"peak_bytes_per_op": 56}}, {"b": {"peak_bytes_per_op": 104}}, 0.20) == []
+        assert len(regressions) == 2
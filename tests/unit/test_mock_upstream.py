@@ -0,0 +1,160 @@
+# tests/unit/test_mock_upstream.py
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from gemini_handler.config import ConfigLoader
+from gemini_handler.gemini_handler import GeminiHandler
+from gemini_handler.mock_upstream import MockGeminiUpstream, MockUpstreamConfig
+
+
+@pytest.fixture
+def upstream():
+    return MockGeminiUpstream(MockUpstreamConfig(latency_ms=0, stream_chunk_interval_ms=0, seed=1))
+
+
+@pytest.fixture
+def client(upstream):
+    return TestClient(upstream.app)
+
+
+def _generate(client, key="k1", **body):
+    return client.post(
+        "/v1beta/models/gemini-2.0-flash:generateContent",
+        params={"key": key},
+        json={"contents": [{"role": "user", "parts": [{"text": "hello world"}]}], **body}
+    )
+
+
+class TestMockUpstream:
+    """Tests for the offline mock Gemini upstream"""
+
+    def test_generate_content_with_usage(self, client):
+        """Test a generation returns text and token usage"""
+        data = _generate(client).json()
+        assert data["candidates"][0]["content"]["parts"][0]["text"]
+        assert data["candidates"][0]["finishReason"] == "STOP"
+        usage = data["usageMetadata"]
+        assert usage["totalTokenCount"] == usage["promptTokenCount"] + usage["candidatesTokenCount"]
+
+    def test_json_mime_type_returns_json_text(self, client):
+        """Test structured-output requests get JSON text back"""
+        data = _generate(client, generationConfig={"responseMimeType": "application/json"}).json()
+        json.loads(data["candidates"][0]["content"]["parts"][0]["text"])
+
+    def test_rate_limits_per_key(self, upstream, client):
+        """Test 429s for listed keys and for keys over their per-minute limit"""
+        upstream.update_config(rate_limited_keys=["bad"], rate_limit_per_minute=2)
+        assert _generate(client, key="bad").status_code == 429
+        assert [_generate(client, key="k1").status_code for _ in range(3)] == [200, 200, 429]
+        assert _generate(client, key="k2").status_code == 200
+        assert _generate(client, key="bad").json()["error"]["status"] == "RESOURCE_EXHAUSTED"
+
+    def test_invalid_key_and_errors(self, upstream, client):
+        """Test invalid keys and injected server errors"""
+        upstream.update_config(invalid_keys=["nope"])
+        assert "API key not valid" in _generate(client, key="nope").json()["error"]["message"]
+        upstream.update_config(error_rate=1.0, error_status=503)
+        assert _generate(client).status_code == 503
+
+    def test_safety_block(self, upstream, client):
+        """Test injected safety blocks carry no content"""
+        upstream.update_config(safety_block_rate=1.0)
+        candidate = _generate(client).json()["candidates"][0]
+        assert candidate["finishReason"] == "SAFETY"
+        assert "content" not in candidate
+
+    def test_streaming_sse(self, upstream, client):
+        """Test SSE streaming splits the text into chunks with usage on the last one"""
+        upstream.update_config(stream_chunks=3)
+        response = client.post(
+            "/v1beta/models/gemini-2.0-flash:streamGenerateContent",
+            params={"key": "k1", "alt": "sse"},
+            json={"contents": [{"parts": [{"text": "hi"}]}]}
+        )
+        chunks = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+        assert len(chunks) == 3
+        text = "".join(c["candidates"][0]["content"]["parts"][0]["text"] for c in chunks)
+        assert text == upstream.config.response_text
+        assert "usageMetadata" in chunks[-1] and "usageMetadata" not in chunks[0]
+
+    def test_embeddings_are_deterministic(self, client):
+        """Test batch embeddings honour outputDimensionality and repeat for equal texts"""
+        response = client.post(
+            "/v1beta/models/text-embedding-004:batchEmbedContents",
+            params={"key": "k1"},
+            json={"requests": [
+                {"content": {"parts": [{"text": t}]}, "outputDimensionality": 8} for t in ("a", "b", "a")
+            ]}
+        )
+        vectors = [e["values"] for e in response.json()["embeddings"]]
+        assert len(vectors[0]) == 8
+        assert vectors[0] == vectors[2] != vectors[1]
+
+    def test_count_tokens(self, client):
+        """Test countTokens estimates from the text"""
+        response = client.post(
+            "/v1beta/models/gemini-2.0-flash:countTokens",
+            params={"key": "k1"},
+            json={"contents": [{"parts": [{"text": "x" * 40}]}]}
+        )
+        assert response.json() == {"totalTokens": 10}
+
+    def test_resumable_upload_is_key_scoped(self, client):
+        """Test a resumable upload, then access from the owning and another key"""
+        start = client.post(
+            "/upload/v1beta/files",
+            headers={
+                "x-goog-api-key": "k1",
+                "x-goog-upload-protocol": "resumable",
+                "x-goog-upload-command": "start",
+                "x-goog-upload-header-content-type": "text/plain"
+            },
+            json={"file": {"displayName": "notes"}}
+        )
+        upload_url = start.headers["x-goog-upload-url"]
+        finished = client.post(upload_url, headers={"x-goog-upload-command": "upload, finalize"}, content=b"hello")
+        file = finished.json()["file"]
+        assert file["displayName"] == "notes"
+        assert file["mimeType"] == "text/plain"
+        assert file["sizeBytes"] == "5"
+
+        assert client.get(f"/v1beta/{file['name']}", params={"key": "k1"}).json()["state"] == "ACTIVE"
+        assert client.get(f"/v1beta/{file['name']}", params={"key": "k2"}).status_code == 403
+
+        file_part = {"fileData": {"mimeType": "text/plain", "fileUri": file["uri"]}}
+        contents = [{"role": "user", "parts": [file_part, {"text": "summarize"}]}]
+        assert _generate(client, key="k1", contents=contents).status_code == 200
+        assert _generate(client, key="k2", contents=contents).status_code == 403
+
+    def test_unknown_setting_rejected(self, client):
+        """Test POST /mock/config validates setting names"""
+        assert client.post("/mock/config", json={"latency_ms": 5}).json()["latency_ms"] == 5
+        assert client.post("/mock/config", json={"nope": 1}).status_code == 400
+
+
+class TestApiEndpoint:
+    """Tests for pointing the handler at a custom endpoint"""
+
+    def test_env_overrides_config(self, tmp_path, monkeypatch):
+        """Test GEMINI_API_ENDPOINT takes precedence over gemini.api_endpoint"""
+        config_path = tmp_path / "config.yaml"
+        config_path.write_text("gemini:\n  api_endpoint: http://127.0.0.1:9000\n")
+        monkeypatch.delenv("GEMINI_API_ENDPOINT", raising=False)
+        assert ConfigLoader.load_api_endpoint(config_path) == "http://127.0.0.1:9000"
+        monkeypatch.setenv("GEMINI_API_ENDPOINT", "http://127.0.0.1:9001")
+        assert ConfigLoader.load_api_endpoint(config_path) == "http://127.0.0.1:9001"
+
+    @patch('gemini_handler.strategies.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_handler_passes_endpoint_to_clients(self, mock_google_genai, mock_genai):
+        """Test the files client and strategy use the custom endpoint"""
+        handler = GeminiHandler(api_keys=["k1"], api_endpoint="http://127.0.0.1:9000", proxy_settings=None)
+        handler.client  # created on first use
+
+        _, kwargs = mock_google_genai.Client.call_args
+        assert kwargs["http_options"] == {"base_url": "http://127.0.0.1:9000"}
+        assert handler._strategy.api_endpoint == "http://127.0.0.1:9000"
+        assert handler.embedding_handler.api_endpoint == "http://127.0.0.1:9000"
@@ -0,0 +1,164 @@
+# tests/unit/test_response_cache.py
+import time
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from gemini_handler.gemini_handler import GeminiHandler
+from gemini_handler.response_cache import ResponseCache
+from gemini_handler.server import GeminiServer
+
+
+class TestResponseCache:
+    """Tests for the ResponseCache class"""
+
+    def test_key_is_canonical(self):
+        """Test that keys ignore dict ordering but not request content"""
+        key1 = ResponseCache.make_key("m", "p", {"temperature": 0, "top_k": 1}, None)
+        key2 = ResponseCache.make_key("m", "p", {"top_k": 1, "temperature": 0}, None)
+        key3 = ResponseCache.make_key("m", "p", {"top_k": 1, "temperature": 0}, "sys")
+        assert key1 == key2
+        assert key1 != key3
+
+    def test_ttl_expiry(self):
+        """Test entries expire after their TTL"""
+        cache = ResponseCache()
+        cache.set("k", {"text": "a"}, ttl_seconds=0.05)
+        assert cache.get("k") == {"text": "a"}
+        time.sleep(0.06)
+        assert cache.get("k") is None
+
+    def test_lru_eviction_by_size(self):
+        """Test the least recently used entry is evicted when over budget"""
+        cache = ResponseCache(max_memory_bytes=80)
+        cache.set("a", {"text": "x" * 20})
+        cache.set("b", {"text": "y" * 20})
+        cache.get("a")  # a is now most recently used
+        cache.set("c", {"text": "z" * 20})
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        """Test entries are read back from the disk tier"""
+        ResponseCache(cache_dir=tmp_path).set("k", {"text": "persisted"})
+        cache = ResponseCache(cache_dir=tmp_path)
+        assert cache.get("k") == {"text": "persisted"}
+        assert cache.get_stats()["disk_hits"] == 1
+
+    @patch('gemini_handler.strategies.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_handler_serves_hits_without_key_use(self, mock_google_genai, mock_genai, mock_genai_response):
+        """Test cached answers skip the strategy and do not use key quota"""
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = mock_genai_response
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        handler = GeminiHandler(api_keys=["test1"], response_cache=ResponseCache())
+        first = handler.generate_content("Classify: hello", model_name="gemini-2.0-flash")
+        uses_after_first = handler.key_manager.key_stats[0].uses
+        second = handler.generate_content("Classify: hello", model_name="gemini-2.0-flash")
+
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert second["text"] == first["text"]
+        assert mock_model.generate_content.call_count == 1
+        assert handler.key_manager.key_stats[0].uses == uses_after_first
+
+        # Per-request bypass goes upstream again
+        handler.generate_content("Classify: hello", model_name="gemini-2.0-flash", use_cache=False)
+        assert mock_model.generate_content.call_count == 2
+
+    @patch('gemini_handler.strategies.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_entries_are_keyed_on_serving_model(self, mock_google_genai, mock_genai, mock_genai_response):
+        """Test a round-robin response is cached under the model that served it and found from any turn"""
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = mock_genai_response
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        handler = GeminiHandler(api_keys=["test1"], response_cache=ResponseCache())
+        served_by = handler.config.models[0]
+        first = handler.generate_content("Classify: hello", model_name="some-other-model")
+        gen_config = handler._strategy.generation_config.to_dict()
+
+        assert first["model"] == served_by
+        cache = handler.response_cache
+        assert cache.get(cache.make_key(served_by, "Classify: hello", gen_config)) is not None
+        assert cache.get(cache.make_key("some-other-model", "Classify: hello", gen_config)) is None
+
+        # The rotation has moved on, but the cached answer is still found
+        second = handler.generate_content("Classify: hello", model_name="some-other-model")
+        assert second["cached"] is True
+        assert mock_model.generate_content.call_count == 1
+
+    @patch('gemini_handler.strategies.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_entry_with_other_fields_is_a_miss(self, mock_google_genai, mock_genai, mock_genai_response, tmp_path):
+        """Test a disk entry written with a different ModelResponse field set is ignored"""
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = mock_genai_response
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        handler = GeminiHandler(api_keys=["test1"], response_cache=ResponseCache(cache_dir=tmp_path))
+        model = handler.config.models[0]
+        key = handler.response_cache.make_key(model, "hello", handler._strategy.generation_config.to_dict())
+        handler.response_cache.set(key, {"success": True, "model": model, "text": "old", "retired_field": 1})
+
+        result = handler.generate_content("hello", model_name=model)
+
+        assert result["cached"] is False
+        assert result["text"] == mock_genai_response.text
+        assert mock_model.generate_content.call_count == 1
+
+    @patch('gemini_handler.strategies.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_structured_content_honours_use_cache(self, mock_google_genai, mock_genai, mock_genai_response):
+        """Test generate_structured_content passes use_cache through"""
+        mock_genai_response.text = '{"label": "greeting"}'
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = mock_genai_response
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        handler = GeminiHandler(api_keys=["test1"], response_cache=ResponseCache())
+        schema = {"type": "object", "properties": {"label": {"type": "string"}}}
+        for _ in range(2):
+            handler.generate_structured_content("Classify: hello", schema, use_cache=False)
+
+        assert mock_model.generate_content.call_count == 2
+        assert handler.response_cache.get_stats()["sets"] == 0
+
+    def test_from_settings(self, tmp_path):
+        """Test the gemini.response_cache settings build a cache only when enabled"""
+        assert ResponseCache.from_settings(None) is None
+        assert ResponseCache.from_settings({"enabled": False, "ttl": 10}) is None
+
+        cache = ResponseCache.from_settings(
+            {"enabled": True, "max_memory_mb": 1, "ttl": None, "cache_dir": str(tmp_path)}
+        )
+        assert cache.max_memory_bytes == 1024 * 1024
+        assert cache.default_ttl_seconds is None
+        assert cache.cache_dir == tmp_path
+
+    @patch('gemini_handler.strategies.genai')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_server_cache_honours_request_fields(self, mock_google_genai, mock_genai, mock_genai_response):
+        """Test the server builds its cache from settings and requests can bypass it"""
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = mock_genai_response
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        server = GeminiServer(
+            api_keys=["test1"], proxy_settings=None, warmup=False, response_cache={"enabled": True}
+        )
+        body = {"model": "gemini-2.0-flash", "messages": [{"role": "user", "content": "hello"}]}
+
+        with TestClient(server.app) as client:
+            for _ in range(2):
+                assert client.post("/v1/chat/completions", json=body).status_code == 200
+            assert mock_model.generate_content.call_count == 1
+
+            response = client.post("/v1/chat/completions", json={**body, "use_cache": False})
+            assert response.status_code == 200
+            assert mock_model.generate_content.call_count == 2
@@ -0,0 +1,109 @@
+# tests/unit/test_semantic_cache.py
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from gemini_handler.data_models import ModelResponse
+from gemini_handler.semantic_cache import SemanticCache
+
+
+def _embedding_handler(vectors):
+    """Create a mock EmbeddingHandler returning the vector registered for each text"""
+    handler = MagicMock()
+    handler.generate_embeddings.side_effect = lambda content, **kwargs: ModelResponse(
+        success=True, model="embed", embeddings=[vectors[content]]
+    )
+    return handler
+
+
+class TestSemanticCache:
+    """Tests for the SemanticCache class"""
+
+    def test_hit_above_threshold_only(self):
+        """Test near-duplicates hit and dissimilar prompts miss"""
+        vectors = {
+            "What is the capital of France?": [1.0, 0.0, 0.0],
+            "what's the capital of france": [0.99, 0.05, 0.0],
+            "How tall is Everest?": [0.0, 1.0, 0.0],
+        }
+        cache = SemanticCache(_embedding_handler(vectors), similarity_threshold=0.95)
+
+        payload, vector = cache.lookup("What is the capital of France?", "m")
+        assert payload is None
+        cache.add("What is the capital of France?", "m", {"text": "Paris"}, vector=vector)
+
+        assert cache.lookup("what's the capital of france", "m")[0] == {"text": "Paris"}
+        assert cache.lookup("How tall is Everest?", "m")[0] is None
+        # Namespaces are isolated
+        assert cache.lookup("what's the capital of france", "other-model")[0] is None
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["lookups"] == 4
+        assert stats["hit_rate"] == 0.25
+
+    def test_eviction_keeps_namespace_bounded(self):
+        """Test least recently used entries are evicted"""
+        vectors = {f"q{i}": np.eye(4)[i].tolist() for i in range(4)}
+        cache = SemanticCache(_embedding_handler(vectors), max_entries_per_namespace=2)
+
+        for i in range(3):
+            cache.add(f"q{i}", "m", {"text": str(i)})
+
+        assert cache.get_stats()["namespaces"]["m"] == 2
+        assert cache.lookup("q0", "m")[0] is None
+        assert cache.lookup("q2", "m")[0] == {"text": "2"}
+
+    def test_split_prompt(self):
+        """Test only the final user turn is compared and non-text turns are skipped"""
+        assert SemanticCache.split_prompt("hi") == ("hi", 0)
+        assert SemanticCache.split_prompt([{"role": "user", "parts": [{"text": "hi"}]}]) == ("hi", 0)
+
+        history = [{"role": "user", "parts": [{"text": "long chat"}]}, {"role": "model", "parts": [{"text": "ok"}]}]
+        text, context = SemanticCache.split_prompt(history + [{"role": "user", "parts": [{"text": "next?"}]}])
+        assert text == "next?" and context != 0
+
+        image = [{"role": "user", "parts": [{"inline_data": {"mime_type": "image/png", "data": b""}}]}]
+        assert SemanticCache.split_prompt(image) is None
+
+    def test_history_must_match_exactly(self):
+        """Test a near-identical last question in a different conversation misses"""
+        vectors = {"What did we decide?": [1.0, 0.0], "what did we decide": [0.99, 0.05]}
+        cache = SemanticCache(_embedding_handler(vectors))
+        chat = lambda topic, question: [
+            {"role": "user", "parts": [{"text": topic}]},
+            {"role": "model", "parts": [{"text": "noted"}]},
+            {"role": "user", "parts": [{"text": question}]},
+        ]
+
+        text, context = SemanticCache.split_prompt(chat("budget meeting", "What did we decide?"))
+        cache.add(text, "m", {"text": "Cut costs"}, context=context)
+
+        text, context = SemanticCache.split_prompt(chat("budget meeting", "what did we decide"))
+        assert cache.lookup(text, "m", context=context)[0] == {"text": "Cut costs"}
+        text, context = SemanticCache.split_prompt(chat("hiring meeting", "what did we decide"))
+        assert cache.lookup(text, "m", context=context)[0] is None
+
+    def test_per_entry_ttl(self):
+        """Test ttl_seconds passed to add() overrides the default lifetime"""
+        vectors = {"a": [1.0, 0.0], "b": [0.0, 1.0]}
+        cache = SemanticCache(_embedding_handler(vectors), ttl_seconds=3600)
+        cache.add("a", "m", {"text": "A"}, ttl_seconds=-1)
+        cache.add("b", "m", {"text": "B"})
+
+        assert cache.lookup("a", "m")[0] is None
+        assert cache.lookup("b", "m")[0] == {"text": "B"}
+
+    def test_lookup_many_counts_one_lookup(self):
+        """Test searching several model namespaces embeds once and counts as one lookup"""
+        embedder = _embedding_handler({"q": [1.0, 0.0], "other": [0.0, 1.0]})
+        cache = SemanticCache(embedder, similarity_threshold=0.9)
+        _, vector = cache.lookup("q", "model-b")
+        cache.add("q", "model-b", {"text": "b"}, vector=vector)
+
+        assert cache.lookup_many("q", ["model-a", "model-b", "model-c"])[0] == {"text": "b"}
+        assert cache.lookup_many("other", ["model-a", "model-b", "model-c"])[0] is None
+
+        stats = cache.get_stats()
+        assert (stats["lookups"], stats["hits"], stats["misses"]) == (3, 1, 2)
+        assert embedder.generate_embeddings.call_count == 3
@@ -0,0 +1,125 @@
+# tests/unit/test_tracing.py
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from gemini_handler.data_models import ModelConfig
+from gemini_handler.key_rotation import KeyRotationManager
+from gemini_handler.strategies import RetryStrategy
+from gemini_handler.tracing import (
+    NOOP_SPAN, InMemoryExporter, JsonLinesExporter, OTLPHttpExporter, configure_tracing, get_tracer,
+    spans_to_otlp
+)
+
+
+@pytest.fixture
+def exporter():
+    """Enable tracing into memory for one test"""
+    exporter = InMemoryExporter()
+    configure_tracing(exporter)
+    yield exporter
+    configure_tracing(None, enabled=False)
+
+
+class TestTracing:
+    """Tests for spans and exporters"""
+
+    def test_disabled_tracer_returns_noop_span(self):
+        """Test the fast path hands out the shared no-op span"""
+        configure_tracing(None, enabled=False)
+        with get_tracer().span("anything") as span:
+            span.set_attribute("ignored", 1)
+        assert span is NOOP_SPAN
+
+    def test_nested_spans_share_trace(self, exporter):
+        """Test child spans get the parent's trace id and span id"""
+        tracer = get_tracer()
+        with tracer.span("parent") as parent:
+            with tracer.span("child", {"model": "m"}):
+                pass
+
+        child, finished_parent = exporter.spans
+        assert finished_parent is parent
+        assert child.trace_id == parent.trace_id
+        assert child.parent_id == parent.span_id
+        assert child.attributes == {"model": "m"}
+        assert parent.parent_id is None
+
+    def test_exception_marks_span_as_error(self, exporter):
+        """Test an exception leaving a span sets its status"""
+        with pytest.raises(ValueError):
+            with get_tracer().span("failing"):
+                raise ValueError("boom")
+        assert exporter.spans[0].status == "error"
+        assert "boom" in exporter.spans[0].status_message
+
+    def test_json_lines_exporter(self, tmp_path):
+        """Test finished spans are appended as JSON lines"""
+        path = tmp_path / "traces.jsonl"
+        configure_tracing(JsonLinesExporter(path))
+        try:
+            with get_tracer().span("one"):
+                pass
+        finally:
+            configure_tracing(None, enabled=False)
+
+        record = json.loads(path.read_text().strip())
+        assert record["name"] == "one"
+        assert record["duration_ms"] >= 0
+
+    def test_otlp_payload(self, exporter):
+        """Test spans convert to the OTLP/JSON structure"""
+        with get_tracer().span("parent"):
+            with get_tracer().span("child", {"attempt": 2, "model": "m"}):
+                pass
+
+        payload = spans_to_otlp(exporter.spans)
+        spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert spans[0]["parentSpanId"] == spans[1]["spanId"]
+        assert {"key": "attempt", "value": {"intValue": "2"}} in spans[0]["attributes"]
+
+    @patch('gemini_handler.tracing.logger')
+    @patch('gemini_handler.tracing.spans_to_otlp')
+    @patch('requests.post')
+    def test_otlp_buffer_drops_oldest_spans(self, mock_post, mock_to_otlp, mock_logger):
+        """Test the OTLP buffer is bounded and dropped spans are reported"""
+        mock_to_otlp.side_effect = lambda batch, service_name: list(batch)
+        exporter = OTLPHttpExporter(max_batch_size=100, flush_interval=60, max_buffer_size=3)
+        try:
+            for span in range(5):
+                exporter.export(span)
+            exporter.flush()
+        finally:
+            exporter.shutdown()
+
+        assert mock_post.call_args.kwargs["json"] == [2, 3, 4]
+        assert mock_logger.warning.call_args.args[1] == 2
+
+    @patch('gemini_handler.strategies.ProxyManager')
+    @patch('gemini_handler.strategies.genai')
+    def test_strategy_spans(self, mock_genai, mock_proxy_manager, exporter):
+        """Test each attempt records key acquisition, upstream call and parsing"""
+        mock_proxy_manager.get_current_proxy.return_value = None
+        success = MagicMock()
+        success.text = "ok"
+        success.candidates = [MagicMock()]
+        success.candidates[0].finish_reason = 1
+        model = MagicMock()
+        model.generate_content.side_effect = [Exception("429 Resource exhausted"), success]
+        mock_genai.GenerativeModel.return_value = model
+
+        config = ModelConfig()
+        config.models = ["model-a"]
+        config.retry_delay = 0
+        strategy = RetryStrategy(config=config, key_manager=KeyRotationManager(["k1", "k2"]))
+
+        assert strategy.generate("hello", "model-a").success
+
+        attempts = [s for s in exporter.spans if s.name == "gemini.attempt"]
+        assert [s.attributes["attempt"] for s in attempts] == [1, 2]
+        assert attempts[0].status == "error"
+        assert attempts[0].attributes["outcome"] == "rate_limited"
+        assert attempts[1].attributes["outcome"] == "success"
+        children = {s.name for s in exporter.spans if s.parent_id == attempts[1].span_id}
+        assert children == {"key.acquire", "gemini.upstream", "gemini.parse"}
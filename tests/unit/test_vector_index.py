@@ -0,0 +1,94 @@
+# tests/unit/test_vector_index.py
+import numpy as np
+import pytest
+
+from gemini_handler.vector_index import IVFIndex, VectorIndex
+
+
+def _clustered_vectors(n_clusters=8, per_cluster=64, dim=16, seed=0):
+    """Create well-separated clusters of random vectors"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    return np.concatenate([
+        center + 0.05 * rng.normal(size=(per_cluster, dim)) for center in centers
+    ]).astype(np.float32)
+
+
+class TestVectorIndex:
+    """Tests for the VectorIndex class"""
+
+    def test_batched_top_k_matches_brute_force(self):
+        """Test search returns the same ranking as full cosine similarity"""
+        data = _clustered_vectors()
+        index = VectorIndex(initial_capacity=4)
+        index.add(data[:100])
+        index.add(list(data[100:]))
+
+        queries = data[[3, 200, 400]] + 0.01
+        scores, ids = index.search(queries, k=5)
+
+        normalized = data / np.linalg.norm(data, axis=1, keepdims=True)
+        q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        expected = np.argsort(-(q @ normalized.T), axis=1)[:, :5]
+
+        assert len(index) == len(data)
+        assert ids == expected.tolist()
+        assert np.all(np.diff(scores, axis=1) <= 0)
+
+    def test_custom_ids_and_dimension_check(self):
+        """Test ids are returned as given and mismatched dimensions are rejected"""
+        index = VectorIndex()
+        index.add([[1.0, 0.0], [0.0, 1.0]], ids=["a", "b"])
+
+        _, ids = index.search([0.1, 0.9], k=1)
+        assert ids == [["b"]]
+        with pytest.raises(ValueError):
+            index.add([[1.0, 0.0, 0.0]])
+
+    def test_save_and_memory_mapped_load(self, tmp_path):
+        """Test a saved index reloads memory-mapped and can still grow"""
+        index = VectorIndex()
+        index.add(_clustered_vectors(per_cluster=4), ids=[f"doc-{i}" for i in range(32)])
+        index.save(tmp_path)
+
+        loaded = VectorIndex.load(tmp_path)
+        assert isinstance(loaded._vectors, np.memmap)
+        assert loaded.search(index.vectors[7], k=1)[1] == [["doc-7"]]
+
+        loaded.add([np.ones(16)], ids=["new"])
+        assert loaded.search(np.ones(16), k=1)[1] == [["new"]]
+
+
+class TestIVFIndex:
+    """Tests for the IVFIndex class"""
+
+    @pytest.mark.parametrize("pq_subvectors", [None, 4])
+    def test_recall_on_clustered_data(self, pq_subvectors):
+        """Test approximate search returns neighbours from the query's own cluster"""
+        data = _clustered_vectors(per_cluster=64)
+        index = IVFIndex(dim=16, n_lists=8, n_probe=2, pq_subvectors=pq_subvectors)
+        index.train(data)
+        index.add(data)
+
+        rows = np.arange(0, len(data), 37)
+        _, ids = index.search(data[rows], k=5)
+        same_cluster = [all(found // 64 == row // 64 for found in result) for row, result in zip(rows, ids)]
+        assert np.mean(same_cluster) >= 0.9
+        if pq_subvectors is None:
+            assert all(result[0] == row for row, result in zip(rows, ids))
+
+    def test_save_and_load(self, tmp_path):
+        """Test an IVF-PQ index round-trips through save/load"""
+        data = _clustered_vectors()
+        index = IVFIndex(dim=16, n_lists=8, n_probe=2, pq_subvectors=4)
+        index.train(data)
+        index.add(data)
+        index.save(tmp_path)
+
+        loaded = IVFIndex.load(tmp_path)
+        np.testing.assert_array_equal(loaded.search(data[:3], k=3)[0], index.search(data[:3], k=3)[0])
+
+    def test_add_requires_training(self):
+        """Test adding to an untrained index fails"""
+        with pytest.raises(RuntimeError):
+            IVFIndex(dim=4).add([[1.0, 0.0, 0.0, 0.0]])
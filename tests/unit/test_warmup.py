@@ -0,0 +1,90 @@
+# tests/unit/test_warmup.py
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from gemini_handler.gemini_handler import GeminiHandler
+from gemini_handler.mock_upstream import MockGeminiUpstream, MockUpstreamConfig
+from gemini_handler.server import GeminiServer
+
+
+@pytest.fixture
+def upstream():
+    mock = MockGeminiUpstream(MockUpstreamConfig(latency_ms=0, invalid_keys=["bad"]))
+    url = mock.start()
+    yield mock, url
+    mock.stop()
+
+
+class TestWarmup:
+    """Tests for fast construction, warmup() and readiness"""
+
+    @patch('gemini_handler.gemini_handler.ProxyManager')
+    @patch('gemini_handler.gemini_handler.google_genai')
+    def test_constructor_defers_clients_and_auto_proxy(self, mock_google_genai, mock_proxy_manager):
+        """Test construction creates no files client and fetches no auto proxies"""
+        handler = GeminiHandler(api_keys=["k1", "k2"], proxy_settings={"auto_proxy": {"auto_update": False}})
+
+        mock_google_genai.Client.assert_not_called()
+        mock_proxy_manager.configure_proxy.assert_not_called()
+        assert all(stats.uses == 0 for stats in handler.key_manager.key_stats.values())
+        assert not handler.ready
+
+        assert handler.file_handler.client is handler.client
+        assert mock_google_genai.Client.call_count == 1
+        mock_proxy_manager.configure_proxy.assert_called_once()
+
+    def test_warmup_probes_keys_and_prefetches_models(self, upstream):
+        """Test warmup validates every key, opens clients and stores the model list"""
+        mock, url = upstream
+        handler = GeminiHandler(api_keys=["k1", "bad", "k3"], proxy_settings=None, api_endpoint=url)
+
+        status = handler.warmup()
+
+        assert status["ready"] and handler.ready
+        assert status["invalid_keys"] == [1]
+        assert "gemini-2.0-flash" in handler.available_models
+        assert set(handler.embedding_handler._clients) == {"k1", "bad", "k3"}
+        assert mock.get_stats()["status_400"] == 1
+
+    def test_awarmup_without_validation(self, upstream):
+        """Test awarmup runs in a thread and probes only one key for the model list"""
+        mock, url = upstream
+        handler = GeminiHandler(api_keys=["k1", "bad"], proxy_settings=None, api_endpoint=url)
+
+        status = asyncio.run(handler.awarmup(validate_keys=False))
+
+        assert status["ready"]
+        assert status["invalid_keys"] == []
+        assert handler.available_models
+        assert "status_400" not in mock.get_stats()
+
+    def test_server_ready_after_background_warmup(self, upstream):
+        """Test /health is live at once and /ready turns 200 once warmup finishes"""
+        _, url = upstream
+        server = GeminiServer(api_keys=["k1"], api_endpoint=url, proxy_settings=None)
+
+        with TestClient(server.app) as client:
+            assert client.get("/health").status_code == 200
+            deadline = time.monotonic() + 10
+            while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert client.get("/ready").json()["status"] == "ready"
+            models = [m["id"] for m in client.get("/v1/models").json()["data"]]
+            assert "gemini-embedding-exp-03-07" in models
+
+    def test_server_not_ready_when_all_keys_invalid(self, upstream):
+        """Test /ready reports failure when no key passes the probe"""
+        _, url = upstream
+        server = GeminiServer(api_keys=["bad"], api_endpoint=url, proxy_settings=None)
+
+        with TestClient(server.app) as client:
+            deadline = time.monotonic() + 10
+            while server.handler.warmup_status is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            response = client.get("/ready")
+            assert response.status_code == 503
+            assert response.json()["status"] == "failed"